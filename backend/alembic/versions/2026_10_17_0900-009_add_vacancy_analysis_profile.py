@@ -0,0 +1,31 @@
+"""Add AI analysis profile (must-haves) to vacancies
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSON
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """
+    Профиль вакансии для AI анализа вычисляется один раз на содержимое вакансии
+    analysis_profile_hash - хеш полей вакансии, по которым профиль построен
+    """
+    op.add_column('vacancies', sa.Column('analysis_profile', JSON, nullable=True))
+    op.add_column('vacancies', sa.Column('analysis_profile_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    """Remove vacancy analysis profile columns"""
+    op.drop_column('vacancies', 'analysis_profile_hash')
+    op.drop_column('vacancies', 'analysis_profile')
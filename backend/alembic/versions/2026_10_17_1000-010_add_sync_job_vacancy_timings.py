@@ -0,0 +1,29 @@
+"""Add per-vacancy timings to sync_jobs
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSON
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """
+    Вакансии синхронизируются параллельно - время и результат каждой
+    сохраняются в задаче синхронизации
+    """
+    op.add_column('sync_jobs', sa.Column('vacancy_timings', JSON, nullable=True))
+
+
+def downgrade():
+    """Remove vacancy_timings column"""
+    op.drop_column('sync_jobs', 'vacancy_timings')
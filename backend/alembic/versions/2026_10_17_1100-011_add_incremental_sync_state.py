@@ -0,0 +1,31 @@
+"""Add incremental sync state: application content hash and vacancy cursor
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSON
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """
+    content_hash - хеш синхронизируемых полей отклика, неизменённые строки не перезаписываются
+    applications_cursor - счётчики коллекций и последний updated_at откликов вакансии
+    """
+    op.add_column('applications', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('vacancies', sa.Column('applications_cursor', JSON, nullable=True))
+
+
+def downgrade():
+    """Remove incremental sync columns"""
+    op.drop_column('vacancies', 'applications_cursor')
+    op.drop_column('applications', 'content_hash')
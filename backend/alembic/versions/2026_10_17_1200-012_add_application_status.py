@@ -0,0 +1,61 @@
+"""Add normalized application status and analysis state with partial indexes
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """
+    status - коллекция HH.ru, сведённая к response/consider/interview/offer/hired/discard/other
+    analysis_state - pending/analyzed, денормализация наличия analysis_results
+    Выборки непроанализированных откликов идут по индексу вместо LIKE '%...%' и anti-join
+    """
+    op.add_column('applications', sa.Column('status', sa.String(length=20), nullable=True))
+    op.add_column('applications', sa.Column(
+        'analysis_state', sa.String(length=20), server_default='pending', nullable=False
+    ))
+
+    # Порядок веток как в ApplicationStatus.from_collection: discard проверяется первым
+    op.execute("""
+        UPDATE applications SET status = CASE
+            WHEN collection_id LIKE '%discard%' THEN 'discard'
+            WHEN collection_id LIKE '%response%' THEN 'response'
+            WHEN collection_id LIKE '%consider%' THEN 'consider'
+            WHEN collection_id LIKE '%interview%' THEN 'interview'
+            WHEN collection_id LIKE '%offer%' THEN 'offer'
+            WHEN collection_id LIKE '%hired%' THEN 'hired'
+            ELSE 'other'
+        END
+        WHERE collection_id IS NOT NULL AND collection_id <> ''
+    """)
+    op.execute("""
+        UPDATE applications SET analysis_state = 'analyzed'
+        WHERE EXISTS (SELECT 1 FROM analysis_results WHERE analysis_results.application_id = applications.id)
+    """)
+
+    op.create_index(
+        'ix_applications_unanalyzed', 'applications', ['vacancy_id', 'status'],
+        postgresql_where=sa.text("analysis_state = 'pending'")
+    )
+    op.create_index(
+        'ix_applications_vacancy_status', 'applications', ['vacancy_id', 'status', 'analysis_state']
+    )
+
+
+def downgrade():
+    """Remove application status columns"""
+    op.drop_index('ix_applications_vacancy_status', table_name='applications')
+    op.drop_index('ix_applications_unanalyzed', table_name='applications')
+    op.drop_column('applications', 'analysis_state')
+    op.drop_column('applications', 'status')
@@ -0,0 +1,61 @@
+"""Move analysis and resume JSON to JSONB and add generated columns from raw_result
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSON, JSONB
+
+# revision identifiers, used by Alembic.
+revision = '013'
+down_revision = '012'
+branch_labels = None
+depends_on = None
+
+# Выражения совпадают с Computed в app/models/application.py.
+# must_have_missing приводится к INTEGER только для строки из цифр: дробное число
+# или текст в старых результатах дают NULL, а не ошибку миграции
+GENERATED_COLUMNS = [
+    ('verdict', sa.Text(),
+     "CASE raw_result ->> 'verdict' "
+     "WHEN 'GREEN' THEN 'High' WHEN 'YELLOW' THEN 'Medium' WHEN 'RED' THEN 'Low' "
+     "ELSE raw_result ->> 'verdict' END"),
+    ('priority', sa.Text(), "raw_result ->> 'priority'"),
+    ('must_have_missing', sa.Integer(),
+     "CASE WHEN raw_result ->> 'must_have_missing' <> '' "
+     "AND TRIM(raw_result ->> 'must_have_missing', '0123456789') = '' "
+     "THEN CAST(raw_result ->> 'must_have_missing' AS INTEGER) END"),
+    ('salary_status', sa.Text(), "raw_result ->> 'salary_status'"),
+    ('one_liner', sa.Text(), "COALESCE(NULLIF(raw_result ->> 'one_liner', ''), raw_result ->> 'verdict_reason')"),
+]
+
+
+def upgrade():
+    """
+    raw_result и resume_data - JSONB
+    verdict, priority, must_have_missing, salary_status, one_liner - STORED генерируемые
+    колонки из raw_result: фильтры и сортировка шортлиста выполняются в SQL без загрузки JSON
+    """
+    op.alter_column('analysis_results', 'raw_result', type_=JSONB, postgresql_using='raw_result::jsonb')
+    op.alter_column('applications', 'resume_data', type_=JSONB, postgresql_using='resume_data::jsonb')
+
+    for name, column_type, expression in GENERATED_COLUMNS:
+        op.add_column('analysis_results', sa.Column(name, column_type, sa.Computed(expression, persisted=True)))
+
+    op.create_index(
+        'ix_analysis_results_verdict_priority', 'analysis_results',
+        ['verdict', 'priority', 'must_have_missing']
+    )
+
+
+def downgrade():
+    """Remove generated columns and return to JSON"""
+    op.drop_index('ix_analysis_results_verdict_priority', table_name='analysis_results')
+    for name, _, _ in reversed(GENERATED_COLUMNS):
+        op.drop_column('analysis_results', name)
+
+    op.alter_column('applications', 'resume_data', type_=JSON, postgresql_using='resume_data::json')
+    op.alter_column('analysis_results', 'raw_result', type_=JSON, postgresql_using='raw_result::json')
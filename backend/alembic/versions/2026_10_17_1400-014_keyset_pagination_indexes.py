@@ -0,0 +1,46 @@
+"""Add composite indexes for keyset pagination of list endpoints
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# Таблицы поиска резюме и загруженных кандидатов миграциями не создаются (create_all в development) -
+# индекс добавляется, только если таблица есть; при create_all он создаётся из модели
+OPTIONAL_TABLE_INDEXES = [
+    ('ix_search_candidates_search_created', 'search_candidates', ['search_id', 'created_at', 'id']),
+    ('ix_uploaded_candidates_user_created', 'uploaded_candidates', ['user_id', 'created_at', 'id']),
+]
+
+# revision identifiers, used by Alembic.
+revision = '014'
+down_revision = '013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """
+    Списки с курсором (created_at DESC, id DESC) внутри вакансии/пользователя/поиска
+    читаются по индексу с позиции курсора - без сортировки и OFFSET
+    """
+    op.create_index('ix_applications_vacancy_created', 'applications', ['vacancy_id', 'created_at', 'id'])
+    op.create_index('ix_vacancies_user_created', 'vacancies', ['user_id', 'created_at', 'id'])
+
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in OPTIONAL_TABLE_INDEXES:
+        if inspector.has_table(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    """Remove keyset pagination indexes"""
+    inspector = sa.inspect(op.get_bind())
+    for name, table, _ in reversed(OPTIONAL_TABLE_INDEXES):
+        if inspector.has_table(table) and name in {index['name'] for index in inspector.get_indexes(table)}:
+            op.drop_index(name, table_name=table)
+    op.drop_index('ix_vacancies_user_created', table_name='vacancies')
+    op.drop_index('ix_applications_vacancy_created', table_name='applications')
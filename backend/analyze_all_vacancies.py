@@ -10,9 +10,9 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from app.database import SessionLocal
 from app.models.vacancy import Vacancy
-from app.models.application import Application, AnalysisResult
+from app.models.application import Application, AnalysisState, ApplicationStatus, collection_condition
 from app.services.ai_analyzer import AIAnalyzer
-from sqlalchemy import or_, and_, not_
+from app.workers.analysis_pipeline import save_analysis_result
 
 async def analyze_vacancy(vacancy_id: str, vacancy_title: str):
     """Анализ всех неанализированных откликов для одной вакансии"""
@@ -20,19 +20,10 @@ async def analyze_vacancy(vacancy_id: str, vacancy_title: str):
 
     try:
         # Найти неанализированные отклики (response и consider, БЕЗ discard)
-        unanalyzed = db.query(Application).outerjoin(
-            AnalysisResult,
-            Application.id == AnalysisResult.application_id
-        ).filter(
+        unanalyzed = db.query(Application).filter(
             Application.vacancy_id == vacancy_id,
-            AnalysisResult.id == None,
-            and_(
-                or_(
-                    Application.collection_id.like("%response%"),
-                    Application.collection_id.like("%consider%")
-                ),
-                not_(Application.collection_id.like("%discard%"))
-            )
+            Application.analysis_state == AnalysisState.pending.value,
+            collection_condition()
         ).all()
 
         print(f'\n[START] Vacancy: {vacancy_title}')
@@ -44,8 +35,8 @@ async def analyze_vacancy(vacancy_id: str, vacancy_title: str):
             return
 
         # Разбивка по коллекциям
-        response_count = sum(1 for app in unanalyzed if 'response' in app.collection_id)
-        consider_count = sum(1 for app in unanalyzed if 'consider' in app.collection_id)
+        response_count = sum(1 for app in unanalyzed if app.status == ApplicationStatus.response.value)
+        consider_count = sum(1 for app in unanalyzed if app.status == ApplicationStatus.consider.value)
 
         print(f'    - response (new): {response_count}')
         print(f'    - consider (reviewing): {consider_count}')
@@ -84,26 +75,8 @@ async def analyze_vacancy(vacancy_id: str, vacancy_title: str):
                     continue
 
                 # Сохранение
-                analysis_result = AnalysisResult(
-                    application_id=application.id,
-                    score=ai_result.get("score"),
-                    skills_match=ai_result.get("skills_match"),
-                    experience_match=ai_result.get("experience_match"),
-                    salary_match=ai_result.get("salary_match"),
-                    strengths=ai_result.get("strengths", []),
-                    weaknesses=ai_result.get("weaknesses", []),
-                    red_flags=ai_result.get("red_flags", []),
-                    recommendation=ai_result.get("recommendation"),
-                    reasoning=ai_result.get("reasoning"),
-                    ai_model=ai_result.get("ai_model"),
-                    ai_tokens_used=ai_result.get("ai_tokens_used"),
-                    ai_cost_rub=ai_result.get("ai_cost_rub"),
-                    processing_time_ms=ai_result.get("processing_time_ms"),
-                    raw_result=ai_result
-                )
-
-                db.add(analysis_result)
-                db.commit()
+                # Вместе с результатом проставляет analyzed_at и analysis_state
+                save_analysis_result(db, str(application.id), ai_result)
 
                 print(f'    [OK] score={ai_result.get("score")}, recommendation={ai_result.get("recommendation")}')
                 successful += 1
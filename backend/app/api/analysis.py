@@ -2,12 +2,15 @@
 API endpoints для AI анализа резюме
 Запуск анализа, получение результатов, экспорт
 """
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List, Dict, Any, Optional
 
-from app.database import get_db
+from app.database import get_async_db, AsyncSessionLocal
 from app.api.auth import get_current_user
 from app.schemas.base import APIResponse
 from app.schemas.analysis import (
@@ -15,23 +18,103 @@ from app.schemas.analysis import (
     AnalysisFilter, AnalysisStats, ExportRequest
 )
 from app.models.vacancy import Vacancy
-from app.models.application import Application, AnalysisResult
+from app.models.application import Application, AnalysisResult, AnalysisState, ApplicationStatus, collection_condition
 from app.services.ai_analyzer import AIAnalyzer
 from app.utils.exceptions import AIAnalysisError, ValidationError
 from app.utils.response import success, created, bad_request, unauthorized, not_found, internal_error
 from app.utils.logger import get_logger
+from app.utils.pagination import Keyset, SortKey, cursor_pagination
 
 logger = get_logger(__name__)
 
 router = APIRouter()
 
 
+async def _queue_analysis(
+    background_tasks: BackgroundTasks,
+    db: AsyncSession,
+    application_ids: List[str],
+    user_id: str,
+    force_reanalysis: bool = False,
+    vacancy_id: Optional[str] = None,
+    priority: str = "interactive"
+) -> Dict[str, Any]:
+    """
+    Постановка анализа в планировщик (честная очередь между пользователями)
+
+    Вес и лимит одновременных чанков берутся из тарифа пользователя.
+    Если Redis недоступен, анализ выполняется в BackgroundTasks текущего процесса
+    (без статуса задачи и отмены). Планировщик работает с синхронным Redis -
+    вызовы идут в пуле потоков, чтобы медленный Redis не останавливал event loop
+    """
+    from app.workers.scheduler import get_scheduler, tenant_policy
+    from app.workers.analysis_jobs import run_ai_analysis_batch
+    import uuid
+
+    try:
+        weight, max_inflight = await db.run_sync(tenant_policy, user_id)
+        job_id = await run_in_threadpool(
+            get_scheduler().submit,
+            application_ids,
+            user_id,
+            weight=weight,
+            max_inflight=max_inflight,
+            priority=priority,
+            force_reanalysis=force_reanalysis,
+            vacancy_id=vacancy_id
+        )
+        return {
+            "job_id": job_id,
+            "queue": "scheduler",
+            "priority": priority,
+            "events_url": f"/api/analysis/job/{job_id}/events"
+        }
+    except Exception as e:
+        logger.warning(f"Очередь анализа недоступна, анализ выполняется в процессе API: {e}")
+        background_tasks.add_task(run_ai_analysis_batch, application_ids, user_id, force_reanalysis)
+        return {"job_id": str(uuid.uuid4()), "queue": "inline"}
+
+
+VERDICT_RANK = {"High": 0, "Medium": 1, "Low": 2}
+PRIORITY_RANK = {"top": 0, "strong": 1}
+
+
+def _shortlist_order() -> tuple:
+    """Сортировка результатов: вердикт, приоритет, затем score"""
+    return (
+        case(VERDICT_RANK, value=AnalysisResult.verdict, else_=3),
+        case(PRIORITY_RANK, value=AnalysisResult.priority, else_=2),
+        AnalysisResult.score.desc().nulls_last()
+    )
+
+
+# Курсорная пагинация /results: порядок как у offset-списка, id - для однозначности.
+# Результаты без score идут последними (coalesce с -1)
+_SCORE_KEY = SortKey(
+    func.coalesce(AnalysisResult.score, -1),
+    lambda row: row.score if row.score is not None else -1,
+    descending=True
+)
+_ID_KEY = SortKey(AnalysisResult.id, lambda row: str(row.id))
+
+RESULTS_KEYSETS = {
+    "score": Keyset("analysis.score", _SCORE_KEY, _ID_KEY),
+    "verdict": Keyset(
+        "analysis.verdict",
+        SortKey(case(VERDICT_RANK, value=AnalysisResult.verdict, else_=3), lambda row: VERDICT_RANK.get(row.verdict, 3)),
+        SortKey(case(PRIORITY_RANK, value=AnalysisResult.priority, else_=2), lambda row: PRIORITY_RANK.get(row.priority, 2)),
+        _SCORE_KEY,
+        _ID_KEY
+    )
+}
+
+
 @router.post("/start", response_model=APIResponse)
 async def start_analysis(
     analysis_request: AnalysisRequest,
     background_tasks: BackgroundTasks,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Запуск AI анализа резюме
@@ -39,16 +122,16 @@ async def start_analysis(
     """
     try:
         from app.models.application import Application
-        from app.workers.analysis_jobs import run_ai_analysis_batch
-        import uuid
 
         applications_count = len(analysis_request.application_ids)
 
         # Проверка существования откликов и принадлежности пользователю
-        applications = db.query(Application).join(Application.vacancy).filter(
-            Application.id.in_(analysis_request.application_ids),
-            Application.vacancy.has(user_id=current_user.id)
-        ).all()
+        applications = (await db.scalars(
+            select(Application.id).join(Application.vacancy).where(
+                Application.id.in_(analysis_request.application_ids),
+                Vacancy.user_id == current_user.id
+            )
+        )).all()
 
         if len(applications) != applications_count:
             raise HTTPException(
@@ -59,18 +142,17 @@ async def start_analysis(
                 }
             )
 
-        job_id = str(uuid.uuid4())
-
-        # Запуск анализа в фоновой задаче (без передачи db - создаётся внутри)
-        background_tasks.add_task(
-            run_ai_analysis_batch,
-            analysis_request.application_ids,
-            current_user.id,
+        # Постановка в очередь анализа (без передачи db - сессия создаётся в воркере)
+        job = await _queue_analysis(
+            background_tasks,
+            db,
+            [str(application_id) for application_id in analysis_request.application_ids],
+            str(current_user.id),
             analysis_request.force_reanalysis
         )
 
         analysis_data = {
-            "job_id": job_id,
+            **job,
             "message": "Анализ поставлен в очередь",
             "applications_queued": applications_count,
             "estimated_time_seconds": applications_count * 15  # 15 сек на резюме
@@ -105,7 +187,7 @@ async def start_analysis_new_applications(
     limit: Optional[int] = None,
     background_tasks: BackgroundTasks = BackgroundTasks(),
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Запуск анализа ТОЛЬКО новых (непроанализированных) откликов
@@ -121,14 +203,14 @@ async def start_analysis_new_applications(
         from app.models.application import Application, AnalysisResult
         from app.models.vacancy import Vacancy
         from app.models.subscription import Subscription, SubscriptionStatus
-        from app.workers.analysis_jobs import run_ai_analysis_batch
-        import uuid
 
         # ПРОВЕРКА ЛИМИТОВ ПОДПИСКИ
-        active_subscription = db.query(Subscription).filter(
-            Subscription.user_id == current_user.id,
-            Subscription.status.in_([SubscriptionStatus.active, SubscriptionStatus.trial])
-        ).first()
+        active_subscription = await db.scalar(
+            select(Subscription).options(selectinload(Subscription.plan)).where(
+                Subscription.user_id == current_user.id,
+                Subscription.status.in_([SubscriptionStatus.active, SubscriptionStatus.trial])
+            ).limit(1)
+        )
 
         if not active_subscription:
             raise HTTPException(
@@ -156,10 +238,12 @@ async def start_analysis_new_applications(
             )
 
         # Проверка существования вакансии и принадлежности пользователю
-        vacancy = db.query(Vacancy).filter(
-            Vacancy.id == vacancy_id,
-            Vacancy.user_id == current_user.id
-        ).first()
+        vacancy = await db.scalar(
+            select(Vacancy.id).where(
+                Vacancy.id == vacancy_id,
+                Vacancy.user_id == current_user.id
+            )
+        )
 
         if not vacancy:
             raise HTTPException(
@@ -171,36 +255,21 @@ async def start_analysis_new_applications(
             )
 
         # Найти все непроанализированные отклики
-        query = db.query(Application).outerjoin(
-            AnalysisResult,
-            Application.id == AnalysisResult.application_id
-        ).filter(
+        # (частичный индекс ix_applications_unanalyzed по vacancy_id и status)
+        query = select(Application.id, Application.status).where(
             Application.vacancy_id == vacancy_id,
-            AnalysisResult.id == None  # Нет анализа
+            Application.analysis_state == AnalysisState.pending.value,  # Нет анализа
+            # По умолчанию: response и consider, НО НЕ discard
+            collection_condition(collection_filter)
         )
 
-        # Фильтр по collection_id
-        if collection_filter:
-            # Если указан конкретный фильтр - используем его
-            query = query.filter(Application.collection_id.like(f"%{collection_filter}%"))
-        else:
-            # По умолчанию: анализируем response и consider, НО НЕ discard
-            from sqlalchemy import or_, and_, not_
-            query = query.filter(
-                and_(
-                    or_(
-                        Application.collection_id.like("%response%"),
-                        Application.collection_id.like("%consider%")
-                    ),
-                    not_(Application.collection_id.like("%discard%"))
-                )
-            )
-
         # Применяем limit если указан
         if limit and limit > 0:
             query = query.limit(limit)
 
-        unanalyzed_applications = query.all()
+        unanalyzed_applications = (await db.execute(query)).all()
+        # Новые отклики (response) первыми в пакете, затем остальные коллекции
+        unanalyzed_applications.sort(key=lambda app: app.status != ApplicationStatus.response.value)
         application_ids = [str(app.id) for app in unanalyzed_applications]
 
         logger.info(f"[START-NEW] Найдено {len(application_ids)} непроанализированных откликов (limit={limit if limit else 'не указан'})")
@@ -212,23 +281,15 @@ async def start_analysis_new_applications(
                 "applications_queued": 0
             })
 
-        job_id = str(uuid.uuid4())
         user_id_str = str(current_user.id)
 
-        logger.info(f"[START-NEW] Запуск фоновой задачи: job_id={job_id}, apps={len(application_ids)}, user={user_id_str}")
-
-        # Запуск анализа в фоновой задаче
-        background_tasks.add_task(
-            run_ai_analysis_batch,
-            application_ids,
-            user_id_str,  # Преобразуем UUID в строку
-            False  # НЕ принудительный анализ
-        )
+        # Постановка в очередь анализа (НЕ принудительный анализ)
+        job = await _queue_analysis(background_tasks, db, application_ids, user_id_str, False, vacancy_id=vacancy_id)
 
-        logger.info(f"[START-NEW] Фоновая задача добавлена в очередь")
+        logger.info(f"[START-NEW] Задача поставлена в очередь: job_id={job['job_id']}, queue={job['queue']}, apps={len(application_ids)}, user={user_id_str}")
 
         analysis_data = {
-            "job_id": job_id,
+            **job,
             "message": f"Анализ {len(application_ids)} новых откликов поставлен в очередь",
             "applications_queued": len(application_ids),
             "collection_filter": collection_filter,
@@ -255,7 +316,7 @@ async def reanalyze_all_applications(
     vacancy_id: str,
     background_tasks: BackgroundTasks = BackgroundTasks(),
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Переанализ ВСЕХ проанализированных откликов с новым промптом
@@ -266,14 +327,14 @@ async def reanalyze_all_applications(
     try:
         from app.models.application import Application, AnalysisResult
         from app.models.vacancy import Vacancy
-        from app.workers.analysis_jobs import run_ai_analysis_batch
-        import uuid
 
         # Проверка вакансии
-        vacancy = db.query(Vacancy).filter(
-            Vacancy.id == vacancy_id,
-            Vacancy.user_id == current_user.id
-        ).first()
+        vacancy = await db.scalar(
+            select(Vacancy.id).where(
+                Vacancy.id == vacancy_id,
+                Vacancy.user_id == current_user.id
+            )
+        )
 
         if not vacancy:
             raise HTTPException(
@@ -285,12 +346,14 @@ async def reanalyze_all_applications(
             )
 
         # Получаем ВСЕ отклики, которые уже проанализированы
-        analyzed_applications = db.query(Application).join(
-            AnalysisResult,
-            Application.id == AnalysisResult.application_id
-        ).filter(
-            Application.vacancy_id == vacancy_id
-        ).all()
+        analyzed_applications = (await db.scalars(
+            select(Application.id).join(
+                AnalysisResult,
+                Application.id == AnalysisResult.application_id
+            ).where(
+                Application.vacancy_id == vacancy_id
+            )
+        )).all()
 
         if not analyzed_applications:
             raise HTTPException(
@@ -301,19 +364,22 @@ async def reanalyze_all_applications(
                 }
             )
 
-        application_ids = [str(app.id) for app in analyzed_applications]
-        job_id = str(uuid.uuid4())
+        application_ids = [str(application_id) for application_id in analyzed_applications]
 
-        # Запуск переанализа в фоновой задаче с force_reanalysis=True
-        background_tasks.add_task(
-            run_ai_analysis_batch,
+        # Постановка переанализа с force_reanalysis=True - фоновый класс,
+        # использует ёмкость, не занятую новыми откликами
+        job = await _queue_analysis(
+            background_tasks,
+            db,
             application_ids,
-            str(current_user.id),  # Преобразуем UUID в строку
-            True  # force_reanalysis=True - ключевой параметр!
+            str(current_user.id),
+            True,  # force_reanalysis=True - ключевой параметр!
+            vacancy_id=vacancy_id,
+            priority="bulk"
         )
 
         analysis_data = {
-            "job_id": job_id,
+            **job,
             "message": f"Переанализ {len(application_ids)} резюме с новым промптом запущен",
             "applications_queued": len(application_ids),
             "estimated_time_seconds": len(application_ids) * 15,
@@ -341,58 +407,75 @@ async def reanalyze_all_applications(
 async def get_analysis_results(
     filters: AnalysisFilter = Depends(),
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение результатов AI анализа
     С фильтрацией по различным параметрам
+
+    С параметром cursor - курсорная пагинация (pagination v2): total только по include_total
     """
+    keyset = RESULTS_KEYSETS.get(filters.sort_by, RESULTS_KEYSETS["score"])
+    after = keyset.decode(filters.cursor) if filters.cursor is not None else None
+
     try:
         from app.models.application import Application, AnalysisResult
+        from app.services.list_projections import analysis_list_query, analysis_list_item
 
-        # Базовый запрос: результаты только для откликов пользователя
-        query = db.query(AnalysisResult).join(Application).join(Application.vacancy).filter(
-            Application.vacancy.has(user_id=current_user.id)
+        # Базовый запрос: результаты только для откликов пользователя, только колонки списка
+        # (raw_result целиком отдаёт /results/{analysis_id})
+        query = analysis_list_query().join(Application.vacancy).where(
+            Vacancy.user_id == current_user.id
         )
 
         # Фильтрация по вакансии
         if filters.vacancy_id:
-            query = query.filter(Application.vacancy_id == filters.vacancy_id)
+            query = query.where(Application.vacancy_id == filters.vacancy_id)
 
         # Фильтрация по минимальному score
         if filters.min_score is not None:
-            query = query.filter(AnalysisResult.score >= filters.min_score)
+            query = query.where(AnalysisResult.score >= filters.min_score)
 
         # Фильтрация по максимальному score
         if filters.max_score is not None:
-            query = query.filter(AnalysisResult.score <= filters.max_score)
+            query = query.where(AnalysisResult.score <= filters.max_score)
 
         # Фильтрация по рекомендации
         if filters.recommendation:
-            query = query.filter(AnalysisResult.recommendation == filters.recommendation)
+            query = query.where(AnalysisResult.recommendation == filters.recommendation)
 
-        # Подсчет общего количества
-        total = query.count()
+        # Фильтры по генерируемым колонкам raw_result - в SQL, без загрузки JSON
+        if filters.verdict:
+            query = query.where(AnalysisResult.verdict == filters.verdict)
+        if filters.priority:
+            query = query.where(AnalysisResult.priority == filters.priority)
+        if filters.max_must_have_missing is not None:
+            query = query.where(AnalysisResult.must_have_missing <= filters.max_must_have_missing)
 
-        # Применение пагинации и сортировка по score (высокие сначала)
         limit = filters.limit or 50
+
+        # Подсчет общего количества
+        total = None
+        if filters.cursor is None or filters.include_total:
+            total = await db.scalar(select(func.count()).select_from(query.with_only_columns(AnalysisResult.id).subquery()))
+
+        if filters.cursor is not None:
+            rows, next_cursor = keyset.page((await db.execute(keyset.apply(query, after, limit))).all(), limit)
+            return success(data={
+                "results": [analysis_list_item(row) for row in rows],
+                "pagination": cursor_pagination(next_cursor, total),
+                "filters_applied": filters.model_dump()
+            })
+
+        # Применение пагинации и сортировка по score (высокие сначала) или как в шортлисте
         offset = filters.offset or 0
-        results = query.order_by(AnalysisResult.score.desc().nulls_last()).offset(offset).limit(limit).all()
-
-        # Сериализация с данными кандидата
-        results_data = []
-        for result in results:
-            result_dict = result.to_dict()
-            # Добавляем данные кандидата из связанного отклика
-            if result.application:
-                result_dict['application'] = {
-                    'candidate_name': result.application.candidate_name,
-                    'candidate_email': result.application.candidate_email,
-                    'candidate_phone': result.application.candidate_phone,
-                    'resume_url': result.application.resume_url,
-                    'created_at': result.application.created_at.isoformat() if result.application.created_at else None,
-                }
-            results_data.append(result_dict)
+        order_by = _shortlist_order() if filters.sort_by == "verdict" else (AnalysisResult.score.desc().nulls_last(),)
+        results = await db.execute(
+            query.order_by(*order_by).offset(offset).limit(limit)
+        )
+
+        # Сериализация с данными кандидата из того же запроса
+        results_data = [analysis_list_item(row) for row in results]
 
         return success(data={
             "results": results_data,
@@ -415,25 +498,40 @@ async def get_analysis_results(
 async def get_analysis_result(
     analysis_id: str,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение конкретного результата анализа
-    Детальная информация об одном анализе
+    Детальная информация об одном анализе (полный raw_result: must-haves, вопросы, заключение)
     """
-    # TODO: Реализовать получение конкретного результата
-    return success(data={
-        "status": "TODO",
-        "message": f"Результат анализа {analysis_id} будет реализован",
-        "analysis_id": analysis_id
-    })
+    from app.services.list_projections import application_list_options
+
+    row = (await db.execute(
+        select(AnalysisResult, Application).join(
+            Application, AnalysisResult.application_id == Application.id
+        ).join(Application.vacancy).where(
+            AnalysisResult.id == analysis_id,
+            Vacancy.user_id == current_user.id
+        ).options(application_list_options())
+    )).first()
+
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": "ANALYSIS_NOT_FOUND", "message": "Результат анализа не найден"}
+        )
+
+    result, application = row
+    result_data = result.to_dict()
+    result_data["application"] = application.to_dict()
+    return success(data=result_data)
 
 
 @router.delete("/results/{analysis_id}", response_model=APIResponse)
 async def delete_analysis_result(
     analysis_id: str,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Удаление результата анализа
@@ -452,7 +550,7 @@ async def delete_analysis_result(
 async def get_vacancy_analysis_stats(
     vacancy_id: str,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Статистика анализа по конкретной вакансии
@@ -460,10 +558,12 @@ async def get_vacancy_analysis_stats(
     """
     try:
         # Проверяем права доступа к вакансии
-        vacancy = db.query(Vacancy).filter(
-            Vacancy.id == vacancy_id,
-            Vacancy.user_id == current_user.id
-        ).first()
+        vacancy = await db.scalar(
+            select(Vacancy.id).where(
+                Vacancy.id == vacancy_id,
+                Vacancy.user_id == current_user.id
+            )
+        )
 
         if not vacancy:
             raise HTTPException(
@@ -475,11 +575,13 @@ async def get_vacancy_analysis_stats(
             )
 
         # Получаем все результаты анализа для вакансии
-        results = db.query(AnalysisResult).join(
-            Application, Application.id == AnalysisResult.application_id
-        ).filter(
-            Application.vacancy_id == vacancy_id
-        ).all()
+        results = (await db.scalars(
+            select(AnalysisResult).join(
+                Application, Application.id == AnalysisResult.application_id
+            ).where(
+                Application.vacancy_id == vacancy_id
+            )
+        )).all()
 
         # Подсчитываем статистику
         total = len(results)
@@ -532,7 +634,7 @@ async def export_analysis_to_excel(
     recommendation: Optional[str] = None,
     min_score: Optional[int] = None,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Экспорт проанализированных откликов в Excel с фильтрацией
@@ -548,10 +650,12 @@ async def export_analysis_to_excel(
         from datetime import datetime
 
         # Проверка вакансии
-        vacancy = db.query(Vacancy).filter(
-            Vacancy.id == vacancy_id,
-            Vacancy.user_id == current_user.id
-        ).first()
+        vacancy = await db.scalar(
+            select(Vacancy).where(
+                Vacancy.id == vacancy_id,
+                Vacancy.user_id == current_user.id
+            )
+        )
 
         if not vacancy:
             raise HTTPException(
@@ -560,22 +664,22 @@ async def export_analysis_to_excel(
             )
 
         # Базовый запрос результатов с фильтрацией
-        query = db.query(AnalysisResult, Application).join(
+        query = select(AnalysisResult, Application).join(
             Application,
             AnalysisResult.application_id == Application.id
-        ).filter(
+        ).where(
             Application.vacancy_id == vacancy_id
         )
 
         # Применение фильтров
         if recommendation:
-            query = query.filter(AnalysisResult.recommendation == recommendation)
+            query = query.where(AnalysisResult.recommendation == recommendation)
 
         if min_score is not None:
-            query = query.filter(AnalysisResult.score >= min_score)
+            query = query.where(AnalysisResult.score >= min_score)
 
-        # Сортировка по оценке от большей к меньшей
-        results = query.order_by(AnalysisResult.score.desc().nulls_last()).all()
+        # Порядок шортлиста: High+top → High+strong → ... → Mismatch, внутри по оценке
+        results = (await db.execute(query.order_by(*_shortlist_order()))).all()
 
         if not results:
             raise HTTPException(
@@ -618,7 +722,7 @@ async def export_analysis_to_excel(
 async def get_export_status(
     export_job_id: str,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Проверка статуса экспорта
@@ -641,7 +745,7 @@ async def get_export_status(
 async def download_export_file(
     export_job_id: str,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Скачивание экспортированного Excel файла
@@ -668,51 +772,199 @@ async def download_export_file(
 async def get_analysis_job_status(
     job_id: str,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Проверка статуса фоновой задачи анализа
     Прогресс выполнения и результаты
     """
-    # TODO: Реализовать получение статуса задачи
-    job_status_data = {
-        "job_id": job_id,
-        "status": "processing",
-        "progress": 60,
-        "total_applications": 5,
-        "processed_applications": 3,
-        "successful_analyses": 3,
-        "failed_analyses": 0,
-        "estimated_completion": "2024-01-01T10:02:00",
-        "errors": []
-    }
-
-    return success(data=job_status_data)
+    job = await _get_user_job(job_id, str(current_user.id))
+    return success(data=job)
 
 
 @router.delete("/job/{job_id}", response_model=APIResponse)
 async def cancel_analysis_job(
     job_id: str,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Отмена выполняющейся задачи анализа
     Останавливает фоновую обработку
     """
-    # TODO: Реализовать отмену задачи
+    await _get_user_job(job_id, str(current_user.id))
+
+    try:
+        from app.workers.scheduler import get_scheduler
+        cancelled = await run_in_threadpool(get_scheduler().cancel, job_id)
+    except Exception as e:
+        logger.error(f"Ошибка отмены задачи {job_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={
+                "error": "JOB_CANCEL_ERROR",
+                "message": "Ошибка при отмене задачи"
+            }
+        )
+
+    if not cancelled:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "error": "JOB_ALREADY_FINISHED",
+                "message": "Задача уже завершена"
+            }
+        )
+
     return success(data={
-        "status": "TODO",
-        "message": f"Отмена задачи анализа {job_id} будет реализована",
+        "message": "Задача анализа отменена",
         "job_id": job_id,
         "cancelled": True
     })
 
 
+async def _get_user_job(job_id: str, user_id: str) -> Dict[str, Any]:
+    """Статус пакета анализа пользователя или 404"""
+    from app.workers.scheduler import get_scheduler
+
+    try:
+        job = await run_in_threadpool(get_scheduler().get_batch, job_id)
+    except Exception as e:
+        logger.error(f"Очередь анализа недоступна: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={
+                "error": "QUEUE_UNAVAILABLE",
+                "message": "Очередь задач недоступна"
+            }
+        )
+
+    if not job or job.pop("user_id") != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "error": "JOB_NOT_FOUND",
+                "message": "Задача не найдена"
+            }
+        )
+    return job
+
+
+async def _get_stream_user_id(request: Request, access_token: Optional[str]) -> str:
+    """
+    Аутентификация SSE подключения
+
+    EventSource в браузере не умеет передавать заголовки, поэтому токен
+    принимается и из query (?access_token=). Сессия БД закрывается до начала
+    потока, чтобы долгие подключения не держали соединения пула
+    """
+    from app.services.auth_service import AuthService
+
+    auth_header = request.headers.get("Authorization", "")
+    token = auth_header[7:] if auth_header.lower().startswith("bearer ") else access_token
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail={"error": "INVALID_CREDENTIALS", "message": "Invalid authentication credentials"},
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    async with AsyncSessionLocal() as db:
+        user = await AuthService(db).get_current_user(token)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail={"error": "INVALID_CREDENTIALS", "message": "Invalid authentication credentials"},
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return str(user.id)
+
+
+def _sse_response(stream) -> StreamingResponse:
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # nginx не должен буферизовать поток
+        }
+    )
+
+
+@router.get("/job/{job_id}/events")
+async def stream_analysis_job_events(
+    job_id: str,
+    request: Request,
+    access_token: Optional[str] = Query(None)
+):
+    """
+    SSE поток задачи анализа
+
+    События: progress (счётчики и ETA), result (сводка каждого сохранённого
+    анализа), done (итог задачи). Первым приходит текущий статус задачи
+    """
+    from app.services.analysis_events import stream_events, job_channel, EVENT_PROGRESS, EVENT_DONE
+    from app.workers.scheduler import get_scheduler, BATCH_FINAL_STATUSES
+
+    user_id = await _get_stream_user_id(request, access_token)
+    await _get_user_job(job_id, user_id)
+
+    async def snapshot():
+        # Читается после подписки на канал задачи - done не теряется
+        job_status = await run_in_threadpool(get_scheduler().get_batch, job_id)
+        if not job_status:
+            return [(EVENT_DONE, {"event": EVENT_DONE, "job_id": job_id, "data": None})]
+        job_status.pop("user_id", None)
+        event = EVENT_DONE if job_status["status"] in BATCH_FINAL_STATUSES else EVENT_PROGRESS
+        return [(event, {"event": event, "job_id": job_id, "data": job_status})]
+
+    return _sse_response(stream_events(
+        [job_channel(job_id)],
+        request.is_disconnected,
+        initial=snapshot,
+        stop_on_done=True
+    ))
+
+
+@router.get("/vacancy/{vacancy_id}/events")
+async def stream_vacancy_analysis_events(
+    vacancy_id: str,
+    request: Request,
+    access_token: Optional[str] = Query(None)
+):
+    """
+    SSE поток анализа по вакансии
+
+    Результаты и прогресс всех задач анализа вакансии - замена опроса /results
+    """
+    from app.services.analysis_events import stream_events, vacancy_channel
+
+    user_id = await _get_stream_user_id(request, access_token)
+
+    async with AsyncSessionLocal() as db:
+        vacancy = await db.scalar(
+            select(Vacancy.id).where(
+                Vacancy.id == vacancy_id,
+                Vacancy.user_id == user_id
+            )
+        )
+
+    if not vacancy:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "error": "VACANCY_NOT_FOUND",
+                "message": "Вакансия не найдена"
+            }
+        )
+
+    return _sse_response(stream_events([vacancy_channel(vacancy_id)], request.is_disconnected))
+
+
 @router.get("/dashboard", response_model=APIResponse)
 async def get_analysis_dashboard(
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Dashboard с общей статистикой анализов
@@ -721,86 +973,99 @@ async def get_analysis_dashboard(
     try:
         from app.models.application import Application, AnalysisResult
         from app.models.vacancy import Vacancy
-        from sqlalchemy import func
         from datetime import datetime, timedelta
 
         # Общее количество анализов
-        total_analyses = db.query(func.count(AnalysisResult.id)).join(
-            Application
-        ).join(
-            Vacancy
-        ).filter(
-            Vacancy.user_id == current_user.id
-        ).scalar() or 0
+        total_analyses = await db.scalar(
+            select(func.count(AnalysisResult.id)).join(
+                Application
+            ).join(
+                Vacancy
+            ).where(
+                Vacancy.user_id == current_user.id
+            )
+        ) or 0
 
         # Анализы за этот месяц
         month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        analyses_this_month = db.query(func.count(AnalysisResult.id)).join(
-            Application
-        ).join(
-            Vacancy
-        ).filter(
-            Vacancy.user_id == current_user.id,
-            AnalysisResult.created_at >= month_start
-        ).scalar() or 0
+        analyses_this_month = await db.scalar(
+            select(func.count(AnalysisResult.id)).join(
+                Application
+            ).join(
+                Vacancy
+            ).where(
+                Vacancy.user_id == current_user.id,
+                AnalysisResult.created_at >= month_start
+            )
+        ) or 0
 
         # Средний балл
-        avg_score = db.query(func.avg(AnalysisResult.score)).join(
-            Application
-        ).join(
-            Vacancy
-        ).filter(
-            Vacancy.user_id == current_user.id,
-            AnalysisResult.score.isnot(None)
-        ).scalar() or 0
+        avg_score = await db.scalar(
+            select(func.avg(AnalysisResult.score)).join(
+                Application
+            ).join(
+                Vacancy
+            ).where(
+                Vacancy.user_id == current_user.id,
+                AnalysisResult.score.isnot(None)
+            )
+        ) or 0
 
         # Количество топ кандидатов (score >= 80)
-        top_candidates_count = db.query(func.count(AnalysisResult.id)).join(
-            Application
-        ).join(
-            Vacancy
-        ).filter(
-            Vacancy.user_id == current_user.id,
-            AnalysisResult.score >= 80
-        ).scalar() or 0
+        top_candidates_count = await db.scalar(
+            select(func.count(AnalysisResult.id)).join(
+                Application
+            ).join(
+                Vacancy
+            ).where(
+                Vacancy.user_id == current_user.id,
+                AnalysisResult.score >= 80
+            )
+        ) or 0
 
         # Общая стоимость анализов (в рублях, конвертируем в копейки для совместимости)
-        total_cost_rub = db.query(func.sum(AnalysisResult.ai_cost_rub)).join(
-            Application
-        ).join(
-            Vacancy
-        ).filter(
-            Vacancy.user_id == current_user.id,
-            AnalysisResult.ai_cost_rub.isnot(None)
-        ).scalar() or 0
+        total_cost_rub = await db.scalar(
+            select(func.sum(AnalysisResult.ai_cost_rub)).join(
+                Application
+            ).join(
+                Vacancy
+            ).where(
+                Vacancy.user_id == current_user.id,
+                AnalysisResult.ai_cost_rub.isnot(None)
+            )
+        ) or 0
         total_cost_cents = int(float(total_cost_rub) * 100) if total_cost_rub else 0
 
         # Стоимость за этот месяц
-        cost_this_month_rub = db.query(func.sum(AnalysisResult.ai_cost_rub)).join(
-            Application
-        ).join(
-            Vacancy
-        ).filter(
-            Vacancy.user_id == current_user.id,
-            AnalysisResult.created_at >= month_start,
-            AnalysisResult.ai_cost_rub.isnot(None)
-        ).scalar() or 0
+        cost_this_month_rub = await db.scalar(
+            select(func.sum(AnalysisResult.ai_cost_rub)).join(
+                Application
+            ).join(
+                Vacancy
+            ).where(
+                Vacancy.user_id == current_user.id,
+                AnalysisResult.created_at >= month_start,
+                AnalysisResult.ai_cost_rub.isnot(None)
+            )
+        ) or 0
         cost_this_month_cents = int(float(cost_this_month_rub) * 100) if cost_this_month_rub else 0
 
         # Недавние анализы (последние 10)
-        recent_analyses_raw = db.query(
-            AnalysisResult, Application, Vacancy
-        ).join(
-            Application,
-            AnalysisResult.application_id == Application.id
-        ).join(
-            Vacancy,
-            Application.vacancy_id == Vacancy.id
-        ).filter(
-            Vacancy.user_id == current_user.id
-        ).order_by(
-            AnalysisResult.created_at.desc()
-        ).limit(10).all()
+        recent_analyses_raw = await db.execute(
+            select(
+                AnalysisResult, Application, Vacancy
+            ).join(
+                Application,
+                AnalysisResult.application_id == Application.id
+            ).join(
+                Vacancy,
+                Application.vacancy_id == Vacancy.id
+            ).where(
+                Vacancy.user_id == current_user.id
+            ).order_by(
+                AnalysisResult.created_at.desc()
+            ).limit(10)
+        )
 
         recent_analyses = [
             {
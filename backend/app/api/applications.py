@@ -4,17 +4,18 @@ API endpoints для работы с откликами
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Any, Optional
 import logging
 
-from app.database import get_db
+from app.database import get_async_db
 from app.schemas.base import APIResponse
 from app.schemas.auth import UserProfile
 from app.services.auth_service import AuthService
-from app.models.application import Application, AnalysisResult
+from app.models.application import Application, AnalysisState, collection_condition
 from app.models.vacancy import Vacancy
+from app.services.list_projections import application_list_options
 from app.utils.exceptions import AuthenticationError
 from app.utils.response import success, not_found
 
@@ -23,10 +24,13 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 security = HTTPBearer()
 
+IS_ANALYZED = Application.analysis_state == AnalysisState.analyzed.value
+IS_PENDING = Application.analysis_state == AnalysisState.pending.value
+
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> UserProfile:
     """Получение текущего пользователя"""
     try:
@@ -51,81 +55,49 @@ async def get_current_user(
 async def get_applications_stats(
     vacancy_id: Optional[str] = Query(None, description="ID вакансии для фильтрации"),
     current_user: UserProfile = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение статистики по откликам
 
     Возвращает:
     - Всего откликов
-    - Непроанализированных откликов (без AnalysisResult)
-    - Проанализированных откликов (с AnalysisResult)
+    - Непроанализированных откликов (analysis_state = pending, только response и consider)
+    - Проанализированных откликов (analysis_state = analyzed)
     - Разбивка по collection_id (response, consider, interview, discard)
     """
     try:
-        # Базовый запрос - только отклики пользователя
-        base_query = db.query(Application).join(Vacancy).filter(
-            Vacancy.user_id == current_user.id
-        )
-
-        # Фильтр по вакансии (если указана)
-        if vacancy_id:
-            base_query = base_query.filter(Application.vacancy_id == vacancy_id)
-
-        # Общее количество откликов
-        total_applications = base_query.count()
-
-        # Количество проанализированных (есть запись в AnalysisResult)
-        analyzed_count = base_query.join(
-            AnalysisResult,
-            Application.id == AnalysisResult.application_id,
-            isouter=False
-        ).count()
-
-        # Количество непроанализированных (нет записи в AnalysisResult)
-        # ИСКЛЮЧАЕМ discard - они не должны анализироваться
-        from sqlalchemy import or_, and_, not_
-        unanalyzed_count = base_query.outerjoin(
-            AnalysisResult,
-            Application.id == AnalysisResult.application_id
-        ).filter(
-            AnalysisResult.id == None,
-            # Только response и consider, БЕЗ discard
-            and_(
-                or_(
-                    Application.collection_id.like('%response%'),
-                    Application.collection_id.like('%consider%')
-                ),
-                not_(Application.collection_id.like('%discard%'))
-            )
-        ).count()
-
-        # Разбивка по collection_id
-        collections_stats = db.query(
+        # Разбивка по collection_id одним запросом, общие счётчики - её сумма
+        # (по индексу (vacancy_id, status, analysis_state), без join к analysis_results)
+        collections_stats = select(
             Application.collection_id,
             func.count(Application.id).label('count'),
-            func.count(AnalysisResult.id).label('analyzed')
-        ).join(Vacancy).outerjoin(
-            AnalysisResult,
-            Application.id == AnalysisResult.application_id
-        ).filter(
+            func.count(Application.id).filter(IS_ANALYZED).label('analyzed'),
+            func.count(Application.id).filter(IS_PENDING, collection_condition()).label('pending')
+        ).join(Vacancy).where(
             Vacancy.user_id == current_user.id
         )
 
+        # Фильтр по вакансии (если указана)
         if vacancy_id:
-            collections_stats = collections_stats.filter(Application.vacancy_id == vacancy_id)
+            collections_stats = collections_stats.where(Application.vacancy_id == vacancy_id)
 
-        collections_stats = collections_stats.group_by(Application.collection_id).all()
+        collections_stats = await db.execute(collections_stats.group_by(Application.collection_id))
 
         # Форматируем результат
+        total_applications = analyzed_count = unanalyzed_count = 0
         collections_breakdown = {}
-        for coll_id, count, analyzed in collections_stats:
+        for coll_id, count, analyzed, pending in collections_stats:
             collection_name = coll_id or "unknown"
             collections_breakdown[collection_name] = {
                 "total": count,
                 "analyzed": analyzed,
                 "unanalyzed": count - analyzed
             }
+            total_applications += count
+            analyzed_count += analyzed
+            # discard и прочие коллекции к анализу не относятся
+            unanalyzed_count += pending
 
         stats_data = {
             "total_applications": total_applications,
@@ -151,7 +123,7 @@ async def get_unanalyzed_applications(
     collection_id: Optional[str] = Query("response", description="Фильтр по статусу (response, consider, interview, discard)"),
     limit: int = Query(100, ge=1, le=1000, description="Максимум откликов"),
     current_user: UserProfile = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение списка непроанализированных откликов
@@ -159,37 +131,22 @@ async def get_unanalyzed_applications(
     По умолчанию возвращает только отклики со статусом 'response' (неразобранные)
     """
     try:
-        # Запрос непроанализированных откликов
-        query = db.query(Application).join(Vacancy).outerjoin(
-            AnalysisResult,
-            Application.id == AnalysisResult.application_id
-        ).filter(
+        # Запрос непроанализированных откликов (без resume_data)
+        query = select(Application).options(application_list_options()).join(Vacancy).where(
             Vacancy.user_id == current_user.id,
-            AnalysisResult.id == None  # Нет анализа
+            IS_PENDING  # Нет анализа
         )
 
         # Фильтр по вакансии
         if vacancy_id:
-            query = query.filter(Application.vacancy_id == vacancy_id)
+            query = query.where(Application.vacancy_id == vacancy_id)
 
         # Фильтр по collection_id (по умолчанию только 'response')
-        if collection_id:
-            query = query.filter(Application.collection_id.like(f"%{collection_id}%"))
-        else:
-            # Если фильтр не указан - берём response и consider, исключаем discard
-            from sqlalchemy import or_, and_, not_
-            query = query.filter(
-                and_(
-                    or_(
-                        Application.collection_id.like('%response%'),
-                        Application.collection_id.like('%consider%')
-                    ),
-                    not_(Application.collection_id.like('%discard%'))
-                )
-            )
+        # (без фильтра - response и consider, discard исключён)
+        query = query.where(collection_condition(collection_id))
 
         # Ограничение количества
-        applications = query.limit(limit).all()
+        applications = (await db.scalars(query.limit(limit))).all()
 
         # Сериализация
         applications_data = [app.to_dict() for app in applications]
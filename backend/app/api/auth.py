@@ -3,9 +3,10 @@ API endpoints для аутентификации
 """
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import get_async_db
 from app.schemas.auth import (
     UserRegistration, UserLogin, Token, UserProfile,
     HHTokenUpdate, PasswordChange, RefreshTokenRequest,
@@ -22,7 +23,7 @@ security = HTTPBearer()
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         auth_service = AuthService(db)
@@ -43,7 +44,7 @@ async def get_current_user(
 
 
 @router.post("/register", response_model=APIResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserRegistration, db: Session = Depends(get_db)):
+async def register(user_data: UserRegistration, db: AsyncSession = Depends(get_async_db)):
     try:
         auth_service = AuthService(db)
         user = await auth_service.register_user(user_data)
@@ -55,7 +56,7 @@ async def register(user_data: UserRegistration, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=APIResponse)
-async def login(login_data: UserLogin, db: Session = Depends(get_db)):
+async def login(login_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
     try:
         auth_service = AuthService(db)
         token_data = await auth_service.authenticate_user(login_data.email, login_data.password)
@@ -72,12 +73,12 @@ async def get_current_user_profile(current_user = Depends(get_current_user)):
 
 
 @router.put("/profile", response_model=APIResponse)
-async def update_profile(profile_data: dict, current_user = Depends(get_current_user), db: Session = Depends(get_db)):
+async def update_profile(profile_data: dict, current_user = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     return success(data={"status": "TODO", "message": "Profile update will be implemented"})
 
 
 @router.post("/hh-token", response_model=APIResponse)
-async def update_hh_token(token_data: HHTokenUpdate, current_user = Depends(get_current_user), db: Session = Depends(get_db)):
+async def update_hh_token(token_data: HHTokenUpdate, current_user = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     try:
         auth_service = AuthService(db)
         result = await auth_service.update_hh_token(current_user.id, token_data.hh_token)
@@ -89,7 +90,7 @@ async def update_hh_token(token_data: HHTokenUpdate, current_user = Depends(get_
 
 
 @router.delete("/hh-token", response_model=APIResponse)
-async def delete_hh_token(current_user = Depends(get_current_user), db: Session = Depends(get_db)):
+async def delete_hh_token(current_user = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     try:
         auth_service = AuthService(db)
         result = await auth_service.delete_hh_token(current_user.id)
@@ -99,7 +100,7 @@ async def delete_hh_token(current_user = Depends(get_current_user), db: Session
 
 
 @router.post("/change-password", response_model=APIResponse)
-async def change_password(password_data: PasswordChange, current_user = Depends(get_current_user), db: Session = Depends(get_db)):
+async def change_password(password_data: PasswordChange, current_user = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     try:
         auth_service = AuthService(db)
         result = await auth_service.change_password(current_user.id, password_data.current_password, password_data.new_password)
@@ -113,7 +114,7 @@ async def change_password(password_data: PasswordChange, current_user = Depends(
 
 
 @router.post("/refresh", response_model=APIResponse)
-async def refresh_token(refresh_data: RefreshTokenRequest, db: Session = Depends(get_db)):
+async def refresh_token(refresh_data: RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
     try:
         auth_service = AuthService(db)
         token_data = await auth_service.refresh_access_token(refresh_data.refresh_token)
@@ -130,7 +131,7 @@ async def logout(current_user = Depends(get_current_user)):
 
 
 @router.post("/forgot-password", response_model=APIResponse)
-async def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(get_db)):
+async def forgot_password(request: ForgotPasswordRequest, db: AsyncSession = Depends(get_async_db)):
     import random
     import string
     import logging
@@ -139,14 +140,16 @@ async def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(
     from app.models.password_reset import PasswordResetCode
 
     try:
-        user = db.query(User).filter(User.email == request.email).first()
+        user = await db.scalar(select(User).where(User.email == request.email))
         if not user:
             return success(data={"message": "If email is registered, reset code will be sent"})
 
-        db.query(PasswordResetCode).filter(
-            PasswordResetCode.user_id == user.id,
-            PasswordResetCode.is_used == False
-        ).delete()
+        await db.execute(
+            delete(PasswordResetCode).where(
+                PasswordResetCode.user_id == user.id,
+                PasswordResetCode.is_used == False
+            )
+        )
 
         code = "".join(random.choices(string.digits, k=6))
         reset_code = PasswordResetCode(
@@ -155,7 +158,7 @@ async def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(
             expires_at=datetime.utcnow() + timedelta(minutes=15)
         )
         db.add(reset_code)
-        db.commit()
+        await db.commit()
 
         # Отправляем код на email
         email_sent = False
@@ -181,23 +184,25 @@ async def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(
 
 
 @router.post("/reset-password", response_model=APIResponse)
-async def reset_password(request: ResetPasswordRequest, db: Session = Depends(get_db)):
+async def reset_password(request: ResetPasswordRequest, db: AsyncSession = Depends(get_async_db)):
     import logging
     from datetime import datetime
     from app.models.user import User
     from app.models.password_reset import PasswordResetCode
 
     try:
-        user = db.query(User).filter(User.email == request.email).first()
+        user = await db.scalar(select(User).where(User.email == request.email))
         if not user:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"error": "INVALID_CODE", "message": "Invalid or expired code"})
 
-        reset_code = db.query(PasswordResetCode).filter(
-            PasswordResetCode.user_id == user.id,
-            PasswordResetCode.code == request.code,
-            PasswordResetCode.is_used == False,
-            PasswordResetCode.expires_at > datetime.utcnow()
-        ).first()
+        reset_code = await db.scalar(
+            select(PasswordResetCode).where(
+                PasswordResetCode.user_id == user.id,
+                PasswordResetCode.code == request.code,
+                PasswordResetCode.is_used == False,
+                PasswordResetCode.expires_at > datetime.utcnow()
+            )
+        )
 
         if not reset_code:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail={"error": "INVALID_CODE", "message": "Invalid or expired code"})
@@ -205,7 +210,7 @@ async def reset_password(request: ResetPasswordRequest, db: Session = Depends(ge
         reset_code.is_used = True
         auth_service = AuthService(db)
         user.password_hash = await auth_service._hash_password(request.new_password)
-        db.commit()
+        await db.commit()
 
         try:
             from app.services.telegram_service import send_admin_notification
@@ -101,18 +101,10 @@ def create_excel_export(vacancy, results: list, recommendation_filter: Optional[
         return r.get(key, default)
 
     def get_verdict(analysis):
-        """Получить вердикт v7.0 или смапить из старого формата"""
-        v = raw(analysis, 'verdict')
+        """Получить вердикт v7.0 (колонка verdict, старые GREEN/YELLOW/RED уже смаплены в БД)"""
+        v = analysis.verdict
         if v in ['High', 'Medium', 'Low', 'Mismatch']:
             return v
-        # Маппинг старых значений
-        old_v = raw(analysis, 'verdict', '')
-        if old_v == 'GREEN':
-            return 'High'
-        elif old_v == 'YELLOW':
-            return 'Medium'
-        elif old_v == 'RED':
-            return 'Low'
         # По score если нет verdict
         score = raw(analysis, 'score', 0) or 0
         if score >= 75:
@@ -134,7 +126,7 @@ def create_excel_export(vacancy, results: list, recommendation_filter: Optional[
 
     def get_priority(analysis):
         """Получить приоритет v7.2"""
-        p = raw(analysis, 'priority', 'basic')
+        p = analysis.priority
         return p if p in ['top', 'strong', 'basic'] else 'basic'
 
     def priority_stars(p):
@@ -142,12 +134,8 @@ def create_excel_export(vacancy, results: list, recommendation_filter: Optional[
         return {'top': '★★★', 'strong': '★★', 'basic': '★'}.get(p, '★')
 
     def get_one_liner(analysis):
-        """Получить one_liner или fallback"""
-        one = raw(analysis, 'one_liner', '')
-        if one:
-            return one
-        # Fallback to verdict_reason
-        return raw(analysis, 'verdict_reason', '') or ''
+        """Получить one_liner (колонка one_liner, fallback на verdict_reason в БД)"""
+        return analysis.one_liner or ''
 
     def get_salary_from_resume(app):
         """Получить зарплату из резюме кандидата"""
@@ -4,9 +4,10 @@ API endpoints для интеграции с HH.ru
 """
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Any, Optional
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.api.auth import get_current_user
 from app.schemas.base import APIResponse
 from app.schemas.hh import (
@@ -17,6 +18,7 @@ from app.services.hh_client import HHClient
 from app.services.auth_service import AuthService
 from app.utils.exceptions import HHIntegrationError, ValidationError
 from app.utils.response import success, created, bad_request, unauthorized, not_found, internal_error
+from app.utils.pagination import cursor_pagination
 
 router = APIRouter()
 
@@ -24,7 +26,7 @@ router = APIRouter()
 @router.get("/test-connection", response_model=APIResponse)
 async def test_hh_connection(
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Тестирование соединения с HH.ru API
@@ -67,27 +69,47 @@ async def get_vacancies(
     limit: int = 50,
     offset: int = 0,
     active_only: bool = True,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение списка вакансий пользователя
     Данные из локальной БД с возможностью фильтрации
+
+    С параметром cursor - курсорная пагинация (pagination v2) вместо offset, total только по include_total
     """
+    from sqlalchemy import func, select
     from app.models.vacancy import Vacancy
+    from app.services.list_projections import VACANCY_KEYSET
+
+    after = VACANCY_KEYSET.decode(cursor) if cursor is not None else None
 
     # Базовый запрос - только вакансии текущего пользователя
-    query = db.query(Vacancy).filter(Vacancy.user_id == current_user.id)
+    query = select(Vacancy).where(Vacancy.user_id == current_user.id)
 
     # Фильтрация по активности
     if active_only:
-        query = query.filter(Vacancy.is_active == True)
+        query = query.where(Vacancy.is_active == True)
+
+    count_query = select(func.count()).select_from(query.with_only_columns(Vacancy.id).subquery())
+
+    if cursor is not None:
+        total = await db.scalar(count_query) if include_total else None
+        vacancies, next_cursor = VACANCY_KEYSET.page(
+            (await db.scalars(VACANCY_KEYSET.apply(query, after, limit))).all(), limit
+        )
+        return success(data={
+            "vacancies": [vacancy.to_dict() for vacancy in vacancies],
+            "pagination": cursor_pagination(next_cursor, total)
+        })
 
     # Подсчет общего количества
-    total = query.count()
+    total = await db.scalar(count_query)
 
     # Применение пагинации и сортировка по дате создания (новые сначала)
-    vacancies = query.order_by(Vacancy.created_at.desc()).offset(offset).limit(limit).all()
+    vacancies = (await db.scalars(query.order_by(Vacancy.created_at.desc()).offset(offset).limit(limit))).all()
 
     # Сериализация
     vacancies_data = [vacancy.to_dict() for vacancy in vacancies]
@@ -136,21 +158,32 @@ async def get_vacancy_applications(
     limit: int = 50,
     offset: int = 0,
     analyzed_only: bool = False,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение откликов на конкретную вакансию
     С возможностью фильтрации по статусу анализа
+
+    С параметром cursor - курсорная пагинация (pagination v2) вместо offset; без фильтра total
+    берётся из счётчика откликов вакансии (оценка), точный - по include_total
     """
+    from sqlalchemy import func, select
     from app.models.vacancy import Vacancy
     from app.models.application import Application
+    from app.services.list_projections import APPLICATION_KEYSET, application_list_options
+
+    after = APPLICATION_KEYSET.decode(cursor) if cursor is not None else None
 
     # Проверка существования вакансии и принадлежности пользователю
-    vacancy = db.query(Vacancy).filter(
-        Vacancy.id == vacancy_id,
-        Vacancy.user_id == current_user.id
-    ).first()
+    vacancy = (await db.execute(
+        select(Vacancy.id, Vacancy.applications_count).where(
+            Vacancy.id == vacancy_id,
+            Vacancy.user_id == current_user.id
+        )
+    )).first()
 
     if not vacancy:
         raise HTTPException(
@@ -162,17 +195,38 @@ async def get_vacancy_applications(
         )
 
     # Базовый запрос откликов для этой вакансии
-    query = db.query(Application).filter(Application.vacancy_id == vacancy_id)
+    query = select(Application).where(Application.vacancy_id == vacancy_id)
 
     # Фильтрация по статусу анализа
     if analyzed_only:
-        query = query.filter(Application.analyzed_at.isnot(None))
+        query = query.where(Application.analyzed_at.isnot(None))
+
+    count_query = select(func.count()).select_from(query.with_only_columns(Application.id).subquery())
+
+    if cursor is not None:
+        total, estimate = None, False
+        if include_total:
+            total = await db.scalar(count_query)
+        elif not analyzed_only:
+            total, estimate = vacancy.applications_count, True
+
+        applications, next_cursor = APPLICATION_KEYSET.page((await db.scalars(
+            APPLICATION_KEYSET.apply(query.options(application_list_options()), after, limit)
+        )).all(), limit)
+        return success(data={
+            "applications": [app.to_dict() for app in applications],
+            "vacancy_id": vacancy_id,
+            "analyzed_only": analyzed_only,
+            "pagination": cursor_pagination(next_cursor, total, total_is_estimate=estimate)
+        })
 
     # Подсчет общего количества
-    total = query.count()
+    total = await db.scalar(count_query)
 
-    # Применение пагинации и сортировка по дате создания (новые сначала)
-    applications = query.order_by(Application.created_at.desc()).offset(offset).limit(limit).all()
+    # Применение пагинации и сортировка по дате создания (новые сначала), без resume_data
+    applications = (await db.scalars(
+        query.options(application_list_options()).order_by(Application.created_at.desc()).offset(offset).limit(limit)
+    )).all()
 
     # Сериализация
     applications_data = [app.to_dict() for app in applications]
@@ -231,7 +285,8 @@ async def start_sync(
             current_user.id,
             sync_job.id,
             sync_request.sync_vacancies,
-            sync_request.sync_applications
+            sync_request.sync_applications,
+            sync_request.force_full_sync
         )
 
         return success(data=sync_job.to_dict())
@@ -356,7 +411,7 @@ async def get_integration_stats(
 async def exchange_oauth_code(
     code: str,
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Обмен OAuth code на access_token
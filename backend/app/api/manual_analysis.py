@@ -12,10 +12,10 @@ from uuid import UUID, uuid4
 
 from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Query, Body
 from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models.user import User
 from app.api.auth import get_current_user
 from app.services.resume_parser import ResumeParser
@@ -231,7 +231,7 @@ async def parse_excel_resumes(
 @router.post("/analyze")
 async def analyze_candidate(
     request: AnalyzeRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
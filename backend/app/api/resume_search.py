@@ -3,11 +3,12 @@ API endpoints для поиска по базе резюме
 Создание поисков, запуск, получение кандидатов, AI анализ
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 import logging
 
-from app.database import get_db
+from app.database import get_async_db
 from app.api.auth import get_current_user
 from app.models.user import User
 from app.models.resume_search import ResumeSearch, SearchCandidate, SearchStatus
@@ -21,10 +22,76 @@ from app.schemas.resume_search import (
 from app.schemas.base import APIResponse
 from app.utils.response import success, created, bad_request, not_found
 from app.services.resume_search_service import ResumeSearchService
+from app.utils.pagination import Keyset, SortKey, cursor_pagination
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Курсорная пагинация кандидатов (order_by -> ключи), id - для однозначности
+_CANDIDATE_ID_KEY = SortKey(SearchCandidate.id, lambda candidate: str(candidate.id))
+CANDIDATE_KEYSETS = {
+    "score": Keyset(
+        "candidates.score",
+        SortKey(
+            func.coalesce(SearchCandidate.ai_score, -1),
+            lambda candidate: candidate.ai_score if candidate.ai_score is not None else -1,
+            descending=True
+        ),
+        _CANDIDATE_ID_KEY
+    ),
+    "name": Keyset(
+        "candidates.name",
+        SortKey(func.coalesce(SearchCandidate.last_name, ""), lambda candidate: candidate.last_name or ""),
+        SortKey(func.coalesce(SearchCandidate.first_name, ""), lambda candidate: candidate.first_name or ""),
+        _CANDIDATE_ID_KEY
+    ),
+    "created": Keyset(
+        "candidates.created",
+        SortKey(SearchCandidate.created_at, lambda candidate: candidate.created_at, descending=True),
+        _CANDIDATE_ID_KEY
+    )
+}
+
+
+async def _get_user_search(db: AsyncSession, search_id: str, user_id) -> ResumeSearch:
+    """Поисковый проект пользователя или 404"""
+    search = await db.scalar(
+        select(ResumeSearch).where(
+            ResumeSearch.id == search_id,
+            ResumeSearch.user_id == user_id
+        )
+    )
+
+    if not search:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": "SEARCH_NOT_FOUND", "message": "Поисковый проект не найден"}
+        )
+    return search
+
+
+async def _get_user_candidate(db: AsyncSession, search_id: str, candidate_id: str, user_id) -> SearchCandidate:
+    """Кандидат из поиска пользователя или 404"""
+    candidate = await db.scalar(
+        select(SearchCandidate).join(ResumeSearch).where(
+            SearchCandidate.id == candidate_id,
+            SearchCandidate.search_id == search_id,
+            ResumeSearch.user_id == user_id
+        )
+    )
+
+    if not candidate:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": "CANDIDATE_NOT_FOUND", "message": "Кандидат не найден"}
+        )
+    return candidate
+
+
+async def _count(db: AsyncSession, query) -> int:
+    """Количество строк запроса"""
+    return await db.scalar(select(func.count()).select_from(query.subquery()))
+
 
 # ==================== CRUD поисковых проектов ====================
 
@@ -35,20 +102,22 @@ async def list_searches(
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение списка поисковых проектов пользователя
     """
-    query = db.query(ResumeSearch).filter(ResumeSearch.user_id == current_user.id)
+    query = select(ResumeSearch).where(ResumeSearch.user_id == current_user.id)
 
     if status_filter:
-        query = query.filter(ResumeSearch.status == status_filter)
+        query = query.where(ResumeSearch.status == status_filter)
     if vacancy_id:
-        query = query.filter(ResumeSearch.vacancy_id == vacancy_id)
+        query = query.where(ResumeSearch.vacancy_id == vacancy_id)
 
-    total = query.count()
-    searches = query.order_by(ResumeSearch.updated_at.desc()).offset(offset).limit(limit).all()
+    total = await _count(db, query)
+    searches = (await db.scalars(
+        query.order_by(ResumeSearch.updated_at.desc()).offset(offset).limit(limit)
+    )).all()
 
     return success(data={
         "searches": [s.to_dict() for s in searches],
@@ -60,17 +129,19 @@ async def list_searches(
 async def create_search(
     data: ResumeSearchCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Создание нового поискового проекта
     """
     # Проверяем вакансию если указана
     if data.vacancy_id:
-        vacancy = db.query(Vacancy).filter(
-            Vacancy.id == data.vacancy_id,
-            Vacancy.user_id == current_user.id
-        ).first()
+        vacancy = await db.scalar(
+            select(Vacancy.id).where(
+                Vacancy.id == data.vacancy_id,
+                Vacancy.user_id == current_user.id
+            )
+        )
         if not vacancy:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -88,8 +159,8 @@ async def create_search(
     )
 
     db.add(search)
-    db.commit()
-    db.refresh(search)
+    await db.commit()
+    await db.refresh(search)
 
     logger.info(f"Создан поисковый проект: {search.name} (user={current_user.email})")
     return created(data=search.to_dict())
@@ -99,21 +170,12 @@ async def create_search(
 async def get_search(
     search_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение поискового проекта по ID
     """
-    search = db.query(ResumeSearch).filter(
-        ResumeSearch.id == search_id,
-        ResumeSearch.user_id == current_user.id
-    ).first()
-
-    if not search:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail={"error": "SEARCH_NOT_FOUND", "message": "Поисковый проект не найден"}
-        )
+    search = await _get_user_search(db, search_id, current_user.id)
 
     return success(data=search.to_dict())
 
@@ -123,21 +185,12 @@ async def update_search(
     search_id: str,
     data: ResumeSearchUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Обновление поискового проекта
     """
-    search = db.query(ResumeSearch).filter(
-        ResumeSearch.id == search_id,
-        ResumeSearch.user_id == current_user.id
-    ).first()
-
-    if not search:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail={"error": "SEARCH_NOT_FOUND", "message": "Поисковый проект не найден"}
-        )
+    search = await _get_user_search(db, search_id, current_user.id)
 
     # Обновляем только переданные поля
     if data.name is not None:
@@ -151,8 +204,8 @@ async def update_search(
     if data.filters is not None:
         search.filters = data.filters.model_dump()
 
-    db.commit()
-    db.refresh(search)
+    await db.commit()
+    await db.refresh(search)
 
     return success(data=search.to_dict())
 
@@ -161,24 +214,15 @@ async def update_search(
 async def delete_search(
     search_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Удаление поискового проекта
     """
-    search = db.query(ResumeSearch).filter(
-        ResumeSearch.id == search_id,
-        ResumeSearch.user_id == current_user.id
-    ).first()
-
-    if not search:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail={"error": "SEARCH_NOT_FOUND", "message": "Поисковый проект не найден"}
-        )
+    search = await _get_user_search(db, search_id, current_user.id)
 
-    db.delete(search)
-    db.commit()
+    await db.delete(search)
+    await db.commit()
 
     logger.info(f"Удален поисковый проект: {search.name} (user={current_user.email})")
     return success(data={"message": "Поисковый проект удален"})
@@ -191,22 +235,13 @@ async def run_search(
     search_id: str,
     data: RunSearchRequest = RunSearchRequest(),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Запуск поиска по базе резюме HH.ru
     Загружает резюме и сохраняет в БД
     """
-    search = db.query(ResumeSearch).filter(
-        ResumeSearch.id == search_id,
-        ResumeSearch.user_id == current_user.id
-    ).first()
-
-    if not search:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail={"error": "SEARCH_NOT_FOUND", "message": "Поисковый проект не найден"}
-        )
+    search = await _get_user_search(db, search_id, current_user.id)
 
     if search.status == SearchStatus.RUNNING:
         raise HTTPException(
@@ -238,35 +273,48 @@ async def list_candidates(
     order_by: str = Query("score", description="Сортировка: score, name, created"),
     page: int = Query(0, ge=0),
     per_page: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Курсор страницы (пагинация v2, пустое значение - первая страница)"),
+    include_total: bool = Query(False, description="Точный total в режиме курсора"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение списка кандидатов из поиска
+
+    С параметром cursor - курсорная пагинация (pagination v2); без фильтров total берётся
+    из счётчика загруженных резюме поиска (оценка), точный - по include_total
     """
-    # Проверяем доступ к поиску
-    search = db.query(ResumeSearch).filter(
-        ResumeSearch.id == search_id,
-        ResumeSearch.user_id == current_user.id
-    ).first()
+    keyset = CANDIDATE_KEYSETS.get(order_by, CANDIDATE_KEYSETS["created"])
+    after = keyset.decode(cursor) if cursor is not None else None
 
-    if not search:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail={"error": "SEARCH_NOT_FOUND", "message": "Поисковый проект не найден"}
-        )
+    # Проверяем доступ к поиску
+    search = await _get_user_search(db, search_id, current_user.id)
 
     # Строим запрос
-    query = db.query(SearchCandidate).filter(SearchCandidate.search_id == search_id)
+    query = select(SearchCandidate).where(SearchCandidate.search_id == search_id)
 
     if analyzed_only:
-        query = query.filter(SearchCandidate.is_analyzed == True)
+        query = query.where(SearchCandidate.is_analyzed == True)
     if recommendation:
-        query = query.filter(SearchCandidate.ai_recommendation == recommendation)
+        query = query.where(SearchCandidate.ai_recommendation == recommendation)
     if min_score is not None:
-        query = query.filter(SearchCandidate.ai_score >= min_score)
+        query = query.where(SearchCandidate.ai_score >= min_score)
     if favorites_only:
-        query = query.filter(SearchCandidate.is_favorite == True)
+        query = query.where(SearchCandidate.is_favorite == True)
+
+    if cursor is not None:
+        filtered = analyzed_only or recommendation or min_score is not None or favorites_only
+        total, estimate = None, False
+        if include_total:
+            total = await _count(db, query)
+        elif not filtered:
+            total, estimate = search.processed_count, True
+
+        candidates, next_cursor = keyset.page((await db.scalars(keyset.apply(query, after, per_page))).all(), per_page)
+        return success(data={
+            "candidates": [c.to_dict() for c in candidates],
+            "pagination": cursor_pagination(next_cursor, total, total_is_estimate=estimate)
+        })
 
     # Сортировка
     if order_by == "score":
@@ -276,8 +324,8 @@ async def list_candidates(
     else:
         query = query.order_by(SearchCandidate.created_at.desc())
 
-    total = query.count()
-    candidates = query.offset(page * per_page).limit(per_page).all()
+    total = await _count(db, query.order_by(None))
+    candidates = (await db.scalars(query.offset(page * per_page).limit(per_page))).all()
 
     return success(data={
         "candidates": [c.to_dict() for c in candidates],
@@ -292,22 +340,12 @@ async def get_candidate(
     search_id: str,
     candidate_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение полных данных кандидата
     """
-    candidate = db.query(SearchCandidate).join(ResumeSearch).filter(
-        SearchCandidate.id == candidate_id,
-        SearchCandidate.search_id == search_id,
-        ResumeSearch.user_id == current_user.id
-    ).first()
-
-    if not candidate:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail={"error": "CANDIDATE_NOT_FOUND", "message": "Кандидат не найден"}
-        )
+    candidate = await _get_user_candidate(db, search_id, candidate_id, current_user.id)
 
     return success(data=candidate.to_dict_full())
 
@@ -318,22 +356,12 @@ async def update_candidate(
     candidate_id: str,
     data: UpdateCandidateRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Обновление данных кандидата (избранное, заметки и т.д.)
     """
-    candidate = db.query(SearchCandidate).join(ResumeSearch).filter(
-        SearchCandidate.id == candidate_id,
-        SearchCandidate.search_id == search_id,
-        ResumeSearch.user_id == current_user.id
-    ).first()
-
-    if not candidate:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail={"error": "CANDIDATE_NOT_FOUND", "message": "Кандидат не найден"}
-        )
+    candidate = await _get_user_candidate(db, search_id, candidate_id, current_user.id)
 
     if data.is_favorite is not None:
         candidate.is_favorite = data.is_favorite
@@ -342,8 +370,8 @@ async def update_candidate(
     if data.notes is not None:
         candidate.notes = data.notes
 
-    db.commit()
-    db.refresh(candidate)
+    await db.commit()
+    await db.refresh(candidate)
 
     return success(data=candidate.to_dict())
 
@@ -355,21 +383,12 @@ async def analyze_candidates(
     search_id: str,
     data: AnalyzeCandidatesRequest = AnalyzeCandidatesRequest(),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Запуск AI анализа кандидатов
     """
-    search = db.query(ResumeSearch).filter(
-        ResumeSearch.id == search_id,
-        ResumeSearch.user_id == current_user.id
-    ).first()
-
-    if not search:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail={"error": "SEARCH_NOT_FOUND", "message": "Поисковый проект не найден"}
-        )
+    search = await _get_user_search(db, search_id, current_user.id)
 
     if search.status == SearchStatus.ANALYZING:
         raise HTTPException(
@@ -399,60 +418,29 @@ async def analyze_candidates(
 async def get_search_stats(
     search_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Статистика по поисковому проекту
     """
-    search = db.query(ResumeSearch).filter(
-        ResumeSearch.id == search_id,
-        ResumeSearch.user_id == current_user.id
-    ).first()
-
-    if not search:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail={"error": "SEARCH_NOT_FOUND", "message": "Поисковый проект не найден"}
-        )
-
-    # Считаем статистику
-    total = db.query(SearchCandidate).filter(SearchCandidate.search_id == search_id).count()
-    analyzed = db.query(SearchCandidate).filter(
-        SearchCandidate.search_id == search_id,
-        SearchCandidate.is_analyzed == True
-    ).count()
-
-    hire_count = db.query(SearchCandidate).filter(
-        SearchCandidate.search_id == search_id,
-        SearchCandidate.ai_recommendation == "hire"
-    ).count()
-
-    consider_count = db.query(SearchCandidate).filter(
-        SearchCandidate.search_id == search_id,
-        SearchCandidate.ai_recommendation == "consider"
-    ).count()
-
-    reject_count = db.query(SearchCandidate).filter(
-        SearchCandidate.search_id == search_id,
-        SearchCandidate.ai_recommendation == "reject"
-    ).count()
-
-    favorites = db.query(SearchCandidate).filter(
-        SearchCandidate.search_id == search_id,
-        SearchCandidate.is_favorite == True
-    ).count()
-
-    contacted = db.query(SearchCandidate).filter(
-        SearchCandidate.search_id == search_id,
-        SearchCandidate.is_contacted == True
-    ).count()
-
-    # Средний score
-    from sqlalchemy import func
-    avg_score = db.query(func.avg(SearchCandidate.ai_score)).filter(
-        SearchCandidate.search_id == search_id,
-        SearchCandidate.ai_score.isnot(None)
-    ).scalar()
+    await _get_user_search(db, search_id, current_user.id)
+
+    # Считаем статистику одним запросом (avg игнорирует NULL)
+    candidate_count = func.count(SearchCandidate.id)
+    (
+        total, analyzed, hire_count, consider_count, reject_count, favorites, contacted, avg_score
+    ) = (await db.execute(
+        select(
+            candidate_count,
+            candidate_count.filter(SearchCandidate.is_analyzed == True),
+            candidate_count.filter(SearchCandidate.ai_recommendation == "hire"),
+            candidate_count.filter(SearchCandidate.ai_recommendation == "consider"),
+            candidate_count.filter(SearchCandidate.ai_recommendation == "reject"),
+            candidate_count.filter(SearchCandidate.is_favorite == True),
+            candidate_count.filter(SearchCandidate.is_contacted == True),
+            func.avg(SearchCandidate.ai_score)
+        ).where(SearchCandidate.search_id == search_id)
+    )).one()
 
     return success(data={
         "total_candidates": total,
@@ -468,10 +456,33 @@ async def get_search_stats(
 
 # ==================== Справочники ====================
 
+@router.get("/areas/suggest", response_model=APIResponse)
+async def suggest_areas(
+    q: str = Query(..., min_length=1, max_length=100, description="Начало названия региона"),
+    limit: int = Query(10, ge=1, le=50),
+    parent_id: Optional[str] = Query(None, description="Искать только внутри региона"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Подсказки регионов HH.ru для поля поиска (по началу названия или слова)
+    """
+    service = ResumeSearchService(db, current_user)
+    try:
+        items = await service.suggest_areas(q, limit=limit, parent_id=parent_id)
+    except Exception as e:
+        logger.error(f"Ошибка подсказки регионов: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail={"error": "HH_DICTIONARY_ERROR", "message": "Не удалось получить регионы HH.ru"}
+        )
+    return success(data={"items": items})
+
+
 @router.get("/dictionaries", response_model=APIResponse)
 async def get_search_dictionaries(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение справочников для фильтров поиска
@@ -4,17 +4,19 @@ API endpoints для настроек пользователя
 """
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import update
 from typing import Dict, Any
 from datetime import datetime
 import logging
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.api.auth import get_current_user
 from app.schemas.base import APIResponse
 from app.services.auth_service import AuthService
 from app.services.encryption import token_encryption
 from app.services.hh_client import HHClient
+from app.services.hh_client_pool import get_hh_client_pool
 from app.models.user import User
 from app.schemas.hh import (
     HHTokenCreate,
@@ -153,7 +155,7 @@ async def get_integration_settings(
 @router.get("/hh-token/status", response_model=APIResponse)
 async def get_hh_token_status(
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Проверка статуса HH.ru токена
@@ -285,6 +287,7 @@ async def save_hh_token(
                 )
             )
             db.commit()
+            await get_hh_client_pool().invalidate(current_user.id)
 
             logger.info(f"HH.ru token saved and verified for user {current_user.id}")
 
@@ -385,6 +388,7 @@ async def delete_hh_token(
             )
         )
         db.commit()
+        await get_hh_client_pool().invalidate(current_user.id)
 
         logger.info(f"HH.ru token deleted for user {current_user.id}")
 
@@ -3,11 +3,11 @@ API endpoints для управления подписками и тарифик
 Получение планов, текущей подписки, обновление тарифа, статистика использования
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pydantic import BaseModel
 
-from app.database import get_db
+from app.database import get_async_db
 from app.api.auth import get_current_user
 from app.models.user import User
 from app.models.subscription import PlanType, SubscriptionStatus
@@ -41,7 +41,7 @@ class UpgradeSubscriptionRequest(BaseModel):
 
 @router.get("/plans", response_model=APIResponse)
 async def get_subscription_plans(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получить список всех доступных тарифных планов
@@ -69,7 +69,7 @@ async def get_subscription_plans(
 @router.get("/current", response_model=APIResponse)
 async def get_current_subscription(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получить текущую подписку пользователя
@@ -101,7 +101,7 @@ async def get_current_subscription(
 async def upgrade_subscription(
     request: UpgradeSubscriptionRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Обновление тарифного плана
@@ -168,7 +168,7 @@ async def upgrade_subscription(
 async def get_usage_statistics(
     days: int = 30,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получить статистику использования
@@ -210,7 +210,7 @@ async def get_usage_statistics(
 @router.get("/limits/check", response_model=APIResponse)
 async def check_limits(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Проверить все лимиты текущего пользователя
@@ -234,7 +234,7 @@ async def check_limits(
         from app.models.application import AnalysisResult, Application
         from app.models.vacancy import Vacancy
         from datetime import datetime, timedelta
-        from sqlalchemy import func
+        from sqlalchemy import func, select
 
         # Определяем начало текущего периода
         if subscription and subscription.started_at:
@@ -245,13 +245,15 @@ async def check_limits(
             period_start = datetime(now.year, now.month, 1)
 
         # Считаем количество анализов за период (через JOIN с applications и vacancies)
-        analyses_used = db.query(func.count(AnalysisResult.id))\
-            .join(Application, AnalysisResult.application_id == Application.id)\
-            .join(Vacancy, Application.vacancy_id == Vacancy.id)\
-            .filter(
+        analyses_used = await db.scalar(
+            select(func.count(AnalysisResult.id))
+            .join(Application, AnalysisResult.application_id == Application.id)
+            .join(Vacancy, Application.vacancy_id == Vacancy.id)
+            .where(
                 Vacancy.user_id == current_user.id,
                 AnalysisResult.created_at >= period_start
-            ).scalar() or 0
+            )
+        ) or 0
 
         # Вычисляем оставшиеся анализы
         if subscription and subscription.plan:
@@ -319,7 +321,7 @@ async def check_limits(
 @router.post("/cancel", response_model=APIResponse)
 async def cancel_subscription(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Отменить текущую подписку
@@ -349,7 +351,7 @@ async def cancel_subscription(
         from datetime import datetime
         subscription.status = SubscriptionStatus.cancelled
         subscription.cancelled_at = datetime.utcnow()
-        db.commit()
+        await db.commit()
 
         return success(data={
             "subscription": subscription.to_dict(),
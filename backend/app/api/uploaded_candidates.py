@@ -7,6 +7,7 @@ from typing import List, Optional
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, Query, Form
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from app.database import get_db
@@ -16,11 +17,37 @@ from app.models.uploaded_candidate import UploadedCandidate, UploadSource
 from app.services.resume_parser import ResumeParser
 from app.api.auth import get_current_user
 from app.utils.exceptions import FileParseError
+from app.utils.pagination import Keyset, SortKey, cursor_pagination
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/uploaded-candidates", tags=["Uploaded Candidates"])
 
 
+def _candidates_keyset(sort_by: str, sort_order: str) -> Keyset:
+    """
+    Порядок списка кандидатов: ключ сортировки и id в одном направлении
+
+    Кандидаты без оценки - в конце при desc и в начале при asc (coalesce с -1),
+    full_name сортируется по фамилии и имени
+    """
+    descending = sort_order == "desc"
+    if sort_by == "ai_score":
+        keys = [SortKey(
+            func.coalesce(UploadedCandidate.ai_score, -1),
+            lambda candidate: candidate.ai_score if candidate.ai_score is not None else -1,
+            descending
+        )]
+    elif sort_by == "full_name":
+        keys = [
+            SortKey(func.coalesce(UploadedCandidate.last_name, ""), lambda candidate: candidate.last_name or "", descending),
+            SortKey(func.coalesce(UploadedCandidate.first_name, ""), lambda candidate: candidate.first_name or "", descending)
+        ]
+    else:
+        keys = [SortKey(UploadedCandidate.created_at, lambda candidate: candidate.created_at, descending)]
+    keys.append(SortKey(UploadedCandidate.id, lambda candidate: str(candidate.id), descending))
+    return Keyset(f"uploaded.{sort_by}.{sort_order}", *keys)
+
+
 @router.post("/upload/pdf")
 async def upload_pdf_resume(
     file: UploadFile = File(...),
@@ -254,6 +281,8 @@ async def get_uploaded_candidates(
     limit: int = Query(50, le=100),
     sort_by: str = Query("ai_score", regex="^(ai_score|created_at|full_name)$"),
     sort_order: str = Query("desc", regex="^(asc|desc)$"),
+    cursor: Optional[str] = Query(None, description="Курсор страницы (пагинация v2, пустое значение - первая страница)"),
+    include_total: bool = Query(False, description="Точный total в режиме курсора"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -265,7 +294,12 @@ async def get_uploaded_candidates(
     - is_analyzed: только проанализированные
     - recommendation: hire/interview/maybe/reject
     - min_score: минимальный AI score
+
+    С параметром cursor - курсорная пагинация (pagination v2) вместо skip, total только по include_total
     """
+    keyset = _candidates_keyset(sort_by, sort_order)
+    after = keyset.decode(cursor) if cursor is not None else None
+
     query = db.query(UploadedCandidate).filter(
         UploadedCandidate.user_id == current_user.id
     )
@@ -280,18 +314,19 @@ async def get_uploaded_candidates(
     if min_score is not None:
         query = query.filter(UploadedCandidate.ai_score >= min_score)
 
+    if cursor is not None:
+        total = query.count() if include_total else None
+        candidates, next_cursor = keyset.page(keyset.apply(query, after, limit).all(), limit)
+        return {
+            "candidates": [c.to_dict() for c in candidates],
+            "pagination": cursor_pagination(next_cursor, total)
+        }
+
     # Общее количество
     total = query.count()
 
-    # Сортировка
-    sort_column = getattr(UploadedCandidate, sort_by, UploadedCandidate.created_at)
-    if sort_order == "desc":
-        query = query.order_by(sort_column.desc().nullslast())
-    else:
-        query = query.order_by(sort_column.asc().nullsfirst())
-
-    # Пагинация
-    candidates = query.offset(skip).limit(limit).all()
+    # Сортировка и пагинация
+    candidates = query.order_by(*keyset.order_by()).offset(skip).limit(limit).all()
 
     return {
         "total": total,
@@ -1,22 +1,28 @@
 """
 API endpoints для работы с вакансиями
-Получение списка вакансий и откликов с mock данными
+Список вакансий и откликов из синхронизированных таблиц, детали вакансии из HH.ru
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Any, Optional
 import logging
 
-from app.database import get_db
+from app.database import get_async_db
 from app.schemas.base import APIResponse
 from app.schemas.hh import HHVacancyFull, HHApplication
 from app.schemas.auth import UserProfile
 from app.services.auth_service import AuthService
 from app.services.hh_client import HHClient
-from app.services.encryption import TokenEncryption
+from app.services.hh_client_pool import get_hh_client_pool
+from app.services.vacancy_read_model import refresh_if_stale, vacancy_list_item, application_list_item
+from app.services.list_projections import APPLICATION_KEYSET, VACANCY_PUBLISHED_KEYSET
+from app.models.vacancy import Vacancy
+from app.models.application import Application
 from app.utils.exceptions import AuthenticationError, HHIntegrationError
 from app.utils.response import success, created, bad_request, unauthorized, not_found, internal_error
+from app.utils.pagination import cursor_pagination
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +33,7 @@ security = HTTPBearer()
 # Dependency для получения текущего пользователя (копируем из auth.py)
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> UserProfile:
     """
     Получение текущего аутентифицированного пользователя
@@ -59,11 +65,12 @@ async def get_current_user(
 
 # Dependency для получения HH.ru клиента с токеном пользователя
 async def get_hh_client(
-    user: UserProfile = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    user: UserProfile = Depends(get_current_user)
 ) -> HHClient:
     """
-    Создание HH.ru клиента с расшифрованным токеном пользователя
+    HH.ru клиент пользователя из пула процесса
+
+    Клиент переиспользуется между запросами и не закрывается в endpoints
     """
     try:
         # Проверяем что у пользователя есть HH токен
@@ -76,14 +83,7 @@ async def get_hh_client(
                 }
             )
 
-        # Расшифровываем токен
-        encryption = TokenEncryption()
-        hh_token = encryption.decrypt(user.encrypted_hh_token)
-
-        # Создаем HH клиент
-        hh_client = HHClient(token=hh_token)
-
-        return hh_client
+        return get_hh_client_pool().get_client(user.id, user.encrypted_hh_token)
 
     except Exception as e:
         logger.error(f"Ошибка создания HH клиента для пользователя {user.id}: {e}")
@@ -98,92 +98,71 @@ async def get_hh_client(
 
 @router.get("/", response_model=APIResponse)
 async def get_vacancies(
+    background_tasks: BackgroundTasks,
     page: int = Query(0, ge=0, description="Номер страницы (начиная с 0)"),
     per_page: int = Query(20, ge=1, le=100, description="Количество вакансий на странице"),
-    hh_client: HHClient = Depends(get_hh_client)
+    active_only: bool = Query(True, description="Только активные вакансии"),
+    cursor: Optional[str] = Query(None, description="Курсор страницы (пагинация v2, пустое значение - первая страница)"),
+    include_total: bool = Query(False, description="Точный total в режиме курсора"),
+    user: UserProfile = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение списка вакансий пользователя
 
+    Данные из синхронизированных таблиц - ответ не зависит от HH.ru.
+    Если данные старше VACANCY_READ_MODEL_TTL, в фоне запускается синхронизация;
+    meta сообщает время синхронизации и идёт ли обновление
+
     Args:
         page: Номер страницы для пагинации
         per_page: Количество вакансий на странице
+        active_only: Только активные вакансии
+        cursor: Курсор страницы - pagination v2 вместо page (total только по include_total)
+        include_total: Считать total в режиме курсора
 
     Returns:
         APIResponse: Список вакансий с пагинацией в стандартном формате API
     """
+    after = VACANCY_PUBLISHED_KEYSET.decode(cursor) if cursor is not None else None
+
     try:
-        logger.info(f"Получение вакансий: страница {page}, по {per_page} на странице")
-
-        # Получаем вакансии через HH клиент (mock или реальный API)
-        vacancies_data = await hh_client.get_vacancies(page=page, per_page=per_page)
-
-        # Преобразуем каждую вакансию в нужный формат
-        vacancy_items = []
-        for vacancy in vacancies_data.get("items", []):
-            vacancy_item = {
-                "id": vacancy.get("id"),
-                "hh_vacancy_id": vacancy.get("id"),
-                "title": vacancy.get("name", ""),
-                "description": vacancy.get("description", "")[:500] + "..." if len(vacancy.get("description", "")) > 500 else vacancy.get("description", ""),
-
-                # Навыки
-                "key_skills": [skill.get("name", "") for skill in vacancy.get("key_skills", [])],
-
-                # Зарплата
-                "salary_from": vacancy.get("salary", {}).get("from") if vacancy.get("salary") else None,
-                "salary_to": vacancy.get("salary", {}).get("to") if vacancy.get("salary") else None,
-                "currency": vacancy.get("salary", {}).get("currency", "RUR") if vacancy.get("salary") else "RUR",
-
-                # Параметры
-                "experience": vacancy.get("experience", {}).get("id") if vacancy.get("experience") else None,
-                "employment": vacancy.get("employment", {}).get("id") if vacancy.get("employment") else None,
-                "schedule": vacancy.get("schedule", {}).get("id") if vacancy.get("schedule") else None,
-                "area": vacancy.get("area", {}).get("name") if vacancy.get("area") else None,
-
-                # Статистика
-                "applications_count": vacancy.get("counters", {}).get("responses", 0),
-                "new_applications_count": vacancy.get("counters", {}).get("unread_responses", 0),
-                "is_active": not vacancy.get("archived", False),
-
-                # Даты
-                "published_at": vacancy.get("published_at"),
-                "created_at": vacancy.get("created_at"),
-
-                # Дополнительные поля
-                "url": vacancy.get("alternate_url"),
-                "employer": {
-                    "name": vacancy.get("employer", {}).get("name", ""),
-                    "url": vacancy.get("employer", {}).get("alternate_url", "")
-                }
-            }
-            vacancy_items.append(vacancy_item)
+        meta = await db.run_sync(refresh_if_stale, user, background_tasks)
+
+        query = select(Vacancy).where(Vacancy.user_id == user.id)
+        if active_only:
+            query = query.where(Vacancy.is_active == True)
+        count_query = select(func.count()).select_from(query.with_only_columns(Vacancy.id).subquery())
+
+        if cursor is not None:
+            total = await db.scalar(count_query) if include_total else None
+            vacancies, next_cursor = VACANCY_PUBLISHED_KEYSET.page(
+                (await db.scalars(VACANCY_PUBLISHED_KEYSET.apply(query, after, per_page))).all(), per_page
+            )
+            return success(data={
+                "items": [vacancy_list_item(vacancy, user.company_name) for vacancy in vacancies],
+                "pagination": cursor_pagination(next_cursor, total),
+                "meta": meta
+            })
+
+        total = await db.scalar(count_query)
+        vacancies = (await db.scalars(query.order_by(
+            Vacancy.published_at.desc(), Vacancy.created_at.desc()
+        ).offset(page * per_page).limit(per_page))).all()
 
         response_data = {
-            "items": vacancy_items,
+            "items": [vacancy_list_item(vacancy, user.company_name) for vacancy in vacancies],
             "pagination": {
-                "page": vacancies_data.get("page", page),
-                "pages": vacancies_data.get("pages", 0),
-                "per_page": vacancies_data.get("per_page", per_page),
-                "total": vacancies_data.get("found", 0)
+                "page": page,
+                "pages": (total + per_page - 1) // per_page,
+                "per_page": per_page,
+                "total": total
             },
-            "meta": {
-                "source": "mock" if hh_client.is_mock_mode else "hh_api"
-            }
+            "meta": meta
         }
 
-        logger.info(f"Успешно получено {len(vacancy_items)} вакансий")
         return success(data=response_data)
 
-    except HHIntegrationError as e:
-        logger.error(f"Ошибка интеграции с HH.ru: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail={
-                "error": "HH_INTEGRATION_ERROR",
-                "message": str(e)
-            }
-        )
     except Exception as e:
         logger.error(f"Неожиданная ошибка при получении вакансий: {e}")
         raise HTTPException(
@@ -193,128 +172,90 @@ async def get_vacancies(
                 "message": "Внутренняя ошибка сервера"
             }
         )
-    finally:
-        # Закрываем HH клиент
-        await hh_client.close()
 
 
 @router.get("/{vacancy_id}/applications", response_model=APIResponse)
 async def get_vacancy_applications(
     vacancy_id: str,
+    background_tasks: BackgroundTasks,
     page: int = Query(0, ge=0, description="Номер страницы (начиная с 0)"),
     per_page: int = Query(20, ge=1, le=100, description="Количество откликов на странице"),
-    hh_client: HHClient = Depends(get_hh_client)
+    cursor: Optional[str] = Query(None, description="Курсор страницы (пагинация v2, пустое значение - первая страница)"),
+    include_total: bool = Query(False, description="Точный total в режиме курсора"),
+    user: UserProfile = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Получение откликов на вакансию
 
+    Данные из синхронизированных таблиц, обновление как у списка вакансий
+
     Args:
         vacancy_id: ID вакансии в HH.ru
         page: Номер страницы для пагинации
         per_page: Количество откликов на странице
+        cursor: Курсор страницы - pagination v2 вместо page (total - счётчик откликов вакансии)
+        include_total: Точный total в режиме курсора
 
     Returns:
         APIResponse: Список откликов с пагинацией в стандартном формате API
     """
-    try:
-        logger.info(f"Получение откликов для вакансии {vacancy_id}: страница {page}, по {per_page} на странице")
+    after = APPLICATION_KEYSET.decode(cursor) if cursor is not None else None
+
+    vacancy = await db.scalar(select(Vacancy).where(
+        Vacancy.user_id == user.id,
+        Vacancy.hh_vacancy_id == vacancy_id
+    ))
 
-        # Получаем отклики через HH клиент
-        applications_data = await hh_client.get_applications(
-            vacancy_id=vacancy_id,
-            page=page,
-            per_page=per_page
+    if not vacancy:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={
+                "error": "VACANCY_NOT_FOUND",
+                "message": f"Вакансия {vacancy_id} не найдена"
+            }
         )
 
-        # Преобразуем каждый отклик в нужный формат
-        application_items = []
-        for application in applications_data.get("items", []):
-            resume = application.get("resume", {})
-
-            # Извлекаем контактные данные
-            contacts = resume.get("contact", [])
-            email = None
-            phone = None
-
-            for contact in contacts:
-                contact_type = contact.get("type", {}).get("id", "")
-                if contact_type == "email":
-                    email = contact.get("value", "")
-                elif contact_type == "cell":
-                    phone_data = contact.get("value", {})
-                    if isinstance(phone_data, dict):
-                        phone = phone_data.get("formatted", "")
-                    else:
-                        phone = str(phone_data)
-
-            application_item = {
-                "id": application.get("id"),
+    try:
+        meta = await db.run_sync(refresh_if_stale, user, background_tasks)
+
+        query = select(Application).where(Application.vacancy_id == vacancy.id)
+        count_query = select(func.count()).select_from(query.with_only_columns(Application.id).subquery())
+
+        if cursor is not None:
+            if include_total:
+                total, estimate = await db.scalar(count_query), False
+            else:
+                total, estimate = vacancy.applications_count, True
+            applications, next_cursor = APPLICATION_KEYSET.page(
+                (await db.scalars(APPLICATION_KEYSET.apply(query, after, per_page))).all(), per_page
+            )
+            return success(data={
                 "vacancy_id": vacancy_id,
-                "hh_application_id": application.get("id"),
-                "hh_resume_id": resume.get("id"),
-
-                # Данные кандидата
-                "candidate_name": f"{resume.get('first_name', '')} {resume.get('last_name', '')}".strip(),
-                "candidate_email": email,
-                "candidate_phone": phone,
-                "resume_url": resume.get("alternate_url"),
-
-                # Информация о резюме
-                "resume_title": resume.get("title", ""),
-                "candidate_age": resume.get("age"),
-                "candidate_area": resume.get("area", {}).get("name") if resume.get("area") else None,
-                "experience_months": resume.get("total_experience", {}).get("months") if resume.get("total_experience") else None,
-
-                # Зарплатные ожидания
-                "expected_salary": {
-                    "amount": resume.get("salary", {}).get("amount") if resume.get("salary") else None,
-                    "currency": resume.get("salary", {}).get("currency", "RUR") if resume.get("salary") else "RUR"
-                },
-
-                # Навыки
-                "skills": resume.get("skill_set", []),
-
-                # Статус
-                "is_duplicate": False,  # TODO: реализовать дедупликацию
-                "analyzed_at": None,    # TODO: связать с анализом
-
-                # Даты
-                "created_at": application.get("created_at"),
-                "updated_at": application.get("updated_at"),
+                "items": [application_list_item(application, vacancy_id) for application in applications],
+                "pagination": cursor_pagination(next_cursor, total, total_is_estimate=estimate),
+                "meta": meta
+            })
 
-                # Дополнительные поля
-                "state": application.get("state", {}).get("name", ""),
-                "has_updates": application.get("has_updates", False),
-                "viewed_by_opponent": application.get("viewed_by_opponent", True)
-            }
-            application_items.append(application_item)
+        total = await db.scalar(count_query)
+        applications = (await db.scalars(query.order_by(
+            Application.created_at.desc()
+        ).offset(page * per_page).limit(per_page))).all()
 
         response_data = {
             "vacancy_id": vacancy_id,
-            "items": application_items,
+            "items": [application_list_item(application, vacancy_id) for application in applications],
             "pagination": {
-                "page": applications_data.get("page", page),
-                "pages": applications_data.get("pages", 0),
-                "per_page": applications_data.get("per_page", per_page),
-                "total": applications_data.get("found", 0)
+                "page": page,
+                "pages": (total + per_page - 1) // per_page,
+                "per_page": per_page,
+                "total": total
             },
-            "meta": {
-                "source": "mock" if hh_client.is_mock_mode else "hh_api"
-            }
+            "meta": meta
         }
 
-        logger.info(f"Успешно получено {len(application_items)} откликов для вакансии {vacancy_id}")
         return success(data=response_data)
 
-    except HHIntegrationError as e:
-        logger.error(f"Ошибка интеграции с HH.ru: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail={
-                "error": "HH_INTEGRATION_ERROR",
-                "message": str(e)
-            }
-        )
     except Exception as e:
         logger.error(f"Неожиданная ошибка при получении откликов для вакансии {vacancy_id}: {e}")
         raise HTTPException(
@@ -324,9 +265,6 @@ async def get_vacancy_applications(
                 "message": "Внутренняя ошибка сервера"
             }
         )
-    finally:
-        # Закрываем HH клиент
-        await hh_client.close()
 
 
 @router.get("/{vacancy_id}", response_model=APIResponse)
@@ -432,6 +370,3 @@ async def get_vacancy_details(
                 "message": "Внутренняя ошибка сервера"
             }
         )
-    finally:
-        # Закрываем HH клиент
-        await hh_client.close()
\ No newline at end of file
@@ -29,8 +29,30 @@ class Settings(BaseSettings):
     OPENAI_MODEL: str = "gpt-4o"
     OPENAI_PROXY_URL: str = ""  # HTTP прокси для OpenAI (необязательно)
 
+    # AI Analysis
+    ANALYSIS_CONCURRENCY: int = 8  # Одновременных запросов к OpenAI в одном пакете
+    ANALYSIS_MAX_ATTEMPTS: int = 3  # Попыток анализа одного отклика
+    ANALYSIS_JOB_TIMEOUT: int = 3600  # Секунд на одну задачу анализа в RQ
+    ANALYSIS_CHUNK_SIZE: int = 20  # Откликов в одном чанке планировщика
+    ANALYSIS_MAX_INFLIGHT_CHUNKS: int = 8  # Чанков в работе одновременно (по числу воркеров)
+    ANALYSIS_INTERACTIVE_RESERVE: int = 2  # Слотов, недоступных переанализу
+    OPENAI_RPM_LIMIT: int = 500  # Начальные лимиты до первого ответа с x-ratelimit-* заголовками
+    OPENAI_TPM_LIMIT: int = 30000
+    ANALYSIS_CACHE_LOCAL_SIZE: int = 2048  # Записей в in-process LRU перед Redis
+    ANALYSIS_CACHE_LOCAL_TTL: int = 600  # Секунд жизни записи в LRU
+    ANALYSIS_SINGLEFLIGHT_LEASE: int = 30  # Секунд аренды блокировки анализа отклика (продлевается)
+    ANALYSIS_SINGLEFLIGHT_RESULT_TTL: int = 300  # Секунд хранения результата для повторных запросов
+
     # HH.ru Integration
     HH_MOCK_MODE: bool = False  # Использовать mock данные вместо реального API
+    HH_API_BASE_URL: str = "https://api.hh.ru"  # Адрес HH.ru API (локальный стенд - hh_stub_server.py)
+    HH_PAGE_CONCURRENCY: int = 4  # Одновременных запросов страниц откликов на один токен
+    HH_REQUESTS_PER_SECOND: float = 5.0  # Запросов к HH.ru в секунду на один токен
+    HH_REQUESTS_BURST: int = 10  # Допустимый всплеск запросов сверх среднего темпа
+    HH_SYNC_VACANCY_CONCURRENCY: int = 4  # Вакансий, синхронизируемых одновременно
+    HH_EMPLOYER_CACHE_TTL: int = 3600  # Время жизни кеша employer_id токена (сек)
+    HH_DICTIONARY_TTL: int = 86400  # Ревалидация справочников и регионов HH.ru по ETag (сек)
+    VACANCY_READ_MODEL_TTL: int = 300  # Через сколько секунд /api/vacancies запускает фоновую синхронизацию
     HH_CLIENT_ID: str
     HH_CLIENT_SECRET: str
     HH_REDIRECT_URI: str = "https://timly-hr.ru/auth"
@@ -2,11 +2,13 @@
 База данных и подключения для Timly
 Настройки подключения к PostgreSQL с пулом соединений
 """
-from sqlalchemy import create_engine, MetaData, TypeDecorator, CHAR
+from sqlalchemy import create_engine, MetaData, TypeDecorator, CHAR, JSON
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from app.config import settings
 import logging
 import uuid
@@ -16,10 +18,20 @@ logger = logging.getLogger(__name__)
 
 # Универсальный UUID тип - просто строки для простоты
 class GUID(TypeDecorator):
-    """Platform-independent GUID type - stores UUIDs as strings"""
+    """
+    Platform-independent GUID type - stores UUIDs as strings
+
+    В PostgreSQL колонки имеют тип uuid (миграция 001): параметры передаются как uuid,
+    иначе asyncpg типизирует их как $1::VARCHAR и сравнение uuid = varchar не выполняется
+    """
     impl = CHAR(36)
     cache_ok = True
 
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(UUID(as_uuid=False))
+        return dialect.type_descriptor(CHAR(36))
+
     def process_bind_param(self, value, dialect):
         """При записи в БД - конвертируем UUID в строку"""
         if value is None:
@@ -31,6 +43,10 @@ class GUID(TypeDecorator):
         return value
 
 
+# JSON документы: JSONB в PostgreSQL (операторы ->>, @>, генерируемые колонки), JSON в SQLite
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
+
 # Создание движка с оптимизацией для производительности
 if settings.DATABASE_URL.startswith("sqlite"):
     # SQLite настройки
@@ -52,9 +68,39 @@ else:
         echo=settings.DEBUG  # SQL логирование только в dev режиме
     )
 
-# Фабрика сессий
+# Фабрика сессий (скрипты, воркеры RQ и фоновые задачи)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def _async_database_url(url: str) -> str:
+    """URL для async драйвера: postgresql -> asyncpg, sqlite -> aiosqlite"""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        return str(parsed.set(drivername="sqlite+aiosqlite"))
+    return str(parsed.set(drivername="postgresql+asyncpg"))
+
+
+# Async движок для API: запросы не блокируют event loop uvicorn
+if settings.DATABASE_URL.startswith("sqlite"):
+    async_engine = create_async_engine(
+        _async_database_url(settings.DATABASE_URL),
+        echo=settings.DEBUG
+    )
+else:
+    async_engine = create_async_engine(
+        _async_database_url(settings.DATABASE_URL),
+        pool_size=10,
+        max_overflow=15,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        pool_timeout=30,
+        echo=settings.DEBUG
+    )
+
+# Фабрика async сессий. expire_on_commit=False: после commit атрибуты не
+# перечитываются неявно (в async это ошибка), серверные значения - через refresh()
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Базовый класс для всех моделей
 Base = declarative_base()
 
@@ -74,6 +120,15 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """
+    Dependency injection для получения async сессии БД
+    Используется в FastAPI endpoints вместо get_db
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 async def init_database():
     """
     Инициализация базы данных при старте приложения
@@ -96,6 +151,7 @@ async def close_database():
     """
     try:
         engine.dispose()
+        await async_engine.dispose()
         logger.info("Database connections closed")
     except Exception as e:
         logger.error(f"Error closing database: {e}")
\ No newline at end of file
@@ -96,6 +96,8 @@ async def startup_event():
 async def shutdown_event():
     """Очистка ресурсов при остановке"""
     logger.info("Shutting down application")
+    from app.services.hh_client_pool import get_hh_client_pool
+    await get_hh_client_pool().close_all()
     await close_database()
 
 
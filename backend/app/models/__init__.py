@@ -4,12 +4,13 @@ SQLAlchemy модели для Timly
 """
 from .user import User
 from .vacancy import Vacancy
-from .application import Application, AnalysisResult, SyncJob
+from .application import Application, AnalysisResult, SyncJob, ApplicationStatus, AnalysisState
 from .resume_search import ResumeSearch, SearchCandidate, SearchStatus
 from .uploaded_candidate import UploadedCandidate, UploadSource
 
 __all__ = [
     "User", "Vacancy", "Application", "AnalysisResult", "SyncJob",
+    "ApplicationStatus", "AnalysisState",
     "ResumeSearch", "SearchCandidate", "SearchStatus",
     "UploadedCandidate", "UploadSource"
 ]
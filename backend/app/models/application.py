@@ -2,13 +2,16 @@
 Модели заявок на вакансии и результатов анализа
 Отклики кандидатов и AI анализ резюме
 """
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, ForeignKey, CheckConstraint, Numeric, JSON
+from sqlalchemy import (
+    Column, String, Integer, Boolean, DateTime, Text, ForeignKey, CheckConstraint, Numeric, JSON, Index, Computed, text
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from typing import Optional
 import uuid
 import enum
 
-from app.database import Base, GUID
+from app.database import Base, GUID, JSONDocument
 
 
 class RecommendationType(enum.Enum):
@@ -19,6 +22,52 @@ class RecommendationType(enum.Enum):
     reject = "reject"       # Отклонить
 
 
+class ApplicationStatus(enum.Enum):
+    """Нормализованная коллекция отклика HH.ru (phone_interview, discard_by_employer и т.д. сводятся к одной)"""
+    response = "response"     # Новые отклики
+    consider = "consider"     # Подумать
+    interview = "interview"   # Собеседования
+    offer = "offer"           # Предложение о работе
+    hired = "hired"           # Выход на работу
+    discard = "discard"       # Отказы
+    other = "other"           # Прочие коллекции
+
+    @classmethod
+    def from_collection(cls, collection_id: Optional[str]) -> Optional[str]:
+        """Статус по collection_id из HH.ru (None, если коллекция неизвестна)"""
+        if not collection_id:
+            return None
+        # discard проверяется первым: discard_to_other_vacancy не должен стать другим статусом
+        for status in (cls.discard, cls.response, cls.consider, cls.interview, cls.offer, cls.hired):
+            if status.value in collection_id:
+                return status.value
+        return cls.other.value
+
+
+class AnalysisState(enum.Enum):
+    """Состояние AI анализа отклика (денормализация наличия AnalysisResult)"""
+    pending = "pending"
+    analyzed = "analyzed"
+
+
+# Отклики к анализу по умолчанию: response и consider, без discard
+ANALYZABLE_STATUSES = (ApplicationStatus.response.value, ApplicationStatus.consider.value)
+
+
+def collection_condition(collection_id: Optional[str] = None):
+    """
+    Условие фильтра откликов по коллекции
+
+    Без collection_id - анализируемые коллекции; известное значение сравнивается
+    с нормализованным status (попадает в индекс), произвольное - подстрокой collection_id
+    """
+    if not collection_id:
+        return Application.status.in_(ANALYZABLE_STATUSES)
+    if collection_id in ApplicationStatus._value2member_map_:
+        return Application.status == collection_id
+    return Application.collection_id.like(f"%{collection_id}%")
+
+
 class JobStatus(enum.Enum):
     """Статусы фоновых задач"""
     pending = "pending"
@@ -49,15 +98,23 @@ class Application(Base):
     resume_url = Column(String(500), nullable=True)
 
     # Данные резюме (полная структура из HH.ru)
-    resume_data = Column(JSON, nullable=True)
+    resume_data = Column(JSONDocument, nullable=True)
     resume_hash = Column(String(64), nullable=True, index=True)  # MD5 для дедупликации
+    content_hash = Column(String(64), nullable=True)  # SHA-256 синхронизируемых полей - неизменённые строки не перезаписываются
 
     # Статусы и коллекции из HH.ru (для фильтрации)
     collection_id = Column(String(50), nullable=True, index=True)  # response, consider, interview, discard
     state = Column(String(50), nullable=True, index=True)          # ID статуса отклика
+    status = Column(String(20), nullable=True)  # ApplicationStatus - проставляется при синхронизации
 
     # Статус обработки
     is_duplicate = Column(Boolean, default=False, nullable=False, index=True)
+    analysis_state = Column(
+        String(20),
+        default=AnalysisState.pending.value,
+        server_default=AnalysisState.pending.value,
+        nullable=False
+    )  # AnalysisState - меняется вместе с analyzed_at при сохранении результата
     analyzed_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
 
@@ -65,6 +122,19 @@ class Application(Base):
     vacancy = relationship("Vacancy", back_populates="applications")
     analysis_result = relationship("AnalysisResult", back_populates="application", uselist=False, cascade="all, delete-orphan")
 
+    # Выборки "непроанализированные отклики вакансии" идут по частичному индексу без LIKE
+    __table_args__ = (
+        Index(
+            "ix_applications_unanalyzed",
+            "vacancy_id", "status",
+            postgresql_where=text("analysis_state = 'pending'"),
+            sqlite_where=text("analysis_state = 'pending'")
+        ),
+        Index("ix_applications_vacancy_status", "vacancy_id", "status", "analysis_state"),
+        # Курсорная пагинация откликов вакансии (created_at DESC, id DESC)
+        Index("ix_applications_vacancy_created", "vacancy_id", "created_at", "id"),
+    )
+
     def __repr__(self):
         return f"<Application(id={self.id}, candidate={self.candidate_name}, vacancy_id={self.vacancy_id})>"
 
@@ -81,7 +151,9 @@ class Application(Base):
             "resume_url": self.resume_url,
             "collection_id": self.collection_id,
             "state": self.state,
+            "status": self.status,
             "is_duplicate": self.is_duplicate,
+            "analysis_state": self.analysis_state,
             "analyzed_at": self.analyzed_at.isoformat() if self.analyzed_at else None,
             "created_at": self.created_at.isoformat() if self.created_at else None,
         }
@@ -117,13 +189,37 @@ class AnalysisResult(Base):
     processing_time_ms = Column(Integer, nullable=True) # Время обработки
 
     # Полный JSON ответ AI для дополнительных полей (v3.0)
-    raw_result = Column(JSON, nullable=True)  # summary_one_line, experience_years, etc.
-    
+    raw_result = Column(JSONDocument, nullable=True)  # summary_one_line, experience_years, etc.
+
+    # Поля raw_result для фильтров и сортировки - генерируемые (STORED) колонки БД,
+    # фильтр "High + top без недостающих must-haves" не загружает JSON
+    verdict = Column(Text, Computed(
+        "CASE raw_result ->> 'verdict' "
+        "WHEN 'GREEN' THEN 'High' WHEN 'YELLOW' THEN 'Medium' WHEN 'RED' THEN 'Low' "
+        "ELSE raw_result ->> 'verdict' END",
+        persisted=True
+    ))  # High/Medium/Low/Mismatch (старые GREEN/YELLOW/RED сводятся к ним)
+    priority = Column(Text, Computed("raw_result ->> 'priority'", persisted=True))  # top/strong/basic
+    must_have_missing = Column(Integer, Computed(
+        "CASE WHEN raw_result ->> 'must_have_missing' <> '' "
+        "AND TRIM(raw_result ->> 'must_have_missing', '0123456789') = '' "
+        "THEN CAST(raw_result ->> 'must_have_missing' AS INTEGER) END",
+        persisted=True
+    ))  # Только неотрицательное целое, иначе NULL
+    salary_status = Column(Text, Computed("raw_result ->> 'salary_status'", persisted=True))
+    one_liner = Column(Text, Computed(
+        "COALESCE(NULLIF(raw_result ->> 'one_liner', ''), raw_result ->> 'verdict_reason')", persisted=True
+    ))
+
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
 
     # Отношения
     application = relationship("Application", back_populates="analysis_result")
 
+    __table_args__ = (
+        Index("ix_analysis_results_verdict_priority", "verdict", "priority", "must_have_missing"),
+    )
+
     def __repr__(self):
         return f"<AnalysisResult(id={self.id}, score={self.score}, recommendation={self.recommendation})>"
 
@@ -146,6 +242,11 @@ class AnalysisResult(Base):
             "ai_cost_rub": float(self.ai_cost_rub) if self.ai_cost_rub else None,
             "processing_time_ms": self.processing_time_ms,
             "created_at": self.created_at.isoformat() if self.created_at else None,
+            "verdict": self.verdict,
+            "priority": self.priority,
+            "must_have_missing": self.must_have_missing,
+            "salary_status": self.salary_status,
+            "one_liner": self.one_liner,
             # v2: Полный ответ AI с tier, scores, confidence, interview_questions
             "raw_result": self.raw_result,
         }
@@ -165,6 +266,8 @@ class SyncJob(Base):
     vacancies_synced = Column(Integer, default=0, nullable=False)
     applications_synced = Column(Integer, default=0, nullable=False)
     errors = Column(JSON, default=list, nullable=False)  # Список ошибок
+    # Время синхронизации откликов по вакансиям: [{vacancy_id, applications, seconds, error}]
+    vacancy_timings = Column(JSON, default=list, nullable=True)
 
     started_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
@@ -185,6 +288,7 @@ class SyncJob(Base):
             "vacancies_synced": self.vacancies_synced,
             "applications_synced": self.applications_synced,
             "errors": self.errors,
+            "vacancy_timings": self.vacancy_timings or [],
             "started_at": self.started_at.isoformat() if self.started_at else None,
             "completed_at": self.completed_at.isoformat() if self.completed_at else None,
             "created_at": self.created_at.isoformat() if self.created_at else None,
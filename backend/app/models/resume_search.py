@@ -2,7 +2,7 @@
 Модель поиска по базе резюме
 Хранит поисковые проекты и найденных кандидатов
 """
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, ForeignKey, JSON, Enum as SQLEnum
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, ForeignKey, JSON, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
@@ -149,6 +149,11 @@ class SearchCandidate(Base):
     # Отношения
     search = relationship("ResumeSearch", back_populates="candidates")
 
+    # Курсорная пагинация списка кандидатов по дате
+    __table_args__ = (
+        Index("ix_search_candidates_search_created", "search_id", "created_at", "id"),
+    )
+
     def __repr__(self):
         return f"<SearchCandidate(id={self.id}, name={self.first_name} {self.last_name}, score={self.ai_score})>"
 
@@ -2,7 +2,7 @@
 Модель загруженных кандидатов
 Хранит резюме, загруженные пользователем из PDF/Excel
 """
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, ForeignKey, JSON, Enum as SQLEnum
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, ForeignKey, JSON, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
@@ -85,6 +85,11 @@ class UploadedCandidate(Base):
     user = relationship("User", backref="uploaded_candidates")
     vacancy = relationship("Vacancy", backref="uploaded_candidates")
 
+    # Курсорная пагинация списка кандидатов по дате
+    __table_args__ = (
+        Index("ix_uploaded_candidates_user_created", "user_id", "created_at", "id"),
+    )
+
     def __repr__(self):
         return f"<UploadedCandidate(id={self.id}, name={self.full_name}, score={self.ai_score})>"
 
@@ -2,7 +2,7 @@
 Модель вакансии из HH.ru
 Хранит данные вакансий и связанную статистику
 """
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, ForeignKey, UniqueConstraint, JSON
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, ForeignKey, UniqueConstraint, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
@@ -41,6 +41,12 @@ class Vacancy(Base):
     applications_count = Column(Integer, default=0, nullable=False)
     new_applications_count = Column(Integer, default=0, nullable=False)
     last_synced_at = Column(DateTime, nullable=True)
+    # Курсор инкрементальной синхронизации откликов: счётчики коллекций и последний updated_at
+    applications_cursor = Column(JSON, nullable=True)
+
+    # AI профиль вакансии: тип позиции, ниша, must-haves (вычисляется один раз на содержимое)
+    analysis_profile = Column(JSON, nullable=True)
+    analysis_profile_hash = Column(String(64), nullable=True)
 
     # Метаданные
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
@@ -53,6 +59,8 @@ class Vacancy(Base):
     # Составной UNIQUE constraint для уникальности (user_id, hh_vacancy_id)
     __table_args__ = (
         UniqueConstraint('user_id', 'hh_vacancy_id', name='uq_user_vacancy'),
+        # Курсорная пагинация списков вакансий по дате
+        Index('ix_vacancies_user_created', 'user_id', 'created_at', 'id'),
     )
 
     def __repr__(self):
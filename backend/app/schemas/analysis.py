@@ -112,10 +112,16 @@ class AnalysisFilter(BaseModel):
     min_score: Optional[int] = Field(None, ge=0, le=100, description="Минимальная оценка")
     max_score: Optional[int] = Field(None, ge=0, le=100, description="Максимальная оценка")
     recommendation: Optional[str] = Field(None, description="Фильтр по рекомендации")
+    verdict: Optional[str] = Field(None, description="Фильтр по вердикту (High, Medium, Low, Mismatch)")
+    priority: Optional[str] = Field(None, description="Фильтр по приоритету (top, strong, basic)")
+    max_must_have_missing: Optional[int] = Field(None, ge=0, description="Максимум неподтверждённых must-haves (0 - все подтверждены)")
+    sort_by: str = Field(default="score", description="Сортировка: score (по умолчанию) или verdict (вердикт, приоритет, score)")
     has_red_flags: Optional[bool] = Field(None, description="Есть ли красные флаги")
     analyzed_after: Optional[datetime] = Field(None, description="Анализированы после даты")
     limit: int = Field(default=50, le=200, description="Количество результатов")
     offset: int = Field(default=0, ge=0, description="Смещение для пагинации")
+    cursor: Optional[str] = Field(None, description="Курсор страницы (пагинация v2, пустое значение - первая страница)")
+    include_total: bool = Field(default=False, description="Считать total в режиме курсора")
 
     @validator('max_score')
     def validate_score_range(cls, v, values):
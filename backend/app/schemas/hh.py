@@ -112,7 +112,7 @@ class SyncJobCreate(BaseModel):
     """Создание задачи синхронизации"""
     sync_vacancies: bool = Field(default=True, description="Синхронизировать вакансии")
     sync_applications: bool = Field(default=True, description="Синхронизировать отклики")
-    force_full_sync: bool = Field(default=False, description="Полная синхронизация")
+    force_full_sync: bool = Field(default=False, description="Полная пересинхронизация всех откликов вместо инкрементальной")
 
     class Config:
         schema_extra = {
@@ -131,6 +131,7 @@ class SyncJobStatus(BaseModel):
     vacancies_synced: int = Field(default=0, description="Синхронизировано вакансий")
     applications_synced: int = Field(default=0, description="Синхронизировано откликов")
     errors: List[str] = Field(default_factory=list, description="Ошибки при синхронизации")
+    vacancy_timings: List[Dict[str, Any]] = Field(default_factory=list, description="Время синхронизации по вакансиям")
 
     started_at: Optional[datetime] = Field(None, description="Время начала")
     completed_at: Optional[datetime] = Field(None, description="Время завершения")
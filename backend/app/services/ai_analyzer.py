@@ -1,23 +1,33 @@
 """
-AI сервис для анализа резюме v7.0 (Hybrid Expert)
+AI сервис для анализа резюме v7.4 (Hybrid Expert)
 Интеграция с OpenAI GPT-4o для анализа кандидатов
 Подход: Must-haves валидация + Холистическая оценка
+Must-haves выделяются один раз на вакансию и переиспользуются для всех резюме
+Промпт собирается со стабильным префиксом для prompt caching OpenAI
 """
+import asyncio
 import json
 import time
-import hashlib
 from typing import Dict, Any, List, Optional
 import logging
 import openai
-import redis
 from openai import AsyncOpenAI
 
 from app.config import settings
+from app.services.analysis_cache import get_analysis_cache
+from app.services.fingerprint import analysis_fingerprint, vacancy_fingerprint
+from app.services.openai_rate_governor import get_openai_governor, estimate_tokens, retry_after_seconds
+from app.services.prompt_builder import AnalysisPromptBuilder, SYSTEM_JSON_INSTRUCTION, cached_prompt_tokens
 from app.utils.exceptions import AIAnalysisError
 
 logger = logging.getLogger(__name__)
 
 
+# Версии промптов - входят в ключи кеша
+PROMPT_VERSION = "7.4"
+VACANCY_PROMPT_VERSION = "1.0"
+
+
 class AIAnalyzer:
     def __init__(self):
         logging.getLogger("openai").setLevel(logging.WARNING)
@@ -33,294 +43,40 @@ class AIAnalyzer:
 
         self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, http_client=http_client)
         self.model = settings.OPENAI_MODEL
+        self.governor = get_openai_governor(self.model)
+        self.prompts = AnalysisPromptBuilder()
+        self._profile_locks: Dict[str, asyncio.Lock] = {}
+        self.cache = get_analysis_cache()
 
-        try:
-            self.cache = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True, socket_connect_timeout=5)
-            self.cache.ping()
-        except Exception as e:
-            logger.warning(f"Redis недоступен: {e}")
-            self.cache = None
-
-    def _get_cache_key(self, vacancy_data: Dict, resume_data: Dict) -> str:
-        vh = hashlib.md5(json.dumps(vacancy_data, sort_keys=True).encode()).hexdigest()[:8]
-        rh = hashlib.md5(json.dumps(resume_data, sort_keys=True).encode()).hexdigest()[:8]
-        return f"analysis:v72:{vh}:{rh}"
-
-    def _get_cached(self, key: str) -> Optional[Dict]:
-        if not self.cache:
-            return None
-        try:
-            cached = self.cache.get(key)
-            return json.loads(cached) if cached else None
-        except:
-            return None
-
-    def _set_cache(self, key: str, result: Dict, ttl: int = 86400):
-        if self.cache:
-            try:
-                self.cache.setex(key, ttl, json.dumps(result, ensure_ascii=False))
-            except:
-                pass
-
-    def _build_prompt(self, vacancy: Dict, resume: Dict, strictness: str = "balanced") -> str:
-        """Построение промпта v7.0 (Hybrid Expert)"""
-        if isinstance(resume, str):
-            resume = json.loads(resume) if resume else {}
-
-        # Опыт работы
-        exp_list = resume.get('experience', [])
-        work_history = ""
-        for i, exp in enumerate(exp_list[:5]):
-            if isinstance(exp, dict):
-                company_raw = exp.get('company', '?')
-                company = company_raw.get('name', '?') if isinstance(company_raw, dict) else (company_raw or '?')
-                pos = exp.get('position', '?')
-                desc = exp.get('description', '') or ''
-                start = exp.get('start')
-                end = exp.get('end')
-                if isinstance(start, dict):
-                    period_start = f"{start.get('month', '')}/{start.get('year', '')}"
-                elif isinstance(start, str):
-                    period_start = start[:7] if len(start) >= 7 else start
-                else:
-                    period_start = '?'
-                if isinstance(end, dict):
-                    period_end = f"{end.get('month', '')}/{end.get('year', '')}"
-                elif isinstance(end, str):
-                    period_end = end[:7] if len(end) >= 7 else end
-                else:
-                    period_end = 'н.в.'
-                period = f"{period_start} - {period_end}"
-                work_history += f"\n### {company} | {pos} | {period}\n{desc}\n"
-
-        # Навыки (список)
-        skills = []
-        for s in resume.get('skill_set', []):
-            skills.append(s.get('name', '') if isinstance(s, dict) else s)
-        skills_text = ', '.join(skills) or 'Не указаны'
-
-        # Зарплата кандидата (NET → GROSS)
-        salary_data = resume.get('salary')
-        salary = salary_data.get('amount', 0) if isinstance(salary_data, dict) else 0
-        salary_gross = int(salary * 1.15) if salary else 0
-
-        # Общий опыт
-        exp_data = resume.get('total_experience')
-        months = exp_data.get('months', 0) if isinstance(exp_data, dict) else 0
-        months = months or 0
-        years, rem = months // 12, months % 12
-
-        # Локация кандидата
-        candidate_area = resume.get('area', {})
-        candidate_city = candidate_area.get('name', '?') if isinstance(candidate_area, dict) else str(candidate_area or '?')
-
-        # Готовность к переезду
-        relocation = resume.get('relocation', {})
-        relocation_ready = relocation.get('type', {}).get('id', '') if isinstance(relocation, dict) else ''
-        relocation_text = "готов к переезду" if relocation_ready == 'relocation_possible' else "не готов к переезду"
-
-        # Сопроводительное письмо
-        cover = resume.get('cover_letter', '') or resume.get('message', '') or 'Не указано'
-
-        # Вакансия
-        v_skills = ', '.join(vacancy.get('key_skills', [])) or 'Не указаны'
-        v_description = vacancy.get('description', '')[:1200] if vacancy.get('description') else ''
-        sal_from = vacancy.get('salary_from', 0) or 0
-        sal_to = vacancy.get('salary_to', 0) or 0
-        v_area = vacancy.get('area', '?')
-
-        return f"""# РОЛЬ
-
-Ты — Senior Recruiter с 15-летним опытом найма. Твоя задача — оценить кандидата так, как это сделал бы опытный HR: целостно, с пониманием контекста, а не по чеклисту.
-
-## ПРИНЦИПЫ ОЦЕНКИ
-
-1. **Понимание вакансии важнее ключевых слов**
-   - Сначала пойми, КАКОЙ человек нужен на эту позицию
-   - Какие задачи он будет решать? Какой контекст?
-   - Что критично, а что можно освоить?
-
-2. **Холистическая оценка кандидата**
-   - Смотри на карьерный путь целиком, не только последнее место
-   - Оценивай КАЧЕСТВО опыта, не только наличие ключевых слов
-   - Ищи паттерны: рост, стабильность, достижения
-
-3. **Релевантность важнее формального соответствия**
-   - Опыт в смежной нише может быть ценнее, чем слабый опыт в целевой
-   - Человек, который вырастил магазин с 0 до 5М в одежде, может быть лучше того, кто "работал с оборудованием" без результатов
-
-4. **Здравый смысл над правилами**
-   - Если что-то не указано — это не автоматический минус
-   - Контекст определяет важность факторов
-
----
-
-# ПОРЯДОК АНАЛИЗА (выполняй строго по шагам)
-
-## ШАГ 1: АНАЛИЗ ВАКАНСИИ
-
-Прочитай вакансию и ответь себе:
-- Какой ТИП работы? (операционка / развитие / запуск с нуля)
-- Какая НИША и её специфика? (технический товар? fashion? FMCG?)
-- Что КРИТИЧНО для успеха на этой позиции?
-- Что можно ОСВОИТЬ за 1-2 месяца?
-
-Выдели 2-4 MUST-HAVE требования — то, БЕЗ ЧЕГО кандидат не справится:
-- Это должны быть реальные стоп-факторы, а не wish-list
-- Пример must-have: "Опыт работы с WB от 1 года" — да
-- Пример НЕ must-have: "Знание Excel" — это осваивается за неделю
-
-## ШАГ 2: ПРОВЕРКА СТОП-ФАКТОРОВ
-
-Для каждого must-have определи статус:
-- ✅ ЕСТЬ — подтверждено в опыте работы
-- ❓ ВОЗМОЖНО — похожий опыт, нужно уточнить
-- ❌ НЕТ — явно отсутствует или противоречит
-
-⚠️ **КРИТИЧЕСКОЕ ПРАВИЛО:**
-Если хотя бы один must-have = ❌ НЕТ → вердикт ОБЯЗАН быть "Mismatch"
-Это правило НЕ МОЖЕТ быть переопределено никакими плюсами кандидата.
-
-## ШАГ 3: ХОЛИСТИЧЕСКИЙ АНАЛИЗ
-
-Если стоп-факторы пройдены, оцени кандидата целостно:
-
-**Сильные стороны (ищи конкретику):**
-- Где работал? (названия компаний)
-- Сколько? (периоды)
-- Что делал? (задачи)
-- Чего достиг? (цифры, если есть)
-- Какой карьерный тренд? (рост/стагнация)
-
-**Риски и сомнения:**
-- Частая смена работы?
-- Gaps в карьере?
-- Деградация позиций?
-- Несоответствие ожиданий по зарплате?
-- Нет подтверждения заявленных навыков?
-
-**Релевантность опыта:**
-- Прямой опыт в нише? → сильный плюс
-- Смежный опыт с похожими задачами? → хороший плюс
-- Опыт с другим товаром, но на тех же площадках? → нормально
-- Совсем другой опыт? → риск
-
-## ШАГ 4: ВЕРДИКТ
-
-| Вердикт | Когда ставить |
-|---------|---------------|
-| **Mismatch** | Хотя бы один must-have отсутствует. Не тратьте время |
-| **Low** | Must-haves формально есть, но слабые. Много сомнений. Только если некого больше |
-| **Medium** | Есть потенциал, но нужно уточнить ключевые моменты на интервью |
-| **High** | Сильное соответствие. Рекомендую связаться в приоритете |
-
----
-
-# ВАКАНСИЯ
-
-**Позиция:** {vacancy.get('title', '?')}
-**Локация:** {v_area}
-**Зарплата:** {sal_from} - {sal_to} RUB gross
-
-**Требования:**
-{v_skills}
-
-**Описание:**
-{v_description}
-
----
-
-# КАНДИДАТ
-
-**{resume.get('first_name', '')} {resume.get('last_name', '')}**
-Желаемая позиция: {resume.get('title', '?')}
-Локация: {candidate_city} | {relocation_text}
-Общий опыт: {years} лет {rem} мес
-Ожидания по зарплате: {salary_gross} RUB gross
-
-**Навыки (заявленные):**
-{skills_text}
-
-**Опыт работы:**
-{work_history or 'Не указан'}
-
-**Сопроводительное письмо:**
-{cover}
-
----
-
-# ФОРМАТ ОТВЕТА (только валидный JSON)
-
-{{
-  "vacancy_analysis": {{
-    "position_type": "operations | growth | launch",
-    "niche_specifics": "краткое описание специфики ниши",
-    "what_critical": "что критично для успеха",
-    "what_learnable": "что можно освоить"
-  }},
-
-  "must_haves": [
-    {{
-      "requirement": "формулировка требования",
-      "status": "yes | maybe | no",
-      "evidence": "цитата из резюме или null",
-      "reasoning": "почему такой статус"
-    }}
-  ],
-
-  "holistic_analysis": {{
-    "career_summary": "2-3 предложения о карьерном пути кандидата",
-    "relevance_assessment": "насколько опыт релевантен этой вакансии и почему",
-    "growth_pattern": "растёт | стабилен | деградирует | непонятно"
-  }},
-
-  "strengths": [
-    "КОНКРЕТНОЕ достижение или навык, подтверждённый опытом (не просто 'работал в компании X')",
-    "Пример: 'Вырастил оборот магазина с 2М до 8М за 1.5 года в Детский мир'"
-  ],
-
-  "concerns": [
-    "УНИКАЛЬНОЕ сомнение (не дублируй одно и то же разными словами)",
-    "Не повторяй информацию из salary_fit здесь"
-  ],
-
-  "verdict": "Mismatch | Low | Medium | High",
-
-  "priority": "top | strong | basic",
-
-  "one_liner": "ОДНО предложение (максимум 20 слов): почему ЭТОТ кандидат и чем он ОТЛИЧАЕТСЯ. Конкретика: цифры, компании, достижения. Пример: 'WB 3 года, вырастила оборот с 2М до 12М — лучший опыт среди откликнувшихся'",
-
-  "reasoning_for_hr": "Развёрнутое объяснение для HR (3-5 предложений). Включи: 1) Главное преимущество, 2) Релевантный опыт с конкретикой, 3) Основные риски. Пиши полными предложениями БЕЗ ОБРЫВОВ.",
+    def result_fingerprint(self, vacancy_data: Dict, resume_data: Dict, vacancy_profile: Optional[Dict] = None) -> str:
+        """Отпечаток всего, от чего зависит результат анализа резюме"""
+        return analysis_fingerprint(vacancy_data, resume_data, PROMPT_VERSION, self.model, vacancy_profile)
 
-  "interview_questions": [
-    {{
-      "question": "ПЕРСОНАЛИЗИРОВАННЫЙ вопрос именно для ЭТОГО кандидата, основанный на его конкретных пробелах или сомнениях из резюме. НЕ общие вопросы типа 'расскажите о себе'",
-      "checks": "Конкретно что выясняем: 'Реальный ли опыт с WB или только упоминание в резюме'"
-    }}
-  ],
+    def _get_cache_key(self, vacancy_data: Dict, resume_data: Dict, vacancy_profile: Optional[Dict] = None) -> str:
+        return f"analysis:{self.result_fingerprint(vacancy_data, resume_data, vacancy_profile)}"
 
-  "salary_fit": {{
-    "status": "в вилке | выше на X% | ниже | не указано",
-    "comment": "краткий комментарий (НЕ дублируй в concerns)"
-  }}
-}}
+    def vacancy_profile_hash(self, vacancy: Dict) -> str:
+        """Отпечаток содержимого вакансии, которое читает анализ вакансии"""
+        return vacancy_fingerprint(vacancy, VACANCY_PROMPT_VERSION, self.model)
 
-⚠️ ПРАВИЛА ПРИОРИТЕТА (priority):
-- "top" = ВСЕ must-haves подтверждены (yes) + есть ИЗМЕРИМЫЕ достижения (цифры роста/выручки) + карьера растёт
-- "strong" = ВСЕ must-haves подтверждены + хороший релевантный опыт, но без wow-достижений
-- "basic" = must-haves есть, но некоторые "maybe" ИЛИ есть существенные concerns
+    async def _get_cached(self, key: str) -> Optional[Dict]:
+        return await self.cache.get(key)
 
-⚠️ ПРАВИЛА КАЧЕСТВА:
-1. one_liner — ОДНО короткое предложение с КОНКРЕТИКОЙ (цифры, компании). НЕ общие слова типа "хороший опыт"
-2. НЕ дублируй информацию между полями
-3. strengths — ДОСТИЖЕНИЯ с цифрами, а не "работал в компании X"
-4. interview_questions — ПЕРСОНАЛИЗИРОВАННЫЕ под пробелы этого кандидата
+    async def _set_cache(self, key: str, result: Dict, ttl: int = 86400):
+        await self.cache.set(key, result, ttl)
 
-⚠️ ЖЕЛЕЗНОЕ ПРАВИЛО: Если любой must_have имеет status="no" → verdict="Mismatch", priority="basic"."""
-
-    def _enrich(self, result: Dict) -> Dict:
+    def _enrich(self, result: Dict, vacancy_profile: Optional[Dict] = None) -> Dict:
         """Обогащение результата v7.2 с приоритетом"""
 
+        # Анализ вакансии из общего профиля - одинаковый для всех кандидатов
+        if vacancy_profile:
+            result["vacancy_analysis"] = {
+                "position_type": vacancy_profile.get("position_type"),
+                "niche_specifics": vacancy_profile.get("niche_specifics"),
+                "what_critical": vacancy_profile.get("what_critical"),
+                "what_learnable": vacancy_profile.get("what_learnable"),
+            }
+
         verdict = result.get("verdict", "Low")
         priority = result.get("priority", "basic")
 
@@ -410,58 +166,47 @@ class AIAnalyzer:
 
         return result
 
-    async def analyze_resume(self, vacancy: Dict, resume: Dict, force: bool = False, strictness: str = "balanced") -> Dict:
-        """
-        Анализ резюме v7.0 (Hybrid Expert)
-        С retry логикой для rate limit
-        """
-        import asyncio
-        start = time.time()
-        key = self._get_cache_key(vacancy, resume)
+    async def _complete_json(self, system: str, prompt: str, max_tokens: int, temperature: float = 0.4):
+        """JSON completion из пары system + user"""
+        messages = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt}
+        ]
+        return await self._complete_messages(messages, max_tokens, temperature)
 
-        if not force:
-            cached = self._get_cached(key)
-            if cached:
-                return cached
-
-        prompt = self._build_prompt(vacancy, resume, strictness)
+    async def _complete_messages(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float = 0.4):
+        """
+        JSON completion с допуском через общий OpenAI лимитер
 
-        # Retry с exponential backoff
+        Returns:
+            Tuple[Dict, Any]: Распарсенный JSON и объект usage
+        """
+        # Retry: пауза берётся из Retry-After и применяется ко всем воркерам через лимитер
         max_retries = 5
-        base_delay = 2  # секунды
+        base_delay = 2  # секунды, если Retry-After не пришёл
 
         for attempt in range(max_retries):
             try:
-                resp = await self.client.chat.completions.create(
+                await self.governor.acquire(estimate_tokens(messages, max_tokens))
+
+                raw = await self.client.chat.completions.with_raw_response.create(
                     model=self.model,
-                    messages=[
-                        {"role": "system", "content": "Ты опытный HR-эксперт. Отвечай ТОЛЬКО валидным JSON. Без markdown, без комментариев."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.4,
-                    max_tokens=2500,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
                     response_format={"type": "json_object"}
                 )
+                await self.governor.update_from_headers(raw.headers)
+                resp = raw.parse()
 
-                result = json.loads(resp.choices[0].message.content)
-                result = self._enrich(result)
-                result.update({
-                    "ai_model": self.model,
-                    "ai_tokens": resp.usage.total_tokens,
-                    "processing_ms": int((time.time() - start) * 1000),
-                    "prompt_version": "7.0"
-                })
-
-                self._set_cache(key, result)
-
-                logger.info(f"AI v7.0: {result.get('verdict')} score={result.get('score')} missing={result.get('must_have_missing')} {resp.usage.total_tokens}tok")
-                return result
+                return json.loads(resp.choices[0].message.content), resp.usage
 
             except openai.RateLimitError as e:
-                delay = base_delay * (2 ** attempt)  # 2, 4, 8, 16, 32 секунды
+                headers = e.response.headers if e.response is not None else {}
+                delay = retry_after_seconds(headers) or base_delay * (2 ** attempt)
                 if attempt < max_retries - 1:
                     logger.warning(f"Rate limit hit, retry {attempt + 1}/{max_retries} after {delay}s")
-                    await asyncio.sleep(delay)
+                    await self.governor.penalize(delay, headers)
                 else:
                     logger.error(f"Rate limit after {max_retries} retries")
                     raise AIAnalysisError("Rate limit OpenAI - исчерпаны retry")
@@ -469,8 +214,119 @@ class AIAnalyzer:
                 logger.error(f"AI error: {e}")
                 raise AIAnalysisError(str(e))
 
+    async def analyze_vacancy(self, vacancy: Dict, force: bool = False) -> Dict:
+        """
+        Анализ вакансии: тип позиции, специфика ниши и 2-4 must-haves
+
+        Выполняется один раз на содержимое вакансии (по vacancy_profile_hash),
+        результат переиспользуется для всех резюме. Профили хранятся в общем
+        кеше анализа (ограниченный LRU процесса + Redis); lock вычисления
+        удаляется после завершения, чтобы словарь не рос с числом вакансий
+
+        Returns:
+            Dict: Профиль вакансии с полем profile_hash
+        """
+        profile_hash = self.vacancy_profile_hash(vacancy)
+        key = f"vacancy_profile:{profile_hash}"
+
+        if not force:
+            cached = await self._get_cached(key)
+            if cached:
+                return cached
+
+        lock = self._profile_locks.setdefault(profile_hash, asyncio.Lock())
+        try:
+            async with lock:
+                return await self._compute_vacancy_profile(vacancy, profile_hash, key, force)
+        finally:
+            # Ожидающие держат ссылку на тот же lock; новые вызовы найдут профиль в кеше
+            if self._profile_locks.get(profile_hash) is lock and not lock.locked():
+                del self._profile_locks[profile_hash]
+
+    async def _compute_vacancy_profile(self, vacancy: Dict, profile_hash: str, key: str, force: bool) -> Dict:
+        """Профиль вакансии под lock: повторная проверка кеша и запрос к модели"""
+        if not force:
+            cached = await self._get_cached(key)
+            if cached:
+                return cached
+
+        result, usage = await self._complete_json(
+            SYSTEM_JSON_INSTRUCTION,
+            self.prompts.build_vacancy_profile_prompt(vacancy),
+            max_tokens=800,
+            temperature=0.2
+        )
+
+        must_haves = [
+            (m.get("requirement") if isinstance(m, dict) else str(m)).strip()
+            for m in result.get("must_haves", [])
+            if m
+        ]
+        profile = {
+            "position_type": result.get("position_type", "operations"),
+            "niche_specifics": result.get("niche_specifics", ""),
+            "what_critical": result.get("what_critical", ""),
+            "what_learnable": result.get("what_learnable", ""),
+            "must_haves": [m for m in must_haves if m][:4],
+            "profile_hash": profile_hash,
+            "prompt_version": VACANCY_PROMPT_VERSION,
+        }
+
+        await self._set_cache(key, profile, ttl=30 * 86400)
+
+        logger.info(f"AI vacancy profile: {len(profile['must_haves'])} must-haves {usage.total_tokens}tok")
+        return profile
+
+    async def analyze_resume(
+        self,
+        vacancy: Dict,
+        resume: Dict,
+        force: bool = False,
+        strictness: str = "balanced",
+        vacancy_profile: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Анализ резюме v7.4 (Hybrid Expert)
+
+        Must-haves берутся из профиля вакансии (передан или вычисляется один раз
+        на вакансию), поэтому все кандидаты оцениваются по одному списку.
+        Правила и вакансия идут первыми сообщениями и кешируются OpenAI между кандидатами
+        """
+        start = time.time()
+
+        if vacancy_profile is None:
+            try:
+                vacancy_profile = await self.analyze_vacancy(vacancy)
+            except AIAnalysisError as e:
+                logger.warning(f"Анализ вакансии не выполнен, must-haves выделит модель: {e}")
+
+        key = self._get_cache_key(vacancy, resume, vacancy_profile)
+
+        if not force:
+            cached = await self._get_cached(key)
+            if cached:
+                return cached
+
+        messages = self.prompts.build_messages(vacancy, resume, vacancy_profile)
+        result, usage = await self._complete_messages(messages, max_tokens=2500)
+        cached_tokens = cached_prompt_tokens(usage)
+
+        result = self._enrich(result, vacancy_profile)
+        result.update({
+            "ai_model": self.model,
+            "ai_tokens": usage.total_tokens,
+            "ai_prompt_tokens": usage.prompt_tokens,
+            "ai_cached_tokens": cached_tokens,
+            "processing_ms": int((time.time() - start) * 1000),
+            "prompt_version": PROMPT_VERSION
+        })
+
+        await self._set_cache(key, result)
+
+        logger.info(f"AI v{PROMPT_VERSION}: {result.get('verdict')} score={result.get('score')} missing={result.get('must_have_missing')} {usage.total_tokens}tok (cached {cached_tokens}/{usage.prompt_tokens})")
+        return result
+
     async def analyze_batch(self, vacancy: Dict, resumes: List[Dict], max_concurrent: int = 3) -> List[Dict]:
-        import asyncio
         sem = asyncio.Semaphore(max_concurrent)
 
         async def one(r):
@@ -0,0 +1,139 @@
+"""
+Двухуровневый кеш результатов AI анализа
+In-process LRU перед async Redis: горячие ключи отдаются без сетевого запроса,
+холодные - через общий пул redis.asyncio без блокировки event loop
+"""
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from app.config import settings
+from app.utils.redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisCache:
+    """
+    Кеш JSON результатов (анализы резюме, профили вакансий)
+
+    - L1: OrderedDict с ограничением по числу записей и TTL записи
+    - L2: Redis, общий для всех процессов; при ошибке Redis отключается на 30 секунд
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, local_ttl: Optional[int] = None):
+        self.max_entries = max_entries or settings.ANALYSIS_CACHE_LOCAL_SIZE
+        self.local_ttl = local_ttl or settings.ANALYSIS_CACHE_LOCAL_TTL
+        self._local: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._redis_retry_at = 0.0
+        self.stats = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "redis_errors": 0,
+            "redis_calls": 0,
+            "redis_seconds": 0.0,
+        }
+
+    def _local_get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return value
+
+    def _local_set(self, key: str, value: Dict[str, Any], ttl: int):
+        self._local[key] = (time.monotonic() + min(ttl, self.local_ttl), value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    def _redis_available(self) -> bool:
+        return time.monotonic() >= self._redis_retry_at
+
+    def _redis_failed(self, e: Exception):
+        self.stats["redis_errors"] += 1
+        self._redis_retry_at = time.monotonic() + 30
+        logger.warning(f"Redis недоступен для кеша анализа, используется только локальный кеш: {e}")
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Получение значения
+
+        Returns:
+            Optional[Dict]: Копия значения или None при промахе
+        """
+        value = self._local_get(key)
+        if value is not None:
+            self.stats["local_hits"] += 1
+            return dict(value)
+
+        if self._redis_available():
+            started = time.perf_counter()
+            try:
+                raw = await get_async_redis().get(key)
+            except Exception as e:
+                self._redis_failed(e)
+                raw = None
+            finally:
+                self.stats["redis_calls"] += 1
+                self.stats["redis_seconds"] += time.perf_counter() - started
+
+            if raw:
+                try:
+                    value = json.loads(raw)
+                except ValueError:
+                    value = None
+                if isinstance(value, dict):
+                    self.stats["redis_hits"] += 1
+                    self._local_set(key, value, self.local_ttl)
+                    return dict(value)
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any], ttl: int = 86400):
+        """Запись значения в оба уровня"""
+        self._local_set(key, dict(value), ttl)
+
+        if not self._redis_available():
+            return
+        started = time.perf_counter()
+        try:
+            await get_async_redis().setex(key, ttl, json.dumps(value, ensure_ascii=False, default=str))
+        except Exception as e:
+            self._redis_failed(e)
+        finally:
+            self.stats["redis_calls"] += 1
+            self.stats["redis_seconds"] += time.perf_counter() - started
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Счётчики попаданий и средняя задержка Redis"""
+        lookups = self.stats["local_hits"] + self.stats["redis_hits"] + self.stats["misses"]
+        hits = self.stats["local_hits"] + self.stats["redis_hits"]
+        calls = self.stats["redis_calls"]
+        return {
+            **self.stats,
+            "redis_seconds": round(self.stats["redis_seconds"], 3),
+            "local_entries": len(self._local),
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+            "redis_avg_ms": round(self.stats["redis_seconds"] / calls * 1000, 2) if calls else 0.0,
+        }
+
+
+# Singleton instance - общий для всех AIAnalyzer процесса
+_analysis_cache: Optional[AnalysisCache] = None
+
+
+def get_analysis_cache() -> AnalysisCache:
+    """Получение общего кеша анализа"""
+    global _analysis_cache
+    if _analysis_cache is None:
+        _analysis_cache = AnalysisCache()
+    return _analysis_cache
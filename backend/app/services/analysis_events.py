@@ -0,0 +1,155 @@
+"""
+События прогресса AI анализа через Redis pub/sub
+Воркеры публикуют результаты и счётчики, API отдаёт их клиентам через SSE
+"""
+import json
+import logging
+import time
+from typing import Dict, Any, Iterable, List, Optional, Tuple, Callable, Awaitable, AsyncIterator
+
+from app.utils.redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+# Типы событий
+EVENT_RESULT = "result"
+EVENT_PROGRESS = "progress"
+EVENT_DONE = "done"
+
+
+def job_channel(job_id: str) -> str:
+    """Канал событий задачи анализа"""
+    return f"analysis:events:job:{job_id}"
+
+
+def vacancy_channel(vacancy_id: str) -> str:
+    """Канал событий вакансии (все задачи анализа по ней)"""
+    return f"analysis:events:vacancy:{vacancy_id}"
+
+
+def build_event_message(event: str, job_id: Optional[str], data: Dict[str, Any]) -> str:
+    """Сообщение pub/sub: {"event", "job_id", "data"}"""
+    return json.dumps({"event": event, "job_id": job_id, "data": data}, ensure_ascii=False, default=str)
+
+
+def result_summary(
+    application_id: str,
+    vacancy_id: str,
+    ai_result: Dict[str, Any],
+    analysis_id: Optional[str] = None,
+    candidate_name: Optional[str] = None
+) -> Dict[str, Any]:
+    """Краткая сводка AnalysisResult для карточки кандидата"""
+    return {
+        "analysis_id": analysis_id,
+        "application_id": application_id,
+        "vacancy_id": vacancy_id,
+        "candidate_name": candidate_name,
+        "score": ai_result.get("score"),
+        "verdict": ai_result.get("verdict"),
+        "priority": ai_result.get("priority"),
+        "recommendation": ai_result.get("recommendation"),
+        "one_liner": ai_result.get("one_liner"),
+        "must_have_missing": ai_result.get("must_have_missing"),
+        "salary_status": ai_result.get("salary_status"),
+    }
+
+
+class AnalysisEventPublisher:
+    """
+    Публикация событий пакета анализа
+
+    Каждое событие уходит в канал вакансии и, если анализ выполняется задачей RQ,
+    в канал задачи. Ошибки Redis не прерывают анализ: публикация отключается на 30 секунд
+    """
+
+    def __init__(self, job_id: Optional[str] = None):
+        self.job_id = job_id
+        self._redis_retry_at = 0.0
+
+    def _channels(self, vacancy_ids: Iterable[str]) -> List[str]:
+        channels = [vacancy_channel(vacancy_id) for vacancy_id in vacancy_ids]
+        if self.job_id:
+            channels.append(job_channel(self.job_id))
+        return channels
+
+    async def publish(self, event: str, data: Dict[str, Any], vacancy_ids: Iterable[str]):
+        """Публикация события во все каналы пакета"""
+        if time.monotonic() < self._redis_retry_at:
+            return
+        message = build_event_message(event, self.job_id, data)
+        try:
+            redis = get_async_redis()
+            for channel in self._channels(vacancy_ids):
+                await redis.publish(channel, message)
+        except Exception as e:
+            self._redis_retry_at = time.monotonic() + 30
+            logger.warning(f"Не удалось опубликовать событие анализа: {e}")
+
+    async def result(self, summary: Dict[str, Any]):
+        """Сохранённый результат анализа одного отклика"""
+        await self.publish(EVENT_RESULT, summary, [summary["vacancy_id"]])
+
+    async def progress(self, snapshot: Dict[str, Any], vacancy_ids: Iterable[str], done: bool = False):
+        """Счётчики и ETA пакета"""
+        data = {key: value for key, value in snapshot.items() if key != "errors"}
+        data["errors_count"] = len(snapshot.get("errors", []))
+        await self.publish(EVENT_DONE if done else EVENT_PROGRESS, data, vacancy_ids)
+
+
+# Комментарий-пинг держит SSE соединение открытым через прокси
+SSE_HEARTBEAT_SECONDS = 15
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Кадр Server-Sent Events"""
+    payload = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+async def stream_events(
+    channels: List[str],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    initial: Optional[Callable[[], Awaitable[List[Tuple[str, Dict[str, Any]]]]]] = None,
+    stop_on_done: bool = False
+) -> AsyncIterator[str]:
+    """
+    SSE поток событий из Redis pub/sub
+
+    initial вызывается после подписки: снимок состояния читается, когда события
+    уже приходят в подписку, поэтому done между снимком и подпиской не теряется
+
+    Args:
+        channels: Каналы pub/sub
+        is_disconnected: Проверка отключения клиента (Request.is_disconnected)
+        initial: Снимок состояния - события, отправляемые сразу после подключения
+        stop_on_done: Закрыть поток после события done
+    """
+    pubsub = get_async_redis().pubsub()
+    await pubsub.subscribe(*channels)
+    try:
+        for event, data in (await initial() if initial else []):
+            yield format_sse(event, data)
+            if stop_on_done and event == EVENT_DONE:
+                return
+
+        while not await is_disconnected():
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=SSE_HEARTBEAT_SECONDS)
+            if message is None:
+                yield ": ping\n\n"
+                continue
+
+            try:
+                payload = json.loads(message["data"])
+            except (TypeError, ValueError):
+                continue
+            event = payload.get("event", EVENT_PROGRESS)
+            yield format_sse(event, payload)
+            if stop_on_done and event == EVENT_DONE:
+                return
+    finally:
+        try:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+        except Exception as e:
+            logger.debug(f"Ошибка закрытия подписки pub/sub: {e}")
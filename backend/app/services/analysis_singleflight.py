@@ -0,0 +1,225 @@
+"""
+Single-flight для AI анализа откликов
+Один отклик с одним содержимым анализируется одновременно только одним процессом,
+повторные запросы (двойной клик, пересечение пакетов) ждут его результат
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable
+
+from app.config import settings
+from app.utils.redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "analysis:flight:"
+
+# Сообщения канала завершения
+FLIGHT_DONE = "done"
+FLIGHT_FAILED = "failed"
+
+# Продление и снятие блокировки только владельцем (по токену)
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class AnalysisSingleFlight:
+    """
+    Распределённая дедупликация анализа на блокировках Redis с арендой
+
+    - Ключ: ID отклика + отпечаток содержимого (вакансия, резюме, профиль, версия промпта, модель)
+    - Владелец продлевает аренду, пока идёт анализ; упавший процесс освобождает ключ
+      по истечении аренды
+    - Результат владельца хранится result_ttl секунд и рассылается ожидающим через pub/sub
+    - При ошибке Redis дедупликация отключается на 30 секунд, анализ выполняется напрямую
+    """
+
+    # Как часто ожидающий проверяет, жива ли блокировка владельца
+    POLL_INTERVAL = 1.0
+
+    def __init__(self, lease_seconds: Optional[int] = None, result_ttl: Optional[int] = None):
+        self.lease_seconds = lease_seconds or settings.ANALYSIS_SINGLEFLIGHT_LEASE
+        self.result_ttl = result_ttl or settings.ANALYSIS_SINGLEFLIGHT_RESULT_TTL
+        self._redis_retry_at = 0.0
+        self.stats = {"leaders": 0, "attached": 0, "bypassed": 0}
+
+    @staticmethod
+    def _key(application_id: str, fingerprint: str, suffix: str) -> str:
+        return f"{KEY_PREFIX}{application_id}:{fingerprint}:{suffix}"
+
+    def _redis_available(self) -> bool:
+        return time.monotonic() >= self._redis_retry_at
+
+    def _redis_failed(self, e: Exception):
+        self._redis_retry_at = time.monotonic() + 30
+        logger.warning(f"Redis недоступен для single-flight анализа, дедупликация отключена: {e}")
+
+    async def run(
+        self,
+        application_id: str,
+        fingerprint: str,
+        compute: Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+    ) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        Анализ отклика не более одного раза одновременно
+
+        Args:
+            application_id: ID отклика
+            fingerprint: Отпечаток содержимого анализа
+            compute: Выполнение анализа (вызывается только владельцем блокировки)
+
+        Returns:
+            Tuple: (результат, attached) - attached=True, если результат получен
+            от другого процесса и сохранять его не нужно
+        """
+        lock_key = self._key(application_id, fingerprint, "lock")
+        result_key = self._key(application_id, fingerprint, "result")
+        token = uuid.uuid4().hex
+
+        while True:
+            if not self._redis_available():
+                self.stats["bypassed"] += 1
+                return await compute(), False
+
+            try:
+                redis = get_async_redis()
+                result = self._decode(await redis.get(result_key))
+                if result is not None:
+                    self.stats["attached"] += 1
+                    return result, True
+                acquired = await redis.set(lock_key, token, nx=True, px=self.lease_seconds * 1000)
+            except Exception as e:
+                self._redis_failed(e)
+                continue
+
+            if acquired:
+                self.stats["leaders"] += 1
+                return await self._lead(application_id, fingerprint, token, compute), False
+
+            logger.info(f"Анализ заявки {application_id} уже выполняется, ожидание результата")
+            result = await self._wait(application_id, fingerprint)
+            if result is not None:
+                self.stats["attached"] += 1
+                return result, True
+            # Владелец завершился ошибкой или потерял аренду - следующая попытка захватывает блокировку
+
+    async def _lead(
+        self,
+        application_id: str,
+        fingerprint: str,
+        token: str,
+        compute: Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+    ) -> Optional[Dict[str, Any]]:
+        """Анализ владельцем блокировки с продлением аренды"""
+        lock_key = self._key(application_id, fingerprint, "lock")
+        renewer = asyncio.create_task(self._renew(lock_key, token))
+        result = None
+        try:
+            result = await compute()
+            return result
+        finally:
+            renewer.cancel()
+            try:
+                redis = get_async_redis()
+                if result:
+                    await redis.setex(
+                        self._key(application_id, fingerprint, "result"),
+                        self.result_ttl,
+                        json.dumps(result, ensure_ascii=False, default=str)
+                    )
+                await redis.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+                await redis.publish(
+                    self._key(application_id, fingerprint, "done"),
+                    FLIGHT_DONE if result else FLIGHT_FAILED
+                )
+            except Exception as e:
+                # Блокировка освободится по истечении аренды
+                self._redis_failed(e)
+
+    async def _renew(self, lock_key: str, token: str):
+        """Продление аренды каждую треть срока, пока идёт анализ"""
+        lease_ms = self.lease_seconds * 1000
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                renewed = await get_async_redis().eval(_RENEW_SCRIPT, 1, lock_key, token, lease_ms)
+            except Exception as e:
+                logger.warning(f"Не удалось продлить блокировку {lock_key}: {e}")
+                continue
+            if not renewed:
+                logger.warning(f"Блокировка {lock_key} потеряна, анализ может быть выполнен повторно")
+                return
+
+    async def _wait(self, application_id: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """
+        Ожидание результата владельца
+
+        Returns:
+            Optional[Dict]: Результат или None, если владелец завершился без результата
+        """
+        lock_key = self._key(application_id, fingerprint, "lock")
+        result_key = self._key(application_id, fingerprint, "result")
+        try:
+            redis = get_async_redis()
+            pubsub = redis.pubsub()
+            await pubsub.subscribe(self._key(application_id, fingerprint, "done"))
+        except Exception as e:
+            self._redis_failed(e)
+            return None
+
+        try:
+            while True:
+                # Проверка после подписки: завершение владельца между SET NX и подпиской не теряется
+                result = self._decode(await redis.get(result_key))
+                if result is not None:
+                    return result
+                if not await redis.exists(lock_key):
+                    return None
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=self.POLL_INTERVAL)
+                if message and message["data"] == FLIGHT_FAILED:
+                    return None
+        except Exception as e:
+            self._redis_failed(e)
+            return None
+        finally:
+            try:
+                await pubsub.unsubscribe()
+                await pubsub.aclose()
+            except Exception as e:
+                logger.debug(f"Ошибка закрытия подписки pub/sub: {e}")
+
+    @staticmethod
+    def _decode(raw: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not raw:
+            return None
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return None
+        return value if isinstance(value, dict) else None
+
+
+# Singleton instance - общий для всех конвейеров процесса
+_analysis_singleflight: Optional[AnalysisSingleFlight] = None
+
+
+def get_analysis_singleflight() -> AnalysisSingleFlight:
+    """Получение общего single-flight анализа"""
+    global _analysis_singleflight
+    if _analysis_singleflight is None:
+        _analysis_singleflight = AnalysisSingleFlight()
+    return _analysis_singleflight
@@ -9,14 +9,16 @@ import asyncio
 from functools import partial
 from jose import jwt, JWTError, ExpiredSignatureError
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.models.user import User
 from app.schemas.auth import UserRegistration
 from app.services.encryption import token_encryption
 from app.services.hh_client import HHClient
+from app.services.hh_client_pool import get_hh_client_pool
 from app.utils.exceptions import AuthenticationError, ValidationError
 
 logger = logging.getLogger(__name__)
@@ -31,7 +33,7 @@ class AuthService:
     Управление JWT токенами, паролями и HH.ru интеграцией
     """
 
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
     # Работа с паролями (async wrappers для blocking operations)
@@ -142,9 +144,9 @@ class AuthService:
         """
         try:
             # Проверка существования пользователя
-            existing_user = self.db.query(User).filter(
-                User.email == user_data.email
-            ).first()
+            existing_user = await self.db.scalar(
+                select(User).where(User.email == user_data.email)
+            )
 
             if existing_user:
                 raise ValidationError("Пользователь с таким email уже существует")
@@ -159,8 +161,8 @@ class AuthService:
             )
 
             self.db.add(new_user)
-            self.db.commit()
-            self.db.refresh(new_user)
+            await self.db.commit()
+            await self.db.refresh(new_user)
 
             logger.info(f"Зарегистрирован новый пользователь: {new_user.email}")
 
@@ -171,9 +173,9 @@ class AuthService:
                 import uuid as uuid_lib
 
                 # Получаем Trial план
-                trial_plan = self.db.query(SubscriptionPlan).filter(
-                    SubscriptionPlan.plan_type == PlanType.trial
-                ).first()
+                trial_plan = await self.db.scalar(
+                    select(SubscriptionPlan).where(SubscriptionPlan.plan_type == PlanType.trial)
+                )
 
                 if trial_plan:
                     # Создаём Trial подписку на 30 дней с лимитом 50 анализов
@@ -188,7 +190,7 @@ class AuthService:
                         exports_used_this_month=0
                     )
                     self.db.add(trial_subscription)
-                    self.db.commit()
+                    await self.db.commit()
                     logger.info(f"Trial подписка создана для пользователя: {new_user.email}")
                 else:
                     logger.warning("Trial план не найден в базе данных")
@@ -207,10 +209,10 @@ class AuthService:
             return new_user
 
         except IntegrityError:
-            self.db.rollback()
+            await self.db.rollback()
             raise ValidationError("Пользователь с таким email уже существует")
         except Exception as e:
-            self.db.rollback()
+            await self.db.rollback()
             logger.error(f"Ошибка регистрации пользователя: {e}")
             raise
 
@@ -228,7 +230,7 @@ class AuthService:
         Raises:
             AuthenticationError: Если аутентификация не удалась
         """
-        user = self.db.query(User).filter(User.email == email).first()
+        user = await self.db.scalar(select(User).where(User.email == email))
 
         if not user:
             raise AuthenticationError("Неверный email или пароль")
@@ -242,7 +244,7 @@ class AuthService:
 
         # Обновление времени последнего входа
         user.last_login_at = datetime.utcnow()
-        self.db.commit()
+        await self.db.commit()
 
         # Создание JWT токенов
         token_data = {
@@ -285,7 +287,7 @@ class AuthService:
                 raise AuthenticationError("Неверный refresh токен")
 
             # Получение пользователя
-            user = self.db.query(User).filter(User.id == user_id).first()
+            user = await self.db.get(User, user_id)
 
             if not user or not user.is_active:
                 raise AuthenticationError("Пользователь не найден или заблокирован")
@@ -333,7 +335,11 @@ class AuthService:
 
             # Конвертируем строку в UUID объект
             user_id = uuid_lib.UUID(user_id_str)
-            user = self.db.query(User).filter(User.id == user_id).first()
+            user = await self.db.get(User, user_id)
+
+            # Чтение завершено - соединение возвращается в пул, пока endpoint
+            # ждёт HH.ru или OpenAI (объекты сессии остаются доступными)
+            await self.db.commit()
 
             if not user or not user.is_active:
                 return None
@@ -357,13 +363,13 @@ class AuthService:
             Dict: Результат операции
         """
         try:
-            user = self.db.query(User).filter(User.id == user_id).first()
+            user = await self.db.get(User, user_id)
             if not user:
                 raise ValidationError("Пользователь не найден")
 
             # Тестирование токена перед сохранением
-            hh_client = HHClient(hh_token)
-            validation_result = await hh_client.test_connection()
+            async with HHClient(hh_token) as hh_client:
+                validation_result = await hh_client.test_connection()
 
             if not validation_result["is_valid"]:
                 raise ValidationError(f"Недействительный HH.ru токен: {validation_result['error_message']}")
@@ -375,7 +381,8 @@ class AuthService:
             user.token_verified = True
             user.token_verified_at = datetime.utcnow()
 
-            self.db.commit()
+            await self.db.commit()
+            await get_hh_client_pool().invalidate(user_id)
 
             logger.info(f"HH.ru токен обновлен для пользователя: {user.email}")
 
@@ -386,7 +393,7 @@ class AuthService:
             }
 
         except Exception as e:
-            self.db.rollback()
+            await self.db.rollback()
             logger.error(f"Ошибка обновления HH.ru токена: {e}")
             raise
 
@@ -401,7 +408,7 @@ class AuthService:
             Dict: Результат операции
         """
         try:
-            user = self.db.query(User).filter(User.id == user_id).first()
+            user = await self.db.get(User, user_id)
             if not user:
                 raise ValidationError("Пользователь не найден")
 
@@ -409,7 +416,8 @@ class AuthService:
             user.token_verified = False
             user.token_verified_at = None
 
-            self.db.commit()
+            await self.db.commit()
+            await get_hh_client_pool().invalidate(user_id)
 
             logger.info(f"HH.ru токен удален для пользователя: {user.email}")
 
@@ -419,14 +427,35 @@ class AuthService:
             }
 
         except Exception as e:
-            self.db.rollback()
+            await self.db.rollback()
             logger.error(f"Ошибка удаления HH.ru токена: {e}")
             raise
 
+    async def get_hh_token(self, user_id: str) -> str:
+        """
+        Расшифрованный HH.ru токен пользователя (из кеша пула клиентов)
+
+        Args:
+            user_id: ID пользователя
+
+        Returns:
+            str: HH.ru токен
+
+        Raises:
+            ValidationError: Если токен не настроен
+        """
+        user = await self.db.get(User, user_id)
+        if not user or not user.has_hh_token:
+            raise ValidationError("HH.ru токен не настроен")
+
+        return get_hh_client_pool().decrypt_token(user.id, user.encrypted_hh_token)
+
     async def get_hh_client(self, user_id: str) -> HHClient:
         """
         Получение HH клиента для пользователя
 
+        Клиент берётся из пула процесса и переиспользуется - закрывать его не нужно
+
         Args:
             user_id: ID пользователя
 
@@ -436,12 +465,11 @@ class AuthService:
         Raises:
             ValidationError: Если токен не настроен
         """
-        user = self.db.query(User).filter(User.id == user_id).first()
+        user = await self.db.get(User, user_id)
         if not user or not user.has_hh_token:
             raise ValidationError("HH.ru токен не настроен")
 
-        decrypted_token = token_encryption.decrypt(user.encrypted_hh_token)
-        return HHClient(decrypted_token)
+        return get_hh_client_pool().get_client(user.id, user.encrypted_hh_token)
 
     # Дополнительные методы
     async def change_password(
@@ -462,7 +490,7 @@ class AuthService:
             Dict: Результат операции
         """
         try:
-            user = self.db.query(User).filter(User.id == user_id).first()
+            user = await self.db.get(User, user_id)
             if not user:
                 raise ValidationError("Пользователь не найден")
 
@@ -472,7 +500,7 @@ class AuthService:
 
             # Async хеширование нового пароля
             user.password_hash = await self._hash_password(new_password)
-            self.db.commit()
+            await self.db.commit()
 
             logger.info(f"Пароль изменен для пользователя: {user.email}")
 
@@ -482,7 +510,7 @@ class AuthService:
             }
 
         except Exception as e:
-            self.db.rollback()
+            await self.db.rollback()
             logger.error(f"Ошибка смены пароля: {e}")
             raise
 
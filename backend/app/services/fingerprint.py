@@ -0,0 +1,136 @@
+"""
+Канонические отпечатки резюме и вакансий для ключей кеша AI анализа
+Хешируются только поля, которые попадают в промпт, в нормализованном виде,
+поэтому изменение служебных полей HH (фото, updated_at, счётчики просмотров,
+метаданные отклика) не сбрасывает кеш
+"""
+import hashlib
+import json
+from typing import Dict, Any, List, Optional
+
+
+# Ограничения совпадают с AnalysisPromptBuilder: всё, что дальше, модель не видит
+VACANCY_DESCRIPTION_LIMIT = 1200
+EXPERIENCE_LIMIT = 5
+
+
+def _text(value: Any) -> str:
+    """Строка без лишних пробелов и переносов"""
+    if value is None:
+        return ""
+    return " ".join(str(value).split())
+
+
+def _name(value: Any) -> str:
+    """Название из справочного объекта HH ({"id", "name"}) или строки"""
+    if isinstance(value, dict):
+        return _text(value.get("name"))
+    return _text(value)
+
+
+def _period(value: Any) -> str:
+    """Дата начала/окончания работы: {"month", "year"} или ISO строка до месяца"""
+    if isinstance(value, dict):
+        return f"{value.get('month', '')}/{value.get('year', '')}"
+    if isinstance(value, str):
+        return value[:7]
+    return ""
+
+
+def _skills(values: Optional[List[Any]]) -> List[str]:
+    return [_name(s) for s in values or [] if _name(s)]
+
+
+def normalize_vacancy(vacancy: Dict[str, Any]) -> Dict[str, Any]:
+    """Поля вакансии, которые читает промпт"""
+    return {
+        "title": _text(vacancy.get("title")),
+        "area": _name(vacancy.get("area")),
+        "salary_from": vacancy.get("salary_from") or 0,
+        "salary_to": vacancy.get("salary_to") or 0,
+        "key_skills": _skills(vacancy.get("key_skills")),
+        "description": _text((vacancy.get("description") or "")[:VACANCY_DESCRIPTION_LIMIT]),
+    }
+
+
+def normalize_resume(resume: Any) -> Dict[str, Any]:
+    """Поля резюме, которые читает промпт"""
+    if isinstance(resume, str):
+        resume = json.loads(resume) if resume else {}
+    resume = resume or {}
+
+    experience = [
+        {
+            "company": _name(exp.get("company")),
+            "position": _text(exp.get("position")),
+            "description": _text(exp.get("description")),
+            "start": _period(exp.get("start")),
+            "end": _period(exp.get("end")),
+        }
+        for exp in (resume.get("experience") or [])[:EXPERIENCE_LIMIT]
+        if isinstance(exp, dict)
+    ]
+
+    salary = resume.get("salary")
+    total_experience = resume.get("total_experience")
+    relocation = resume.get("relocation")
+    relocation_type = relocation.get("type") if isinstance(relocation, dict) else None
+
+    return {
+        "first_name": _text(resume.get("first_name")),
+        "last_name": _text(resume.get("last_name")),
+        "title": _text(resume.get("title")),
+        "area": _name(resume.get("area")),
+        "relocation": relocation_type.get("id", "") if isinstance(relocation_type, dict) else "",
+        "total_experience_months": (total_experience.get("months") or 0) if isinstance(total_experience, dict) else 0,
+        "salary": (salary.get("amount") or 0) if isinstance(salary, dict) else 0,
+        "skills": _skills(resume.get("skill_set")),
+        "experience": experience,
+        "cover_letter": _text(resume.get("cover_letter") or resume.get("message")),
+    }
+
+
+def _digest(payload: Dict[str, Any]) -> str:
+    """Полный SHA-256 канонического JSON"""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def vacancy_fingerprint(vacancy: Dict[str, Any], prompt_version: str, model: str) -> str:
+    """Отпечаток вакансии для версии промпта и модели"""
+    return _digest({
+        "vacancy": normalize_vacancy(vacancy),
+        "prompt_version": prompt_version,
+        "model": model,
+    })
+
+
+def resume_fingerprint(resume: Any, prompt_version: str, model: str) -> str:
+    """Отпечаток резюме для версии промпта и модели"""
+    return _digest({
+        "resume": normalize_resume(resume),
+        "prompt_version": prompt_version,
+        "model": model,
+    })
+
+
+def analysis_fingerprint(
+    vacancy: Dict[str, Any],
+    resume: Any,
+    prompt_version: str,
+    model: str,
+    vacancy_profile: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Отпечаток анализа резюме под вакансию
+
+    Включает профиль вакансии (must-haves), с которым выполнялся анализ:
+    при перестроении профиля старые результаты не переиспользуются
+    """
+    return _digest({
+        "vacancy": normalize_vacancy(vacancy),
+        "resume": normalize_resume(resume),
+        "vacancy_profile": (vacancy_profile or {}).get("profile_hash", "inline"),
+        "prompt_version": prompt_version,
+        "model": model,
+    })
@@ -5,16 +5,71 @@
 """
 import httpx
 import asyncio
-from typing import Dict, List, Any, Optional
+import hashlib
+import time
+import weakref
+from typing import Dict, List, Any, Optional, AsyncIterator, Tuple
 import logging
 from datetime import datetime
 
 from app.config import settings
 from app.utils.exceptions import HHIntegrationError
 from app.services.hh_mock import HHMockService
+from app.services.hh_rate_limiter import get_hh_rate_limiter, parse_retry_after
 
 logger = logging.getLogger(__name__)
 
+class _PageLimiter:
+    """Семафор страниц токена и число загрузок, которые его используют"""
+
+    def __init__(self):
+        self.semaphore = asyncio.Semaphore(max(1, settings.HH_PAGE_CONCURRENCY))
+        self.users = 0
+
+
+# Ограничители параллельных запросов страниц по хешу токена работодателя.
+# Семафоры asyncio привязаны к event loop, поэтому хранятся отдельно для каждого loop;
+# запись удаляется, когда токен больше не загружает страницы - словарь не растёт с числом токенов
+_page_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, _PageLimiter]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _acquire_page_limiter(token: str) -> asyncio.Semaphore:
+    """Общий для всех клиентов токена лимит одновременных запросов страниц"""
+    limiters = _page_limiters.setdefault(asyncio.get_running_loop(), {})
+    key = _token_key(token)
+    limiter = limiters.get(key)
+    if limiter is None:
+        limiter = limiters[key] = _PageLimiter()
+    limiter.users += 1
+    return limiter.semaphore
+
+
+def _release_page_limiter(token: str):
+    """Загрузка страниц завершена - последний пользователь токена удаляет семафор"""
+    limiters = _page_limiters.get(asyncio.get_running_loop(), {})
+    key = _token_key(token)
+    limiter = limiters.get(key)
+    if limiter is None:
+        return
+    limiter.users -= 1
+    if limiter.users <= 0:
+        del limiters[key]
+
+
+# employer_id по токену работодателя: (employer_id, время истечения по monotonic)
+_employer_ids: Dict[str, Tuple[str, float]] = {}
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def forget_employer_id(token: str):
+    """Сброс кешированного employer_id токена (при изменении или удалении токена)"""
+    _employer_ids.pop(_token_key(token), None)
+
 
 class HHClient:
     """
@@ -25,7 +80,7 @@ class HHClient:
 
     def __init__(self, token: str):
         self.token = token
-        self.base_url = "https://api.hh.ru"
+        self.base_url = settings.HH_API_BASE_URL.rstrip("/")
         self.timeout = 30.0
         self.is_mock_mode = settings.HH_MOCK_MODE
 
@@ -88,6 +143,7 @@ class HHClient:
 
         for attempt in range(max_retries + 1):
             try:
+                await get_hh_rate_limiter(self.token).acquire()
                 response = await self.session.request(
                     method=method,
                     url=url,
@@ -96,12 +152,13 @@ class HHClient:
                 )
 
                 # Обработка rate limiting
+                # Пауза общая для всех клиентов токена - ждём её в acquire следующей попытки
                 if response.status_code == 429:
-                    retry_after = int(response.headers.get("Retry-After", 60))
-                    logger.warning(f"Rate limit hit, waiting {retry_after} seconds")
+                    await get_hh_rate_limiter(self.token).penalize(
+                        parse_retry_after(response.headers.get("Retry-After"))
+                    )
 
                     if attempt < max_retries:
-                        await asyncio.sleep(retry_after)
                         continue
 
                     raise HHIntegrationError(
@@ -168,12 +225,31 @@ class HHClient:
         Returns:
             Dict: Ответ API
 
+        Raises:
+            HHIntegrationError: При ошибках API
+        """
+        response = await self._get_full_url(url, max_retries=max_retries)
+        return response.json()
+
+    async def _get_full_url(
+        self,
+        url: str,
+        max_retries: int = 3,
+        headers: Optional[Dict[str, str]] = None
+    ) -> httpx.Response:
+        """
+        GET запрос к полному URL с retry логикой
+
+        Returns:
+            httpx.Response: Ответ 200 или 304 (на условный запрос с If-None-Match)
+
         Raises:
             HHIntegrationError: При ошибках API
         """
         for attempt in range(max_retries + 1):
             try:
-                response = await self.session.get(url)
+                await get_hh_rate_limiter(self.token).acquire()
+                response = await self.session.get(url, headers=headers)
 
                 # Обработка ошибок аналогично _make_request
                 if response.status_code == 403:
@@ -189,17 +265,18 @@ class HHClient:
                     )
 
                 if response.status_code == 429:
-                    retry_after = int(response.headers.get("Retry-After", 60))
+                    await get_hh_rate_limiter(self.token).penalize(
+                        parse_retry_after(response.headers.get("Retry-After"))
+                    )
                     if attempt < max_retries:
-                        await asyncio.sleep(retry_after)
                         continue
                     raise HHIntegrationError(
                         "Превышен лимит запросов к HH.ru API",
                         status_code=429
                     )
 
-                if response.status_code == 200:
-                    return response.json()
+                if response.status_code in (200, 304):
+                    return response
 
                 if response.status_code >= 400:
                     error_data = response.json() if response.content else {}
@@ -294,6 +371,33 @@ class HHClient:
             logger.error(f"Ошибка получения информации о работодателе: {e}")
             raise HHIntegrationError(f"Не удалось получить информацию о компании: {e}")
 
+    async def get_employer_id(self) -> str:
+        """
+        ID работодателя токена
+
+        Кешируется на HH_EMPLOYER_CACHE_TTL секунд, чтобы не запрашивать /me
+        перед каждым списком вакансий
+
+        Returns:
+            str: ID работодателя в HH.ru
+
+        Raises:
+            HHIntegrationError: Если токен не является токеном работодателя
+        """
+        key = _token_key(self.token)
+        cached = _employer_ids.get(key)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+
+        me_data = await self._make_request("GET", "/me")
+        employer_id = me_data.get("employer", {}).get("id")
+        if not employer_id:
+            raise HHIntegrationError("Токен не является токеном работодателя")
+
+        employer_id = str(employer_id)
+        _employer_ids[key] = (employer_id, time.monotonic() + settings.HH_EMPLOYER_CACHE_TTL)
+        return employer_id
+
     async def get_vacancies(self, page: int = 0, per_page: int = 20) -> Dict[str, Any]:
         """
         Получение списка вакансий работодателя
@@ -317,15 +421,8 @@ class HHClient:
                     "per_page": per_page
                 }
 
-                # Сначала получаем employer_id из /me используя _make_request для корректной обработки ошибок
-                me_data = await self._make_request("GET", "/me")
-
-                employer_id = me_data.get("employer", {}).get("id")
-                if not employer_id:
-                    raise HHIntegrationError("Токен не является токеном работодателя")
-
                 # Используем публичный endpoint /vacancies с фильтром по employer_id
-                params["employer_id"] = employer_id
+                params["employer_id"] = await self.get_employer_id()
 
                 data = await self._make_request("GET", "/vacancies", params=params)
 
@@ -379,69 +476,10 @@ class HHClient:
                     per_page=per_page
                 )
             else:
-                # Реальный API HH.ru - получение откликов через коллекции
-                # Сначала получаем список коллекций
-                collections_data = await self._make_request(
-                    "GET",
-                    "/negotiations",
-                    params={"vacancy_id": vacancy_id}
-                )
-
-                # Собираем все отклики из всех коллекций
+                # Реальный API HH.ru - все страницы всех коллекций
                 all_items = []
-
-                for collection in collections_data.get("collections", []):
-                    # Используем sub_collections (они содержат реальные URL)
-                    sub_collections = collection.get("sub_collections", [])
-
-                    for sub_collection in sub_collections:
-                        # Используем только root коллекции (они содержат все отклики)
-                        if not sub_collection.get("root_collection", False):
-                            continue
-
-                        total = sub_collection.get("counters", {}).get("total", 0)
-                        if total == 0:
-                            continue
-
-                        collection_url = sub_collection.get("url")
-                        collection_id = sub_collection.get("id")
-
-                        logger.debug(f"Загрузка коллекции {collection_id} для вакансии {vacancy_id} ({total} откликов)")
-
-                        # Загружаем все страницы коллекции
-                        collection_page = 0
-                        collection_items = []
-
-                        while True:
-                            # Добавляем параметр page к URL коллекции (per_page не поддерживается для коллекций)
-                            page_url = f"{collection_url}&page={collection_page}"
-
-                            # Используем _make_request_full_url для корректной обработки ошибок
-                            coll_data = await self._make_request_full_url(page_url)
-
-                            items = coll_data.get("items", [])
-                            if not items:  # Если больше нет откликов, выходим
-                                break
-
-                            # Добавляем collection_id к каждому элементу для фильтрации
-                            for item in items:
-                                item["_collection_id"] = collection_id
-
-                            collection_items.extend(items)
-
-                            # Проверяем, есть ли ещё страницы
-                            current_page = coll_data.get("page", collection_page)
-                            total_pages = coll_data.get("pages", 1)
-
-                            logger.debug(f"Загружена страница {current_page + 1}/{total_pages} коллекции {collection_id}: {len(items)} откликов")
-
-                            if current_page >= total_pages - 1:  # Последняя страница
-                                break
-
-                            collection_page += 1
-
-                        all_items.extend(collection_items)
-                        logger.debug(f"Получено {len(collection_items)} откликов из коллекции {collection_id}")
+                async for items in self.iter_applications(vacancy_id):
+                    all_items.extend(items)
 
                 logger.info(f"Получено {len(all_items)} откликов на вакансию {vacancy_id}")
 
@@ -458,6 +496,126 @@ class HHClient:
             logger.error(f"Ошибка получения откликов для вакансии {vacancy_id}: {e}")
             raise HHIntegrationError(f"Не удалось получить отклики: {e}")
 
+    async def get_application_collections(self, vacancy_id: str) -> List[Dict[str, Any]]:
+        """
+        Коллекции откликов вакансии (/negotiations) со счётчиками
+
+        Returns:
+            List[Dict]: Все sub_collections; в mock режиме коллекций нет - пустой список
+        """
+        if self.is_mock_mode:
+            return []
+
+        collections_data = await self._make_request(
+            "GET",
+            "/negotiations",
+            params={"vacancy_id": vacancy_id}
+        )
+        return [
+            sub_collection
+            for collection in collections_data.get("collections", [])
+            for sub_collection in collection.get("sub_collections", [])
+        ]
+
+    async def iter_applications(
+        self,
+        vacancy_id: str,
+        per_page: int = 100,
+        collections: Optional[List[Dict[str, Any]]] = None,
+        first_page_only: bool = False
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Потоковая загрузка откликов на вакансию страницами
+
+        Первые страницы всех коллекций запрашиваются параллельно, после первой страницы
+        коллекции известно число страниц - остальные запрашиваются параллельно с ней.
+        Одновременно выполняется не более HH_PAGE_CONCURRENCY запросов на токен.
+        Страницы отдаются в порядке получения, а не по номеру
+
+        Args:
+            vacancy_id: ID вакансии в HH.ru
+            per_page: Размер страницы (только mock режим - коллекции HH.ru его не поддерживают)
+            collections: Уже полученные get_application_collections - повторный запрос не выполняется
+            first_page_only: Только первая страница каждой коллекции (проверка изменений)
+
+        Yields:
+            List[Dict]: Отклики одной страницы с полем _collection_id
+
+        Raises:
+            HHIntegrationError: При ошибках API
+        """
+        if self.is_mock_mode:
+            page = 0
+            while True:
+                data = await self.mock_service.get_mock_applications(
+                    vacancy_id=vacancy_id,
+                    page=page,
+                    per_page=per_page
+                )
+                items = data.get("items", [])
+                if items:
+                    yield items
+                if not items or first_page_only or page >= data.get("pages", 1) - 1:
+                    return
+                page += 1
+
+        if collections is None:
+            collections = await self.get_application_collections(vacancy_id)
+
+        # Используем только root sub_collections - они содержат все отклики и реальные URL
+        roots = [
+            sub_collection
+            for sub_collection in collections
+            if sub_collection.get("root_collection", False)
+            and sub_collection.get("counters", {}).get("total", 0) > 0
+        ]
+        limiter = _acquire_page_limiter(self.token)
+
+        async def fetch_page(collection_id: str, collection_url: str, page: int) -> Tuple[List[Dict], List[int]]:
+            """Страница коллекции и номера страниц, которые нужно запросить после неё"""
+            async with limiter:
+                # per_page не поддерживается для коллекций
+                data = await self._make_request_full_url(f"{collection_url}&page={page}")
+
+            items = data.get("items", [])
+            for item in items:
+                item["_collection_id"] = collection_id
+
+            total_pages = data.get("pages", 1)
+            logger.debug(f"Загружена страница {page + 1}/{total_pages} коллекции {collection_id}: {len(items)} откликов")
+            next_pages = list(range(1, total_pages)) if page == 0 and items and not first_page_only else []
+            return items, next_pages
+
+        def start(sub_collection: Dict[str, Any], page: int) -> asyncio.Task:
+            task = asyncio.create_task(fetch_page(sub_collection.get("id"), sub_collection.get("url"), page))
+            pending[task] = sub_collection
+            return task
+
+        pending: Dict[asyncio.Task, Dict[str, Any]] = {}
+        for sub_collection in roots:
+            logger.debug(
+                f"Загрузка коллекции {sub_collection.get('id')} для вакансии {vacancy_id} "
+                f"({sub_collection.get('counters', {}).get('total', 0)} откликов)"
+            )
+            start(sub_collection, 0)
+
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    sub_collection = pending.pop(task)
+                    items, next_pages = task.result()
+                    for page in next_pages:
+                        start(sub_collection, page)
+                    if items:
+                        yield items
+        finally:
+            # Ошибка страницы или остановка потребителя отменяет остальные запросы
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            _release_page_limiter(self.token)
+
     async def get_resume_details(self, resume_id: str) -> Dict[str, Any]:
         """
         Получение детальной информации о резюме
@@ -640,6 +798,52 @@ class HHClient:
             logger.error(f"Ошибка поиска резюме: {e}")
             raise HHIntegrationError(f"Не удалось выполнить поиск резюме: {e}")
 
+    async def search_resumes_all(self, max_results: int, per_page: int = 100, **filters) -> Dict[str, Any]:
+        """
+        Поиск резюме с загрузкой нескольких страниц
+
+        После первой страницы известно число страниц - остальные запрашиваются параллельно.
+        Одновременно выполняется не более HH_PAGE_CONCURRENCY запросов на токен.
+        Порядок результатов (релевантность) сохраняется
+
+        Args:
+            max_results: Сколько резюме загрузить
+            per_page: Размер страницы (макс 100)
+            **filters: Параметры search_resumes (text, area, experience, ...)
+
+        Returns:
+            Dict: found - всего найдено, items - не более max_results резюме
+
+        Raises:
+            HHIntegrationError: При ошибках API
+        """
+        per_page = max(1, min(per_page, max_results, 100))
+        limiter = _acquire_page_limiter(self.token)
+
+        async def fetch_page(page: int) -> Dict[str, Any]:
+            async with limiter:
+                return await self.search_resumes(page=page, per_page=per_page, **filters)
+
+        try:
+            first = await fetch_page(0)
+            items = list(first.get("items", []))
+            pages = min(first.get("pages", 1), -(-max_results // per_page))
+
+            if items and pages > 1:
+                tasks = [asyncio.create_task(fetch_page(page)) for page in range(1, pages)]
+                try:
+                    for result in await asyncio.gather(*tasks):
+                        items.extend(result.get("items", []))
+                finally:
+                    # Ошибка одной страницы отменяет остальные запросы
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            _release_page_limiter(self.token)
+
+        return {"found": first.get("found", 0), "items": items[:max_results]}
+
     async def get_resume_search_dictionaries(self) -> Dict[str, Any]:
         """
         Получение справочников для поиска резюме
@@ -677,6 +881,26 @@ class HHClient:
             logger.error(f"Ошибка получения справочников: {e}")
             raise HHIntegrationError(f"Не удалось получить справочники: {e}")
 
+    async def get_reference(self, endpoint: str, etag: Optional[str] = None) -> Tuple[Optional[Any], Optional[str]]:
+        """
+        Условный запрос справочника HH.ru (/dictionaries, /areas) с ETag
+
+        Args:
+            endpoint: API endpoint справочника
+            etag: ETag закешированной версии
+
+        Returns:
+            Tuple: (данные, ETag); данные None если справочник не изменился (304)
+
+        Raises:
+            HHIntegrationError: При ошибках API
+        """
+        headers = {"If-None-Match": etag} if etag else None
+        response = await self._get_full_url(f"{self.base_url}{endpoint}", headers=headers)
+        if response.status_code == 304:
+            return None, etag
+        return response.json(), response.headers.get("ETag")
+
     async def get_resume_views_history(self, resume_id: str) -> Dict[str, Any]:
         """
         Получение истории просмотров резюме работодателем
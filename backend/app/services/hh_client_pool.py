@@ -0,0 +1,111 @@
+"""
+Пул HH.ru клиентов процесса
+Один HHClient с keep-alive соединениями на пользователя и кеш расшифрованных токенов
+"""
+import asyncio
+import logging
+import weakref
+from typing import Dict, Optional, Tuple
+
+from app.services.encryption import token_encryption
+from app.services.hh_client import HHClient, forget_employer_id
+
+logger = logging.getLogger(__name__)
+
+
+class HHClientPool:
+    """
+    Реестр HH.ru клиентов по пользователю
+
+    - Клиенты переиспользуются между запросами: соединения и TLS сессии к api.hh.ru
+      не устанавливаются заново. Соединения httpx привязаны к event loop,
+      поэтому клиенты хранятся отдельно для каждого loop
+    - Расшифрованный токен кешируется вместе с зашифрованным значением: если токен
+      изменён другим процессом, шифротекст в БД отличается и токен расшифровывается заново
+    - Клиенты из пула закрывает только пул (invalidate / close_all)
+    """
+
+    def __init__(self):
+        self._tokens: Dict[str, Tuple[str, str]] = {}
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, HHClient]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def decrypt_token(self, user_id, encrypted_token: str) -> str:
+        """
+        Расшифрованный HH.ru токен пользователя
+
+        Args:
+            user_id: ID пользователя
+            encrypted_token: Зашифрованный токен из БД
+
+        Returns:
+            str: Токен HH.ru
+        """
+        key = str(user_id)
+        cached = self._tokens.get(key)
+        if cached and cached[0] == encrypted_token:
+            return cached[1]
+
+        token = token_encryption.decrypt(encrypted_token)
+        self._tokens[key] = (encrypted_token, token)
+        return token
+
+    def get_client(self, user_id, encrypted_token: str) -> HHClient:
+        """
+        Клиент пользователя для текущего event loop
+
+        Не закрывайте полученный клиент - он используется следующими запросами
+        """
+        key = str(user_id)
+        token = self.decrypt_token(key, encrypted_token)
+        clients = self._clients.setdefault(asyncio.get_running_loop(), {})
+
+        client = clients.get(key)
+        if client is not None and client.token == token:
+            return client
+        if client is not None:
+            # Токен изменён в другом процессе - старый клиент больше не нужен
+            asyncio.create_task(client.close())
+
+        client = HHClient(token)
+        clients[key] = client
+        return client
+
+    async def invalidate(self, user_id):
+        """Сброс токена и клиентов пользователя после изменения или удаления токена"""
+        key = str(user_id)
+        cached = self._tokens.pop(key, None)
+        if cached:
+            forget_employer_id(cached[1])
+
+        current_loop = asyncio.get_running_loop()
+        for loop, clients in list(self._clients.items()):
+            client = clients.pop(key, None)
+            if client is None:
+                continue
+            # Клиент другого loop нельзя закрыть отсюда - он освободится вместе с loop
+            if loop is current_loop:
+                await client.close()
+        logger.info(f"Кеш HH.ru клиента пользователя {key} сброшен")
+
+    async def close_all(self):
+        """Закрытие клиентов текущего event loop при остановке приложения"""
+        clients = self._clients.pop(asyncio.get_running_loop(), {})
+        for client in clients.values():
+            try:
+                await client.close()
+            except Exception as e:
+                logger.debug(f"Ошибка закрытия HH клиента: {e}")
+
+
+# Singleton instance
+_hh_client_pool: Optional[HHClientPool] = None
+
+
+def get_hh_client_pool() -> HHClientPool:
+    """Получение пула HH.ru клиентов процесса"""
+    global _hh_client_pool
+    if _hh_client_pool is None:
+        _hh_client_pool = HHClientPool()
+    return _hh_client_pool
@@ -0,0 +1,268 @@
+"""
+Справочники HH.ru для фильтров поиска резюме
+Кеш /dictionaries и /areas с ревалидацией по ETag и индекс регионов для подсказок
+"""
+import asyncio
+import bisect
+import logging
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.config import settings
+from app.services.hh_client import HHClient
+
+logger = logging.getLogger(__name__)
+
+# Регионы списка по умолчанию - полное дерево клиенту не отдаётся, остальные через подсказки
+POPULAR_AREA_IDS = ["1", "2", "3", "4", "88", "66", "76", "104"]
+
+ORDER_BY = [
+    {"id": "relevance", "name": "По релевантности"},
+    {"id": "publication_time", "name": "По дате обновления"},
+    {"id": "salary_desc", "name": "По убыванию зарплаты"},
+    {"id": "salary_asc", "name": "По возрастанию зарплаты"}
+]
+
+# Сколько подходящих регионов ранжируется для одной подсказки
+SUGGEST_SCAN_LIMIT = 500
+
+# Пауза перед повторной попыткой, если HH.ru недоступен и отдаётся устаревший справочник
+STALE_RETRY_SECONDS = 300
+
+
+def normalize_area_name(value: str) -> str:
+    """Ключ поиска региона: нижний регистр, ё -> е"""
+    return value.strip().lower().replace("ё", "е")
+
+
+class AreaIndex:
+    """
+    Плоский индекс дерева регионов HH.ru
+
+    - areas: ID -> {id, name, parent_id, depth}
+    - Отсортированные ключи (название целиком и каждое следующее слово названия)
+      для поиска по префиксу через bisect
+    """
+
+    def __init__(self, tree: List[Dict[str, Any]]):
+        self.areas: Dict[str, Dict[str, Any]] = {}
+        keys: List[Tuple[str, int, str]] = []
+
+        stack = [(node, None, 0) for node in reversed(tree)]
+        while stack:
+            node, parent_id, depth = stack.pop()
+            area_id = str(node.get("id"))
+            name = node.get("name") or ""
+            self.areas[area_id] = {"id": area_id, "name": name, "parent_id": parent_id, "depth": depth}
+
+            normalized = normalize_area_name(name)
+            if normalized:
+                keys.append((normalized, 0, area_id))
+                # "Нижний Новгород" находится и по "новг"
+                words = normalized.replace("-", " ").split()
+                for position in range(1, len(words)):
+                    keys.append((" ".join(words[position:]), 1, area_id))
+
+            for child in reversed(node.get("areas") or []):
+                stack.append((child, area_id, depth + 1))
+
+        keys.sort()
+        self._keys = keys
+        self._key_names = [key for key, _, _ in keys]
+
+    def __len__(self) -> int:
+        return len(self.areas)
+
+    def path(self, area_id: str) -> List[str]:
+        """Названия родительских регионов от корня"""
+        names = []
+        parent_id = self.areas.get(area_id, {}).get("parent_id")
+        while parent_id and parent_id in self.areas:
+            names.append(self.areas[parent_id]["name"])
+            parent_id = self.areas[parent_id]["parent_id"]
+        return list(reversed(names))
+
+    def is_within(self, area_id: str, ancestor_id: str) -> bool:
+        """Регион совпадает с ancestor_id или вложен в него"""
+        while area_id:
+            if area_id == ancestor_id:
+                return True
+            area_id = self.areas.get(area_id, {}).get("parent_id")
+        return False
+
+    def item(self, area_id: str) -> Optional[Dict[str, Any]]:
+        """Регион для ответа API: id, name, parent_id и путь родителей строкой"""
+        area = self.areas.get(area_id)
+        if area is None:
+            return None
+        return {
+            "id": area["id"],
+            "name": area["name"],
+            "parent_id": area["parent_id"],
+            "path": ", ".join(self.path(area_id))
+        }
+
+    def suggest(self, query: str, limit: int = 10, parent_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Подсказки регионов по префиксу
+
+        Сначала совпадения с началом названия, затем с началом слова;
+        внутри - регионы выше по дереву и с более коротким названием
+
+        Args:
+            query: Начало названия
+            limit: Максимум подсказок
+            parent_id: Искать только внутри региона
+
+        Returns:
+            List[Dict]: Регионы (см. item)
+        """
+        prefix = normalize_area_name(query)
+        if not prefix:
+            return []
+
+        best: Dict[str, int] = {}
+        position = bisect.bisect_left(self._key_names, prefix)
+        while position < len(self._keys) and len(best) < SUGGEST_SCAN_LIMIT:
+            key, rank, area_id = self._keys[position]
+            if not key.startswith(prefix):
+                break
+            position += 1
+            if parent_id and not self.is_within(area_id, parent_id):
+                continue
+            best[area_id] = min(rank, best.get(area_id, rank))
+
+        ranked = sorted(
+            best.items(),
+            key=lambda entry: (
+                entry[1],
+                self.areas[entry[0]]["depth"],
+                len(self.areas[entry[0]]["name"]),
+                self.areas[entry[0]]["name"]
+            )
+        )
+        return [self.item(area_id) for area_id, _ in ranked[:limit]]
+
+
+@dataclass
+class _CachedReference:
+    """Закешированный справочник HH.ru"""
+    data: Any
+    etag: Optional[str]
+    expires_at: float
+
+
+class HHDictionaryService:
+    """
+    Кеш справочников HH.ru на процесс
+
+    - Справочники не зависят от пользователя: загружаются через любой HH клиент
+    - По истечении HH_DICTIONARY_TTL запрос повторяется с If-None-Match,
+      на 304 справочник продлевается без загрузки
+    - Индекс регионов перестраивается только при изменении /areas
+    - Если HH.ru недоступен, отдаётся устаревшая версия
+    """
+
+    def __init__(self, ttl: Optional[int] = None):
+        self.ttl = ttl or settings.HH_DICTIONARY_TTL
+        self._cache: Dict[str, _CachedReference] = {}
+        self._area_index: Optional[AreaIndex] = None
+        self._locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Lock]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _lock(self, endpoint: str) -> asyncio.Lock:
+        # Одновременные запросы с пустым кешем ждут одну загрузку
+        locks = self._locks.setdefault(asyncio.get_running_loop(), {})
+        lock = locks.get(endpoint)
+        if lock is None:
+            lock = asyncio.Lock()
+            locks[endpoint] = lock
+        return lock
+
+    async def _get(self, hh_client: HHClient, endpoint: str) -> Any:
+        cached = self._cache.get(endpoint)
+        if cached and cached.expires_at > time.monotonic():
+            return cached.data
+
+        async with self._lock(endpoint):
+            cached = self._cache.get(endpoint)
+            if cached and cached.expires_at > time.monotonic():
+                return cached.data
+
+            try:
+                data, etag = await hh_client.get_reference(endpoint, cached.etag if cached else None)
+            except Exception as e:
+                if cached is None:
+                    raise
+                logger.warning(f"Не удалось обновить справочник HH.ru {endpoint}, используется кеш: {e}")
+                cached.expires_at = time.monotonic() + STALE_RETRY_SECONDS
+                return cached.data
+
+            if data is None and cached:
+                logger.debug(f"Справочник HH.ru {endpoint} не изменился (304)")
+                cached.expires_at = time.monotonic() + self.ttl
+                return cached.data
+
+            self._cache[endpoint] = _CachedReference(data=data, etag=etag, expires_at=time.monotonic() + self.ttl)
+            if endpoint == "/areas":
+                self._area_index = AreaIndex(data or [])
+                logger.info(f"Индекс регионов HH.ru построен: {len(self._area_index)} регионов")
+            return data
+
+    async def get_area_index(self, hh_client: HHClient) -> AreaIndex:
+        """Индекс регионов (загружается при первом обращении и после изменения /areas)"""
+        if hh_client.is_mock_mode:
+            mock = await hh_client.mock_service.get_mock_dictionaries()
+            return AreaIndex(mock["areas"])
+
+        await self._get(hh_client, "/areas")
+        return self._area_index
+
+    async def get_dictionaries(self, hh_client: HHClient) -> Dict[str, Any]:
+        """
+        Справочники для фильтров поиска резюме
+
+        Вместо дерева регионов - крупные города; остальные регионы через suggest_areas
+        """
+        if hh_client.is_mock_mode:
+            return await hh_client.mock_service.get_mock_dictionaries()
+
+        dictionaries = await self._get(hh_client, "/dictionaries")
+        index = await self.get_area_index(hh_client)
+        areas = [index.item(area_id) for area_id in POPULAR_AREA_IDS if area_id in index.areas]
+
+        return {
+            "experience": dictionaries.get("experience", []),
+            "education_level": dictionaries.get("education_level", []),
+            "gender": dictionaries.get("gender", []),
+            "job_search_status": dictionaries.get("resume_search_job_search_status", []),
+            "relocation": dictionaries.get("relocation_type", []),
+            "order_by": ORDER_BY,
+            "areas": areas
+        }
+
+    async def suggest_areas(
+        self,
+        hh_client: HHClient,
+        query: str,
+        limit: int = 10,
+        parent_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Подсказки регионов по началу названия"""
+        index = await self.get_area_index(hh_client)
+        return index.suggest(query, limit=limit, parent_id=parent_id)
+
+
+# Singleton instance
+_hh_dictionary_service: Optional[HHDictionaryService] = None
+
+
+def get_hh_dictionary_service() -> HHDictionaryService:
+    """Получение сервиса справочников HH.ru"""
+    global _hh_dictionary_service
+    if _hh_dictionary_service is None:
+        _hh_dictionary_service = HHDictionaryService()
+    return _hh_dictionary_service
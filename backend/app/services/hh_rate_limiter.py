@@ -0,0 +1,223 @@
+"""
+Лимитер запросов к HH.ru API
+Token bucket в Redis на токен работодателя, общий для всех воркеров и API процессов
+После 429 все клиенты токена ждут до общего "blocked until" из Retry-After
+"""
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from app.config import settings
+from app.utils.redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "hh:ratelimit:"
+
+# Состояние ключа хранится не меньше этого времени (мс)
+STATE_TTL_MS = 300_000
+
+# Атомарная попытка взять 1 запрос.
+# Возвращает 0 при успехе или время ожидания в мс.
+# При успехе после ожидания учитывает его в общих счётчиках throttled / throttled_ms
+_ACQUIRE_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cap = tonumber(ARGV[3])
+local waited = tonumber(ARGV[4])
+local b = redis.call('HMGET', key, 'tokens', 'ts', 'blocked_until')
+local tokens = tonumber(b[1]) or cap
+local ts = tonumber(b[2]) or now
+local blocked_until = tonumber(b[3]) or 0
+
+if now < blocked_until then
+  return blocked_until - now
+end
+
+tokens = math.min(cap, tokens + math.max(0, now - ts) * rate / 1000)
+local wait = 0
+if tokens < 1 then
+  wait = math.ceil((1 - tokens) * 1000 / rate)
+else
+  tokens = tokens - 1
+  if waited > 0 then
+    redis.call('HINCRBY', key, 'throttled', 1)
+    redis.call('HINCRBY', key, 'throttled_ms', waited)
+  end
+end
+
+redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', key, math.max(ARGV[5], blocked_until - now))
+return wait
+"""
+
+# 429: продление общего "blocked until" и счётчик ответов 429
+_BLOCK_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local until_ms = now + tonumber(ARGV[2])
+local current = tonumber(redis.call('HGET', key, 'blocked_until')) or 0
+if until_ms > current then
+  redis.call('HSET', key, 'blocked_until', until_ms)
+  current = until_ms
+end
+redis.call('HINCRBY', key, 'rate_limit_hits', 1)
+redis.call('PEXPIRE', key, math.max(ARGV[3], current - now))
+return 1
+"""
+
+
+def token_hash(token: str) -> str:
+    """Хеш токена работодателя - ключ лимитера в Redis и в памяти процесса"""
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+def parse_retry_after(value: Optional[str], default: float = 60.0) -> float:
+    """Пауза из заголовка Retry-After ответа 429 в секундах"""
+    try:
+        return max(0.0, float(value)) if value else default
+    except ValueError:
+        return default
+
+
+class _LocalBucket:
+    """In-process token bucket - резерв на случай недоступности Redis"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.ts = time.time() * 1000
+        self.blocked_until = 0.0
+
+    def acquire(self, now: float) -> int:
+        if now < self.blocked_until:
+            return int(self.blocked_until - now)
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.ts) * self.rate / 1000)
+        self.ts = now
+        if self.tokens < 1:
+            return int((1 - self.tokens) * 1000 / self.rate + 0.999)
+        self.tokens -= 1
+        return 0
+
+    def block(self, now: float, blocked_ms: int):
+        self.blocked_until = max(self.blocked_until, now + blocked_ms)
+
+
+class HHRateLimiter:
+    """
+    Допуск запросов к HH.ru по токену работодателя
+
+    - acquire() ждёт, пока в общем bucket токена есть запрос: не более rate запросов
+      в секунду с всплеском до burst на все процессы
+    - penalize() при 429 блокирует токен для ВСЕХ процессов до Retry-After,
+      параллельные синхронизации и поиски замедляются вместе
+    - Время ожидания учитывается в stats процесса и в общих счётчиках Redis
+    """
+
+    def __init__(self, token: str, rate: Optional[float] = None, burst: Optional[int] = None):
+        # Сам токен в Redis не попадает и в лимитере не хранится - только его хеш
+        self.key = f"{KEY_PREFIX}{token_hash(token)}"
+        self.rate = max(0.1, rate or settings.HH_REQUESTS_PER_SECOND)
+        self.capacity = float(max(1, burst or settings.HH_REQUESTS_BURST))
+        self._local = _LocalBucket(self.rate, self.capacity)
+        self._redis_retry_at = 0.0
+        self.stats = {
+            "acquired": 0,
+            "throttled": 0,
+            "throttled_seconds": 0.0,
+            "rate_limit_hits": 0,
+        }
+
+    async def _eval(self, script: str, *args) -> Optional[int]:
+        # После ошибки Redis не дёргаем его 30 секунд, чтобы не ждать таймаут на каждом запросе
+        if time.monotonic() < self._redis_retry_at:
+            return None
+        try:
+            return int(await get_async_redis().eval(script, 1, self.key, *args))
+        except Exception as e:
+            logger.warning(f"Redis недоступен для лимитера HH.ru, используется локальный bucket: {e}")
+            self._redis_retry_at = time.monotonic() + 30
+            return None
+
+    async def acquire(self):
+        """Ожидание права на один запрос"""
+        waited = 0.0
+        while True:
+            now = time.time() * 1000
+            wait_ms = await self._eval(
+                _ACQUIRE_SCRIPT, int(now), self.rate, self.capacity, int(waited * 1000), STATE_TTL_MS
+            )
+            if wait_ms is None:
+                wait_ms = self._local.acquire(now)
+
+            if wait_ms <= 0:
+                self.stats["acquired"] += 1
+                if waited:
+                    self.stats["throttled"] += 1
+                    self.stats["throttled_seconds"] += waited
+                return
+
+            # Джиттер, чтобы ожидающие клиенты не просыпались одновременно
+            delay = wait_ms / 1000 + random.uniform(0, 0.05)
+            await asyncio.sleep(delay)
+            waited += delay
+
+    async def penalize(self, retry_after: float):
+        """
+        Реакция на 429: общий "blocked until" для всех клиентов токена
+
+        Args:
+            retry_after: Пауза в секундах из Retry-After
+        """
+        self.stats["rate_limit_hits"] += 1
+        blocked_ms = int(retry_after * 1000)
+        now = time.time() * 1000
+        result = await self._eval(_BLOCK_SCRIPT, int(now), blocked_ms, STATE_TTL_MS)
+        if result is None:
+            self._local.block(now, blocked_ms)
+        logger.warning(f"HH.ru 429: запросы токена приостановлены на {retry_after:.1f}s")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Счётчики допуска процесса для логов и метрик"""
+        return {**self.stats, "throttled_seconds": round(self.stats["throttled_seconds"], 2)}
+
+    async def get_shared_stats(self) -> Dict[str, Any]:
+        """Счётчики токена по всем процессам (из Redis) за время жизни ключа"""
+        try:
+            throttled, throttled_ms, hits = await get_async_redis().hmget(
+                self.key, "throttled", "throttled_ms", "rate_limit_hits"
+            )
+        except Exception as e:
+            logger.debug(f"Не удалось получить счётчики лимитера HH.ru: {e}")
+            return {}
+        return {
+            "throttled": int(throttled or 0),
+            "throttled_seconds": round(int(throttled_ms or 0) / 1000, 2),
+            "rate_limit_hits": int(hits or 0),
+        }
+
+
+# Лимитеры по хешу токена работодателя: состояние в Redis, локальный bucket только резерв.
+# LRU - токены ротируются, без ограничения словарь рос бы с каждым новым токеном
+LIMITERS_MAX = 1024
+_limiters: "OrderedDict[str, HHRateLimiter]" = OrderedDict()
+
+
+def get_hh_rate_limiter(token: str) -> HHRateLimiter:
+    """Получение общего лимитера токена работодателя"""
+    key = token_hash(token)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        limiter = HHRateLimiter(token)
+        _limiters[key] = limiter
+        while len(_limiters) > LIMITERS_MAX:
+            _limiters.popitem(last=False)
+    else:
+        _limiters.move_to_end(key)
+    return limiter
@@ -0,0 +1,121 @@
+"""
+Проекции для списков API
+Списки выбирают только отдаваемые колонки одним запросом с join;
+JSON документы (resume_data, raw_result) целиком загружаются только в детальных ответах
+"""
+from typing import Dict, Any
+
+from sqlalchemy import Select, func, select
+from sqlalchemy.orm import load_only
+
+from app.models.application import Application, AnalysisResult
+from app.models.vacancy import Vacancy
+from app.utils.pagination import Keyset, SortKey
+
+# Курсорная пагинация: новые сначала, id - для однозначности (индексы *_created)
+APPLICATION_KEYSET = Keyset(
+    "applications.created",
+    SortKey(Application.created_at, lambda application: application.created_at, descending=True),
+    SortKey(Application.id, lambda application: str(application.id), descending=True)
+)
+
+VACANCY_KEYSET = Keyset(
+    "vacancies.created",
+    SortKey(Vacancy.created_at, lambda vacancy: vacancy.created_at, descending=True),
+    SortKey(Vacancy.id, lambda vacancy: str(vacancy.id), descending=True)
+)
+
+# Список /api/vacancies: по дате публикации, вакансии без неё - по дате создания
+VACANCY_PUBLISHED_KEYSET = Keyset(
+    "vacancies.published",
+    SortKey(
+        func.coalesce(Vacancy.published_at, Vacancy.created_at),
+        lambda vacancy: vacancy.published_at or vacancy.created_at,
+        descending=True
+    ),
+    SortKey(Vacancy.id, lambda vacancy: str(vacancy.id), descending=True)
+)
+
+
+def application_list_options():
+    """
+    Колонки отклика для списков (всё из Application.to_dict, без resume_data)
+
+    raiseload: обращение к незагруженной колонке падает вместо скрытого запроса на строку
+    """
+    return load_only(
+        Application.id,
+        Application.vacancy_id,
+        Application.hh_application_id,
+        Application.hh_resume_id,
+        Application.candidate_name,
+        Application.candidate_email,
+        Application.candidate_phone,
+        Application.resume_url,
+        Application.collection_id,
+        Application.state,
+        Application.status,
+        Application.is_duplicate,
+        Application.analysis_state,
+        Application.analyzed_at,
+        Application.created_at,
+        raiseload=True
+    )
+
+
+def analysis_list_query() -> Select:
+    """
+    Результаты анализа с данными кандидата одним запросом
+
+    Вместо raw_result - генерируемые колонки и must_haves (нужны для бейджа в строке списка)
+    """
+    return select(
+        AnalysisResult.id,
+        AnalysisResult.application_id,
+        AnalysisResult.score,
+        AnalysisResult.skills_match,
+        AnalysisResult.experience_match,
+        AnalysisResult.salary_match,
+        AnalysisResult.recommendation,
+        AnalysisResult.verdict,
+        AnalysisResult.priority,
+        AnalysisResult.must_have_missing,
+        AnalysisResult.salary_status,
+        AnalysisResult.one_liner,
+        AnalysisResult.raw_result["must_haves"].label("must_haves"),
+        AnalysisResult.ai_model,
+        AnalysisResult.created_at,
+        Application.candidate_name,
+        Application.candidate_email,
+        Application.candidate_phone,
+        Application.resume_url,
+        Application.created_at.label("application_created_at")
+    ).join(Application, AnalysisResult.application_id == Application.id)
+
+
+def analysis_list_item(row) -> Dict[str, Any]:
+    """Строка analysis_list_query в формате списка /api/analysis/results"""
+    return {
+        "id": str(row.id),
+        "application_id": str(row.application_id),
+        "score": row.score,
+        "skills_match": row.skills_match,
+        "experience_match": row.experience_match,
+        "salary_match": row.salary_match,
+        "recommendation": row.recommendation,
+        "verdict": row.verdict,
+        "priority": row.priority,
+        "must_have_missing": row.must_have_missing,
+        "salary_status": row.salary_status,
+        "one_liner": row.one_liner,
+        "must_haves": row.must_haves or [],
+        "ai_model": row.ai_model,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "application": {
+            "candidate_name": row.candidate_name,
+            "candidate_email": row.candidate_email,
+            "candidate_phone": row.candidate_phone,
+            "resume_url": row.resume_url,
+            "created_at": row.application_created_at.isoformat() if row.application_created_at else None,
+        }
+    }
@@ -0,0 +1,306 @@
+"""
+Адаптивный лимитер запросов к OpenAI
+Token bucket в Redis по RPM/TPM, общий для всех воркеров и API процессов
+Ёмкость и остаток синхронизируются с заголовками x-ratelimit-* каждого ответа
+"""
+import asyncio
+import logging
+import random
+import re
+import time
+from typing import Dict, Any, Optional, Mapping
+
+from app.config import settings
+from app.utils.redis_client import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+# Окно лимитов OpenAI - одна минута
+WINDOW_MS = 60_000
+
+# Атомарная попытка взять 1 запрос и cost токенов.
+# Возвращает 0 при успехе или время ожидания в мс.
+_ACQUIRE_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local b = redis.call('HMGET', key, 'req_cap', 'req', 'tok_cap', 'tok', 'ts', 'blocked_until')
+local req_cap = tonumber(b[1]) or tonumber(ARGV[3])
+local tok_cap = tonumber(b[3]) or tonumber(ARGV[4])
+local req = tonumber(b[2]) or req_cap
+local tok = tonumber(b[4]) or tok_cap
+local ts = tonumber(b[5]) or now
+local blocked_until = tonumber(b[6]) or 0
+
+if now < blocked_until then
+  return blocked_until - now
+end
+
+local elapsed = math.max(0, now - ts)
+req = math.min(req_cap, req + elapsed * req_cap / 60000)
+tok = math.min(tok_cap, tok + elapsed * tok_cap / 60000)
+cost = math.min(cost, tok_cap)
+
+local wait = 0
+if req < 1 then
+  wait = math.max(wait, (1 - req) * 60000 / req_cap)
+end
+if tok < cost then
+  wait = math.max(wait, (cost - tok) * 60000 / tok_cap)
+end
+
+if wait <= 0 then
+  req = req - 1
+  tok = tok - cost
+end
+
+redis.call('HSET', key, 'req_cap', req_cap, 'tok_cap', tok_cap, 'req', req, 'tok', tok, 'ts', now)
+redis.call('PEXPIRE', key, 300000)
+return math.ceil(wait)
+"""
+
+# Синхронизация с заголовками ответа: сервер - источник истины по остатку
+_SYNC_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local fields = {'ts', now}
+if ARGV[2] ~= '' then table.insert(fields, 'req_cap'); table.insert(fields, ARGV[2]) end
+if ARGV[3] ~= '' then table.insert(fields, 'tok_cap'); table.insert(fields, ARGV[3]) end
+if ARGV[4] ~= '' then table.insert(fields, 'req'); table.insert(fields, ARGV[4]) end
+if ARGV[5] ~= '' then table.insert(fields, 'tok'); table.insert(fields, ARGV[5]) end
+redis.call('HSET', key, unpack(fields))
+local blocked = tonumber(ARGV[6])
+if blocked > 0 then
+  local current = tonumber(redis.call('HGET', key, 'blocked_until')) or 0
+  if now + blocked > current then
+    redis.call('HSET', key, 'blocked_until', now + blocked)
+  end
+end
+redis.call('PEXPIRE', key, 300000)
+return 1
+"""
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_MS = {"ms": 1, "s": 1000, "m": 60_000, "h": 3_600_000}
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[int]:
+    """
+    Парсинг x-ratelimit-reset-* ("20ms", "1s", "6m0s") в миллисекунды
+
+    Returns:
+        Optional[int]: Миллисекунды или None если заголовка нет
+    """
+    if not value:
+        return None
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        try:
+            return int(float(value) * 1000)
+        except ValueError:
+            return None
+    return int(sum(float(amount) * _DURATION_MS[unit] for amount, unit in parts))
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> Optional[float]:
+    """Пауза из retry-after-ms / retry-after ответа 429 в секундах"""
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value) * scale
+            except ValueError:
+                continue
+    return None
+
+
+def estimate_tokens(messages, max_tokens: int) -> int:
+    """
+    Оценка токенов запроса для лимита TPM
+
+    OpenAI резервирует prompt + max_tokens при приёме запроса.
+    Для кириллицы ~3 символа на токен.
+    """
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return chars // 3 + max_tokens
+
+
+class _LocalBucket:
+    """In-process token bucket - резерв на случай недоступности Redis"""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.req_cap = float(rpm)
+        self.tok_cap = float(tpm)
+        self.req = self.req_cap
+        self.tok = self.tok_cap
+        self.ts = time.time() * 1000
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        elapsed = max(0.0, now - self.ts)
+        self.req = min(self.req_cap, self.req + elapsed * self.req_cap / WINDOW_MS)
+        self.tok = min(self.tok_cap, self.tok + elapsed * self.tok_cap / WINDOW_MS)
+        self.ts = now
+
+    def acquire(self, now: float, cost: int) -> int:
+        if now < self.blocked_until:
+            return int(self.blocked_until - now)
+        self._refill(now)
+        cost = min(cost, self.tok_cap)
+        wait = 0.0
+        if self.req < 1:
+            wait = max(wait, (1 - self.req) * WINDOW_MS / self.req_cap)
+        if self.tok < cost:
+            wait = max(wait, (cost - self.tok) * WINDOW_MS / self.tok_cap)
+        if wait <= 0:
+            self.req -= 1
+            self.tok -= cost
+        return int(wait + 0.999)
+
+    def sync(self, now: float, limits: Dict[str, Optional[float]], blocked_ms: int):
+        self._refill(now)
+        if limits["req_cap"]:
+            self.req_cap = limits["req_cap"]
+        if limits["tok_cap"]:
+            self.tok_cap = limits["tok_cap"]
+        if limits["req"] is not None:
+            self.req = limits["req"]
+        if limits["tok"] is not None:
+            self.tok = limits["tok"]
+        if blocked_ms > 0:
+            self.blocked_until = max(self.blocked_until, now + blocked_ms)
+
+
+class OpenAIRateGovernor:
+    """
+    Допуск запросов к OpenAI по оценке токенов
+
+    - acquire() ждёт, пока в общем bucket есть 1 запрос и N токенов
+    - update_from_headers() выставляет ёмкость и остаток по x-ratelimit-* заголовкам
+    - penalize() при 429 блокирует bucket для ВСЕХ процессов до Retry-After
+    """
+
+    def __init__(self, model: str, rpm: Optional[int] = None, tpm: Optional[int] = None):
+        self.model = model
+        self.key = f"openai:ratelimit:{model}"
+        self.default_rpm = rpm or settings.OPENAI_RPM_LIMIT
+        self.default_tpm = tpm or settings.OPENAI_TPM_LIMIT
+        self._local = _LocalBucket(self.default_rpm, self.default_tpm)
+        self._redis_retry_at = 0.0
+        self.stats = {
+            "acquired": 0,
+            "throttled": 0,
+            "throttled_seconds": 0.0,
+            "rate_limit_hits": 0,
+        }
+
+    async def _eval(self, script: str, *args) -> Optional[int]:
+        # После ошибки Redis не дёргаем его 30 секунд, чтобы не ждать таймаут на каждом запросе
+        if time.monotonic() < self._redis_retry_at:
+            return None
+        try:
+            return int(await get_async_redis().eval(script, 1, self.key, *args))
+        except Exception as e:
+            logger.warning(f"Redis недоступен для лимитера OpenAI, используется локальный bucket: {e}")
+            self._redis_retry_at = time.monotonic() + 30
+            return None
+
+    async def acquire(self, estimated_tokens: int, max_wait: float = 300.0):
+        """
+        Ожидание допуска запроса
+
+        Args:
+            estimated_tokens: Оценка prompt + max_tokens
+            max_wait: Максимальное суммарное ожидание в секундах
+        """
+        waited = 0.0
+        while True:
+            now = time.time() * 1000
+            wait_ms = await self._eval(
+                _ACQUIRE_SCRIPT, int(now), estimated_tokens, self.default_rpm, self.default_tpm
+            )
+            if wait_ms is None:
+                wait_ms = self._local.acquire(now, estimated_tokens)
+
+            if wait_ms <= 0:
+                self.stats["acquired"] += 1
+                if waited:
+                    self.stats["throttled"] += 1
+                    self.stats["throttled_seconds"] += waited
+                return
+
+            if waited >= max_wait:
+                logger.warning(f"OpenAI лимитер: ожидание превысило {max_wait}s, запрос пропущен без допуска")
+                return
+
+            # Джиттер, чтобы ожидающие воркеры не просыпались одновременно
+            delay = min(wait_ms / 1000 + random.uniform(0, 0.25), max(0.05, max_wait - waited))
+            await asyncio.sleep(delay)
+            waited += delay
+
+    async def update_from_headers(self, headers: Mapping[str, str]):
+        """Синхронизация bucket с заголовками x-ratelimit-* ответа OpenAI"""
+        def number(name: str) -> Optional[float]:
+            value = headers.get(name)
+            try:
+                return float(value) if value is not None else None
+            except ValueError:
+                return None
+
+        limits = {
+            "req_cap": number("x-ratelimit-limit-requests"),
+            "tok_cap": number("x-ratelimit-limit-tokens"),
+            "req": number("x-ratelimit-remaining-requests"),
+            "tok": number("x-ratelimit-remaining-tokens"),
+        }
+        if not any(v is not None for v in limits.values()):
+            return
+
+        # Если остаток исчерпан - блокируем до reset, а не ждём 429
+        blocked_ms = 0
+        if limits["req"] is not None and limits["req"] < 1:
+            blocked_ms = max(blocked_ms, parse_reset_duration(headers.get("x-ratelimit-reset-requests")) or 0)
+        if limits["tok"] is not None and limits["tok"] < 1:
+            blocked_ms = max(blocked_ms, parse_reset_duration(headers.get("x-ratelimit-reset-tokens")) or 0)
+
+        now = time.time() * 1000
+        args = ["" if v is None else str(v) for v in (limits["req_cap"], limits["tok_cap"], limits["req"], limits["tok"])]
+        result = await self._eval(_SYNC_SCRIPT, int(now), *args, blocked_ms)
+        if result is None:
+            self._local.sync(now, limits, blocked_ms)
+
+    async def penalize(self, retry_after: float, headers: Optional[Mapping[str, str]] = None):
+        """
+        Реакция на 429: общий "blocked until" для всех воркеров
+
+        Args:
+            retry_after: Пауза в секундах
+            headers: Заголовки ответа 429 (если есть - тоже синхронизируются)
+        """
+        self.stats["rate_limit_hits"] += 1
+        blocked_ms = int(retry_after * 1000)
+        now = time.time() * 1000
+        empty = {"req_cap": None, "tok_cap": None, "req": None, "tok": None}
+        result = await self._eval(_SYNC_SCRIPT, int(now), "", "", "", "", blocked_ms)
+        if result is None:
+            self._local.sync(now, empty, blocked_ms)
+        if headers:
+            await self.update_from_headers(headers)
+        logger.warning(f"OpenAI 429: все воркеры приостановлены на {retry_after:.1f}s")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Счётчики допуска для логов и метрик"""
+        return {**self.stats, "throttled_seconds": round(self.stats["throttled_seconds"], 2)}
+
+
+# Singleton экземпляры по модели (лимиты OpenAI считаются на модель)
+_governors: Dict[str, OpenAIRateGovernor] = {}
+
+
+def get_openai_governor(model: str) -> OpenAIRateGovernor:
+    """Получение общего лимитера для модели"""
+    governor = _governors.get(model)
+    if governor is None:
+        governor = OpenAIRateGovernor(model)
+        _governors[model] = governor
+    return governor
@@ -0,0 +1,370 @@
+"""
+Построитель промптов AI анализа с учётом prompt caching
+Стабильный префикс (правила + схема ответа + вакансия) и изменяемый блок кандидата
+
+OpenAI кеширует совпадающий префикс запроса (от 1024 токенов). Поэтому сообщения
+собираются так, чтобы всё неизменное шло первым и было побайтно одинаковым:
+  1. system - правила оценки и формат ответа (одинаковы для всех вакансий)
+  2. user   - анализ вакансии и её описание (одинаковы для всех кандидатов вакансии)
+  3. user   - данные кандидата (единственная изменяемая часть)
+"""
+import json
+from typing import Dict, Any, List, Optional
+
+
+SYSTEM_JSON_INSTRUCTION = "Ты опытный HR-эксперт. Отвечай ТОЛЬКО валидным JSON. Без markdown, без комментариев."
+
+RULES = """# РОЛЬ
+
+Ты — Senior Recruiter с 15-летним опытом найма. Твоя задача — оценить кандидата так, как это сделал бы опытный HR: целостно, с пониманием контекста, а не по чеклисту.
+
+## ПРИНЦИПЫ ОЦЕНКИ
+
+1. **Понимание вакансии важнее ключевых слов**
+   - Сначала пойми, КАКОЙ человек нужен на эту позицию
+   - Какие задачи он будет решать? Какой контекст?
+   - Что критично, а что можно освоить?
+
+2. **Холистическая оценка кандидата**
+   - Смотри на карьерный путь целиком, не только последнее место
+   - Оценивай КАЧЕСТВО опыта, не только наличие ключевых слов
+   - Ищи паттерны: рост, стабильность, достижения
+
+3. **Релевантность важнее формального соответствия**
+   - Опыт в смежной нише может быть ценнее, чем слабый опыт в целевой
+   - Человек, который вырастил магазин с 0 до 5М в одежде, может быть лучше того, кто "работал с оборудованием" без результатов
+
+4. **Здравый смысл над правилами**
+   - Если что-то не указано — это не автоматический минус
+   - Контекст определяет важность факторов
+
+---
+
+# ПОРЯДОК АНАЛИЗА (выполняй строго по шагам)
+
+## ШАГ 1: ТРЕБОВАНИЯ ВАКАНСИИ
+
+Описан в сообщении с вакансией.
+
+## ШАГ 2: ПРОВЕРКА СТОП-ФАКТОРОВ
+
+Для каждого must-have определи статус:
+- ✅ ЕСТЬ — подтверждено в опыте работы
+- ❓ ВОЗМОЖНО — похожий опыт, нужно уточнить
+- ❌ НЕТ — явно отсутствует или противоречит
+
+⚠️ **КРИТИЧЕСКОЕ ПРАВИЛО:**
+Если хотя бы один must-have = ❌ НЕТ → вердикт ОБЯЗАН быть "Mismatch"
+Это правило НЕ МОЖЕТ быть переопределено никакими плюсами кандидата.
+
+## ШАГ 3: ХОЛИСТИЧЕСКИЙ АНАЛИЗ
+
+Если стоп-факторы пройдены, оцени кандидата целостно:
+
+**Сильные стороны (ищи конкретику):**
+- Где работал? (названия компаний)
+- Сколько? (периоды)
+- Что делал? (задачи)
+- Чего достиг? (цифры, если есть)
+- Какой карьерный тренд? (рост/стагнация)
+
+**Риски и сомнения:**
+- Частая смена работы?
+- Gaps в карьере?
+- Деградация позиций?
+- Несоответствие ожиданий по зарплате?
+- Нет подтверждения заявленных навыков?
+
+**Релевантность опыта:**
+- Прямой опыт в нише? → сильный плюс
+- Смежный опыт с похожими задачами? → хороший плюс
+- Опыт с другим товаром, но на тех же площадках? → нормально
+- Совсем другой опыт? → риск
+
+## ШАГ 4: ВЕРДИКТ
+
+| Вердикт | Когда ставить |
+|---------|---------------|
+| **Mismatch** | Хотя бы один must-have отсутствует. Не тратьте время |
+| **Low** | Must-haves формально есть, но слабые. Много сомнений. Только если некого больше |
+| **Medium** | Есть потенциал, но нужно уточнить ключевые моменты на интервью |
+| **High** | Сильное соответствие. Рекомендую связаться в приоритете |"""
+
+# Шаг 1, если анализ вакансии не удалось выполнить заранее (модель делает его сама)
+INLINE_VACANCY_STEP = """## ШАГ 1: АНАЛИЗ ВАКАНСИИ
+
+Прочитай вакансию и ответь себе:
+- Какой ТИП работы? (операционка / развитие / запуск с нуля)
+- Какая НИША и её специфика? (технический товар? fashion? FMCG?)
+- Что КРИТИЧНО для успеха на этой позиции?
+- Что можно ОСВОИТЬ за 1-2 месяца?
+
+Выдели 2-4 MUST-HAVE требования — то, БЕЗ ЧЕГО кандидат не справится:
+- Это должны быть реальные стоп-факторы, а не wish-list
+- Пример must-have: "Опыт работы с WB от 1 года" — да
+- Пример НЕ must-have: "Знание Excel" — это осваивается за неделю"""
+
+INLINE_VACANCY_SCHEMA = """  "vacancy_analysis": {
+    "position_type": "operations | growth | launch",
+    "niche_specifics": "краткое описание специфики ниши",
+    "what_critical": "что критично для успеха",
+    "what_learnable": "что можно освоить"
+  },
+
+"""
+
+RESPONSE_SCHEMA = """# ФОРМАТ ОТВЕТА (только валидный JSON)
+
+{
+<<VACANCY_ANALYSIS>>  "must_haves": [
+    {
+      "requirement": "формулировка требования",
+      "status": "yes | maybe | no",
+      "evidence": "цитата из резюме или null",
+      "reasoning": "почему такой статус"
+    }
+  ],
+
+  "holistic_analysis": {
+    "career_summary": "2-3 предложения о карьерном пути кандидата",
+    "relevance_assessment": "насколько опыт релевантен этой вакансии и почему",
+    "growth_pattern": "растёт | стабилен | деградирует | непонятно"
+  },
+
+  "strengths": [
+    "КОНКРЕТНОЕ достижение или навык, подтверждённый опытом (не просто 'работал в компании X')",
+    "Пример: 'Вырастил оборот магазина с 2М до 8М за 1.5 года в Детский мир'"
+  ],
+
+  "concerns": [
+    "УНИКАЛЬНОЕ сомнение (не дублируй одно и то же разными словами)",
+    "Не повторяй информацию из salary_fit здесь"
+  ],
+
+  "verdict": "Mismatch | Low | Medium | High",
+
+  "priority": "top | strong | basic",
+
+  "one_liner": "ОДНО предложение (максимум 20 слов): почему ЭТОТ кандидат и чем он ОТЛИЧАЕТСЯ. Конкретика: цифры, компании, достижения. Пример: 'WB 3 года, вырастила оборот с 2М до 12М — лучший опыт среди откликнувшихся'",
+
+  "reasoning_for_hr": "Развёрнутое объяснение для HR (3-5 предложений). Включи: 1) Главное преимущество, 2) Релевантный опыт с конкретикой, 3) Основные риски. Пиши полными предложениями БЕЗ ОБРЫВОВ.",
+
+  "interview_questions": [
+    {
+      "question": "ПЕРСОНАЛИЗИРОВАННЫЙ вопрос именно для ЭТОГО кандидата, основанный на его конкретных пробелах или сомнениях из резюме. НЕ общие вопросы типа 'расскажите о себе'",
+      "checks": "Конкретно что выясняем: 'Реальный ли опыт с WB или только упоминание в резюме'"
+    }
+  ],
+
+  "salary_fit": {
+    "status": "в вилке | выше на X% | ниже | не указано",
+    "comment": "краткий комментарий (НЕ дублируй в concerns)"
+  }
+}
+
+⚠️ ПРАВИЛА ПРИОРИТЕТА (priority):
+- "top" = ВСЕ must-haves подтверждены (yes) + есть ИЗМЕРИМЫЕ достижения (цифры роста/выручки) + карьера растёт
+- "strong" = ВСЕ must-haves подтверждены + хороший релевантный опыт, но без wow-достижений
+- "basic" = must-haves есть, но некоторые "maybe" ИЛИ есть существенные concerns
+
+⚠️ ПРАВИЛА КАЧЕСТВА:
+1. one_liner — ОДНО короткое предложение с КОНКРЕТИКОЙ (цифры, компании). НЕ общие слова типа "хороший опыт"
+2. НЕ дублируй информацию между полями
+3. strengths — ДОСТИЖЕНИЯ с цифрами, а не "работал в компании X"
+4. interview_questions — ПЕРСОНАЛИЗИРОВАННЫЕ под пробелы этого кандидата
+
+⚠️ ЖЕЛЕЗНОЕ ПРАВИЛО: Если любой must_have имеет status="no" → verdict="Mismatch", priority="basic"."""
+
+CANDIDATE_INSTRUCTION = "Оцени этого кандидата строго по порядку анализа и верни JSON в указанном формате."
+
+# Системные префиксы собираются один раз - побайтно одинаковы во всех запросах процесса
+_SYSTEM_PREFIX_PROFILE = "\n\n".join([SYSTEM_JSON_INSTRUCTION, RULES, RESPONSE_SCHEMA.replace("<<VACANCY_ANALYSIS>>", "")])
+_SYSTEM_PREFIX_INLINE = "\n\n".join([SYSTEM_JSON_INSTRUCTION, RULES, RESPONSE_SCHEMA.replace("<<VACANCY_ANALYSIS>>", INLINE_VACANCY_SCHEMA)])
+
+
+class AnalysisPromptBuilder:
+    """
+    Сборка сообщений для анализа резюме и анализа вакансии
+
+    build_messages() возвращает [system, vacancy, candidate]: первые два сообщения
+    зависят только от вакансии и её профиля, поэтому совпадают у всех кандидатов
+    """
+
+    def system_prefix(self, vacancy_profile: Optional[Dict] = None) -> str:
+        """Правила и схема ответа - неизменная часть промпта"""
+        return _SYSTEM_PREFIX_PROFILE if vacancy_profile else _SYSTEM_PREFIX_INLINE
+
+    def vacancy_details(self, vacancy: Dict) -> str:
+        """Блок с данными вакансии"""
+        v_skills = ', '.join(vacancy.get('key_skills') or []) or 'Не указаны'
+        v_description = vacancy.get('description', '')[:1200] if vacancy.get('description') else ''
+        sal_from = vacancy.get('salary_from', 0) or 0
+        sal_to = vacancy.get('salary_to', 0) or 0
+        # Как в отпечатке вакансии (fingerprint._name): из справочного объекта HH только название
+        area = vacancy.get('area')
+        v_area = (area.get('name') if isinstance(area, dict) else area) or '?'
+
+        return f"""# ВАКАНСИЯ
+
+**Позиция:** {vacancy.get('title', '?')}
+**Локация:** {v_area}
+**Зарплата:** {sal_from} - {sal_to} RUB gross
+
+**Требования:**
+{v_skills}
+
+**Описание:**
+{v_description}"""
+
+    def vacancy_block(self, vacancy: Dict, vacancy_profile: Optional[Dict] = None) -> str:
+        """Шаг 1 и вакансия - одинаковы для всех кандидатов вакансии"""
+        step1_text = self.format_vacancy_profile(vacancy_profile) if vacancy_profile else INLINE_VACANCY_STEP
+        return f"{step1_text}\n\n---\n\n{self.vacancy_details(vacancy)}"
+
+    def format_vacancy_profile(self, profile: Dict) -> str:
+        """Шаг 1: зафиксированный анализ вакансии"""
+        must_haves = "\n".join(
+            f"{i}. {requirement}" for i, requirement in enumerate(profile.get("must_haves", []), 1)
+        ) or "Не выделены — оценивай по описанию вакансии"
+
+        return f"""## ШАГ 1: ТРЕБОВАНИЯ ВАКАНСИИ (уже определены)
+
+Анализ вакансии выполнен заранее и одинаков для всех кандидатов:
+- Тип работы: {profile.get('position_type', '?')}
+- Специфика ниши: {profile.get('niche_specifics', '?')}
+- Критично для успеха: {profile.get('what_critical', '?')}
+- Можно освоить: {profile.get('what_learnable', '?')}
+
+MUST-HAVE требования (проверяй ТОЛЬКО их, в этом порядке, формулировки в ответе не меняй):
+{must_haves}"""
+
+    def candidate_block(self, resume: Dict) -> str:
+        """Данные кандидата - единственная изменяемая часть"""
+        if isinstance(resume, str):
+            resume = json.loads(resume) if resume else {}
+
+        # Опыт работы
+        exp_list = resume.get('experience', [])
+        work_history = ""
+        for i, exp in enumerate(exp_list[:5]):
+            if isinstance(exp, dict):
+                company_raw = exp.get('company', '?')
+                company = company_raw.get('name', '?') if isinstance(company_raw, dict) else (company_raw or '?')
+                pos = exp.get('position', '?')
+                desc = exp.get('description', '') or ''
+                start = exp.get('start')
+                end = exp.get('end')
+                if isinstance(start, dict):
+                    period_start = f"{start.get('month', '')}/{start.get('year', '')}"
+                elif isinstance(start, str):
+                    period_start = start[:7] if len(start) >= 7 else start
+                else:
+                    period_start = '?'
+                if isinstance(end, dict):
+                    period_end = f"{end.get('month', '')}/{end.get('year', '')}"
+                elif isinstance(end, str):
+                    period_end = end[:7] if len(end) >= 7 else end
+                else:
+                    period_end = 'н.в.'
+                period = f"{period_start} - {period_end}"
+                work_history += f"\n### {company} | {pos} | {period}\n{desc}\n"
+
+        # Навыки (список)
+        skills = []
+        for s in resume.get('skill_set', []):
+            skills.append(s.get('name', '') if isinstance(s, dict) else s)
+        skills_text = ', '.join(skills) or 'Не указаны'
+
+        # Зарплата кандидата (NET → GROSS)
+        salary_data = resume.get('salary')
+        salary = salary_data.get('amount', 0) if isinstance(salary_data, dict) else 0
+        salary_gross = int(salary * 1.15) if salary else 0
+
+        # Общий опыт
+        exp_data = resume.get('total_experience')
+        months = exp_data.get('months', 0) if isinstance(exp_data, dict) else 0
+        months = months or 0
+        years, rem = months // 12, months % 12
+
+        # Локация кандидата
+        candidate_area = resume.get('area', {})
+        candidate_city = candidate_area.get('name', '?') if isinstance(candidate_area, dict) else str(candidate_area or '?')
+
+        # Готовность к переезду
+        relocation = resume.get('relocation', {})
+        relocation_ready = relocation.get('type', {}).get('id', '') if isinstance(relocation, dict) else ''
+        relocation_text = "готов к переезду" if relocation_ready == 'relocation_possible' else "не готов к переезду"
+
+        # Сопроводительное письмо
+        cover = resume.get('cover_letter', '') or resume.get('message', '') or 'Не указано'
+
+        return f"""# КАНДИДАТ
+
+**{resume.get('first_name', '')} {resume.get('last_name', '')}**
+Желаемая позиция: {resume.get('title', '?')}
+Локация: {candidate_city} | {relocation_text}
+Общий опыт: {years} лет {rem} мес
+Ожидания по зарплате: {salary_gross} RUB gross
+
+**Навыки (заявленные):**
+{skills_text}
+
+**Опыт работы:**
+{work_history or 'Не указан'}
+
+**Сопроводительное письмо:**
+{cover}
+
+---
+
+{CANDIDATE_INSTRUCTION}"""
+
+    def build_messages(
+        self,
+        vacancy: Dict,
+        resume: Dict,
+        vacancy_profile: Optional[Dict] = None
+    ) -> List[Dict[str, str]]:
+        """Сообщения для анализа резюме: стабильный префикс + блок кандидата"""
+        return [
+            {"role": "system", "content": self.system_prefix(vacancy_profile)},
+            {"role": "user", "content": self.vacancy_block(vacancy, vacancy_profile)},
+            {"role": "user", "content": self.candidate_block(resume)},
+        ]
+
+    def build_vacancy_profile_prompt(self, vacancy: Dict) -> str:
+        """Промпт анализа вакансии (шаг 1 v7, вынесенный в отдельный запрос)"""
+        return f"""# РОЛЬ
+
+Ты — Senior Recruiter с 15-летним опытом найма. Твоя задача — понять, КАКОЙ человек нужен на эту позицию.
+Результат будет использован для оценки ВСЕХ кандидатов на вакансию, поэтому требования должны быть точными и проверяемыми по резюме.
+
+{INLINE_VACANCY_STEP}
+
+---
+
+{self.vacancy_details(vacancy)}
+
+---
+
+# ФОРМАТ ОТВЕТА (только валидный JSON)
+
+{{
+  "position_type": "operations | growth | launch",
+  "niche_specifics": "краткое описание специфики ниши",
+  "what_critical": "что критично для успеха",
+  "what_learnable": "что можно освоить",
+  "must_haves": [
+    "формулировка требования (2-4 штуки, только реальные стоп-факторы)"
+  ]
+}}"""
+
+
+def cached_prompt_tokens(usage: Any) -> int:
+    """Количество токенов префикса, взятых из кеша OpenAI (usage.prompt_tokens_details)"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    if details is None:
+        return 0
+    if isinstance(details, dict):
+        return int(details.get("cached_tokens") or 0)
+    return int(getattr(details, "cached_tokens", 0) or 0)
@@ -3,16 +3,19 @@
 Интеграция с HH.ru API и AI анализом
 """
 import logging
+import uuid
 from datetime import datetime
-from typing import Dict, Any, List, Optional
-from sqlalchemy.orm import Session
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.user import User
 from app.models.vacancy import Vacancy
 from app.models.resume_search import ResumeSearch, SearchCandidate, SearchStatus
 from app.services.hh_client import HHClient
 from app.services.ai_analyzer import AIAnalyzer
-from app.services.encryption import token_encryption
+from app.services.hh_client_pool import get_hh_client_pool
+from app.services.hh_dictionary_service import get_hh_dictionary_service
 from app.utils.exceptions import HHIntegrationError, AIAnalysisError
 
 logger = logging.getLogger(__name__)
@@ -23,20 +26,24 @@ class ResumeSearchService:
     Сервис для поиска и анализа резюме из базы HH.ru
     """
 
-    def __init__(self, db: Session, user: User):
+    def __init__(self, db: AsyncSession, user: User):
         self.db = db
         self.user = user
         self._hh_client: Optional[HHClient] = None
         self._ai_analyzer: Optional[AIAnalyzer] = None
 
     async def _get_hh_client(self) -> HHClient:
-        """Получение HH клиента с токеном пользователя"""
+        """
+        HH клиент пользователя из пула процесса
+
+        Клиент переиспользуется между запросами (подсказки регионов идут на каждый ввод)
+        и закрывается пулом, а не сервисом
+        """
         if self._hh_client is None:
             if not self.user.has_hh_token:
                 raise HHIntegrationError("HH.ru токен не настроен. Добавьте токен в настройках.")
 
-            decrypted_token = token_encryption.decrypt(self.user.encrypted_hh_token)
-            self._hh_client = HHClient(decrypted_token)
+            self._hh_client = get_hh_client_pool().get_client(self.user.id, self.user.encrypted_hh_token)
 
         return self._hh_client
 
@@ -62,84 +69,39 @@ class ResumeSearchService:
             search.status = SearchStatus.RUNNING
             search.last_run_at = datetime.utcnow()
             search.error_message = None
-            self.db.commit()
+            await self.db.commit()
 
             # Получаем HH клиент
             hh_client = await self._get_hh_client()
 
-            # Формируем параметры поиска из фильтров
-            filters = search.filters or {}
-
             # Выполняем поиск
             logger.info(f"Запуск поиска '{search.name}': query='{search.search_query}'")
 
-            all_resumes = []
-            page = 0
-            per_page = min(50, max_results)  # API ограничение
-
-            while len(all_resumes) < max_results:
-                result = await hh_client.search_resumes(
-                    text=search.search_query,
-                    area=filters.get("area"),
-                    experience=filters.get("experience"),
-                    salary_from=filters.get("salary_from"),
-                    salary_to=filters.get("salary_to"),
-                    age_from=filters.get("age_from"),
-                    age_to=filters.get("age_to"),
-                    gender=filters.get("gender"),
-                    education_level=filters.get("education_level"),
-                    job_search_status=filters.get("job_search_status"),
-                    relocation=filters.get("relocation"),
-                    page=page,
-                    per_page=per_page
-                )
-
-                items = result.get("items", [])
-                if not items:
-                    break
-
-                all_resumes.extend(items)
-                search.total_found = result.get("found", 0)
-
-                # Проверяем, есть ли ещё страницы
-                total_pages = result.get("pages", 1)
-                if page >= total_pages - 1:
-                    break
-
-                page += 1
-
-            # Ограничиваем количество результатов
-            all_resumes = all_resumes[:max_results]
+            filters = search.filters or {}
+            result = await hh_client.search_resumes_all(
+                max_results=max_results,
+                text=search.search_query,
+                area=filters.get("area"),
+                experience=filters.get("experience"),
+                salary_from=filters.get("salary_from"),
+                salary_to=filters.get("salary_to"),
+                age_from=filters.get("age_from"),
+                age_to=filters.get("age_to"),
+                gender=filters.get("gender"),
+                education_level=filters.get("education_level"),
+                job_search_status=filters.get("job_search_status"),
+                relocation=filters.get("relocation")
+            )
+            search.total_found = result["found"]
+            all_resumes = result["items"]
 
             # Сохраняем кандидатов в БД
-            new_count = 0
-            updated_count = 0
-
-            for resume_item in all_resumes:
-                hh_resume_id = resume_item.get("id")
-                if not hh_resume_id:
-                    continue
-
-                # Проверяем, есть ли уже этот кандидат
-                existing = self.db.query(SearchCandidate).filter(
-                    SearchCandidate.search_id == search.id,
-                    SearchCandidate.hh_resume_id == hh_resume_id
-                ).first()
-
-                if existing:
-                    # Обновляем данные
-                    self._update_candidate_from_resume(existing, resume_item)
-                    updated_count += 1
-                else:
-                    # Создаём нового кандидата
-                    candidate = self._create_candidate_from_resume(search.id, resume_item)
-                    self.db.add(candidate)
-                    new_count += 1
+            new_count, updated_count = await self._save_candidates(search.id, all_resumes)
 
             # Обновляем статистику поиска
             search.processed_count = len(all_resumes)
             search.status = SearchStatus.COMPLETED
-            self.db.commit()
+            await self.db.commit()
 
             logger.info(f"Поиск '{search.name}' завершён: найдено {search.total_found}, загружено {len(all_resumes)} (новых: {new_count}, обновлено: {updated_count})")
 
@@ -155,14 +117,70 @@ class ResumeSearchService:
             logger.error(f"Ошибка поиска '{search.name}': {e}")
             search.status = SearchStatus.FAILED
             search.error_message = str(e)
-            self.db.commit()
+            await self.db.commit()
             raise
 
-    def _create_candidate_from_resume(self, search_id: str, resume_data: Dict) -> SearchCandidate:
-        """Создание кандидата из данных резюме"""
-        # Извлекаем данные из резюме
+    async def _save_candidates(self, search_id, resumes: List[Dict]) -> Tuple[int, int]:
+        """
+        Пакетное сохранение кандидатов поиска
+
+        Существующие кандидаты поиска загружаются одним запросом, новые вставляются
+        и существующие обновляются пакетом. Поля AI анализа и заметки рекрутера не меняются
+
+        Returns:
+            Tuple[int, int]: (новых, обновлено)
+        """
+        existing = dict((await self.db.execute(
+            select(SearchCandidate.hh_resume_id, SearchCandidate.id).where(
+                SearchCandidate.search_id == search_id
+            )
+        )).all())
+
+        new_rows: Dict[str, Dict[str, Any]] = {}
+        update_rows: Dict[str, Dict[str, Any]] = {}
+        for resume_item in resumes:
+            hh_resume_id = resume_item.get("id")
+            if not hh_resume_id or hh_resume_id in new_rows or hh_resume_id in update_rows:
+                continue
+
+            if hh_resume_id in existing:
+                update_rows[hh_resume_id] = {
+                    "id": existing[hh_resume_id],
+                    **self._candidate_values(resume_item, for_update=True)
+                }
+            else:
+                new_rows[hh_resume_id] = {
+                    "id": uuid.uuid4(),
+                    "search_id": search_id,
+                    **self._candidate_values(resume_item)
+                }
+
+        if new_rows:
+            await self.db.execute(insert(SearchCandidate), list(new_rows.values()))
+        if update_rows:
+            # Пакетный UPDATE по первичному ключу
+            await self.db.execute(update(SearchCandidate), list(update_rows.values()))
+
+        return len(new_rows), len(update_rows)
+
+    @staticmethod
+    def _candidate_values(resume_data: Dict, for_update: bool = False) -> Dict[str, Any]:
+        """Поля кандидата из данных резюме (for_update - только обновляемые при повторном поиске)"""
         salary_data = resume_data.get("salary", {}) or {}
         area_data = resume_data.get("area", {}) or {}
+
+        values = {
+            "first_name": resume_data.get("first_name"),
+            "last_name": resume_data.get("last_name"),
+            "title": resume_data.get("title"),
+            "age": resume_data.get("age"),
+            "area": area_data.get("name") if isinstance(area_data, dict) else None,
+            "salary": salary_data.get("amount") if isinstance(salary_data, dict) else None,
+            "resume_data": resume_data
+        }
+        if for_update:
+            return values
+
         experience_data = resume_data.get("total_experience", {}) or {}
 
         # Получаем навыки
@@ -173,37 +191,15 @@ class ResumeSearchService:
             elif isinstance(skill, dict):
                 skills.append(skill.get("name", ""))
 
-        candidate = SearchCandidate(
-            search_id=search_id,
-            hh_resume_id=resume_data.get("id"),
-            first_name=resume_data.get("first_name"),
-            last_name=resume_data.get("last_name"),
-            middle_name=resume_data.get("middle_name"),
-            title=resume_data.get("title"),
-            age=resume_data.get("age"),
-            gender=resume_data.get("gender", {}).get("id") if isinstance(resume_data.get("gender"), dict) else None,
-            area=area_data.get("name") if isinstance(area_data, dict) else None,
-            salary=salary_data.get("amount") if isinstance(salary_data, dict) else None,
-            currency=salary_data.get("currency", "RUB") if isinstance(salary_data, dict) else "RUB",
-            experience_years=experience_data.get("months") if isinstance(experience_data, dict) else None,
-            skills=skills,
-            resume_data=resume_data
-        )
-
-        return candidate
-
-    def _update_candidate_from_resume(self, candidate: SearchCandidate, resume_data: Dict):
-        """Обновление данных кандидата"""
-        salary_data = resume_data.get("salary", {}) or {}
-        area_data = resume_data.get("area", {}) or {}
-
-        candidate.first_name = resume_data.get("first_name")
-        candidate.last_name = resume_data.get("last_name")
-        candidate.title = resume_data.get("title")
-        candidate.age = resume_data.get("age")
-        candidate.area = area_data.get("name") if isinstance(area_data, dict) else None
-        candidate.salary = salary_data.get("amount") if isinstance(salary_data, dict) else None
-        candidate.resume_data = resume_data
+        values.update({
+            "hh_resume_id": resume_data.get("id"),
+            "middle_name": resume_data.get("middle_name"),
+            "gender": resume_data.get("gender", {}).get("id") if isinstance(resume_data.get("gender"), dict) else None,
+            "currency": salary_data.get("currency", "RUB") if isinstance(salary_data, dict) else "RUB",
+            "experience_years": experience_data.get("months") if isinstance(experience_data, dict) else None,
+            "skills": skills
+        })
+        return values
 
     async def analyze_candidates(
         self,
@@ -225,22 +221,22 @@ class ResumeSearchService:
         try:
             # Обновляем статус
             search.status = SearchStatus.ANALYZING
-            self.db.commit()
+            await self.db.commit()
 
             # Получаем кандидатов для анализа
-            query = self.db.query(SearchCandidate).filter(SearchCandidate.search_id == search.id)
+            query = select(SearchCandidate).where(SearchCandidate.search_id == search.id)
 
             if candidate_ids:
-                query = query.filter(SearchCandidate.id.in_(candidate_ids))
+                query = query.where(SearchCandidate.id.in_(candidate_ids))
 
             if not force_reanalysis:
-                query = query.filter(SearchCandidate.is_analyzed == False)
+                query = query.where(SearchCandidate.is_analyzed == False)
 
-            candidates = query.all()
+            candidates = (await self.db.scalars(query)).all()
 
             if not candidates:
                 search.status = SearchStatus.DONE
-                self.db.commit()
+                await self.db.commit()
                 return {
                     "status": "completed",
                     "analyzed_count": 0,
@@ -250,7 +246,7 @@ class ResumeSearchService:
             # Получаем данные вакансии для контекста (если есть)
             vacancy_data = None
             if search.vacancy_id:
-                vacancy = self.db.query(Vacancy).filter(Vacancy.id == search.vacancy_id).first()
+                vacancy = await self.db.get(Vacancy, search.vacancy_id)
                 if vacancy:
                     vacancy_data = {
                         "title": vacancy.title,
@@ -296,7 +292,7 @@ class ResumeSearchService:
                     analyzed_count += 1
                     search.analyzed_count = analyzed_count
 
-                    self.db.commit()
+                    await self.db.commit()
 
                 except Exception as e:
                     logger.error(f"Ошибка анализа кандидата {candidate.id}: {e}")
@@ -304,7 +300,7 @@ class ResumeSearchService:
 
             # Обновляем статус поиска
             search.status = SearchStatus.DONE
-            self.db.commit()
+            await self.db.commit()
 
             logger.info(f"Анализ '{search.name}' завершён: проанализировано {analyzed_count}, ошибок {errors_count}")
 
@@ -318,19 +314,24 @@ class ResumeSearchService:
             logger.error(f"Ошибка анализа кандидатов '{search.name}': {e}")
             search.status = SearchStatus.FAILED
             search.error_message = str(e)
-            self.db.commit()
+            await self.db.commit()
             raise
 
     async def get_dictionaries(self) -> Dict[str, Any]:
-        """Получение справочников для фильтров поиска"""
+        """Получение справочников для фильтров поиска (кеш процесса)"""
         try:
             hh_client = await self._get_hh_client()
-            return await hh_client.get_resume_search_dictionaries()
+            return await get_hh_dictionary_service().get_dictionaries(hh_client)
         except Exception as e:
             logger.error(f"Ошибка получения справочников: {e}")
             # Возвращаем базовые справочники
             return self._get_default_dictionaries()
 
+    async def suggest_areas(self, query: str, limit: int = 10, parent_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Подсказки регионов по началу названия"""
+        hh_client = await self._get_hh_client()
+        return await get_hh_dictionary_service().suggest_areas(hh_client, query, limit=limit, parent_id=parent_id)
+
     def _get_default_dictionaries(self) -> Dict[str, Any]:
         """Справочники по умолчанию"""
         return {
@@ -381,8 +382,3 @@ class ResumeSearchService:
                 {"id": "104", "name": "Краснодар", "parent_id": None}
             ]
         }
-
-    async def close(self):
-        """Закрытие соединений"""
-        if self._hh_client:
-            await self._hh_client.close()
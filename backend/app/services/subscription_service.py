@@ -2,8 +2,9 @@
 Сервис управления подписками и тарификацией
 Проверка лимитов, обновление подписок, логирование использования
 """
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import Optional, Tuple, List, Dict, Any
 from datetime import datetime, timedelta
 import uuid
@@ -20,29 +21,44 @@ from app.utils.exceptions import ValidationError
 class SubscriptionService:
     """Сервис для работы с подписками"""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
+    @staticmethod
+    def _subscriptions():
+        """Запрос подписок вместе с тарифным планом (ленивая загрузка в async сессии недоступна)"""
+        return select(Subscription).options(selectinload(Subscription.plan))
+
+    async def _reload(self, subscription: Subscription) -> Subscription:
+        """Перечитать подписку после commit: серверные значения по умолчанию и план"""
+        return await self.db.scalar(
+            self._subscriptions()
+            .where(Subscription.id == subscription.id)
+            .execution_options(populate_existing=True)
+        )
+
     async def get_or_create_subscription(self, user_id: uuid.UUID) -> Subscription:
         """
         Получить активную подписку пользователя или создать бесплатную
         """
         # Ищем активную подписку
-        subscription = self.db.query(Subscription).filter(
-            Subscription.user_id == user_id,
-            Subscription.status.in_([SubscriptionStatus.active, SubscriptionStatus.trial])
-        ).first()
+        subscription = await self.db.scalar(
+            self._subscriptions().where(
+                Subscription.user_id == user_id,
+                Subscription.status.in_([SubscriptionStatus.active, SubscriptionStatus.trial])
+            ).limit(1)
+        )
 
         if subscription:
             # Проверяем необходимость сброса месячных лимитов
             if subscription.should_reset_monthly_usage():
                 subscription.reset_monthly_usage()
-                self.db.commit()
+                await self.db.commit()
 
             # Проверяем не истекла ли подписка
             if subscription.expires_at and datetime.utcnow() > subscription.expires_at:
                 subscription.status = SubscriptionStatus.expired
-                self.db.commit()
+                await self.db.commit()
                 # Создаём новую бесплатную подписку
                 return await self._create_free_subscription(user_id)
 
@@ -54,9 +70,9 @@ class SubscriptionService:
     async def _create_free_subscription(self, user_id: uuid.UUID) -> Subscription:
         """Создание бесплатной подписки для пользователя"""
         # Получаем бесплатный план
-        free_plan = self.db.query(SubscriptionPlan).filter(
-            SubscriptionPlan.plan_type == PlanType.free
-        ).first()
+        free_plan = await self.db.scalar(
+            select(SubscriptionPlan).where(SubscriptionPlan.plan_type == PlanType.free).limit(1)
+        )
 
         if not free_plan:
             raise ValidationError("Бесплатный тарифный план не найден в системе")
@@ -71,10 +87,9 @@ class SubscriptionService:
         )
 
         self.db.add(subscription)
-        self.db.commit()
-        self.db.refresh(subscription)
+        await self.db.commit()
 
-        return subscription
+        return await self._reload(subscription)
 
     async def check_can_analyze(self, user_id: uuid.UUID) -> Tuple[bool, Optional[str]]:
         """
@@ -102,10 +117,12 @@ class SubscriptionService:
         subscription = await self.get_or_create_subscription(user_id)
 
         # Считаем активные вакансии пользователя
-        active_count = self.db.query(func.count(Vacancy.id)).filter(
-            Vacancy.user_id == user_id,
-            Vacancy.is_active == True
-        ).scalar()
+        active_count = await self.db.scalar(
+            select(func.count(Vacancy.id)).where(
+                Vacancy.user_id == user_id,
+                Vacancy.is_active == True
+            )
+        )
 
         if active_count >= subscription.plan.max_active_vacancies:
             return False, f"Достигнут лимит активных вакансий ({subscription.plan.max_active_vacancies})"
@@ -122,7 +139,7 @@ class SubscriptionService:
         subscription = await self.get_or_create_subscription(user_id)
 
         subscription.analyses_used_this_month += 1
-        self.db.commit()
+        await self.db.commit()
 
         # Логируем использование
         await self._log_usage(
@@ -143,7 +160,7 @@ class SubscriptionService:
         subscription = await self.get_or_create_subscription(user_id)
 
         subscription.exports_used_this_month += 1
-        self.db.commit()
+        await self.db.commit()
 
         # Логируем использование
         await self._log_usage(
@@ -174,20 +191,25 @@ class SubscriptionService:
         )
 
         self.db.add(log_entry)
-        self.db.commit()
+        await self.db.commit()
 
     async def get_all_plans(self) -> List[SubscriptionPlan]:
         """Получить все активные тарифные планы"""
-        return self.db.query(SubscriptionPlan).filter(
-            SubscriptionPlan.is_active == True
-        ).order_by(SubscriptionPlan.display_order).all()
+        result = await self.db.scalars(
+            select(SubscriptionPlan).where(
+                SubscriptionPlan.is_active == True
+            ).order_by(SubscriptionPlan.display_order)
+        )
+        return list(result)
 
     async def get_plan_by_type(self, plan_type: PlanType) -> Optional[SubscriptionPlan]:
         """Получить тарифный план по типу"""
-        return self.db.query(SubscriptionPlan).filter(
-            SubscriptionPlan.plan_type == plan_type,
-            SubscriptionPlan.is_active == True
-        ).first()
+        return await self.db.scalar(
+            select(SubscriptionPlan).where(
+                SubscriptionPlan.plan_type == plan_type,
+                SubscriptionPlan.is_active == True
+            ).limit(1)
+        )
 
     async def upgrade_subscription(
         self,
@@ -228,10 +250,9 @@ class SubscriptionService:
         )
 
         self.db.add(new_subscription)
-        self.db.commit()
-        self.db.refresh(new_subscription)
+        await self.db.commit()
 
-        return new_subscription
+        return await self._reload(new_subscription)
 
     async def get_usage_statistics(
         self,
@@ -247,10 +268,12 @@ class SubscriptionService:
         subscription = await self.get_or_create_subscription(user_id)
 
         # Получаем логи
-        logs = self.db.query(UsageLog).filter(
-            UsageLog.user_id == user_id,
-            UsageLog.created_at >= from_date
-        ).all()
+        logs = await self.db.scalars(
+            select(UsageLog).where(
+                UsageLog.user_id == user_id,
+                UsageLog.created_at >= from_date
+            )
+        )
 
         # Группируем по типу действия
         stats_by_action = {}
@@ -261,17 +284,19 @@ class SubscriptionService:
             stats_by_action[action_type] += 1
 
         # Получаем данные по дням для графика
-        daily_stats = self.db.query(
-            func.date(UsageLog.created_at).label('date'),
-            UsageLog.action_type,
-            func.count(UsageLog.id).label('count')
-        ).filter(
-            UsageLog.user_id == user_id,
-            UsageLog.created_at >= from_date
-        ).group_by(
-            func.date(UsageLog.created_at),
-            UsageLog.action_type
-        ).all()
+        daily_stats = await self.db.execute(
+            select(
+                func.date(UsageLog.created_at).label('date'),
+                UsageLog.action_type,
+                func.count(UsageLog.id).label('count')
+            ).where(
+                UsageLog.user_id == user_id,
+                UsageLog.created_at >= from_date
+            ).group_by(
+                func.date(UsageLog.created_at),
+                UsageLog.action_type
+            )
+        )
 
         daily_data = {}
         for stat in daily_stats:
@@ -0,0 +1,189 @@
+"""
+Локальная модель чтения вакансий и откликов (stale-while-revalidate)
+/api/vacancies отдаёт данные из синхронизированных таблиц, а не из HH.ru;
+устаревшие данные обновляет фоновая инкрементальная синхронизация
+"""
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+
+from fastapi import BackgroundTasks
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.application import Application, SyncJob
+from app.models.user import User
+from app.models.vacancy import Vacancy
+
+logger = logging.getLogger(__name__)
+
+# Задача pending/running старше этого считается зависшей и не блокирует обновление
+SYNC_JOB_STUCK_AFTER = timedelta(minutes=30)
+
+
+def refresh_if_stale(db: Session, user: User, background_tasks: BackgroundTasks) -> Dict[str, Any]:
+    """
+    Свежесть локальных данных пользователя и запуск фонового обновления
+
+    Данные устаревают через VACANCY_READ_MODEL_TTL секунд после последней успешной
+    синхронизации. Обновление не запускается, если синхронизация уже идёт или
+    запускалась позже чем TTL назад (в том числе неудачно) - HH.ru не опрашивается
+    на каждый просмотр страницы. Async endpoints вызывают функцию через
+    AsyncSession.run_sync - запросы не блокируют event loop
+
+    Args:
+        db: Сессия БД
+        user: Текущий пользователь
+        background_tasks: Фоновые задачи запроса
+
+    Returns:
+        Dict: meta ответа - source, synced_at, age_seconds, stale, refreshing, sync_job_id
+    """
+    now = datetime.utcnow()
+    ttl = timedelta(seconds=settings.VACANCY_READ_MODEL_TTL)
+
+    latest_job = db.query(SyncJob).filter(
+        SyncJob.user_id == user.id
+    ).order_by(SyncJob.created_at.desc()).first()
+
+    synced_at = None
+    if latest_job and latest_job.status == "completed":
+        synced_at = latest_job.completed_at
+    elif latest_job:
+        synced_at = db.query(SyncJob.completed_at).filter(
+            SyncJob.user_id == user.id,
+            SyncJob.status == "completed"
+        ).order_by(SyncJob.created_at.desc()).limit(1).scalar()
+
+    refreshing = bool(
+        latest_job
+        and latest_job.status in ("pending", "running")
+        and latest_job.created_at > now - SYNC_JOB_STUCK_AFTER
+    )
+    stale = synced_at is None or now - synced_at > ttl
+    recently_attempted = bool(latest_job and latest_job.created_at > now - ttl)
+
+    sync_job_id: Optional[str] = str(latest_job.id) if refreshing else None
+    if stale and not refreshing and not recently_attempted and user.has_hh_token:
+        sync_job_id = _start_refresh(db, user, background_tasks)
+        refreshing = sync_job_id is not None
+
+    return {
+        "source": "local",
+        "synced_at": synced_at.isoformat() if synced_at else None,
+        "age_seconds": int((now - synced_at).total_seconds()) if synced_at else None,
+        "stale": stale,
+        "refreshing": refreshing,
+        "sync_job_id": sync_job_id
+    }
+
+
+def _start_refresh(db: Session, user: User, background_tasks: BackgroundTasks) -> Optional[str]:
+    """Инкрементальная синхронизация в фоне после ответа"""
+    from app.workers.sync_jobs import run_vacancy_sync_background
+
+    try:
+        sync_job = SyncJob(
+            id=uuid.uuid4(),
+            user_id=user.id,
+            status="pending",
+            vacancies_synced=0,
+            applications_synced=0,
+            errors=[]
+        )
+        db.add(sync_job)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Не удалось запустить обновление вакансий пользователя {user.id}: {e}")
+        return None
+
+    background_tasks.add_task(run_vacancy_sync_background, user.id, sync_job.id, True, True, False)
+    logger.info(f"Данные вакансий пользователя {user.id} устарели, запущена синхронизация {sync_job.id}")
+    return str(sync_job.id)
+
+
+def vacancy_list_item(vacancy: Vacancy, company_name: Optional[str] = None) -> Dict[str, Any]:
+    """Вакансия в формате списка /api/vacancies (id - ID вакансии в HH.ru)"""
+    description = vacancy.description or ""
+    return {
+        "id": vacancy.hh_vacancy_id,
+        "hh_vacancy_id": vacancy.hh_vacancy_id,
+        "title": vacancy.title,
+        "description": description[:500] + "..." if len(description) > 500 else description,
+
+        # Навыки
+        "key_skills": vacancy.key_skills or [],
+
+        # Зарплата
+        "salary_from": vacancy.salary_from,
+        "salary_to": vacancy.salary_to,
+        "currency": vacancy.currency or "RUR",
+
+        # Параметры
+        "experience": vacancy.experience or None,
+        "employment": vacancy.employment or None,
+        "schedule": vacancy.schedule or None,
+        "area": vacancy.area or None,
+
+        # Статистика
+        "applications_count": vacancy.applications_count,
+        "new_applications_count": vacancy.new_applications_count,
+        "is_active": vacancy.is_active,
+
+        # Даты
+        "published_at": vacancy.published_at.isoformat() if vacancy.published_at else None,
+        "created_at": vacancy.created_at.isoformat() if vacancy.created_at else None,
+        "last_synced_at": vacancy.last_synced_at.isoformat() if vacancy.last_synced_at else None,
+
+        # Дополнительные поля
+        "url": f"https://hh.ru/vacancy/{vacancy.hh_vacancy_id}",
+        "employer": {
+            "name": company_name or "",
+            "url": ""
+        }
+    }
+
+
+def application_list_item(application: Application, hh_vacancy_id: str) -> Dict[str, Any]:
+    """Отклик в формате списка /api/vacancies/{id}/applications"""
+    resume = application.resume_data or {}
+    salary = resume.get("salary") or {}
+    return {
+        "id": application.hh_application_id,
+        "vacancy_id": hh_vacancy_id,
+        "hh_application_id": application.hh_application_id,
+        "hh_resume_id": application.hh_resume_id,
+
+        # Данные кандидата
+        "candidate_name": application.candidate_name,
+        "candidate_email": application.candidate_email,
+        "candidate_phone": application.candidate_phone,
+        "resume_url": application.resume_url,
+
+        # Информация о резюме
+        "resume_title": resume.get("title", ""),
+        "candidate_age": resume.get("age"),
+        "candidate_area": (resume.get("area") or {}).get("name"),
+        "experience_months": (resume.get("total_experience") or {}).get("months"),
+
+        # Зарплатные ожидания
+        "expected_salary": {
+            "amount": salary.get("amount"),
+            "currency": salary.get("currency", "RUR")
+        },
+
+        # Навыки
+        "skills": resume.get("skill_set", []),
+
+        # Статус
+        "is_duplicate": application.is_duplicate,
+        "analyzed_at": application.analyzed_at.isoformat() if application.analyzed_at else None,
+        "collection_id": application.collection_id,
+        "status": application.status,
+        "state": application.state or "",
+
+        # Даты
+        "created_at": application.created_at.isoformat() if application.created_at else None
+    }
@@ -0,0 +1,128 @@
+"""
+Keyset (курсорная) пагинация списков
+
+Контракт v2: клиент передаёт ?cursor= (пустое значение - первая страница) и получает
+pagination = {version, next_cursor, has_more, total, total_is_estimate}. Страница выбирается
+условием по ключу сортировки последней строки - без OFFSET и без COUNT на каждую страницу;
+total считается только по include_total или берётся из счётчика (total_is_estimate).
+
+Без cursor endpoint отвечает по контракту v1 (offset/page и точный total) - старые клиенты
+работают как раньше
+"""
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_
+
+from app.utils.exceptions import ValidationError
+
+PAGINATION_VERSION = 2
+
+
+@dataclass(frozen=True)
+class SortKey:
+    """Ключ сортировки: выражение ORDER BY и его значение в строке результата"""
+    expression: Any
+    value: Callable[[Any], Any]
+    descending: bool = False
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$dt" in value:
+        return datetime.fromisoformat(value["$dt"])
+    return value
+
+
+class Keyset:
+    """
+    Порядок списка для курсорной пагинации
+
+    Последний ключ должен быть уникальным (id), иначе строки с одинаковыми
+    значениями сортировки на границе страниц теряются. NULL в ключах не допускаются -
+    nullable колонки оборачиваются в coalesce
+    """
+
+    def __init__(self, name: str, *keys: SortKey):
+        self.name = name
+        self.keys = keys
+
+    def order_by(self) -> List[Any]:
+        """Выражения ORDER BY"""
+        return [key.expression.desc() if key.descending else key.expression.asc() for key in self.keys]
+
+    def decode(self, cursor: Optional[str]) -> Optional[List[Any]]:
+        """
+        Значения ключей из курсора (None - первая страница)
+
+        Raises:
+            ValidationError: Курсор повреждён или выдан для другой сортировки
+        """
+        if not cursor:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            values = [_decode_value(value) for value in payload["v"]]
+        except (ValueError, TypeError, KeyError):
+            raise ValidationError("Некорректный курсор страницы", {"cursor": cursor})
+        if payload.get("k") != self.name or len(values) != len(self.keys):
+            raise ValidationError("Курсор выдан для другой сортировки", {"cursor": cursor})
+        return values
+
+    def encode(self, row: Any) -> str:
+        """Курсор на строки после row"""
+        payload = {"k": self.name, "v": [_encode_value(key.value(row)) for key in self.keys]}
+        raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    def after(self, values: Sequence[Any]):
+        """Условие "строка идёт после values" для смешанных направлений сортировки"""
+        clauses = []
+        for position, key in enumerate(self.keys):
+            equal = [self.keys[i].expression == values[i] for i in range(position)]
+            beyond = key.expression < values[position] if key.descending else key.expression > values[position]
+            clauses.append(and_(*equal, beyond))
+        return or_(*clauses)
+
+    def apply(self, query, after: Optional[Sequence[Any]], limit: int):
+        """
+        Страница запроса (Select или Query): условие курсора, ORDER BY и limit + 1 строка
+        для определения has_more
+
+        after - значения из decode(); курсор декодируется до выполнения запроса,
+        чтобы повреждённый курсор возвращал 400, а не ошибку запроса
+        """
+        if after is not None:
+            query = query.filter(self.after(after))
+        return query.order_by(*self.order_by()).limit(limit + 1)
+
+    def page(self, rows: Sequence[Any], limit: int) -> Tuple[List[Any], Optional[str]]:
+        """Строки страницы и курсор следующей (None - страница последняя)"""
+        rows = list(rows)
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, self.encode(rows[-1])
+
+
+def cursor_pagination(
+    next_cursor: Optional[str],
+    total: Optional[int] = None,
+    total_is_estimate: bool = False
+) -> dict:
+    """Блок pagination ответа v2"""
+    return {
+        "version": PAGINATION_VERSION,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+        "total": total,
+        "total_is_estimate": total_is_estimate if total is not None else False
+    }
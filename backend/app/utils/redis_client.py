@@ -0,0 +1,41 @@
+"""
+Общие подключения к Redis
+Async клиент с пулом соединений на каждый event loop
+"""
+import asyncio
+import weakref
+import logging
+
+import redis.asyncio as aioredis
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Соединения redis.asyncio привязаны к event loop, в котором созданы.
+# Воркеры запускают новый loop на каждый пакет, поэтому клиент кешируется по loop.
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.Redis]" = weakref.WeakKeyDictionary()
+
+
+def get_async_redis() -> aioredis.Redis:
+    """
+    Получение async Redis клиента для текущего event loop
+
+    Подключение ленивое: первый запрос открывает соединение из пула,
+    конструктор ничего не блокирует
+
+    Returns:
+        aioredis.Redis: Клиент с пулом соединений
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = aioredis.Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_connect_timeout=2,
+            socket_timeout=2,
+            max_connections=50
+        )
+        _async_clients[loop] = client
+    return client
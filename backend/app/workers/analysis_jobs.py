@@ -4,16 +4,14 @@ RQ воркеры для анализа кандидатов
 """
 import asyncio
 import logging
-from typing import List, Dict, Any
-from datetime import datetime
-from sqlalchemy.orm import Session
-from rq import get_current_job
+from typing import List, Dict, Any, Optional
 
 from app.database import SessionLocal
-from app.services.ai_analyzer import AIAnalyzer
 from app.models.application import Application, AnalysisResult
 from app.models.vacancy import Vacancy
-from app.utils.exceptions import BackgroundJobError, AIAnalysisError
+from app.utils.exceptions import BackgroundJobError
+from app.workers.scheduler import get_scheduler
+from app.workers.analysis_pipeline import AnalysisPipeline
 
 logger = logging.getLogger(__name__)
 
@@ -21,289 +19,101 @@ logger = logging.getLogger(__name__)
 def run_ai_analysis_batch(
     application_ids: List[str],
     user_id: str,
-    force_reanalysis: bool = False
+    force_reanalysis: bool = False,
+    concurrency: Optional[int] = None
 ) -> Dict[str, Any]:
     """
-    Запуск AI анализа для пакета откликов (для BackgroundTasks)
+    Запуск AI анализа для пакета откликов в текущем процессе
+
+    Используется API как резерв, если планировщик (Redis) недоступен
+
+    Отклики анализируются параллельно через AnalysisPipeline:
+    одновременно выполняется до concurrency запросов к OpenAI,
+    без фиксированных пауз между резюме
 
     Args:
         application_ids: Список ID заявок для анализа
         user_id: ID пользователя
         force_reanalysis: Принудительный повторный анализ
+        concurrency: Лимит одновременных анализов (по умолчанию ANALYSIS_CONCURRENCY)
 
     Returns:
         Dict: Результат выполнения анализа
     """
-    # DEBUG: выводим в консоль для отладки
-    print(f"[DEBUG] run_ai_analysis_batch STARTED: {len(application_ids)} applications")
-    print(f"[DEBUG] user_id={user_id}, force_reanalysis={force_reanalysis}")
-
-    # Создаём новую сессию БД для фоновой задачи
-    db = SessionLocal()
-
     try:
         logger.info(f"Запуск пакетного анализа: {len(application_ids)} заявок для пользователя {user_id}")
-        print(f"[DEBUG] Logger info logged")
-
-        ai_analyzer = AIAnalyzer()
-        print(f"[DEBUG] AIAnalyzer created")
-
-        results = {
-            "processed_applications": 0,
-            "successful_analyses": 0,
-            "failed_analyses": 0,
-            "errors": []
-        }
-
-        # Создаём event loop для async операций
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        print(f"[DEBUG] Event loop created")
-
-        try:
-            import time as time_module
-            for i, application_id in enumerate(application_ids):
-                print(f"[DEBUG] Processing application {i+1}/{len(application_ids)}: {application_id}")
-                try:
-                    # Анализ одной заявки
-                    analysis_result = loop.run_until_complete(
-                        analyze_single_application_async(
-                            application_id,
-                            ai_analyzer,
-                            db,
-                            force_reanalysis
-                        )
-                    )
-
-                    print(f"[DEBUG] Analysis result: {analysis_result}")
-
-                    if analysis_result:
-                        results["successful_analyses"] += 1
-                        print(f"[DEBUG] Success! Total successful: {results['successful_analyses']}")
-                    else:
-                        results["failed_analyses"] += 1
-                        print(f"[DEBUG] Failed! Total failed: {results['failed_analyses']}")
-
-                    results["processed_applications"] += 1
-
-                    # Задержка между запросами для избежания rate limit (1 секунда)
-                    if i < len(application_ids) - 1:
-                        time_module.sleep(1)
-
-                except Exception as e:
-                    error_msg = f"Ошибка анализа заявки {application_id}: {e}"
-                    logger.error(error_msg)
-                    print(f"[DEBUG ERROR] {error_msg}")
-                    import traceback
-                    traceback.print_exc()
-                    results["errors"].append(error_msg)
-                    results["failed_analyses"] += 1
-                    # При ошибке тоже делаем паузу
-                    time_module.sleep(2)
-        finally:
-            loop.close()
-            print(f"[DEBUG] Event loop closed")
+
+        pipeline = AnalysisPipeline(
+            concurrency=concurrency,
+            force_reanalysis=force_reanalysis
+        )
+        results = asyncio.run(pipeline.run(application_ids))
 
         logger.info(f"Пакетный анализ завершен: {results}")
-        print(f"[DEBUG] BATCH ANALYSIS COMPLETED: {results}")
         return results
 
     except Exception as e:
-        logger.error(f"Критическая ошибка в пакетном анализе: {e}")
-        print(f"[DEBUG CRITICAL ERROR] {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error(f"Критическая ошибка в пакетном анализе: {e}", exc_info=True)
         raise BackgroundJobError(f"Анализ завершился с ошибкой: {e}")
 
-    finally:
-        db.close()
-
 
-def run_analysis_job(job_id: str, application_ids: List[str], user_id: str):
+def run_analysis_chunk(chunk_id: str) -> Dict[str, Any]:
     """
-    Выполнение AI анализа резюме
+    RQ задача AI анализа одного чанка пакета
+
+    Чанки передаются воркерам планировщиком (app.workers.scheduler).
+    Прирост счётчиков пишется в пакет и публикуется в SSE, после чанка
+    слот освобождается и планировщик передаёт следующий чанк
 
     Args:
-        job_id: ID фоновой задачи
-        application_ids: Список ID заявок для анализа
-        user_id: ID пользователя
+        chunk_id: ID чанка в планировщике
 
     Returns:
-        Dict: Результат выполнения анализа
+        Dict: Результат выполнения анализа чанка
     """
-    db = SessionLocal()
-    current_job = get_current_job()
+    scheduler = get_scheduler()
+    chunk = scheduler.get_chunk(chunk_id)
+    if not chunk:
+        logger.info(f"Чанк {chunk_id} пропущен: пакет отменён или истёк")
+        scheduler.release(chunk_id)
+        scheduler.dispatch()
+        return {}
+
+    batch_id = chunk["batch_id"]
+    counters = ("processed_applications", "successful_analyses", "failed_analyses", "skipped_analyses")
+    reported = {field: 0 for field in counters}
+    reported_errors = 0
+
+    def report_progress(snapshot: Dict[str, Any]):
+        nonlocal reported_errors
+        delta = {field: snapshot[field] - reported[field] for field in counters}
+        errors = snapshot["errors"][reported_errors:]
+        reported.update({field: snapshot[field] for field in counters})
+        reported_errors = len(snapshot["errors"])
+        scheduler.record_progress(batch_id, delta, errors, chunk_id=chunk_id)
 
     try:
-        logger.info(f"Запуск задачи анализа {job_id}: {len(application_ids)} заявок")
-
-        ai_analyzer = AIAnalyzer()
-        results = {
-            "processed_applications": 0,
-            "successful_analyses": 0,
-            "failed_analyses": 0,
-            "errors": []
-        }
-
-        for i, application_id in enumerate(application_ids):
-            try:
-                # Обновление прогресса задачи
-                if current_job:
-                    current_job.meta = {
-                        "progress": int((i / len(application_ids)) * 100),
-                        "current_application": i + 1,
-                        "total_applications": len(application_ids)
-                    }
-                    current_job.save_meta()
-
-                # Анализ одной заявки
-                analysis_result = analyze_single_application(
-                    application_id,
-                    ai_analyzer,
-                    db
-                )
-
-                if analysis_result:
-                    results["successful_analyses"] += 1
-                else:
-                    results["failed_analyses"] += 1
-
-                results["processed_applications"] += 1
-
-            except Exception as e:
-                error_msg = f"Ошибка анализа заявки {application_id}: {e}"
-                logger.error(error_msg)
-                results["errors"].append(error_msg)
-                results["failed_analyses"] += 1
-
-        # Финальное обновление прогресса
-        if current_job:
-            current_job.meta = {
-                "progress": 100,
-                "completed": True,
-                "results": results
-            }
-            current_job.save_meta()
+        scheduler.start_chunk(batch_id, chunk_id)
+        logger.info(f"Запуск чанка {chunk_id} пакета {batch_id}: {len(chunk['application_ids'])} заявок")
+
+        pipeline = AnalysisPipeline(
+            force_reanalysis=chunk["force_reanalysis"],
+            progress_callback=report_progress,
+            job_id=batch_id,
+            publish_progress=False
+        )
+        results = asyncio.run(pipeline.run(chunk["application_ids"]))
 
-        logger.info(f"Задача анализа {job_id} завершена: {results}")
+        logger.info(f"Чанк {chunk_id} пакета {batch_id} завершен: {results}")
         return results
 
     except Exception as e:
-        logger.error(f"Критическая ошибка в задаче анализа {job_id}: {e}")
-        raise BackgroundJobError(f"Анализ завершился с ошибкой: {e}", job_id=job_id)
+        logger.error(f"Критическая ошибка в чанке {chunk_id} пакета {batch_id}: {e}", exc_info=True)
+        raise BackgroundJobError(f"Анализ завершился с ошибкой: {e}", job_id=batch_id)
 
     finally:
-        db.close()
-
-
-async def analyze_single_application_async(
-    application_id: str,
-    ai_analyzer: AIAnalyzer,
-    db: Session,
-    force_reanalysis: bool = False
-) -> bool:
-    """
-    Анализ одной заявки
-
-    Args:
-        application_id: ID заявки
-        ai_analyzer: AI анализатор
-        db: Сессия БД
-        force_reanalysis: Принудительный повторный анализ
-
-    Returns:
-        bool: Успех анализа
-    """
-    try:
-        # Получение заявки с вакансией
-        application = db.query(Application).join(Vacancy).filter(
-            Application.id == application_id
-        ).first()
-
-        if not application:
-            logger.error(f"Заявка {application_id} не найдена")
-            return False
-
-        if not application.resume_data:
-            logger.warning(f"Отсутствуют данные резюме для заявки {application_id}")
-            return False
-
-        # Проверка существующего анализа
-        existing_analysis = db.query(AnalysisResult).filter(
-            AnalysisResult.application_id == application_id
-        ).first()
-
-        if existing_analysis and not force_reanalysis:
-            logger.info(f"Анализ для заявки {application_id} уже существует")
-            return True
-
-        if existing_analysis and force_reanalysis:
-            logger.info(f"Принудительный повторный анализ для заявки {application_id}")
-            db.delete(existing_analysis)
-            db.commit()
-
-        # Подготовка данных для анализа
-        vacancy_data = {
-            "title": application.vacancy.title,
-            "description": application.vacancy.description,
-            "key_skills": application.vacancy.key_skills,
-            "experience": application.vacancy.experience,
-            "salary_from": application.vacancy.salary_from,
-            "salary_to": application.vacancy.salary_to,
-            "currency": application.vacancy.currency
-        }
-
-        # Выполнение AI анализа
-        ai_result = await ai_analyzer.analyze_resume(
-            vacancy_data,
-            application.resume_data
-        )
-
-        # Проверка результата анализа
-        if not ai_result:
-            logger.error(f"AI анализ вернул пустой результат для заявки {application_id}")
-            return False
-
-        # Сохранение результата анализа
-        analysis_result = AnalysisResult(
-            application_id=application_id,
-            score=ai_result.get("score"),
-            skills_match=ai_result.get("skills_match"),
-            experience_match=ai_result.get("experience_match"),
-            salary_match=ai_result.get("salary_match"),
-            strengths=ai_result.get("strengths", []),
-            weaknesses=ai_result.get("weaknesses", []),
-            red_flags=ai_result.get("red_flags", []),
-            recommendation=ai_result.get("recommendation"),
-            reasoning=ai_result.get("reasoning"),
-            ai_model=ai_result.get("ai_model"),
-            ai_tokens_used=ai_result.get("ai_tokens_used"),
-            ai_cost_rub=ai_result.get("ai_cost_rub"),
-            processing_time_ms=ai_result.get("processing_time_ms"),
-            raw_result=ai_result  # Сохраняем полный JSON для новых полей
-        )
-
-        db.add(analysis_result)
-
-        # Обновление времени анализа в заявке
-        application.analyzed_at = datetime.utcnow()
-
-        db.commit()
-
-        logger.info(
-            f"Анализ заявки {application_id} завершен: "
-            f"оценка {ai_result.get('score')}, "
-            f"рекомендация {ai_result.get('recommendation')}"
-        )
-
-        return True
-
-    except AIAnalysisError as e:
-        logger.error(f"Ошибка AI анализа для заявки {application_id}: {e}")
-        return False
-    except Exception as e:
-        logger.error(f"Неожиданная ошибка анализа заявки {application_id}: {e}")
-        return False
+        scheduler.release(chunk_id)
+        scheduler.dispatch()
 
 
 def generate_excel_export(export_job_id: str, export_config: Dict[str, Any], user_id: str):
@@ -0,0 +1,476 @@
+"""
+Конвейер параллельного AI анализа откликов
+N одновременных запросов к OpenAI, общий AIAnalyzer и единый путь записи в БД
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple, Callable
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services.ai_analyzer import AIAnalyzer
+from app.services.analysis_cache import get_analysis_cache
+from app.services.analysis_singleflight import get_analysis_singleflight
+from app.services.analysis_events import AnalysisEventPublisher, result_summary
+from app.models.application import Application, AnalysisResult, AnalysisState
+from app.models.vacancy import Vacancy
+from app.utils.exceptions import AIAnalysisError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AnalysisTask:
+    """Подготовленные данные для анализа одного отклика"""
+    application_id: str
+    vacancy_id: str
+    vacancy_data: Dict[str, Any]
+    resume_data: Dict[str, Any]
+    vacancy_profile: Dict[str, Any] = field(default_factory=dict)
+    candidate_name: Optional[str] = None
+    # Результат, который был у отклика до анализа (force_reanalysis)
+    existing_analysis_id: Optional[str] = None
+    # Результат получен от другого процесса single-flight
+    attached: bool = False
+
+
+@dataclass
+class VacancyContext:
+    """Вакансия пакета и сохранённый в БД AI профиль"""
+    vacancy_data: Dict[str, Any]
+    stored_profile: Optional[Dict[str, Any]]
+    stored_profile_hash: Optional[str]
+
+
+def build_vacancy_data(vacancy) -> Dict[str, Any]:
+    """Данные вакансии в формате, который ожидает AIAnalyzer"""
+    return {
+        "title": vacancy.title,
+        "description": vacancy.description,
+        "key_skills": vacancy.key_skills,
+        "experience": vacancy.experience,
+        "salary_from": vacancy.salary_from,
+        "salary_to": vacancy.salary_to,
+        "currency": vacancy.currency
+    }
+
+
+def build_analysis_result(application_id: str, ai_result: Dict[str, Any]) -> AnalysisResult:
+    """Создание ORM объекта AnalysisResult из ответа AIAnalyzer"""
+    return AnalysisResult(
+        application_id=application_id,
+        score=ai_result.get("score"),
+        skills_match=ai_result.get("skills_match"),
+        experience_match=ai_result.get("experience_match"),
+        salary_match=ai_result.get("salary_match"),
+        strengths=ai_result.get("strengths", []),
+        weaknesses=ai_result.get("weaknesses", []),
+        red_flags=ai_result.get("red_flags", []),
+        recommendation=ai_result.get("recommendation"),
+        reasoning=ai_result.get("reasoning"),
+        ai_model=ai_result.get("ai_model"),
+        ai_tokens_used=ai_result.get("ai_tokens_used") or ai_result.get("ai_tokens"),
+        ai_cost_rub=ai_result.get("ai_cost_rub"),
+        processing_time_ms=ai_result.get("processing_time_ms") or ai_result.get("processing_ms"),
+        raw_result=ai_result  # Сохраняем полный JSON для новых полей
+    )
+
+
+def save_analysis_result(db: Session, application_id: str, ai_result: Dict[str, Any]) -> str:
+    """
+    Сохранение результата - замена старого анализа в той же транзакции
+
+    Старый результат удаляется только вместе с записью нового, поэтому
+    при ошибке анализа у отклика остаётся прежний результат
+
+    Returns:
+        str: ID сохранённого AnalysisResult
+    """
+    existing = db.query(AnalysisResult).filter(
+        AnalysisResult.application_id == application_id
+    ).first()
+    if existing:
+        db.delete(existing)
+        db.flush()
+
+    analysis_result = build_analysis_result(application_id, ai_result)
+    db.add(analysis_result)
+    db.flush()
+    analysis_id = str(analysis_result.id)
+    db.query(Application).filter(Application.id == application_id).update(
+        {
+            Application.analyzed_at: datetime.utcnow(),
+            Application.analysis_state: AnalysisState.analyzed.value
+        },
+        synchronize_session=False
+    )
+    db.commit()
+
+    logger.info(
+        f"Анализ заявки {application_id} завершен: "
+        f"оценка {ai_result.get('score')}, "
+        f"рекомендация {ai_result.get('recommendation')}"
+    )
+    return analysis_id
+
+
+def _save_vacancy_profile(vacancy_id: str, profile: Dict[str, Any]):
+    """Сохранение профиля вакансии в отдельной сессии"""
+    db = SessionLocal()
+    try:
+        db.query(Vacancy).filter(Vacancy.id == vacancy_id).update(
+            {
+                Vacancy.analysis_profile: profile,
+                Vacancy.analysis_profile_hash: profile.get("profile_hash")
+            },
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+async def resolve_vacancy_profile(
+    ai_analyzer: AIAnalyzer,
+    vacancy_id: str,
+    context: VacancyContext
+) -> Dict[str, Any]:
+    """
+    Профиль вакансии (must-haves) для анализа резюме
+
+    Берётся из строки Vacancy, если содержимое вакансии не менялось,
+    иначе вычисляется один раз и сохраняется. Пустой dict - анализ вакансии
+    не удался, must-haves выделит модель в промпте резюме
+    """
+    profile_hash = ai_analyzer.vacancy_profile_hash(context.vacancy_data)
+    if context.stored_profile and context.stored_profile_hash == profile_hash:
+        return context.stored_profile
+
+    try:
+        profile = await ai_analyzer.analyze_vacancy(context.vacancy_data)
+    except AIAnalysisError as e:
+        logger.warning(f"Профиль вакансии {vacancy_id} не построен: {e}")
+        return {}
+
+    try:
+        await asyncio.to_thread(_save_vacancy_profile, vacancy_id, profile)
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить профиль вакансии {vacancy_id}: {e}")
+    return profile
+
+
+class AnalysisPipeline:
+    """
+    Параллельный пакетный анализ откликов
+
+    - Все отклики и вакансии загружаются одним запросом
+    - Запросы к OpenAI выполняются конкурентно (не более concurrency одновременно)
+    - Результаты записывает один writer через очередь - сессия БД не делится между корутинами
+    - Ошибка анализа одного отклика повторяется до max_attempts раз, не затрагивая остальные
+    - Отклик, который уже анализирует другой процесс, не анализируется повторно:
+      результат берётся у владельца single-flight блокировки; если владелец его
+      не сохранил (ошибка записи, падение процесса), результат сохраняет writer
+    - Каждый сохранённый результат и прогресс публикуются в Redis pub/sub (каналы задачи и вакансии)
+    """
+
+    # Не чаще раза в секунду: прогресс пишется в Redis
+    PROGRESS_INTERVAL = 1.0
+
+    def __init__(
+        self,
+        ai_analyzer: Optional[AIAnalyzer] = None,
+        concurrency: Optional[int] = None,
+        force_reanalysis: bool = False,
+        max_attempts: Optional[int] = None,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        job_id: Optional[str] = None,
+        publish_progress: bool = True
+    ):
+        self.ai_analyzer = ai_analyzer or AIAnalyzer()
+        self.concurrency = max(1, concurrency or settings.ANALYSIS_CONCURRENCY)
+        self.force_reanalysis = force_reanalysis
+        self.max_attempts = max(1, max_attempts or settings.ANALYSIS_MAX_ATTEMPTS)
+        self.progress_callback = progress_callback
+        self.events = AnalysisEventPublisher(job_id)
+        self.flights = get_analysis_singleflight()
+        # Чанк пакета не публикует свой прогресс - это делает планировщик по сумме чанков
+        self.publish_progress = publish_progress
+        self._progress_reported_at = 0.0
+        self._started = 0.0
+        self._vacancy_ids: List[str] = []
+
+    async def run(self, application_ids: List[str]) -> Dict[str, Any]:
+        """
+        Анализ пакета откликов
+
+        Args:
+            application_ids: Список ID заявок
+
+        Returns:
+            Dict: Счётчики выполнения и пропускная способность
+        """
+        started = time.monotonic()
+        self._started = started
+        results = {
+            "total_applications": len(application_ids),
+            "processed_applications": 0,
+            "successful_analyses": 0,
+            "failed_analyses": 0,
+            "skipped_analyses": 0,
+            "prompt_tokens": 0,
+            "cached_prompt_tokens": 0,
+            "errors": []
+        }
+
+        tasks, vacancies, skipped, errors = await asyncio.to_thread(self._load_tasks, application_ids)
+        results["skipped_analyses"] += skipped
+        results["successful_analyses"] += skipped
+        results["processed_applications"] += skipped
+        for error_msg in errors:
+            results["errors"].append(error_msg)
+            results["failed_analyses"] += 1
+            results["processed_applications"] += 1
+
+        logger.info(
+            f"Конвейер анализа: {len(tasks)} к анализу, {skipped} уже проанализированы, "
+            f"concurrency={self.concurrency}"
+        )
+
+        # Анализ вакансии - один раз на вакансию до анализа резюме
+        vacancy_ids = list(vacancies)
+        self._vacancy_ids = vacancy_ids
+        resolved = await asyncio.gather(*(
+            resolve_vacancy_profile(self.ai_analyzer, vacancy_id, vacancies[vacancy_id])
+            for vacancy_id in vacancy_ids
+        ))
+        profiles = dict(zip(vacancy_ids, resolved))
+        for task in tasks:
+            task.vacancy_profile = profiles.get(task.vacancy_id, {})
+
+        queue: asyncio.Queue = asyncio.Queue()
+        writer = asyncio.create_task(self._writer(queue, results))
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def complete(task: AnalysisTask) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                return await self.ai_analyzer.analyze_resume(
+                    task.vacancy_data,
+                    task.resume_data,
+                    vacancy_profile=task.vacancy_profile
+                )
+
+        async def analyze(task: AnalysisTask):
+            ai_result = None
+            attached = False
+            error = None
+            fingerprint = self.ai_analyzer.result_fingerprint(task.vacancy_data, task.resume_data, task.vacancy_profile)
+            for attempt in range(1, self.max_attempts + 1):
+                # Ожидание чужого анализа не занимает слот семафора
+                try:
+                    ai_result, attached = await self.flights.run(
+                        task.application_id, fingerprint, lambda: complete(task)
+                    )
+                    error = None
+                except AIAnalysisError as e:
+                    error = e
+                except Exception as e:
+                    logger.error(f"Неожиданная ошибка анализа заявки {task.application_id}: {e}", exc_info=True)
+                    error = e
+
+                if ai_result or attempt == self.max_attempts:
+                    break
+                # Пауза вне семафора - слот отдаётся другим откликам
+                delay = 2 ** attempt
+                logger.warning(
+                    f"Анализ заявки {task.application_id} не удался (попытка {attempt}/{self.max_attempts}), "
+                    f"повтор через {delay}s: {error or 'пустой результат'}"
+                )
+                await asyncio.sleep(delay)
+
+            if ai_result and attached:
+                # Владелец публикует результат до сохранения - строка проверяется здесь
+                saved_id = await asyncio.to_thread(self._saved_analysis_id, task.application_id)
+                if saved_id is not None and saved_id != task.existing_analysis_id:
+                    results["skipped_analyses"] += 1
+                    results["successful_analyses"] += 1
+                    results["processed_applications"] += 1
+                    await self._report_progress(results)
+                    return
+                logger.info(f"Анализ заявки {task.application_id} выполнен другим процессом, результат сохраняется здесь")
+                task.attached = True
+                await queue.put((task, ai_result))
+                return
+
+            if ai_result:
+                results["prompt_tokens"] += ai_result.get("ai_prompt_tokens") or 0
+                results["cached_prompt_tokens"] += ai_result.get("ai_cached_tokens") or 0
+                await queue.put((task, ai_result))
+                return
+
+            error_msg = f"Ошибка анализа заявки {task.application_id}: {error or 'AI анализ вернул пустой результат'}"
+            logger.error(error_msg)
+            results["errors"].append(error_msg)
+            results["failed_analyses"] += 1
+            results["processed_applications"] += 1
+            await self._report_progress(results)
+
+        await self._report_progress(results, force=True)
+        try:
+            await asyncio.gather(*(analyze(task) for task in tasks))
+        finally:
+            await queue.put(None)
+            await writer
+
+        duration = time.monotonic() - started
+        analyzed = results["successful_analyses"] - results["skipped_analyses"]
+        results["duration_seconds"] = round(duration, 2)
+        results["throughput_per_minute"] = round(analyzed / duration * 60, 1) if duration > 0 else 0.0
+        results["prompt_cache_hit_ratio"] = (
+            round(results["cached_prompt_tokens"] / results["prompt_tokens"], 3) if results["prompt_tokens"] else 0.0
+        )
+
+        logger.info(
+            f"Конвейер анализа завершен за {results['duration_seconds']}s: "
+            f"{analyzed} проанализировано, {results['failed_analyses']} ошибок, "
+            f"{results['throughput_per_minute']} резюме/мин, "
+            f"кеш промпта {results['prompt_cache_hit_ratio']:.0%}"
+        )
+        logger.info(f"Кеш анализа: {get_analysis_cache().get_stats()}")
+        await self._report_progress(results, force=True, done=True)
+        return results
+
+    async def _report_progress(self, results: Dict[str, Any], force: bool = False, done: bool = False):
+        """
+        Публикация счётчиков и ETA в pub/sub и progress_callback
+
+        Ошибки публикации и callback не прерывают анализ
+        """
+        now = time.monotonic()
+        if not force and now - self._progress_reported_at < self.PROGRESS_INTERVAL:
+            return
+        self._progress_reported_at = now
+
+        total = results["total_applications"]
+        processed = results["processed_applications"]
+        analyzed = processed - results["skipped_analyses"]
+        snapshot = dict(results, errors=list(results["errors"]))
+        snapshot["progress"] = int(processed / total * 100) if total else 100
+        snapshot["estimated_seconds_left"] = (
+            int((now - self._started) / analyzed * (total - processed)) if analyzed > 0 and not done else None
+        )
+
+        if self.publish_progress:
+            await self.events.progress(snapshot, self._vacancy_ids, done=done)
+        if not self.progress_callback:
+            return
+        try:
+            await asyncio.to_thread(self.progress_callback, snapshot)
+        except Exception as e:
+            logger.warning(f"Не удалось передать прогресс анализа: {e}")
+
+    def _load_tasks(
+        self,
+        application_ids: List[str]
+    ) -> Tuple[List[AnalysisTask], Dict[str, VacancyContext], int, List[str]]:
+        """Загрузка откликов с вакансиями одним запросом"""
+        db = SessionLocal()
+        try:
+            applications = db.query(Application).options(
+                joinedload(Application.vacancy),
+                joinedload(Application.analysis_result)
+            ).filter(
+                Application.id.in_(application_ids)
+            ).all()
+            by_id = {str(app.id): app for app in applications}
+
+            tasks = []
+            skipped = 0
+            errors = []
+            vacancies: Dict[str, VacancyContext] = {}
+
+            for application_id in application_ids:
+                application = by_id.get(str(application_id))
+                if not application:
+                    errors.append(f"Заявка {application_id} не найдена")
+                    continue
+                if not application.resume_data:
+                    errors.append(f"Отсутствуют данные резюме для заявки {application_id}")
+                    continue
+                if application.analysis_result and not self.force_reanalysis:
+                    skipped += 1
+                    continue
+
+                vacancy_key = str(application.vacancy_id)
+                if vacancy_key not in vacancies:
+                    vacancies[vacancy_key] = VacancyContext(
+                        vacancy_data=build_vacancy_data(application.vacancy),
+                        stored_profile=application.vacancy.analysis_profile,
+                        stored_profile_hash=application.vacancy.analysis_profile_hash
+                    )
+
+                tasks.append(AnalysisTask(
+                    application_id=str(application.id),
+                    vacancy_id=vacancy_key,
+                    vacancy_data=vacancies[vacancy_key].vacancy_data,
+                    resume_data=application.resume_data,
+                    candidate_name=application.candidate_name,
+                    existing_analysis_id=str(application.analysis_result.id) if application.analysis_result else None
+                ))
+
+            return tasks, vacancies, skipped, errors
+        finally:
+            db.close()
+
+    @staticmethod
+    def _saved_analysis_id(application_id: str) -> Optional[str]:
+        """ID текущего результата анализа отклика"""
+        db = SessionLocal()
+        try:
+            saved_id = db.query(AnalysisResult.id).filter(
+                AnalysisResult.application_id == application_id
+            ).scalar()
+            return str(saved_id) if saved_id is not None else None
+        finally:
+            db.close()
+
+    async def _writer(self, queue: asyncio.Queue, results: Dict[str, Any]):
+        """Единственный writer: последовательно сохраняет результаты в своей сессии"""
+        db = SessionLocal()
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                task, ai_result = item
+                try:
+                    analysis_id = await asyncio.to_thread(save_analysis_result, db, task.application_id, ai_result)
+                    results["successful_analyses"] += 1
+                    await self.events.result(result_summary(
+                        task.application_id,
+                        task.vacancy_id,
+                        ai_result,
+                        analysis_id=analysis_id,
+                        candidate_name=task.candidate_name
+                    ))
+                except Exception as e:
+                    db.rollback()
+                    if task.attached and isinstance(e, IntegrityError):
+                        # Владелец single-flight сохранил результат одновременно с writer
+                        logger.info(f"Анализ заявки {task.application_id} сохранён другим процессом")
+                        results["successful_analyses"] += 1
+                        results["skipped_analyses"] += 1
+                    else:
+                        error_msg = f"Ошибка сохранения анализа заявки {task.application_id}: {e}"
+                        logger.error(error_msg)
+                        results["errors"].append(error_msg)
+                        results["failed_analyses"] += 1
+                results["processed_applications"] += 1
+                await self._report_progress(results)
+        finally:
+            db.close()
@@ -0,0 +1,91 @@
+"""
+Очереди RQ для фоновых задач
+Чанки AI анализа передаются сюда планировщиком (app.workers.scheduler)
+"""
+import logging
+from typing import Optional
+
+from redis import Redis
+from rq import Queue
+from rq.command import send_stop_job_command
+from rq.exceptions import NoSuchJobError
+from rq.job import Job, JobStatus
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Очереди по классу приоритета планировщика.
+# Воркер слушает их в этом порядке: interactive всегда забирается первым
+ANALYSIS_QUEUES = {
+    "interactive": "analysis_interactive",
+    "bulk": "analysis_bulk",
+}
+
+# Сколько хранить результат и ошибки задачи
+JOB_RESULT_TTL = 86400
+JOB_FAILURE_TTL = 7 * 86400
+
+_redis_connection: Optional[Redis] = None
+
+
+def get_redis_connection() -> Redis:
+    """
+    Синхронное подключение Redis для RQ
+
+    RQ хранит pickle данные задач, поэтому decode_responses не используется
+    """
+    global _redis_connection
+    if _redis_connection is None:
+        _redis_connection = Redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=2,
+            socket_timeout=5
+        )
+    return _redis_connection
+
+
+def get_analysis_queue(priority: str) -> Queue:
+    """Очередь RQ для класса приоритета"""
+    return Queue(
+        ANALYSIS_QUEUES[priority],
+        connection=get_redis_connection(),
+        default_timeout=settings.ANALYSIS_JOB_TIMEOUT
+    )
+
+
+def enqueue_chunk(chunk_id: str, priority: str) -> Job:
+    """
+    Передача чанка анализа воркерам
+
+    Raises:
+        redis.exceptions.RedisError: Redis недоступен
+    """
+    from app.workers.analysis_jobs import run_analysis_chunk
+
+    return get_analysis_queue(priority).enqueue(
+        run_analysis_chunk,
+        chunk_id,
+        result_ttl=JOB_RESULT_TTL,
+        failure_ttl=JOB_FAILURE_TTL,
+        description=f"AI анализ, чанк {chunk_id}"
+    )
+
+
+def stop_job(job_id: str):
+    """Остановка задачи RQ: ожидающая снимается с очереди, выполняющаяся прерывается"""
+    connection = get_redis_connection()
+    try:
+        job = Job.fetch(job_id, connection=connection)
+    except NoSuchJobError:
+        return
+
+    status = job.get_status()
+    try:
+        if status == JobStatus.STARTED:
+            send_stop_job_command(connection, job_id)
+        elif status in (JobStatus.QUEUED, JobStatus.DEFERRED, JobStatus.SCHEDULED):
+            job.cancel()
+    except Exception as e:
+        # Задача могла завершиться между проверкой статуса и командой
+        logger.warning(f"Не удалось остановить задачу {job_id}: {e}")
@@ -0,0 +1,538 @@
+"""
+Планировщик AI анализа с честной очередью между пользователями
+Weighted fair queuing по тарифу, приоритет новых откликов над переанализом,
+ограничение одновременных пакетов на пользователя
+
+Пакет анализа (batch) делится на чанки по ANALYSIS_CHUNK_SIZE откликов.
+Чанки ждут в очередях планировщика в Redis и передаются в RQ только когда
+есть свободный слот, поэтому большой переанализ одного пользователя
+не занимает воркеры на часы и не задерживает чужие новые отклики.
+"""
+import json
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+from redis import Redis
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.subscription import Subscription, SubscriptionStatus, PlanType
+from app.services.analysis_events import build_event_message, job_channel, vacancy_channel, EVENT_PROGRESS, EVENT_DONE
+
+logger = logging.getLogger(__name__)
+
+# Классы приоритета: interactive обслуживается первым, bulk - остаточной ёмкостью
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BULK = "bulk"
+PRIORITY_CLASSES = (PRIORITY_INTERACTIVE, PRIORITY_BULK)
+
+# Вес тарифа в WFQ: доля ёмкости при конкуренции пользователей
+PLAN_WEIGHTS = {
+    PlanType.trial: 1,
+    PlanType.free: 1,
+    PlanType.starter: 2,
+    PlanType.professional: 4,
+    PlanType.enterprise: 8,
+}
+
+# Максимум одновременно выполняющихся чанков пользователя
+PLAN_MAX_INFLIGHT = {
+    PlanType.trial: 1,
+    PlanType.free: 1,
+    PlanType.starter: 2,
+    PlanType.professional: 3,
+    PlanType.enterprise: 4,
+}
+
+KEY_PREFIX = "analysis:sched:"
+BATCH_PREFIX = "analysis:batch:"
+BATCH_TTL = 7 * 86400
+BATCH_ERRORS_LIMIT = 20
+
+BATCH_FINAL_STATUSES = ("finished", "canceled")
+
+# Счётчики пакета, которые чанк добавляет по мере выполнения
+CHUNK_COUNTERS = ("processed_applications", "successful_analyses", "failed_analyses", "skipped_analyses")
+
+# Сколько раз чанк с истёкшей арендой возвращается в очередь, прежде чем считается ошибкой
+CHUNK_MAX_REQUEUES = 2
+
+# Запас аренды сверх таймаута RQ: при таймауте чанк освобождает слот сам
+LEASE_GRACE_SECONDS = 60
+
+# Постановка чанков пользователя в очередь класса.
+# Новый пользователь в очереди получает тег start = max(vclock, last_finish)
+_SUBMIT_SCRIPT = """
+local p = ARGV[1]
+local cls = ARGV[2]
+local tenant = ARGV[3]
+local weight = tonumber(ARGV[4])
+local queue = p .. 'queue:' .. cls
+local pending = p .. 'pending:' .. cls .. ':' .. tenant
+local tenant_key = p .. 'tenant:' .. tenant
+
+redis.call('HSET', tenant_key, 'weight', ARGV[4], 'max_inflight', ARGV[5])
+for i = 6, #ARGV do
+  redis.call('RPUSH', pending, ARGV[i])
+end
+
+if not redis.call('ZSCORE', queue, tenant) then
+  local vclock = tonumber(redis.call('GET', p .. 'vclock:' .. cls) or '0')
+  local last_finish = tonumber(redis.call('HGET', tenant_key, 'last_finish:' .. cls) or '0')
+  local head = redis.call('LINDEX', pending, 0)
+  local size = tonumber(redis.call('HGET', p .. 'chunk:' .. head, 'size') or '1')
+  redis.call('ZADD', queue, math.max(vclock, last_finish) + size / weight, tenant)
+end
+return 1
+"""
+
+# Выбор следующего чанка: пользователь с минимальным finish тегом,
+# у которого есть свободный слот. Возвращает chunk_id или false.
+# Истёкшие аренды разбираются до вызова (AnalysisScheduler._expire_leases)
+_DISPATCH_SCRIPT = """
+local p = ARGV[1]
+local now = tonumber(ARGV[2])
+local lease = tonumber(ARGV[3])
+local global_cap = tonumber(ARGV[4])
+local bulk_cap = tonumber(ARGV[5])
+
+local inflight = redis.call('ZCARD', p .. 'inflight')
+if inflight >= global_cap then return false end
+
+for _, cls in ipairs({'interactive', 'bulk'}) do
+  if cls == 'interactive' or inflight < bulk_cap then
+    local queue = p .. 'queue:' .. cls
+    local tenants = redis.call('ZRANGE', queue, 0, -1, 'WITHSCORES')
+    for i = 1, #tenants, 2 do
+      local tenant = tenants[i]
+      local finish = tonumber(tenants[i + 1])
+      local tenant_key = p .. 'tenant:' .. tenant
+      local cap = tonumber(redis.call('HGET', tenant_key, 'max_inflight') or '1')
+      if redis.call('ZCARD', p .. 'inflight:' .. tenant) < cap then
+        local pending = p .. 'pending:' .. cls .. ':' .. tenant
+        local cid = redis.call('LPOP', pending)
+        if cid then
+          redis.call('SET', p .. 'vclock:' .. cls, finish)
+          redis.call('HSET', tenant_key, 'last_finish:' .. cls, finish)
+          local head = redis.call('LINDEX', pending, 0)
+          if head then
+            local size = tonumber(redis.call('HGET', p .. 'chunk:' .. head, 'size') or '1')
+            local weight = tonumber(redis.call('HGET', tenant_key, 'weight') or '1')
+            redis.call('ZADD', queue, finish + size / weight, tenant)
+          else
+            redis.call('ZREM', queue, tenant)
+          end
+          redis.call('ZADD', p .. 'inflight', now + lease, cid)
+          redis.call('ZADD', p .. 'inflight:' .. tenant, now + lease, cid)
+          return cid
+        else
+          redis.call('ZREM', queue, tenant)
+        end
+      end
+    end
+  end
+end
+return false
+"""
+
+
+def tenant_policy(db: Session, user_id: str) -> Tuple[int, int]:
+    """
+    Вес и лимит одновременных чанков пользователя по активной подписке
+
+    Returns:
+        Tuple[int, int]: (weight, max_inflight)
+    """
+    subscription = db.query(Subscription).filter(
+        Subscription.user_id == user_id,
+        Subscription.status.in_([SubscriptionStatus.active, SubscriptionStatus.trial])
+    ).first()
+    plan_type = subscription.plan.plan_type if subscription and subscription.plan else PlanType.free
+    return PLAN_WEIGHTS.get(plan_type, 1), PLAN_MAX_INFLIGHT.get(plan_type, 1)
+
+
+class AnalysisScheduler:
+    """
+    Очереди пакетов анализа в Redis
+
+    - submit() делит пакет на чанки и ставит их в очередь пользователя
+    - dispatch() передаёт в RQ чанки, пока есть свободные слоты
+    - release() освобождает слот после чанка и обновляет статус пакета
+    - чанк упавшего воркера (истёкшая аренда) возвращается в очередь пользователя,
+      после CHUNK_MAX_REQUEUES возвратов его отклики считаются ошибкой
+    """
+
+    def __init__(self, redis: Optional[Redis] = None):
+        self.redis = redis or Redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=True,
+            socket_connect_timeout=2,
+            socket_timeout=5
+        )
+        self._submit = self.redis.register_script(_SUBMIT_SCRIPT)
+        self._dispatch = self.redis.register_script(_DISPATCH_SCRIPT)
+
+    # === Пакеты ===
+
+    def submit(
+        self,
+        application_ids: List[str],
+        user_id: str,
+        weight: int = 1,
+        max_inflight: int = 1,
+        priority: str = PRIORITY_INTERACTIVE,
+        force_reanalysis: bool = False,
+        vacancy_id: Optional[str] = None
+    ) -> str:
+        """
+        Постановка пакета анализа
+
+        Returns:
+            str: ID пакета (job_id для статуса, отмены и SSE)
+
+        Raises:
+            redis.exceptions.RedisError: Redis недоступен, пакет не поставлен.
+                Ошибка передачи в RQ после постановки не пробрасывается - чанки
+                остаются в очереди и передаются следующим dispatch()
+        """
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Неизвестный приоритет: {priority}")
+
+        batch_id = str(uuid.uuid4())
+        chunk_size = max(1, settings.ANALYSIS_CHUNK_SIZE)
+        chunks = [application_ids[i:i + chunk_size] for i in range(0, len(application_ids), chunk_size)]
+        chunk_ids = [str(uuid.uuid4()) for _ in chunks]
+
+        pipe = self.redis.pipeline()
+        pipe.hset(self._batch_key(batch_id), mapping={
+            "user_id": str(user_id),
+            "vacancy_id": str(vacancy_id) if vacancy_id else "",
+            "priority": priority,
+            "status": "queued",
+            "total_applications": len(application_ids),
+            "chunks_total": len(chunks),
+            "chunks_done": 0,
+            "processed_applications": 0,
+            "successful_analyses": 0,
+            "failed_analyses": 0,
+            "skipped_analyses": 0,
+            "enqueued_at": datetime.utcnow().isoformat(),
+        })
+        pipe.expire(self._batch_key(batch_id), BATCH_TTL)
+        for chunk_id, chunk in zip(chunk_ids, chunks):
+            pipe.hset(self._key(f"chunk:{chunk_id}"), mapping={
+                "batch_id": batch_id,
+                "user_id": str(user_id),
+                "priority": priority,
+                "size": len(chunk),
+                "application_ids": json.dumps(chunk),
+                "force_reanalysis": int(force_reanalysis),
+            })
+            pipe.expire(self._key(f"chunk:{chunk_id}"), BATCH_TTL)
+        pipe.sadd(self._batch_key(batch_id, "chunks"), *chunk_ids)
+        pipe.expire(self._batch_key(batch_id, "chunks"), BATCH_TTL)
+        pipe.execute()
+
+        self._submit(args=[KEY_PREFIX, priority, str(user_id), weight, max_inflight, *chunk_ids])
+        logger.info(
+            f"Пакет анализа {batch_id}: {len(application_ids)} откликов, {len(chunks)} чанков, "
+            f"priority={priority}, weight={weight}, max_inflight={max_inflight}, user={user_id}"
+        )
+
+        try:
+            self.dispatch()
+        except Exception as e:
+            logger.warning(f"Пакет анализа {batch_id} поставлен, но не передан в RQ: {e}")
+        return batch_id
+
+    def dispatch(self) -> int:
+        """
+        Передача чанков в RQ, пока есть свободные слоты
+
+        Returns:
+            int: Количество переданных чанков
+        """
+        from app.workers.queue import enqueue_chunk
+
+        global_cap = max(1, settings.ANALYSIS_MAX_INFLIGHT_CHUNKS)
+        # Часть слотов всегда остаётся под interactive, чтобы новые отклики не ждали переанализ
+        bulk_cap = max(1, global_cap - settings.ANALYSIS_INTERACTIVE_RESERVE)
+        lease_ms = self._lease_ms()
+        self._expire_leases()
+
+        dispatched = 0
+        while True:
+            chunk_id = self._dispatch(args=[KEY_PREFIX, int(time.time() * 1000), lease_ms, global_cap, bulk_cap])
+            if not chunk_id:
+                return dispatched
+
+            chunk = self.redis.hgetall(self._key(f"chunk:{chunk_id}"))
+            if not chunk:
+                self.release(chunk_id)
+                continue
+            try:
+                job = enqueue_chunk(chunk_id, chunk["priority"])
+                self.redis.sadd(self._batch_key(chunk["batch_id"], "jobs"), job.id)
+                self.redis.expire(self._batch_key(chunk["batch_id"], "jobs"), BATCH_TTL)
+                dispatched += 1
+            except Exception:
+                self._requeue(chunk_id, chunk)
+                raise
+
+    def get_chunk(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+        """Данные чанка для воркера или None, если пакет отменён/истёк"""
+        chunk = self.redis.hgetall(self._key(f"chunk:{chunk_id}"))
+        if not chunk:
+            return None
+        status = self.redis.hget(self._batch_key(chunk["batch_id"]), "status")
+        if status in BATCH_FINAL_STATUSES:
+            return None
+        return {
+            "batch_id": chunk["batch_id"],
+            "user_id": chunk["user_id"],
+            "application_ids": json.loads(chunk["application_ids"]),
+            "force_reanalysis": chunk.get("force_reanalysis") == "1",
+        }
+
+    def start_chunk(self, batch_id: str, chunk_id: Optional[str] = None):
+        """
+        Отметка начала выполнения пакета (первый чанк)
+
+        Аренда чанка отсчитывается заново от старта: время ожидания в очереди RQ
+        не должно приводить к повторной выдаче выполняющегося чанка
+        """
+        if chunk_id:
+            chunk = self.redis.hgetall(self._key(f"chunk:{chunk_id}"))
+            if chunk:
+                expires_at = int(time.time() * 1000) + self._lease_ms()
+                pipe = self.redis.pipeline()
+                pipe.zadd(self._key("inflight"), {chunk_id: expires_at}, xx=True)
+                pipe.zadd(self._key(f"inflight:{chunk['user_id']}"), {chunk_id: expires_at}, xx=True)
+                pipe.execute()
+
+        key = self._batch_key(batch_id)
+        if self.redis.hsetnx(key, "started_at", datetime.utcnow().isoformat()):
+            self.redis.hset(key, "status", "started")
+
+    def record_progress(
+        self,
+        batch_id: str,
+        delta: Dict[str, int],
+        errors: List[str],
+        chunk_id: Optional[str] = None
+    ):
+        """
+        Добавление прироста счётчиков чанка к пакету и публикация прогресса
+
+        С chunk_id прирост запоминается и в чанке - при повторной выдаче чанка
+        после падения воркера он вычитается из пакета
+        """
+        key = self._batch_key(batch_id)
+        pipe = self.redis.pipeline()
+        for field, value in delta.items():
+            if value:
+                pipe.hincrby(key, field, value)
+                if chunk_id:
+                    pipe.hincrby(self._key(f"chunk:{chunk_id}"), field, value)
+        if errors:
+            errors_key = self._batch_key(batch_id, "errors")
+            pipe.rpush(errors_key, *errors)
+            pipe.ltrim(errors_key, -BATCH_ERRORS_LIMIT, -1)
+            pipe.expire(errors_key, BATCH_TTL)
+        pipe.execute()
+        self._publish(batch_id, EVENT_PROGRESS)
+
+    def release(self, chunk_id: str):
+        """Освобождение слота после чанка и завершение пакета после последнего чанка"""
+        chunk = self.redis.hgetall(self._key(f"chunk:{chunk_id}"))
+        if not chunk:
+            return
+        self._free_slot(chunk_id, chunk["user_id"])
+        self.redis.delete(self._key(f"chunk:{chunk_id}"))
+
+        key = self._batch_key(chunk["batch_id"])
+        done = self.redis.hincrby(key, "chunks_done", 1)
+        if done >= int(self.redis.hget(key, "chunks_total") or 0):
+            if self.redis.hget(key, "status") not in BATCH_FINAL_STATUSES:
+                self.redis.hset(key, mapping={"status": "finished", "ended_at": datetime.utcnow().isoformat()})
+                self._publish(chunk["batch_id"], EVENT_DONE)
+
+    def get_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """Статус пакета в формате /job/{job_id}/status или None"""
+        batch = self.redis.hgetall(self._batch_key(batch_id))
+        if not batch:
+            return None
+
+        total = int(batch.get("total_applications", 0))
+        processed = int(batch.get("processed_applications", 0))
+        skipped = int(batch.get("skipped_analyses", 0))
+        status = batch.get("status", "queued")
+
+        eta = None
+        if status == "started" and batch.get("started_at") and processed > skipped:
+            elapsed = (datetime.utcnow() - datetime.fromisoformat(batch["started_at"])).total_seconds()
+            eta = int(elapsed / (processed - skipped) * (total - processed))
+
+        return {
+            "job_id": batch_id,
+            "user_id": batch.get("user_id"),
+            "status": status,
+            "priority": batch.get("priority"),
+            "progress": int(processed / total * 100) if total else 100,
+            "vacancy_id": batch.get("vacancy_id") or None,
+            "total_applications": total,
+            "processed_applications": processed,
+            "successful_analyses": int(batch.get("successful_analyses", 0)),
+            "failed_analyses": int(batch.get("failed_analyses", 0)),
+            "skipped_analyses": skipped,
+            "estimated_seconds_left": eta,
+            "errors": self.redis.lrange(self._batch_key(batch_id, "errors"), 0, -1),
+            "enqueued_at": batch.get("enqueued_at"),
+            "started_at": batch.get("started_at"),
+            "ended_at": batch.get("ended_at"),
+        }
+
+    def cancel(self, batch_id: str) -> bool:
+        """
+        Отмена пакета: ожидающие чанки удаляются, выполняющиеся останавливаются
+
+        Остановленная или снятая с очереди задача RQ не доходит до release() в
+        run_analysis_chunk, поэтому слоты переданных чанков освобождаются здесь -
+        иначе пользователь ждёт истечения аренды (ANALYSIS_JOB_TIMEOUT).
+        Уже сохранённые результаты анализа остаются - каждый коммитится отдельно
+
+        Returns:
+            bool: False если пакет уже завершён
+        """
+        from app.workers.queue import stop_job
+
+        key = self._batch_key(batch_id)
+        if self.redis.hget(key, "status") in BATCH_FINAL_STATUSES:
+            return False
+        self.redis.hset(key, mapping={"status": "canceled", "ended_at": datetime.utcnow().isoformat()})
+
+        chunks = {}
+        for chunk_id in self.redis.smembers(self._batch_key(batch_id, "chunks")):
+            chunk = self.redis.hgetall(self._key(f"chunk:{chunk_id}"))
+            if chunk:
+                chunks[chunk_id] = chunk
+                self.redis.lrem(self._key(f"pending:{chunk['priority']}:{chunk['user_id']}"), 0, chunk_id)
+        for job_id in self.redis.smembers(self._batch_key(batch_id, "jobs")):
+            stop_job(job_id)
+
+        # Чанк, который успел завершиться без остановки, найдёт удалённый hash и release() ничего не сделает
+        for chunk_id, chunk in chunks.items():
+            self._free_slot(chunk_id, chunk["user_id"])
+            self.redis.delete(self._key(f"chunk:{chunk_id}"))
+
+        self._publish(batch_id, EVENT_DONE)
+        self.dispatch()
+        logger.info(f"Пакет анализа {batch_id} отменён")
+        return True
+
+    # === Внутреннее ===
+
+    @staticmethod
+    def _lease_ms() -> int:
+        return (settings.ANALYSIS_JOB_TIMEOUT + LEASE_GRACE_SECONDS) * 1000
+
+    def _expire_leases(self):
+        """
+        Чанки с истёкшей арендой (воркер упал или убит) возвращаются в очередь
+
+        Прогресс, который чанк успел добавить в пакет, вычитается - чанк выполняется
+        заново, уже сохранённые результаты пропускаются конвейером. После
+        CHUNK_MAX_REQUEUES возвратов оставшиеся отклики чанка считаются ошибкой,
+        чтобы пакет дошёл до финального статуса
+        """
+        now = int(time.time() * 1000)
+        for chunk_id in self.redis.zrangebyscore(self._key("inflight"), "-inf", now):
+            # При одновременных dispatch() чанк разбирает тот, чей ZREM удалил запись
+            if not self.redis.zrem(self._key("inflight"), chunk_id):
+                continue
+            chunk = self.redis.hgetall(self._key(f"chunk:{chunk_id}"))
+            if not chunk:
+                continue
+
+            chunk_key = self._key(f"chunk:{chunk_id}")
+            batch_key = self._batch_key(chunk["batch_id"])
+            reported = {field: int(chunk.get(field, 0)) for field in CHUNK_COUNTERS}
+            requeues = self.redis.hincrby(chunk_key, "requeues", 1)
+
+            if requeues > CHUNK_MAX_REQUEUES:
+                remaining = max(0, int(chunk.get("size", 0)) - reported["processed_applications"])
+                error = f"Чанк {chunk_id} не завершён после {CHUNK_MAX_REQUEUES} повторов: воркер недоступен"
+                logger.error(f"{error}, пакет {chunk['batch_id']}")
+                pipe = self.redis.pipeline()
+                pipe.hincrby(batch_key, "processed_applications", remaining)
+                pipe.hincrby(batch_key, "failed_analyses", remaining)
+                errors_key = self._batch_key(chunk["batch_id"], "errors")
+                pipe.rpush(errors_key, error)
+                pipe.ltrim(errors_key, -BATCH_ERRORS_LIMIT, -1)
+                pipe.expire(errors_key, BATCH_TTL)
+                pipe.execute()
+                self.release(chunk_id)
+                continue
+
+            logger.warning(f"Аренда чанка {chunk_id} истекла, чанк возвращается в очередь (повтор {requeues})")
+            pipe = self.redis.pipeline()
+            for field, value in reported.items():
+                if value:
+                    pipe.hincrby(batch_key, field, -value)
+                pipe.hset(chunk_key, field, 0)
+            pipe.execute()
+            self._requeue(chunk_id, chunk)
+
+    def _requeue(self, chunk_id: str, chunk: Dict[str, str]):
+        """Чанк возвращается в начало очереди пользователя, слот освобождается"""
+        tenant = self.redis.hgetall(self._key(f"tenant:{chunk['user_id']}"))
+        self.redis.lpush(self._key(f"pending:{chunk['priority']}:{chunk['user_id']}"), chunk_id)
+        self._submit(args=[
+            KEY_PREFIX, chunk["priority"], chunk["user_id"],
+            tenant.get("weight", 1), tenant.get("max_inflight", 1)
+        ])
+        self._free_slot(chunk_id, chunk["user_id"])
+
+    def _free_slot(self, chunk_id: str, user_id: str):
+        pipe = self.redis.pipeline()
+        pipe.zrem(self._key("inflight"), chunk_id)
+        pipe.zrem(self._key(f"inflight:{user_id}"), chunk_id)
+        pipe.execute()
+
+    def _publish(self, batch_id: str, event: str):
+        """Прогресс пакета в каналы задачи и вакансии"""
+        try:
+            data = self.get_batch(batch_id)
+            if not data:
+                return
+            data.pop("user_id", None)
+            data["errors_count"] = len(data.pop("errors"))
+            message = build_event_message(event, batch_id, data)
+            self.redis.publish(job_channel(batch_id), message)
+            if data["vacancy_id"]:
+                self.redis.publish(vacancy_channel(data["vacancy_id"]), message)
+        except Exception as e:
+            logger.warning(f"Не удалось опубликовать прогресс пакета {batch_id}: {e}")
+
+    @staticmethod
+    def _key(suffix: str) -> str:
+        return f"{KEY_PREFIX}{suffix}"
+
+    @staticmethod
+    def _batch_key(batch_id: str, suffix: Optional[str] = None) -> str:
+        return f"{BATCH_PREFIX}{batch_id}" + (f":{suffix}" if suffix else "")
+
+
+# Singleton instance
+_scheduler: Optional[AnalysisScheduler] = None
+
+
+def get_scheduler() -> AnalysisScheduler:
+    """Получение планировщика анализа"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = AnalysisScheduler()
+    return _scheduler
@@ -3,16 +3,25 @@
 Async функции для получения вакансий и откликов через FastAPI BackgroundTasks
 """
 import asyncio
+import hashlib
 import json
 import logging
-from typing import List, Dict, Any
-from datetime import datetime
-from uuid import UUID
+import time
+from typing import List, Dict, Any, Tuple, Optional
+from datetime import datetime, timezone
+from uuid import UUID, uuid4
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
-from app.models.application import SyncJob, Application
+from app.config import settings
+from app.models.application import SyncJob, Application, ApplicationStatus, AnalysisState
 from app.models.vacancy import Vacancy
-from app.services.auth_service import AuthService
+from app.models.user import User
+from app.services.hh_client import HHClient
+from app.services.hh_client_pool import get_hh_client_pool
+from app.services.hh_rate_limiter import get_hh_rate_limiter
+from app.utils.exceptions import ValidationError
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +30,8 @@ def run_vacancy_sync_background(
     user_id: UUID,
     sync_job_id: UUID,
     sync_vacancies: bool = True,
-    sync_applications: bool = True
+    sync_applications: bool = True,
+    full_sync: bool = False
 ):
     """
     Синхронная обёртка для BackgroundTasks
@@ -33,7 +43,7 @@ def run_vacancy_sync_background(
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         try:
-            loop.run_until_complete(run_vacancy_sync(user_id, sync_job_id, sync_vacancies, sync_applications))
+            loop.run_until_complete(run_vacancy_sync(user_id, sync_job_id, sync_vacancies, sync_applications, full_sync))
             logger.info(f"[BACKGROUND] Sync job {sync_job_id} completed successfully")
         finally:
             loop.close()
@@ -57,9 +67,16 @@ async def run_vacancy_sync(
     user_id: UUID,
     sync_job_id: UUID,
     sync_vacancies: bool = True,
-    sync_applications: bool = True
+    sync_applications: bool = True,
+    full_sync: bool = False
 ):
-    """Основная функция синхронизации вакансий и откликов с HH.ru"""
+    """
+    Основная функция синхронизации вакансий и откликов с HH.ru
+
+    По умолчанию синхронизация инкрементальная: загружаются только вакансии с изменившимися
+    коллекциями откликов и записываются только изменившиеся отклики.
+    full_sync - полная пересинхронизация всех откликов всех вакансий
+    """
     from app.database import SessionLocal
 
     # Создаём новую сессию БД для фоновой задачи
@@ -73,18 +90,21 @@ async def run_vacancy_sync(
             sync_job.started_at = datetime.utcnow()
             db.commit()
 
-        logger.info(f"[SYNC] Starting sync job {sync_job_id} for user {user_id}")
+        logger.info(f"[SYNC] Starting {'full' if full_sync else 'incremental'} sync job {sync_job_id} for user {user_id}")
 
-        logger.info(f"[SYNC] Creating AuthService...")
-        auth_service = AuthService(db)
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user or not user.has_hh_token:
+            raise ValidationError("HH.ru токен не настроен")
 
+        # Собственный клиент: задача работает в своём event loop и закрывает его по завершении
         logger.info(f"[SYNC] Getting HH client...")
-        hh_client = await auth_service.get_hh_client(user_id)
+        hh_client = HHClient(get_hh_client_pool().decrypt_token(user.id, user.encrypted_hh_token))
         logger.info(f"[SYNC] HH client obtained successfully")
 
         vacancies_synced = 0
         applications_synced = 0
         errors = []
+        vacancy_timings = []
 
         if sync_vacancies:
             try:
@@ -94,23 +114,28 @@ async def run_vacancy_sync(
                 logger.info(f"[SYNC] Synced {vacancies_synced} vacancies")
 
                 if sync_applications:
-                    for vacancy_id in vacancy_ids:
-                        try:
-                            apps_count = await _sync_vacancy_applications(db, user_id, vacancy_id, hh_client)
-                            applications_synced += apps_count
-                        except Exception as e:
-                            errors.append(f"Error syncing applications for vacancy {vacancy_id}: {str(e)}")
+                    vacancy_timings = await _sync_applications_concurrently(user_id, vacancy_ids, hh_client, full_sync)
+                    for timing in vacancy_timings:
+                        applications_synced += timing["applications"]
+                        if timing["error"]:
+                            errors.append(f"Error syncing applications for vacancy {timing['vacancy_id']}: {timing['error']}")
 
                 logger.info(f"Synced {applications_synced} applications")
             except Exception as e:
                 errors.append(f"Error syncing vacancies: {str(e)}")
                 raise
 
+        limiter = get_hh_rate_limiter(hh_client.token)
+        logger.info(
+            f"[SYNC] HH.ru limiter: process {limiter.get_stats()}, token {await limiter.get_shared_stats()}"
+        )
+
         if sync_job:
             sync_job.status = "completed"
             sync_job.vacancies_synced = vacancies_synced
             sync_job.applications_synced = applications_synced
             sync_job.errors = errors
+            sync_job.vacancy_timings = vacancy_timings
             sync_job.completed_at = datetime.utcnow()
             db.commit()
 
@@ -129,8 +154,52 @@ async def run_vacancy_sync(
         db.close()
 
 
+async def _sync_applications_concurrently(
+    user_id: UUID,
+    vacancy_ids: List[str],
+    hh_client,
+    full_sync: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Синхронизация откликов нескольких вакансий параллельно
+
+    Одновременно обрабатывается до HH_SYNC_VACANCY_CONCURRENCY вакансий,
+    темп запросов к HH.ru ограничивает общий лимитер токена в HHClient
+
+    Returns:
+        List[Dict]: Время и результат по каждой вакансии в порядке vacancy_ids
+    """
+    semaphore = asyncio.Semaphore(max(1, settings.HH_SYNC_VACANCY_CONCURRENCY))
+
+    async def sync_one(vacancy_id: str) -> Dict[str, Any]:
+        async with semaphore:
+            return await _sync_vacancy_isolated(user_id, vacancy_id, hh_client, full_sync)
+
+    return list(await asyncio.gather(*(sync_one(vacancy_id) for vacancy_id in vacancy_ids)))
+
+
+async def _sync_vacancy_isolated(user_id: UUID, vacancy_id: str, hh_client, full_sync: bool = False) -> Dict[str, Any]:
+    """Синхронизация откликов вакансии в собственной сессии БД - ошибка не затрагивает другие вакансии"""
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    started = time.monotonic()
+    timing = {"vacancy_id": vacancy_id, "applications": 0, "seconds": 0.0, "error": None}
+    try:
+        timing["applications"] = await _sync_vacancy_applications(db, user_id, vacancy_id, hh_client, full_sync)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"[SYNC] Error syncing applications for vacancy {vacancy_id}: {str(e)}")
+        timing["error"] = str(e)
+    finally:
+        db.close()
+        timing["seconds"] = round(time.monotonic() - started, 2)
+    logger.info(f"[SYNC] Vacancy {vacancy_id}: {timing['applications']} applications in {timing['seconds']}s")
+    return timing
+
+
 async def _sync_vacancies(db: Session, user_id: UUID, hh_client) -> List[str]:
-    """Синхронизация вакансий работодателя"""
+    """Синхронизация вакансий работодателя - одна пакетная запись на страницу"""
     vacancy_ids = []
     page = 0
     per_page = 100
@@ -140,12 +209,7 @@ async def _sync_vacancies(db: Session, user_id: UUID, hh_client) -> List[str]:
         if not vacancies_data or not vacancies_data.get('items'):
             break
 
-        for vacancy_data in vacancies_data['items']:
-            try:
-                vacancy_id = await _upsert_vacancy(db, user_id, vacancy_data)
-                vacancy_ids.append(vacancy_id)
-            except Exception as e:
-                logger.error(f"Error upserting vacancy: {str(e)}")
+        vacancy_ids.extend(await _upsert_vacancies(db, user_id, vacancies_data['items']))
 
         if page >= vacancies_data.get('pages', 1) - 1:
             break
@@ -154,15 +218,25 @@ async def _sync_vacancies(db: Session, user_id: UUID, hh_client) -> List[str]:
     return vacancy_ids
 
 
-async def _upsert_vacancy(db: Session, user_id: UUID, vacancy_data: Dict) -> str:
-    """Создание или обновление вакансии"""
-    hh_vacancy_id = str(vacancy_data.get('id'))
-    existing = db.query(Vacancy).filter(
-        Vacancy.user_id == user_id,
-        Vacancy.hh_vacancy_id == hh_vacancy_id
-    ).first()
+def _parse_published_at(value: Any) -> Any:
+    """Парсинг даты published_at из ISO 8601 формата"""
+    if not value:
+        return None
+    try:
+        date_str = value
+        # Убираем timezone suffix для совместимости с fromisoformat
+        if '+' in date_str:
+            date_str = date_str.rsplit('+', 1)[0]
+        elif date_str.endswith('Z'):
+            date_str = date_str[:-1]
+        return datetime.fromisoformat(date_str)
+    except Exception as e:
+        logger.warning(f"Failed to parse published_at: {value}, error: {e}")
+        return None
 
-    # Парсинг данных из HH.ru API
+
+def _vacancy_values(user_id: UUID, vacancy_data: Dict) -> Dict[str, Any]:
+    """Поля вакансии из данных HH.ru API"""
     salary = vacancy_data.get('salary') or {}
     experience = vacancy_data.get('experience') or {}
     employment = vacancy_data.get('employment') or {}
@@ -170,24 +244,9 @@ async def _upsert_vacancy(db: Session, user_id: UUID, vacancy_data: Dict) -> str
     area = vacancy_data.get('area') or {}
     key_skills = vacancy_data.get('key_skills', [])
 
-    # Парсинг даты published_at из ISO 8601 формата
-    published_at = None
-    if vacancy_data.get('published_at'):
-        try:
-            date_str = vacancy_data['published_at']
-            # Убираем timezone suffix для совместимости с fromisoformat
-            if '+' in date_str:
-                date_str = date_str.rsplit('+', 1)[0]
-            elif date_str.endswith('Z'):
-                date_str = date_str[:-1]
-            published_at = datetime.fromisoformat(date_str)
-        except Exception as e:
-            logger.warning(f"Failed to parse published_at: {vacancy_data.get('published_at')}, error: {e}")
-            published_at = None
-
-    data = {
-        "user_id": user_id,
-        "hh_vacancy_id": hh_vacancy_id,
+    return {
+        "user_id": str(user_id),
+        "hh_vacancy_id": str(vacancy_data.get('id')),
         "title": vacancy_data.get('name', ''),
         "description": vacancy_data.get('description', ''),
         "key_skills": [skill.get('name') for skill in key_skills] if isinstance(key_skills, list) else [],
@@ -199,79 +258,190 @@ async def _upsert_vacancy(db: Session, user_id: UUID, vacancy_data: Dict) -> str
         "schedule": schedule.get('id', ''),
         "area": area.get('name', ''),
         "is_active": not vacancy_data.get('archived', False),
-        "published_at": published_at,
+        "published_at": _parse_published_at(vacancy_data.get('published_at')),
         "last_synced_at": datetime.utcnow()
     }
 
+
+async def _upsert_vacancies(db: Session, user_id: UUID, items: List[Dict]) -> List[str]:
+    """
+    Пакетное создание или обновление вакансий страницы
+
+    Returns:
+        List[str]: ID вакансий в порядке страницы
+    """
+    rows = []
+    for vacancy_data in items:
+        try:
+            rows.append(_vacancy_values(user_id, vacancy_data))
+        except Exception as e:
+            logger.error(f"Error preparing vacancy: {str(e)}")
+
+    try:
+        _upsert_rows(db, Vacancy, rows, ("user_id", "hh_vacancy_id"))
+        db.commit()
+    except Exception as e:
+        # Ошибка одной строки не должна терять страницу - повтор по одной вакансии
+        db.rollback()
+        logger.error(f"Bulk vacancy upsert failed, falling back to per-row: {str(e)}")
+        vacancy_ids = []
+        for row in rows:
+            try:
+                vacancy_ids.append(await _upsert_vacancy(db, row))
+            except Exception as row_error:
+                logger.error(f"Error upserting vacancy: {str(row_error)}")
+                db.rollback()
+        return vacancy_ids
+
+    hh_ids = [row["hh_vacancy_id"] for row in rows]
+    ids_by_hh_id = dict(
+        db.query(Vacancy.hh_vacancy_id, Vacancy.id).filter(
+            Vacancy.user_id == user_id,
+            Vacancy.hh_vacancy_id.in_(hh_ids)
+        ).all()
+    )
+    return [str(ids_by_hh_id[hh_id]) for hh_id in hh_ids if hh_id in ids_by_hh_id]
+
+
+async def _upsert_vacancy(db: Session, data: Dict[str, Any]) -> str:
+    """Создание или обновление одной вакансии (резервный путь)"""
+    existing = db.query(Vacancy).filter(
+        Vacancy.user_id == data["user_id"],
+        Vacancy.hh_vacancy_id == data["hh_vacancy_id"]
+    ).first()
+
     if existing:
         for key, value in data.items():
             if key != "user_id":
                 setattr(existing, key, value)
         db.commit()
-        db.refresh(existing)
         return str(existing.id)
     else:
         new_vacancy = Vacancy(**data)
         db.add(new_vacancy)
+        db.flush()
+        vacancy_id = str(new_vacancy.id)
         db.commit()
-        db.refresh(new_vacancy)
-        return str(new_vacancy.id)
+        return vacancy_id
 
 
-async def _sync_vacancy_applications(db: Session, user_id: UUID, vacancy_id: str, hh_client) -> int:
-    """Синхронизация откликов для вакансии"""
-    count = 0
+async def _sync_vacancy_applications(
+    db: Session,
+    user_id: UUID,
+    vacancy_id: str,
+    hh_client,
+    full_sync: bool = False
+) -> int:
+    """
+    Синхронизация откликов для вакансии
+
+    Инкрементальный режим по курсору вакансии (applications_cursor):
+    - архивная вакансия, уже синхронизированная ранее, не запрашивается
+    - если счётчики коллекций /negotiations не изменились, загружаются только первые
+      страницы коллекций: отклик может измениться без изменения счётчиков (правка резюме,
+      смена статуса), остальные страницы запрашиваются, если на первых есть изменения
+    - отклики не новее курсора и без has_updates отбрасываются до записи
+    - отклик с неизменным content_hash не перезаписывается
+    - если хотя бы один отклик не записан, курсор не сдвигается - следующая
+      синхронизация загрузит отклики повторно
+
+    Returns:
+        int: Количество созданных или изменённых откликов
+    """
     vacancy = db.query(Vacancy).filter(Vacancy.id == vacancy_id).first()
     if not vacancy:
         return 0
 
-    page = 0
-    per_page = 100
-
-    while True:
-        logger.info(f"Загрузка откликов для вакансии {vacancy.hh_vacancy_id} (страница {page})")
-        apps_data = await hh_client.get_vacancy_applications(vacancy.hh_vacancy_id, page=page, per_page=per_page)
-        logger.info(f"Получено откликов: {len(apps_data.get('items', []))}")
-        if not apps_data or not apps_data.get('items'):
-            break
-
-        for app_data in apps_data['items']:
-            try:
-                await _upsert_application(db, vacancy_id, app_data)
-                count += 1
-            except Exception as e:
-                logger.error(f"Error upserting application: {str(e)}")
-                # Откатываем транзакцию если была ошибка
-                db.rollback()
-
-        if page >= apps_data.get('pages', 1) - 1:
-            break
-        page += 1
+    cursor = vacancy.applications_cursor or {}
+    if not full_sync and cursor and not vacancy.is_active:
+        logger.info(f"Вакансия {vacancy.hh_vacancy_id} в архиве, отклики не запрашиваются")
+        return 0
 
-    # Обновляем счетчики откликов в вакансии
-    vacancy.applications_count = count
+    collections = await hh_client.get_application_collections(vacancy.hh_vacancy_id)
+    signature = {str(sub_collection.get("id")): sub_collection.get("counters", {}) for sub_collection in collections}
+    since = None if full_sync else _parse_hh_timestamp(cursor.get("updated_at"))
+
+    # Счётчики - только подсказка: решение принимается по has_updates и updated_at откликов
+    if not full_sync and collections and cursor.get("collections") == signature:
+        probe_changed = False
+        async for items in hh_client.iter_applications(
+            vacancy.hh_vacancy_id, collections=collections, first_page_only=True
+        ):
+            probe_changed = probe_changed or any(_is_application_changed(item, since) for item in items)
+        if not probe_changed:
+            logger.info(f"Отклики вакансии {vacancy.hh_vacancy_id} не изменились")
+            return 0
+
+    latest = since
+    written = 0
+    failed = 0
+
+    # Страницы обрабатываются по мере загрузки, без накопления всех откликов в памяти
+    logger.info(f"Загрузка откликов для вакансии {vacancy.hh_vacancy_id}")
+    async for items in hh_client.iter_applications(vacancy.hh_vacancy_id, collections=collections):
+        changed = []
+        for item in items:
+            updated_at = _parse_hh_timestamp(item.get("updated_at"))
+            if updated_at and (latest is None or updated_at > latest):
+                latest = updated_at
+            if _is_application_changed(item, since):
+                changed.append(item)
+
+        logger.info(f"Получено откликов: {len(items)}, к записи: {len(changed)}")
+        if changed:
+            page_written, page_failed = await _upsert_applications(
+                db, vacancy_id, changed, skip_unchanged=not full_sync
+            )
+            written += page_written
+            failed += page_failed
+
+    # Обновляем счетчики откликов и курсор вакансии
+    vacancy.applications_count = db.query(Application).filter(Application.vacancy_id == vacancy_id).count()
     vacancy.new_applications_count = db.query(Application).filter(
         Application.vacancy_id == vacancy_id,
-        Application.analyzed_at.is_(None)
+        Application.analysis_state == AnalysisState.pending.value
     ).count()
+    if failed:
+        logger.warning(
+            f"Не записано откликов вакансии {vacancy.hh_vacancy_id}: {failed}, курсор не обновлён"
+        )
+    else:
+        vacancy.applications_cursor = {
+            "collections": signature,
+            "updated_at": latest.isoformat() if latest else None
+        }
     db.commit()
 
-    return count
+    return written
 
 
-async def _upsert_application(db: Session, vacancy_id: str, application_data: Dict) -> str:
-    """Создание или обновление отклика"""
-    hh_application_id = str(application_data.get('id'))
+def _is_application_changed(item: Dict[str, Any], since: Optional[datetime]) -> bool:
+    """Отклик новее курсора или помечен HH.ru как обновлённый (has_updates)"""
+    if item.get("has_updates") or since is None:
+        return True
+    updated_at = _parse_hh_timestamp(item.get("updated_at"))
+    return updated_at is None or updated_at > since
 
-    # Ищем дубликаты по hh_application_id глобально (не только в рамках вакансии)
-    # Потому что один и тот же отклик может быть связан с разными вакансиями
-    existing = db.query(Application).filter(
-        Application.hh_application_id == hh_application_id
-    ).first()
 
-    resume = application_data.get('resume', {})
-    first_name = resume.get('first_name', '')
-    last_name = resume.get('last_name', '')
+def _parse_hh_timestamp(value: Any) -> Optional[datetime]:
+    """Время HH.ru ("2024-01-10T09:15:00+0300") как datetime с часовым поясом"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.strptime(value, "%Y-%m-%dT%H:%M:%S%z")
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _application_values(vacancy_id: str, application_data: Dict) -> Dict[str, Any]:
+    """Поля отклика из данных HH.ru API"""
+    resume = application_data.get('resume') or {}
+    first_name = resume.get('first_name') or ''
+    last_name = resume.get('last_name') or ''
     candidate_name = f"{first_name} {last_name}".strip() or "Имя не указано"
 
     # Парсинг контактов из резюме (извлекаем formatted строку из dict)
@@ -298,43 +468,178 @@ async def _upsert_application(db: Session, vacancy_id: str, application_data: Di
                     else:
                         candidate_phone = value
 
-    # Сериализуем resume_data через JSON чтобы убрать не-сериализуемые объекты
-    try:
-        resume_data_clean = json.loads(json.dumps(resume, default=str))
-    except Exception as e:
-        logger.warning(f"Failed to serialize resume_data, using empty dict: {e}")
-        resume_data_clean = {}
-
-    # Извлекаем collection_id и state из данных HH.ru
-    # collection_id берем из параметра _collection_id, если он был передан
+    # collection_id берем из _collection_id, который проставляет HHClient,
     # state извлекаем из поля state.id
     state_data = application_data.get('state', {})
     state_id = state_data.get('id') if isinstance(state_data, dict) else None
 
-    data = {
-        "vacancy_id": vacancy_id,
-        "hh_application_id": hh_application_id,
+    # resume_data - данные из JSON ответа HH.ru, повторная сериализация не нужна
+    values = {
+        "vacancy_id": str(vacancy_id),
+        "hh_application_id": str(application_data.get('id')),
         "hh_resume_id": str(resume.get('id', '')),
         "hh_negotiation_id": str(application_data.get('negotiation_id', '')),
         "candidate_name": str(candidate_name) if candidate_name else None,
         "candidate_email": str(candidate_email) if candidate_email else None,
         "candidate_phone": str(candidate_phone) if candidate_phone else None,
         "resume_url": str(resume.get('alternate_url', '')) if resume.get('alternate_url') else None,
-        "resume_data": resume_data_clean,
-        "collection_id": application_data.get('_collection_id'),  # Добавим в hh_client
+        "resume_data": resume,
+        "collection_id": application_data.get('_collection_id'),
         "state": state_id
     }
+    canonical = json.dumps(values, sort_keys=True, ensure_ascii=False, default=str)
+    values["content_hash"] = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    # status выводится из collection_id и в хеш не входит
+    values["status"] = ApplicationStatus.from_collection(values["collection_id"])
+    return values
+
+
+async def _upsert_applications(
+    db: Session,
+    vacancy_id: str,
+    items: List[Dict],
+    skip_unchanged: bool = True
+) -> Tuple[int, int]:
+    """
+    Пакетное создание или обновление откликов страницы одним коммитом
+
+    Дубликаты ищутся по hh_application_id глобально (не только в рамках вакансии),
+    потому что один и тот же отклик может быть связан с разными вакансиями
+
+    Args:
+        skip_unchanged: Не перезаписывать отклики с тем же content_hash
+
+    Returns:
+        Tuple[int, int]: (создано или изменено, не записано из-за ошибок)
+    """
+    rows = []
+    failed = 0
+    for application_data in items:
+        try:
+            rows.append(_application_values(vacancy_id, application_data))
+        except Exception as e:
+            logger.error(f"Error preparing application: {str(e)}")
+            failed += 1
+
+    change_column = "content_hash" if skip_unchanged else None
+    try:
+        written = _upsert_rows(db, Application, rows, ("hh_application_id",), change_column)
+        db.commit()
+        return written, failed
+    except Exception as e:
+        # Ошибка одной строки не должна терять страницу - повтор по одному отклику
+        db.rollback()
+        logger.error(f"Bulk application upsert failed, falling back to per-row: {str(e)}")
+
+    count = 0
+    for row in rows:
+        try:
+            if await _upsert_application(db, row, skip_unchanged):
+                count += 1
+        except Exception as e:
+            logger.error(f"Error upserting application: {str(e)}")
+            db.rollback()
+            failed += 1
+    return count, failed
+
+
+async def _upsert_application(db: Session, data: Dict[str, Any], skip_unchanged: bool = True) -> Optional[str]:
+    """
+    Создание или обновление одного отклика (резервный путь)
+
+    Returns:
+        Optional[str]: ID отклика или None, если он не изменился
+    """
+    existing = db.query(Application).filter(
+        Application.hh_application_id == data["hh_application_id"]
+    ).first()
+
+    if existing and skip_unchanged and existing.content_hash == data.get("content_hash"):
+        return None
 
     if existing:
         # Обновляем все поля, включая vacancy_id (отклик мог переместиться на другую вакансию)
         for key, value in data.items():
             setattr(existing, key, value)
         db.commit()
-        db.refresh(existing)
         return str(existing.id)
     else:
         new_app = Application(**data)
         db.add(new_app)
+        db.flush()
+        application_id = str(new_app.id)
         db.commit()
-        db.refresh(new_app)
-        return str(new_app.id)
+        return application_id
+
+
+# Размер чанка резервного пути: IN (...) укладывается в лимит параметров SQLite
+UPSERT_CHUNK_SIZE = 500
+
+
+def _upsert_rows(
+    db: Session,
+    model,
+    rows: List[Dict[str, Any]],
+    conflict_columns: Tuple[str, ...],
+    change_column: Optional[str] = None
+) -> int:
+    """
+    Пакетный upsert строк без коммита
+
+    PostgreSQL: один INSERT ... ON CONFLICT DO UPDATE на все строки.
+    Другие БД (SQLite в разработке): чанками - один SELECT существующих записей
+    на чанк, изменения отправляются при коммите
+
+    Args:
+        model: ORM модель
+        rows: Значения колонок; одинаковые ключи конфликта схлопываются (последняя строка побеждает)
+        conflict_columns: Колонки уникального ключа
+        change_column: Колонка хеша содержимого - существующие строки с тем же значением не обновляются
+
+    Returns:
+        int: Количество вставленных или обновлённых строк
+    """
+    unique_rows = {tuple(str(row[column]) for column in conflict_columns): row for row in rows}
+    if not unique_rows:
+        return 0
+    rows = list(unique_rows.values())
+    update_columns = [column for column in rows[0] if column not in conflict_columns and column != "user_id"]
+
+    if db.get_bind().dialect.name == "postgresql":
+        table = model.__table__
+        statement = pg_insert(table).values([{"id": str(uuid4()), **row} for row in rows])
+        update = {column: statement.excluded[column] for column in update_columns}
+        if "updated_at" in table.c:
+            update["updated_at"] = func.now()
+        where = table.c[change_column].is_distinct_from(statement.excluded[change_column]) if change_column else None
+        result = db.execute(statement.on_conflict_do_update(
+            index_elements=list(conflict_columns),
+            set_=update,
+            where=where
+        ))
+        return result.rowcount
+
+    written = 0
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        chunk = rows[start:start + UPSERT_CHUNK_SIZE]
+        filters = [
+            getattr(model, column).in_({row[column] for row in chunk})
+            for column in conflict_columns
+        ]
+        existing = {
+            tuple(str(getattr(obj, column)) for column in conflict_columns): obj
+            for obj in db.query(model).filter(*filters).all()
+        }
+        for row in chunk:
+            obj = existing.get(tuple(str(row[column]) for column in conflict_columns))
+            if obj is None:
+                # Строковый id: пакетный INSERT сверяет ключи с тем, что возвращает GUID
+                db.add(model(id=str(uuid4()), **row))
+                written += 1
+                continue
+            if change_column and getattr(obj, change_column) == row[change_column]:
+                continue
+            for column in update_columns:
+                setattr(obj, column, row[column])
+            written += 1
+    return written
@@ -0,0 +1,31 @@
+"""
+Запуск RQ воркера Timly
+Использование: python -m app.workers.worker [queue ...]
+
+Воркеры масштабируются отдельно от API - количество процессов
+определяется деплоем (Procfile / docker-compose)
+"""
+import sys
+
+from rq import Worker
+
+import app.models  # noqa: F401 - регистрация всех моделей SQLAlchemy до первой задачи
+from app.utils.logger import setup_logging, setup_sentry
+from app.workers.queue import ANALYSIS_QUEUES, get_redis_connection
+from app.workers.scheduler import get_scheduler
+
+
+def main():
+    setup_logging()
+    setup_sentry()
+
+    # Чанки, ожидавшие освобождения слотов (например, после падения воркера), передаются сразу
+    get_scheduler().dispatch()
+
+    queue_names = sys.argv[1:] or list(ANALYSIS_QUEUES.values())
+    worker = Worker(queue_names, connection=get_redis_connection())
+    worker.work(with_scheduler=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Бенчмарк HHClient против локального стенда HH.ru (hh_stub_server.py)
+Замеряет загрузку вакансий, откликов по коллекциям и постраничный поиск резюме
+настоящим HHClient - с пулом соединений, лимитером и обработкой 429
+
+Использование:
+    python hh_stub_server.py --port 8900 &
+    python benchmark_hh_client.py [--base-url http://127.0.0.1:8900] [--search-results 500] [--sync]
+
+--sync дополнительно запускает полную синхронизацию (run_vacancy_sync) во временного
+пользователя в БД из DATABASE_URL; созданные данные удаляются после замера
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import httpx
+
+from app.config import settings
+
+
+def percentile(values, share: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+def report(label: str, seconds: float, requests: int, items: int):
+    print(
+        f"  {label:<12} {seconds:8.2f}s  {requests:6d} запросов  {requests / seconds if seconds else 0:8.1f} req/s"
+        f"  {items:7d} объектов  {items / seconds if seconds else 0:9.1f} obj/s"
+    )
+
+
+async def fetch_stub_stats(base_url: str):
+    async with httpx.AsyncClient() as client:
+        try:
+            return (await client.get(f"{base_url}/_stub/stats")).json()
+        except Exception:
+            return {}
+
+
+async def bench_client(token: str, search_text: str, search_results: int):
+    from app.services.hh_client import HHClient
+    from app.services.hh_rate_limiter import get_hh_rate_limiter
+
+    async with HHClient(token) as client:
+        print("HHClient:")
+
+        started = time.perf_counter()
+        vacancy_ids, page, requests = [], 0, 0
+        while True:
+            data = await client.get_my_vacancies(page=page, per_page=100)
+            requests += 1
+            vacancy_ids.extend(item["id"] for item in data.get("items", []))
+            if page >= data.get("pages", 1) - 1:
+                break
+            page += 1
+        report("вакансии", time.perf_counter() - started, requests, len(vacancy_ids))
+
+        semaphore = asyncio.Semaphore(max(1, settings.HH_SYNC_VACANCY_CONCURRENCY))
+        vacancy_seconds = []
+
+        async def load(vacancy_id: str):
+            async with semaphore:
+                vacancy_started = time.perf_counter()
+                pages = items = 0
+                async for page_items in client.iter_applications(vacancy_id):
+                    pages += 1
+                    items += len(page_items)
+                vacancy_seconds.append(time.perf_counter() - vacancy_started)
+                return pages, items
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(load(vacancy_id) for vacancy_id in vacancy_ids))
+        elapsed = time.perf_counter() - started
+        pages = sum(result[0] for result in results) + len(vacancy_ids)
+        report("отклики", elapsed, pages, sum(result[1] for result in results))
+        print(
+            f"  {'':<12} вакансия: p50 {percentile(vacancy_seconds, 0.5):.2f}s, "
+            f"p95 {percentile(vacancy_seconds, 0.95):.2f}s, max {max(vacancy_seconds or [0]):.2f}s"
+        )
+
+        started = time.perf_counter()
+        found, page, requests = 0, 0, 0
+        while found < search_results:
+            data = await client.search_resumes(text=search_text, page=page, per_page=50)
+            requests += 1
+            found += len(data.get("items", []))
+            if not data.get("items") or page >= data.get("pages", 1) - 1:
+                break
+            page += 1
+        report("поиск", time.perf_counter() - started, requests, found)
+
+        print(f"  лимитер: {get_hh_rate_limiter(token).get_stats()}")
+
+
+async def bench_sync(token: str):
+    from app.database import SessionLocal
+    from app.models import User, Vacancy, Application
+    from app.models.application import SyncJob
+    from app.services.encryption import token_encryption
+    from app.workers.sync_jobs import run_vacancy_sync
+
+    db = SessionLocal()
+    run_id = uuid.uuid4().hex[:8]
+    user = User(
+        email=f"bench-hh-{run_id}@example.com",
+        password_hash="x",
+        encrypted_hh_token=token_encryption.encrypt(token),
+        token_verified=True
+    )
+    db.add(user)
+    db.flush()
+    job = SyncJob(user_id=user.id, status="pending")
+    db.add(job)
+    db.commit()
+    user_id, job_id = user.id, job.id
+
+    print("Синхронизация (run_vacancy_sync, полная):")
+    try:
+        started = time.perf_counter()
+        await run_vacancy_sync(user_id, job_id, full_sync=True)
+        elapsed = time.perf_counter() - started
+        db.expire_all()
+        job = db.query(SyncJob).filter(SyncJob.id == job_id).first()
+        print(
+            f"  {elapsed:.2f}s, статус {job.status}: {job.vacancies_synced} вакансий, "
+            f"{job.applications_synced} откликов ({job.applications_synced / elapsed if elapsed else 0:.0f}/s)"
+        )
+        if job.errors:
+            print(f"  ошибки: {job.errors[:3]}")
+    finally:
+        vacancy_ids = [row.id for row in db.query(Vacancy.id).filter(Vacancy.user_id == user_id)]
+        if vacancy_ids:
+            db.query(Application).filter(Application.vacancy_id.in_(vacancy_ids)).delete(synchronize_session=False)
+        db.query(Vacancy).filter(Vacancy.user_id == user_id).delete(synchronize_session=False)
+        db.query(SyncJob).filter(SyncJob.user_id == user_id).delete(synchronize_session=False)
+        db.query(User).filter(User.id == user_id).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+
+async def run(args):
+    print(
+        f"Стенд: {settings.HH_API_BASE_URL}, лимитер {settings.HH_REQUESTS_PER_SECOND} req/s "
+        f"(burst {settings.HH_REQUESTS_BURST}), страниц параллельно {settings.HH_PAGE_CONCURRENCY}, "
+        f"вакансий параллельно {settings.HH_SYNC_VACANCY_CONCURRENCY}"
+    )
+    await bench_client(args.token, args.search_text, args.search_results)
+    if args.sync:
+        await bench_sync(args.token)
+    stats = await fetch_stub_stats(settings.HH_API_BASE_URL)
+    if stats:
+        print(f"Стенд: {stats['total_requests']} запросов, 429: {stats['throttled']}, по эндпоинтам {stats['requests']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк HHClient против локального стенда HH.ru")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8900", help="Адрес hh_stub_server.py")
+    parser.add_argument("--token", default=f"bench-{uuid.uuid4().hex[:8]}", help="HH.ru токен (любой для стенда)")
+    parser.add_argument("--search-text", default="менеджер маркетплейсов")
+    parser.add_argument("--search-results", type=int, default=500, help="Сколько резюме загрузить поиском")
+    parser.add_argument("--sync", action="store_true", help="Также замерить полную синхронизацию с записью в БД")
+    args = parser.parse_args()
+
+    settings.HH_API_BASE_URL = args.base_url
+    settings.HH_MOCK_MODE = False
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
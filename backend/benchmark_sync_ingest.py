@@ -0,0 +1,136 @@
+"""
+Бенчмарк записи откликов при синхронизации с HH.ru
+Сравнивает построчный upsert (SELECT + commit + refresh на каждый отклик)
+с пакетной записью страницы (_upsert_applications)
+
+Использование: python benchmark_sync_ingest.py [--rows 2000] [--page-size 20]
+Работает с БД из DATABASE_URL; созданные данные удаляются после замера
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.database import SessionLocal
+from app.models import User, Vacancy, Application
+from app.workers.sync_jobs import _upsert_applications
+
+
+def make_items(count: int, run_id: str, version: int):
+    """Отклики в формате HH.ru API"""
+    return [
+        {
+            "id": f"bench-{run_id}-{i}",
+            "state": {"id": "response", "name": "Отклик"},
+            "_collection_id": "response",
+            "resume": {
+                "id": f"resume-{run_id}-{i}",
+                "first_name": "Иван",
+                "last_name": f"Бенчмарков {i}",
+                "title": f"Менеджер маркетплейсов v{version}",
+                "alternate_url": f"https://hh.ru/resume/{run_id}-{i}",
+                "contact": [
+                    {"type": {"id": "email"}, "value": f"candidate{i}@example.com"},
+                    {"type": {"id": "cell"}, "value": {"formatted": "+7 (999) 123-45-67"}},
+                ],
+                "skill_set": ["Wildberries", "Ozon", "Excel"],
+                "experience": [
+                    {"company": "ООО Ромашка", "position": "Менеджер", "description": "Ведение карточек " * 20}
+                ],
+            },
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_upsert(db, vacancy_id: str, application_data: dict):
+    """Построчный путь до пакетной записи: SELECT, копия resume через JSON, commit и refresh"""
+    hh_application_id = str(application_data["id"])
+    existing = db.query(Application).filter(Application.hh_application_id == hh_application_id).first()
+    resume = application_data.get("resume", {})
+    data = {
+        "vacancy_id": vacancy_id,
+        "hh_application_id": hh_application_id,
+        "hh_resume_id": str(resume.get("id", "")),
+        "candidate_name": f"{resume.get('first_name', '')} {resume.get('last_name', '')}".strip(),
+        "resume_url": resume.get("alternate_url"),
+        "resume_data": json.loads(json.dumps(resume, default=str)),
+        "collection_id": application_data.get("_collection_id"),
+        "state": application_data.get("state", {}).get("id"),
+    }
+    if existing:
+        for key, value in data.items():
+            setattr(existing, key, value)
+        db.commit()
+        db.refresh(existing)
+    else:
+        application = Application(**data)
+        db.add(application)
+        db.commit()
+        db.refresh(application)
+
+
+def measure(label: str, rows: int, fn) -> float:
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed else 0.0
+    print(f"  {label:<28} {elapsed:8.2f}s  {rate:10.0f} rows/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк записи откликов HH.ru")
+    parser.add_argument("--rows", type=int, default=2000, help="Количество откликов")
+    parser.add_argument("--page-size", type=int, default=20, help="Откликов на странице HH.ru")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    run_id = uuid.uuid4().hex[:8]
+    user = User(email=f"bench-{run_id}@example.com", password_hash="x")
+    db.add(user)
+    db.flush()
+    vacancies = {}
+    for name in ("legacy", "bulk"):
+        vacancy = Vacancy(user_id=user.id, hh_vacancy_id=f"bench-{run_id}-{name}", title="Бенчмарк", key_skills=[])
+        db.add(vacancy)
+        db.flush()
+        vacancies[name] = str(vacancy.id)
+    db.commit()
+
+    print(f"БД: {db.get_bind().dialect.name}, откликов: {args.rows}, страница: {args.page_size}")
+    try:
+        for phase, version in (("insert", 1), ("update", 2)):
+            print(f"{phase}:")
+            legacy_items = make_items(args.rows, f"{run_id}-legacy", version)
+            bulk_items = make_items(args.rows, f"{run_id}-bulk", version)
+
+            def run_legacy():
+                for item in legacy_items:
+                    legacy_upsert(db, vacancies["legacy"], item)
+
+            def run_bulk():
+                async def ingest():
+                    for start in range(0, len(bulk_items), args.page_size):
+                        await _upsert_applications(db, vacancies["bulk"], bulk_items[start:start + args.page_size])
+                asyncio.run(ingest())
+
+            before = measure("построчно (до)", args.rows, run_legacy)
+            after = measure("пакетом страницы (после)", args.rows, run_bulk)
+            print(f"  ускорение: x{after / before:.1f}" if before else "")
+    finally:
+        db.rollback()
+        db.query(Application).filter(Application.vacancy_id.in_(list(vacancies.values()))).delete(synchronize_session=False)
+        db.query(Vacancy).filter(Vacancy.user_id == user.id).delete(synchronize_session=False)
+        db.query(User).filter(User.id == user.id).delete(synchronize_session=False)
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,496 @@
+"""
+Локальный HTTP сервер вместо HH.ru API для нагрузочного тестирования
+В отличие от HHMockService работает по HTTP: настоящий HHClient проверяет пул соединений,
+пагинацию по URL коллекций откликов, 429/Retry-After и медленные хвосты задержек
+
+Эндпоинты: /me, /vacancies, /vacancies/{id}, /negotiations, /negotiations/{collection},
+/resumes, /resumes/{id}, /dictionaries, /areas и /_stub/stats со счётчиками запросов
+
+Данные генерируются детерминированно по --seed при каждом запросе и не хранятся в памяти,
+поэтому масштаб ограничен только временем ответа
+
+Использование:
+    python hh_stub_server.py [--port 8900] [--vacancies 20] [--applications 500]
+        [--latency-ms 80] [--latency-p99-ms 600] [--rate-limit 20] [--retry-after 1]
+
+    HH_API_BASE_URL=http://127.0.0.1:8900 HH_MOCK_MODE=false - приложение и воркеры
+    работают с сервером вместо api.hh.ru (токен HH.ru - любая непустая строка)
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+EMPLOYER_ID = "1455"
+
+# Коллекции откликов: id, название, доля откликов вакансии
+COLLECTIONS = [
+    ("response", "Отклики", 0.6),
+    ("consider", "Подумать", 0.15),
+    ("phone_interview", "Телефонное интервью", 0.1),
+    ("interview", "Собеседование", 0.08),
+    ("offer", "Предложение о работе", 0.02),
+    ("discard_by_employer", "Отказ", 0.05),
+]
+COLLECTION_NAMES = {collection_id: name for collection_id, name, _ in COLLECTIONS}
+
+FIRST_NAMES = ["Анна", "Мария", "Елена", "Ольга", "Иван", "Дмитрий", "Алексей", "Сергей", "Наталья", "Павел"]
+LAST_NAMES = ["Иванова", "Смирнова", "Кузнецова", "Попова", "Петров", "Соколов", "Лебедев", "Козлов", "Новикова", "Морозов"]
+TITLES = [
+    "Менеджер маркетплейсов", "Python разработчик", "Аналитик данных", "Менеджер по продажам",
+    "Бухгалтер", "Специалист по закупкам", "Frontend разработчик", "HR менеджер",
+]
+SKILLS = [
+    "Wildberries", "Ozon", "Excel", "1С", "SQL", "Python", "FastAPI", "React",
+    "Переговоры", "B2B продажи", "Аналитика", "Power BI", "CRM", "Закупки",
+]
+COMPANIES = ["ООО Ромашка", "АО Вектор", "ООО Северный ветер", "ПАО Горизонт", "ООО Маркет Про"]
+
+EXPERIENCE = [
+    {"id": "noExperience", "name": "Нет опыта"},
+    {"id": "between1And3", "name": "От 1 года до 3 лет"},
+    {"id": "between3And6", "name": "От 3 до 6 лет"},
+    {"id": "moreThan6", "name": "Более 6 лет"},
+]
+EMPLOYMENT = [
+    {"id": "full", "name": "Полная занятость"},
+    {"id": "part", "name": "Частичная занятость"},
+    {"id": "project", "name": "Проектная работа"},
+]
+SCHEDULE = [
+    {"id": "fullDay", "name": "Полный день"},
+    {"id": "remote", "name": "Удаленная работа"},
+    {"id": "flexible", "name": "Гибкий график"},
+]
+CITIES = [("1", "Москва"), ("2", "Санкт-Петербург"), ("3", "Екатеринбург"), ("4", "Новосибирск"), ("88", "Казань")]
+
+DICTIONARIES = {
+    "experience": EXPERIENCE,
+    "employment": EMPLOYMENT,
+    "schedule": SCHEDULE,
+    "education_level": [
+        {"id": "secondary", "name": "Среднее"},
+        {"id": "special_secondary", "name": "Среднее специальное"},
+        {"id": "unfinished_higher", "name": "Неоконченное высшее"},
+        {"id": "higher", "name": "Высшее"},
+        {"id": "bachelor", "name": "Бакалавр"},
+        {"id": "master", "name": "Магистр"},
+    ],
+    "gender": [{"id": "male", "name": "Мужской"}, {"id": "female", "name": "Женский"}],
+    "resume_search_job_search_status": [
+        {"id": "active_search", "name": "Активно ищет работу"},
+        {"id": "looking_for_offers", "name": "Рассматривает предложения"},
+        {"id": "not_looking_for_job", "name": "Не ищет работу"},
+    ],
+    "relocation_type": [
+        {"id": "living", "name": "Только проживающие"},
+        {"id": "living_or_relocation", "name": "Проживающие или готовые к переезду"},
+        {"id": "relocation", "name": "Готовые к переезду"},
+    ],
+    "currency": [{"code": "RUR", "abbr": "₽", "name": "Рубли", "rate": 1.0}],
+}
+
+# Глубина выдачи поиска резюме, как у HH.ru
+SEARCH_DEPTH = 2000
+# Размер страницы коллекции откликов (per_page коллекции не поддерживают)
+COLLECTION_PAGE_SIZE = 20
+
+
+@dataclass
+class StubConfig:
+    """Масштаб данных и поведение сервера"""
+    vacancies: int = 20
+    applications: int = 500
+    resumes: int = 5000
+    areas: int = 2000
+    seed: int = 42
+    latency_ms: float = 80.0
+    latency_p99_ms: float = 600.0
+    rate_limit: int = 0
+    retry_after: int = 1
+
+
+def _rng(*parts) -> random.Random:
+    """Детерминированный генератор для объекта - данные одинаковы между запросами"""
+    return random.Random("|".join(str(part) for part in parts))
+
+
+def _timestamp(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%S%z")
+
+
+class StubData:
+    """Генерация вакансий, откликов, резюме и регионов по seed"""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.epoch = datetime(2026, 1, 1, tzinfo=timezone(timedelta(hours=3)))
+        self.areas = self._build_areas()
+
+    def vacancy_id(self, index: int) -> str:
+        return str(100_000_000 + index)
+
+    def vacancy_index(self, vacancy_id: str) -> Optional[int]:
+        try:
+            index = int(vacancy_id) - 100_000_000
+        except ValueError:
+            return None
+        return index if 0 <= index < self.config.vacancies else None
+
+    def vacancy(self, index: int, base_url: str) -> Dict[str, Any]:
+        rng = _rng(self.config.seed, "vacancy", index)
+        vacancy_id = self.vacancy_id(index)
+        salary_from = rng.randrange(40, 250) * 1000
+        area_id, area_name = rng.choice(CITIES)
+        skills = rng.sample(SKILLS, 5)
+        title = rng.choice(TITLES)
+        return {
+            "id": vacancy_id,
+            "name": title,
+            "description": f"<p>Ищем: {title}. Требования: {', '.join(skills)}.</p>" * 3,
+            "key_skills": [{"name": skill} for skill in skills],
+            "salary": {"from": salary_from, "to": salary_from + 50_000, "currency": "RUR", "gross": False},
+            "experience": rng.choice(EXPERIENCE),
+            "employment": rng.choice(EMPLOYMENT),
+            "schedule": rng.choice(SCHEDULE),
+            "area": {"id": area_id, "name": area_name, "url": f"{base_url}/areas/{area_id}"},
+            "employer": {"id": EMPLOYER_ID, "name": "Стенд HH.ru"},
+            "archived": False,
+            "published_at": _timestamp(self.epoch + timedelta(hours=index)),
+            "url": f"{base_url}/vacancies/{vacancy_id}",
+            "alternate_url": f"https://hh.ru/vacancy/{vacancy_id}",
+        }
+
+    def collection_sizes(self, index: int) -> Dict[str, int]:
+        """Число откликов вакансии по коллекциям"""
+        total = max(0, int(self.config.applications * _rng(self.config.seed, "volume", index).uniform(0.5, 1.5)))
+        sizes = {collection_id: int(total * share) for collection_id, _, share in COLLECTIONS}
+        sizes["response"] += total - sum(sizes.values())
+        return sizes
+
+    def resume_id(self, resume_index: int) -> str:
+        """ID резюме: хеш + порядковый номер, по которому резюме восстанавливается в /resumes/{id}"""
+        digest = hashlib.md5(f"{self.config.seed}:{resume_index}".encode()).hexdigest()
+        return f"{digest[:26]}{resume_index:012x}"
+
+    def resume_index(self, resume_id: str) -> Optional[int]:
+        try:
+            return int(resume_id[-12:], 16) if len(resume_id) == 38 else None
+        except ValueError:
+            return None
+
+    def resume(self, resume_index: int, base_url: str, full: bool = True) -> Dict[str, Any]:
+        rng = _rng(self.config.seed, "resume", resume_index)
+        resume_id = self.resume_id(resume_index)
+        area_id, area_name = rng.choice(CITIES)
+        updated = self.epoch + timedelta(minutes=resume_index % 100_000)
+        resume = {
+            "id": resume_id,
+            "title": rng.choice(TITLES),
+            "first_name": rng.choice(FIRST_NAMES),
+            "last_name": rng.choice(LAST_NAMES),
+            "age": rng.randrange(20, 55),
+            "area": {"id": area_id, "name": area_name},
+            "salary": {"amount": rng.randrange(40, 300) * 1000, "currency": "RUR"},
+            "total_experience": {"months": rng.randrange(0, 240)},
+            "updated_at": _timestamp(updated),
+            "url": f"{base_url}/resumes/{resume_id}",
+            "alternate_url": f"https://hh.ru/resume/{resume_id}",
+        }
+        if full:
+            resume.update({
+                "skill_set": rng.sample(SKILLS, rng.randrange(3, 8)),
+                "contact": [
+                    {"type": {"id": "email"}, "value": f"candidate{resume_index}@example.com"},
+                    {"type": {"id": "cell"}, "value": {"formatted": f"+7 (9{resume_index % 100:02d}) 123-45-67"}},
+                ],
+                "experience": [
+                    {
+                        "company": rng.choice(COMPANIES),
+                        "position": rng.choice(TITLES),
+                        "start": "2020-01-01",
+                        "end": None if job == 0 else "2022-12-01",
+                        "description": "Ведение ассортимента, отчётность, работа с поставщиками. " * rng.randrange(2, 8),
+                    }
+                    for job in range(rng.randrange(1, 4))
+                ],
+                "education": {"level": rng.choice(DICTIONARIES["education_level"])},
+            })
+        return resume
+
+    def application(self, vacancy_index: int, collection_id: str, position: int, base_url: str) -> Dict[str, Any]:
+        # Сквозной номер отклика вакансии: коллекции идут друг за другом в порядке COLLECTIONS
+        sizes = self.collection_sizes(vacancy_index)
+        offset = 0
+        for collection_id_, _, _ in COLLECTIONS:
+            if collection_id_ == collection_id:
+                break
+            offset += sizes[collection_id_]
+        number = offset + position
+        rng = _rng(self.config.seed, "application", vacancy_index, number)
+        created = self.epoch + timedelta(days=vacancy_index % 30, minutes=number * 7)
+        updated = created + timedelta(hours=rng.randrange(0, 72))
+        return {
+            "id": str(vacancy_index * 1_000_000 + number + 1),
+            "state": {"id": collection_id, "name": COLLECTION_NAMES[collection_id]},
+            "created_at": _timestamp(created),
+            "updated_at": _timestamp(updated),
+            "has_updates": rng.random() < 0.1,
+            "resume": self.resume(vacancy_index * 1_000_000 + number, base_url),
+        }
+
+    def _build_areas(self) -> List[Dict[str, Any]]:
+        """Дерево регионов: страна - регионы - города, всего около config.areas узлов"""
+        regions_count = max(1, int(math.sqrt(self.config.areas)))
+        cities_per_region = max(0, self.config.areas // regions_count - 1)
+        regions = []
+        for region in range(regions_count):
+            region_id = str(1000 + region)
+            regions.append({
+                "id": region_id,
+                "parent_id": "113",
+                "name": f"Область {region + 1}",
+                "areas": [
+                    {"id": f"{region_id}{city:04d}", "parent_id": region_id, "name": f"Город {region + 1}-{city + 1}", "areas": []}
+                    for city in range(cities_per_region)
+                ],
+            })
+        cities = [{"id": area_id, "parent_id": "113", "name": name, "areas": []} for area_id, name in CITIES]
+        return [{"id": "113", "parent_id": None, "name": "Россия", "areas": cities + regions}]
+
+
+class StubState:
+    """Счётчики запросов и лимит запросов в секунду на токен"""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.requests: Counter = Counter()
+        self.throttled = 0
+        self.windows: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0])
+        self.started = time.monotonic()
+        # Медиана и p99 задают логнормальное распределение задержки
+        self.mu = math.log(max(config.latency_ms, 0.001))
+        self.sigma = max(0.0, math.log(max(config.latency_p99_ms, config.latency_ms) / max(config.latency_ms, 0.001)) / 2.326)
+
+    def latency(self) -> float:
+        if self.config.latency_ms <= 0:
+            return 0.0
+        return random.lognormvariate(self.mu, self.sigma) / 1000
+
+    def allow(self, token: str) -> bool:
+        """Фиксированное окно в одну секунду на токен"""
+        if not self.config.rate_limit:
+            return True
+        window = self.windows[token]
+        now = time.monotonic()
+        if now - window[0] >= 1.0:
+            window[0], window[1] = now, 0
+        window[1] += 1
+        return window[1] <= self.config.rate_limit
+
+
+def _page(total: int, page: int, per_page: int) -> Dict[str, int]:
+    pages = max(1, math.ceil(total / per_page)) if per_page else 1
+    return {"found": total, "pages": pages, "page": page, "per_page": per_page}
+
+
+def _int(value: Optional[str], default: int) -> int:
+    try:
+        return int(value) if value is not None else default
+    except ValueError:
+        return default
+
+
+def _error(status_code: int, value: str, description: str) -> JSONResponse:
+    return JSONResponse({"description": description, "errors": [{"type": value}]}, status_code=status_code)
+
+
+def _cached_json(request: Request, payload: Any, max_age: int = 3600) -> Response:
+    """Ответ справочника с ETag: при совпадении If-None-Match - 304 без тела"""
+    body = json.dumps(payload, ensure_ascii=False).encode()
+    etag = f'"{hashlib.md5(body).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": f"max-age={max_age}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    """FastAPI приложение стенда HH.ru"""
+    app = FastAPI(title="HH.ru API stub", docs_url=None, redoc_url=None)
+    data = StubData(config)
+    state = StubState(config)
+
+    @app.middleware("http")
+    async def emulate_api(request: Request, call_next):
+        path = request.url.path
+        if path.startswith("/_stub"):
+            return await call_next(request)
+
+        state.requests[path.split("/")[1] or "/"] += 1
+        await asyncio.sleep(state.latency())
+
+        authorization = request.headers.get("authorization", "")
+        if not authorization.startswith("Bearer ") or not authorization[7:].strip():
+            return _error(401, "oauth", "Требуется токен авторизации")
+        if not state.allow(authorization[7:]):
+            state.throttled += 1
+            response = _error(429, "too_many_requests", "Превышен лимит запросов")
+            response.headers["Retry-After"] = str(config.retry_after)
+            return response
+        return await call_next(request)
+
+    def base_url(request: Request) -> str:
+        return str(request.base_url).rstrip("/")
+
+    @app.get("/me")
+    async def me():
+        return {
+            "id": "1",
+            "first_name": "Стенд",
+            "last_name": "HH.ru",
+            "is_employer": True,
+            "employer": {"id": EMPLOYER_ID, "name": "Стенд HH.ru"},
+        }
+
+    @app.get("/vacancies")
+    async def vacancies(request: Request):
+        page = _int(request.query_params.get("page"), 0)
+        per_page = min(_int(request.query_params.get("per_page"), 20), 100)
+        employer_id = request.query_params.get("employer_id")
+        total = config.vacancies if employer_id in (None, EMPLOYER_ID) else 0
+        start = page * per_page
+        items = [data.vacancy(index, base_url(request)) for index in range(start, min(total, start + per_page))]
+        return {"items": items, **_page(total, page, per_page)}
+
+    @app.get("/vacancies/{vacancy_id}")
+    async def vacancy(vacancy_id: str, request: Request):
+        index = data.vacancy_index(vacancy_id)
+        if index is None:
+            return _error(404, "not_found", "Вакансия не найдена")
+        return data.vacancy(index, base_url(request))
+
+    @app.get("/negotiations")
+    async def negotiations(request: Request):
+        index = data.vacancy_index(request.query_params.get("vacancy_id", ""))
+        if index is None:
+            return _error(404, "not_found", "Вакансия не найдена")
+        vacancy_id = data.vacancy_id(index)
+        sizes = data.collection_sizes(index)
+        collections = []
+        for collection_id, name, _ in COLLECTIONS:
+            url = f"{base_url(request)}/negotiations/{collection_id}?vacancy_id={vacancy_id}"
+            counters = {"total": sizes[collection_id], "new": sizes[collection_id] // 10}
+            collections.append({
+                "id": collection_id,
+                "name": name,
+                "url": url,
+                "counters": counters,
+                "sub_collections": [
+                    {"id": collection_id, "name": name, "url": url, "counters": counters, "root_collection": True}
+                ],
+            })
+        return {"collections": collections}
+
+    @app.get("/negotiations/{collection_id}")
+    async def collection(collection_id: str, request: Request):
+        index = data.vacancy_index(request.query_params.get("vacancy_id", ""))
+        if index is None or collection_id not in COLLECTION_NAMES:
+            return _error(404, "not_found", "Коллекция не найдена")
+        page = _int(request.query_params.get("page"), 0)
+        total = data.collection_sizes(index)[collection_id]
+        start = page * COLLECTION_PAGE_SIZE
+        items = [
+            data.application(index, collection_id, position, base_url(request))
+            for position in range(start, min(total, start + COLLECTION_PAGE_SIZE))
+        ]
+        return {"items": items, **_page(total, page, COLLECTION_PAGE_SIZE)}
+
+    @app.get("/resumes")
+    async def resumes(request: Request):
+        page = _int(request.query_params.get("page"), 0)
+        per_page = min(_int(request.query_params.get("per_page"), 20), 100)
+        if (page + 1) * per_page > SEARCH_DEPTH:
+            return _error(400, "bad_argument", f"Глубина выдачи ограничена {SEARCH_DEPTH} резюме")
+        # Число найденных зависит от запроса, чтобы разные поиски отличались
+        text = request.query_params.get("text", "")
+        found = int(config.resumes * _rng(config.seed, "search", text).uniform(0.2, 1.0))
+        offset = _rng(config.seed, "search-offset", text).randrange(0, 10_000_000)
+        start = page * per_page
+        items = [
+            data.resume(offset + position, base_url(request), full=False)
+            for position in range(start, min(found, start + per_page))
+        ]
+        pages = _page(found, page, per_page)
+        pages["pages"] = min(pages["pages"], max(1, SEARCH_DEPTH // per_page))
+        return {"items": items, **pages}
+
+    @app.get("/resumes/{resume_id}")
+    async def resume(resume_id: str, request: Request):
+        index = data.resume_index(resume_id)
+        if index is None or data.resume_id(index) != resume_id:
+            return _error(404, "not_found", "Резюме не найдено")
+        return data.resume(index, base_url(request))
+
+    @app.get("/dictionaries")
+    async def dictionaries(request: Request):
+        return _cached_json(request, DICTIONARIES)
+
+    @app.get("/areas")
+    async def areas(request: Request):
+        return _cached_json(request, data.areas)
+
+    @app.get("/_stub/stats")
+    async def stats():
+        return {
+            "requests": dict(state.requests),
+            "total_requests": sum(state.requests.values()),
+            "throttled": state.throttled,
+            "uptime_seconds": round(time.monotonic() - state.started, 1),
+        }
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный стенд HH.ru API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--vacancies", type=int, default=20, help="Вакансий работодателя")
+    parser.add_argument("--applications", type=int, default=500, help="Откликов на вакансию в среднем (±50%)")
+    parser.add_argument("--resumes", type=int, default=5000, help="Максимум найденных резюме на поисковый запрос")
+    parser.add_argument("--areas", type=int, default=2000, help="Узлов в дереве регионов")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="Медиана задержки ответа")
+    parser.add_argument("--latency-p99-ms", type=float, default=600.0, help="99-й перцентиль задержки")
+    parser.add_argument("--rate-limit", type=int, default=0, help="Запросов в секунду на токен до 429 (0 - без лимита)")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After ответа 429, секунд")
+    args = parser.parse_args()
+
+    config = StubConfig(
+        vacancies=args.vacancies,
+        applications=args.applications,
+        resumes=args.resumes,
+        areas=args.areas,
+        seed=args.seed,
+        latency_ms=args.latency_ms,
+        latency_p99_ms=args.latency_p99_ms,
+        rate_limit=args.rate_limit,
+        retry_after=args.retry_after,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
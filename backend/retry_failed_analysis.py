@@ -8,22 +8,19 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from app.database import SessionLocal
-from app.models.application import Application, AnalysisResult
+from app.models.application import Application, AnalysisState, ApplicationStatus
 from app.services.ai_analyzer import AIAnalyzer
-from sqlalchemy import select
+from app.workers.analysis_pipeline import save_analysis_result
 
 async def retry_failed_analyses(vacancy_id: str):
     db = SessionLocal()
 
     try:
         # Находим неанализированные отклики
-        unanalyzed = db.query(Application).outerjoin(
-            AnalysisResult,
-            Application.id == AnalysisResult.application_id
-        ).filter(
+        unanalyzed = db.query(Application).filter(
             Application.vacancy_id == vacancy_id,
-            Application.collection_id.like('%response%'),
-            AnalysisResult.id == None
+            Application.status == ApplicationStatus.response.value,
+            Application.analysis_state == AnalysisState.pending.value
         ).all()
 
         print(f"Найдено неанализированных резюме: {len(unanalyzed)}")
@@ -62,26 +59,8 @@ async def retry_failed_analyses(vacancy_id: str):
                     continue
 
                 # Сохранение
-                analysis_result = AnalysisResult(
-                    application_id=application.id,
-                    score=ai_result.get("score"),
-                    skills_match=ai_result.get("skills_match"),
-                    experience_match=ai_result.get("experience_match"),
-                    salary_match=ai_result.get("salary_match"),
-                    strengths=ai_result.get("strengths", []),
-                    weaknesses=ai_result.get("weaknesses", []),
-                    red_flags=ai_result.get("red_flags", []),
-                    recommendation=ai_result.get("recommendation"),
-                    reasoning=ai_result.get("reasoning"),
-                    ai_model=ai_result.get("ai_model"),
-                    ai_tokens_used=ai_result.get("ai_tokens_used"),
-                    ai_cost_rub=ai_result.get("ai_cost_rub"),
-                    processing_time_ms=ai_result.get("processing_time_ms"),
-                    raw_result=ai_result
-                )
-
-                db.add(analysis_result)
-                db.commit()
+                # Вместе с результатом проставляет analyzed_at и analysis_state
+                save_analysis_result(db, str(application.id), ai_result)
 
                 print(f"  [OK] Успешно: score={ai_result.get('score')}, recommendation={ai_result.get('recommendation')}")
                 successful += 1
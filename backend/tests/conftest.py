@@ -7,12 +7,14 @@ import asyncio
 from typing import Generator
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from unittest.mock import Mock, AsyncMock, patch
 
 # Импорты приложения
 from app.main import app
-from app.database import get_db, Base
+from app.database import get_db, get_async_db, Base
 from app.models.user import User
 
 
@@ -24,6 +26,10 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async endpoints - та же БД; NullPool: у каждого TestClient свой event loop
+async_engine = create_async_engine("sqlite+aiosqlite:///./test_timly.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 def override_get_db():
     """Override для подключения к тестовой БД"""
@@ -34,6 +40,12 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    """Override async сессии для тестовой БД"""
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
 @pytest.fixture(scope="session", autouse=True)
 def setup_test_db():
     """Настройка тестовой базы данных для всей сессии"""
@@ -42,6 +54,7 @@ def setup_test_db():
 
     # Переопределяем зависимость БД
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
 
     yield
 
@@ -0,0 +1,109 @@
+"""
+Тесты двухуровневого кеша анализа: LRU и TTL локального уровня, чтение из Redis
+(fakeredis) с прогревом локального уровня, счётчики и работа без Redis
+"""
+import fakeredis
+import pytest
+
+from app.services import analysis_cache
+from app.services.analysis_cache import AnalysisCache
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(analysis_cache, "get_async_redis", lambda: client)
+    return client
+
+
+@pytest.fixture
+def redis_unavailable(monkeypatch):
+    calls = []
+
+    def unavailable():
+        calls.append(1)
+        raise ConnectionError("Redis недоступен")
+
+    monkeypatch.setattr(analysis_cache, "get_async_redis", unavailable)
+    return calls
+
+
+@pytest.mark.unit
+async def test_local_lru_evicts_least_recently_used(redis):
+    cache = AnalysisCache(max_entries=2, local_ttl=60)
+    await cache.set("a", {"score": 1})
+    await cache.set("b", {"score": 2})
+
+    # Чтение "a" делает её свежей - вытесняется "b"
+    assert await cache.get("a") == {"score": 1}
+    await cache.set("c", {"score": 3})
+
+    assert list(cache._local) == ["a", "c"]
+    assert cache.get_stats()["local_entries"] == 2
+
+
+@pytest.mark.unit
+async def test_evicted_key_is_served_from_redis_and_rewarmed(redis):
+    cache = AnalysisCache(max_entries=1, local_ttl=60)
+    await cache.set("a", {"score": 1})
+    await cache.set("b", {"score": 2})
+
+    assert await cache.get("a") == {"score": 1}
+    assert await cache.get("a") == {"score": 1}
+
+    stats = cache.get_stats()
+    assert stats["redis_hits"] == 1
+    assert stats["local_hits"] == 1
+    assert stats["misses"] == 0
+    assert stats["hit_ratio"] == 1.0
+    assert list(cache._local) == ["a"]
+
+
+@pytest.mark.unit
+async def test_expired_local_entry_falls_back_to_redis(redis):
+    cache = AnalysisCache(max_entries=10, local_ttl=60)
+    await cache.set("a", {"score": 1})
+    expires_at, value = cache._local["a"]
+    cache._local["a"] = (expires_at - 120, value)
+
+    assert await cache.get("a") == {"score": 1}
+    assert cache.stats["redis_hits"] == 1
+
+
+@pytest.mark.unit
+async def test_returned_value_is_a_copy(redis):
+    """Изменение полученного значения не портит кеш"""
+    cache = AnalysisCache(max_entries=10, local_ttl=60)
+    await cache.set("a", {"score": 1})
+
+    value = await cache.get("a")
+    value["score"] = 99
+
+    assert await cache.get("a") == {"score": 1}
+
+
+@pytest.mark.unit
+async def test_miss_and_corrupt_redis_value_count_as_miss(redis):
+    cache = AnalysisCache(max_entries=10, local_ttl=60)
+    await redis.set("broken", "{not json")
+
+    assert await cache.get("missing") is None
+    assert await cache.get("broken") is None
+
+    stats = cache.get_stats()
+    assert stats["misses"] == 2
+    assert stats["hit_ratio"] == 0.0
+    assert stats["redis_calls"] == 2
+
+
+@pytest.mark.unit
+async def test_redis_errors_disable_redis_level(redis_unavailable):
+    """После ошибки Redis не опрашивается, локальный уровень продолжает работать"""
+    cache = AnalysisCache(max_entries=10, local_ttl=60)
+
+    assert await cache.get("a") is None
+    await cache.set("a", {"score": 1})
+    assert await cache.get("a") == {"score": 1}
+
+    assert len(redis_unavailable) == 1
+    assert cache.get_stats()["redis_errors"] == 1
@@ -0,0 +1,201 @@
+"""
+Тесты планировщика AI анализа на fakeredis (Lua скрипты выполняются через lupa):
+лимит чанков пользователя, резерв interactive, WFQ по весам, отмена и истечение аренды
+"""
+import fakeredis
+import pytest
+
+from app.config import settings
+from app.workers import queue as analysis_queue
+from app.workers import scheduler as scheduler_module
+from app.workers.scheduler import AnalysisScheduler, PRIORITY_BULK, PRIORITY_INTERACTIVE
+
+INFLIGHT = "analysis:sched:inflight"
+
+
+class FakeJob:
+    def __init__(self, job_id: str):
+        self.id = job_id
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def enqueued(monkeypatch):
+    """Чанки, переданные в RQ (enqueue_chunk), и остановленные задачи"""
+    calls = {"chunks": [], "stopped": []}
+
+    def enqueue_chunk(chunk_id, priority):
+        calls["chunks"].append(chunk_id)
+        return FakeJob(f"job-{chunk_id}")
+
+    monkeypatch.setattr(analysis_queue, "enqueue_chunk", enqueue_chunk)
+    monkeypatch.setattr(analysis_queue, "stop_job", calls["stopped"].append)
+    return calls
+
+
+@pytest.fixture
+def scheduler(redis, enqueued, monkeypatch):
+    monkeypatch.setattr(settings, "ANALYSIS_CHUNK_SIZE", 2)
+    monkeypatch.setattr(settings, "ANALYSIS_MAX_INFLIGHT_CHUNKS", 4)
+    monkeypatch.setattr(settings, "ANALYSIS_INTERACTIVE_RESERVE", 1)
+    return AnalysisScheduler(redis=redis)
+
+
+def application_ids(count: int, prefix: str = "app"):
+    return [f"{prefix}-{i}" for i in range(count)]
+
+
+def finish(scheduler, chunk_id: str):
+    """Воркер выполнил чанк: отчёт о прогрессе и освобождение слота"""
+    chunk = scheduler.get_chunk(chunk_id)
+    size = len(chunk["application_ids"])
+    scheduler.record_progress(
+        chunk["batch_id"], {"processed_applications": size, "successful_analyses": size}, [], chunk_id=chunk_id
+    )
+    scheduler.release(chunk_id)
+    scheduler.dispatch()
+
+
+@pytest.mark.unit
+def test_tenant_cap_limits_inflight_chunks(scheduler, enqueued, redis):
+    """Пакет из трёх чанков при max_inflight=1 выполняется по одному чанку"""
+    batch_id = scheduler.submit(application_ids(6), "user-1", max_inflight=1)
+
+    assert len(enqueued["chunks"]) == 1
+    assert redis.zcard(INFLIGHT) == 1
+
+    finish(scheduler, enqueued["chunks"][0])
+    assert len(enqueued["chunks"]) == 2
+
+    finish(scheduler, enqueued["chunks"][1])
+    finish(scheduler, enqueued["chunks"][2])
+
+    batch = scheduler.get_batch(batch_id)
+    assert batch["status"] == "finished"
+    assert batch["processed_applications"] == 6
+    assert batch["progress"] == 100
+    assert redis.zcard(INFLIGHT) == 0
+
+
+@pytest.mark.unit
+def test_interactive_reserve_is_not_used_by_bulk(scheduler, enqueued):
+    """Переанализ занимает не больше global_cap - reserve слотов, новые отклики получают резерв"""
+    scheduler.submit(application_ids(20, "bulk"), "user-bulk", max_inflight=10, priority=PRIORITY_BULK)
+    assert len(enqueued["chunks"]) == 3
+
+    scheduler.submit(application_ids(2, "new"), "user-new", max_inflight=1, priority=PRIORITY_INTERACTIVE)
+    assert len(enqueued["chunks"]) == 4
+    assert scheduler.get_chunk(enqueued["chunks"][-1])["user_id"] == "user-new"
+
+
+@pytest.mark.unit
+def test_weighted_fair_share_between_tenants(scheduler, enqueued, monkeypatch):
+    """При одном слоте пользователь с весом 3 получает втрое больше чанков, чем с весом 1"""
+    monkeypatch.setattr(settings, "ANALYSIS_MAX_INFLIGHT_CHUNKS", 1)
+    monkeypatch.setattr(settings, "ANALYSIS_INTERACTIVE_RESERVE", 0)
+    scheduler.submit(application_ids(40, "light"), "light", weight=1, max_inflight=1)
+    scheduler.submit(application_ids(40, "heavy"), "heavy", weight=3, max_inflight=1)
+
+    owners = []
+    while len(owners) < 9:
+        chunk_id = enqueued["chunks"][-1]
+        owners.append(scheduler.get_chunk(chunk_id)["user_id"])
+        finish(scheduler, chunk_id)
+
+    # Первый чанк получает пользователь, поставивший пакет раньше
+    owners = owners[1:]
+    assert owners.count("heavy") == 6
+    assert owners.count("light") == 2
+
+
+@pytest.mark.unit
+def test_cancel_frees_slots_and_drops_pending_chunks(scheduler, enqueued, redis):
+    """Отмена: задачи RQ останавливаются, слоты и очередь пользователя освобождаются"""
+    batch_id = scheduler.submit(application_ids(6), "user-1", max_inflight=1)
+    running = enqueued["chunks"][0]
+
+    assert scheduler.cancel(batch_id) is True
+    assert enqueued["stopped"] == [f"job-{running}"]
+    assert redis.zcard(INFLIGHT) == 0
+    assert redis.llen("analysis:sched:pending:interactive:user-1") == 0
+    assert scheduler.get_batch(batch_id)["status"] == "canceled"
+    assert scheduler.cancel(batch_id) is False
+
+    # Остановленный чанк не дошёл до release(): слот пользователя всё равно свободен
+    scheduler.submit(application_ids(2, "next"), "user-1", max_inflight=1)
+    assert len(enqueued["chunks"]) == 2
+
+
+@pytest.mark.unit
+def test_expired_lease_requeues_chunk_without_double_counting(scheduler, enqueued, redis):
+    """Чанк упавшего воркера возвращается в очередь, его прогресс вычитается из пакета"""
+    batch_id = scheduler.submit(application_ids(2), "user-1", max_inflight=1)
+    chunk_id = enqueued["chunks"][0]
+    scheduler.start_chunk(batch_id, chunk_id)
+    scheduler.record_progress(batch_id, {"processed_applications": 1, "successful_analyses": 1}, [], chunk_id=chunk_id)
+
+    redis.zadd(INFLIGHT, {chunk_id: 0})
+    scheduler.dispatch()
+
+    assert enqueued["chunks"] == [chunk_id, chunk_id]
+    assert scheduler.get_batch(batch_id)["processed_applications"] == 0
+
+    finish(scheduler, chunk_id)
+    batch = scheduler.get_batch(batch_id)
+    assert batch["status"] == "finished"
+    assert batch["processed_applications"] == 2
+
+
+@pytest.mark.unit
+def test_chunk_fails_after_max_requeues(scheduler, enqueued, redis):
+    """После CHUNK_MAX_REQUEUES возвратов отклики чанка считаются ошибкой и пакет завершается"""
+    batch_id = scheduler.submit(application_ids(2), "user-1", max_inflight=1)
+    chunk_id = enqueued["chunks"][0]
+
+    for _ in range(scheduler_module.CHUNK_MAX_REQUEUES + 1):
+        redis.zadd(INFLIGHT, {chunk_id: 0})
+        scheduler.dispatch()
+
+    assert len(enqueued["chunks"]) == scheduler_module.CHUNK_MAX_REQUEUES + 1
+    batch = scheduler.get_batch(batch_id)
+    assert batch["status"] == "finished"
+    assert batch["failed_analyses"] == 2
+    assert batch["processed_applications"] == 2
+    assert len(batch["errors"]) == 1
+    assert redis.zcard(INFLIGHT) == 0
+
+
+@pytest.mark.unit
+def test_start_chunk_renews_lease(scheduler, enqueued, redis):
+    """Аренда отсчитывается от старта чанка воркером, а не от передачи в RQ"""
+    batch_id = scheduler.submit(application_ids(2), "user-1", max_inflight=1)
+    chunk_id = enqueued["chunks"][0]
+    redis.zadd(INFLIGHT, {chunk_id: 1})
+
+    scheduler.start_chunk(batch_id, chunk_id)
+    scheduler.dispatch()
+
+    assert enqueued["chunks"] == [chunk_id]
+    assert redis.zscore(INFLIGHT, chunk_id) > 1
+    assert scheduler.get_batch(batch_id)["status"] == "started"
+
+
+@pytest.mark.unit
+def test_submit_keeps_chunks_queued_when_enqueue_fails(scheduler, enqueued, monkeypatch, redis):
+    """Ошибка передачи в RQ не пробрасывается из submit(): чанк ждёт следующий dispatch()"""
+    def enqueue_chunk(chunk_id, priority):
+        raise ConnectionError("RQ недоступен")
+
+    monkeypatch.setattr(analysis_queue, "enqueue_chunk", enqueue_chunk)
+    batch_id = scheduler.submit(application_ids(2), "user-1", max_inflight=1)
+
+    assert scheduler.get_batch(batch_id)["status"] == "queued"
+    assert redis.llen("analysis:sched:pending:interactive:user-1") == 1
+    assert redis.zcard(INFLIGHT) == 0
+
+    monkeypatch.setattr(analysis_queue, "enqueue_chunk", lambda chunk_id, priority: FakeJob(chunk_id))
+    assert scheduler.dispatch() == 1
@@ -0,0 +1,225 @@
+"""
+Тесты single-flight AI анализа на fakeredis: владелец и ожидающие, истечение аренды
+упавшего владельца, сохранение результата владельца конвейером (attached)
+"""
+import asyncio
+import json
+import uuid
+from unittest.mock import AsyncMock, MagicMock
+
+import fakeredis
+import pytest
+
+from app.models.application import AnalysisResult, Application
+from app.models.user import User
+from app.models.vacancy import Vacancy
+from app.services import analysis_singleflight
+from app.services.analysis_singleflight import AnalysisSingleFlight
+from app.workers import analysis_pipeline
+from app.workers.analysis_pipeline import AnalysisPipeline, save_analysis_result
+from tests.conftest import TestingSessionLocal
+
+AI_RESULT = {"score": 80, "recommendation": "hire", "verdict": "High"}
+LEADER_RESULT = {"score": 55, "recommendation": "maybe", "verdict": "Medium"}
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(analysis_singleflight, "get_async_redis", lambda: client)
+    return client
+
+
+@pytest.fixture
+def flights(redis, monkeypatch):
+    monkeypatch.setattr(AnalysisSingleFlight, "POLL_INTERVAL", 0.05)
+    return AnalysisSingleFlight(lease_seconds=30, result_ttl=60)
+
+
+def counting(result, delay: float = 0.0):
+    """compute() с подсчётом вызовов"""
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return result
+
+    return compute, calls
+
+
+@pytest.mark.unit
+async def test_leader_stores_result_and_releases_lock(flights, redis):
+    """Владелец анализирует сам, повторный запрос получает его результат без анализа"""
+    compute, calls = counting(AI_RESULT)
+
+    assert await flights.run("app-1", "fp", compute) == (AI_RESULT, False)
+    assert await flights.run("app-1", "fp", compute) == (AI_RESULT, True)
+
+    assert len(calls) == 1
+    assert not await redis.exists(AnalysisSingleFlight._key("app-1", "fp", "lock"))
+    assert flights.stats == {"leaders": 1, "attached": 1, "bypassed": 0}
+
+
+@pytest.mark.unit
+async def test_concurrent_requests_share_one_analysis(flights):
+    """Одновременные запросы одного отклика: один анализ, остальные ждут результат"""
+    compute, calls = counting(AI_RESULT, delay=0.2)
+
+    results = await asyncio.gather(*(flights.run("app-1", "fp", compute) for _ in range(3)))
+
+    assert len(calls) == 1
+    assert sorted(attached for _, attached in results) == [False, True, True]
+    assert all(result == AI_RESULT for result, _ in results)
+
+
+@pytest.mark.unit
+async def test_other_fingerprint_is_analyzed_separately(flights):
+    """Изменилось содержимое (вакансия, резюме, промпт) - результат не переиспользуется"""
+    compute, calls = counting(AI_RESULT)
+
+    await flights.run("app-1", "fp-old", compute)
+    assert await flights.run("app-1", "fp-new", compute) == (AI_RESULT, False)
+    assert len(calls) == 2
+
+
+@pytest.mark.unit
+async def test_waiter_takes_over_after_lease_expiry(flights, redis):
+    """Владелец упал без результата: после истечения аренды анализ выполняет ожидающий"""
+    await redis.set(AnalysisSingleFlight._key("app-1", "fp", "lock"), "dead-owner", px=200)
+    compute, calls = counting(AI_RESULT)
+
+    assert await flights.run("app-1", "fp", compute) == (AI_RESULT, False)
+    assert len(calls) == 1
+
+
+@pytest.mark.unit
+async def test_failed_leader_does_not_block_waiters(flights):
+    """Владелец завершился без результата - ожидающий анализирует сам, а не получает пустой ответ"""
+    failed, _ = counting(None, delay=0.1)
+    compute, calls = counting(AI_RESULT)
+
+    async def waiter():
+        await asyncio.sleep(0.02)
+        return await flights.run("app-1", "fp", compute)
+
+    leader_result, waiter_result = await asyncio.gather(flights.run("app-1", "fp", failed), waiter())
+
+    assert leader_result == (None, False)
+    assert waiter_result == (AI_RESULT, False)
+    assert len(calls) == 1
+
+
+@pytest.mark.unit
+async def test_redis_error_falls_back_to_direct_analysis(monkeypatch):
+    """Redis недоступен - анализ выполняется напрямую, без дедупликации"""
+    def unavailable():
+        raise ConnectionError("Redis недоступен")
+
+    monkeypatch.setattr(analysis_singleflight, "get_async_redis", unavailable)
+    flights = AnalysisSingleFlight(lease_seconds=30, result_ttl=60)
+    compute, calls = counting(AI_RESULT)
+
+    assert await flights.run("app-1", "fp", compute) == (AI_RESULT, False)
+    assert await flights.run("app-1", "fp", compute) == (AI_RESULT, False)
+    assert len(calls) == 2
+    assert flights.stats["bypassed"] == 2
+
+
+# === Конвейер: результат, полученный от владельца ===
+
+def seed_application(db) -> str:
+    """Отклик без анализа"""
+    user = User(id=str(uuid.uuid4()), email=f"{uuid.uuid4().hex[:8]}@test.ru", password_hash="x")
+    db.add(user)
+    db.flush()
+    vacancy = Vacancy(id=str(uuid.uuid4()), user_id=user.id, hh_vacancy_id=uuid.uuid4().hex[:8], title="Менеджер WB")
+    db.add(vacancy)
+    application = Application(
+        id=str(uuid.uuid4()),
+        vacancy_id=vacancy.id,
+        hh_application_id=uuid.uuid4().hex,
+        collection_id="response",
+        status="response",
+        resume_data={"title": "Менеджер", "skill_set": ["WB"]}
+    )
+    db.add(application)
+    db.commit()
+    return application.id
+
+
+@pytest.fixture
+def pipeline(flights, monkeypatch):
+    """Конвейер на тестовой БД; анализатор не вызывается - результат уже у владельца"""
+    monkeypatch.setattr(analysis_pipeline, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(analysis_pipeline, "resolve_vacancy_profile", AsyncMock(return_value={}))
+
+    analyzer = MagicMock()
+    analyzer.result_fingerprint.return_value = "fp"
+    analyzer.analyze_resume = AsyncMock(return_value=AI_RESULT)
+
+    instance = AnalysisPipeline(ai_analyzer=analyzer, concurrency=2, max_attempts=1, publish_progress=False)
+    instance.events = AsyncMock()
+    instance.flights = flights
+    return instance
+
+
+async def publish_leader_result(redis, application_id: str):
+    """Владелец опубликовал результат в single-flight"""
+    await redis.set(AnalysisSingleFlight._key(application_id, "fp", "result"), json.dumps(LEADER_RESULT))
+
+
+def saved_scores(db, application_id: str):
+    db.expire_all()
+    return [row.score for row in db.query(AnalysisResult).filter(AnalysisResult.application_id == application_id)]
+
+
+@pytest.mark.integration
+async def test_pipeline_persists_attached_result_when_leader_did_not(pipeline, redis, db):
+    """Владелец не сохранил результат (упал после публикации) - его сохраняет ожидающий конвейер"""
+    application_id = seed_application(db)
+    await publish_leader_result(redis, application_id)
+
+    results = await pipeline.run([application_id])
+
+    pipeline.ai_analyzer.analyze_resume.assert_not_called()
+    assert saved_scores(db, application_id) == [LEADER_RESULT["score"]]
+    assert results["successful_analyses"] == 1
+    assert results["skipped_analyses"] == 0
+    assert results["failed_analyses"] == 0
+
+
+@pytest.mark.integration
+async def test_pipeline_skips_attached_result_saved_by_leader(pipeline, redis, db):
+    """Владелец уже сохранил результат - конвейер не пишет вторую строку"""
+    application_id = seed_application(db)
+    await publish_leader_result(redis, application_id)
+
+    def leader_saves(*args):
+        # Владелец сохраняет результат после загрузки отклика конвейером
+        save_analysis_result(db, application_id, LEADER_RESULT)
+        return "fp"
+
+    pipeline.ai_analyzer.result_fingerprint.side_effect = leader_saves
+
+    results = await pipeline.run([application_id])
+
+    assert saved_scores(db, application_id) == [LEADER_RESULT["score"]]
+    assert results["successful_analyses"] == 1
+    assert results["skipped_analyses"] == 1
+    assert results["processed_applications"] == 1
+
+
+@pytest.mark.integration
+async def test_pipeline_replaces_old_result_on_forced_reanalysis(pipeline, redis, db):
+    """Переанализ: старая строка не считается результатом владельца и заменяется"""
+    application_id = seed_application(db)
+    save_analysis_result(db, application_id, AI_RESULT)
+    await publish_leader_result(redis, application_id)
+    pipeline.force_reanalysis = True
+
+    results = await pipeline.run([application_id])
+
+    assert saved_scores(db, application_id) == [LEADER_RESULT["score"]]
+    assert results["skipped_analyses"] == 0
+    assert results["successful_analyses"] == 1
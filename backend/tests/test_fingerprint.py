@@ -0,0 +1,129 @@
+"""
+Тесты отпечатков кеша анализа: не меняются от порядка ключей, пробелов и служебных
+полей HH, меняются от содержимого промпта, версии промпта, модели и профиля вакансии
+"""
+import copy
+import json
+
+import pytest
+
+from app.services.fingerprint import analysis_fingerprint, resume_fingerprint, vacancy_fingerprint
+from app.services.prompt_builder import AnalysisPromptBuilder
+
+VACANCY = {
+    "title": "Менеджер маркетплейсов",
+    "area": {"id": "1", "name": "Москва"},
+    "salary_from": 100000,
+    "salary_to": 150000,
+    "key_skills": ["Wildberries", "Ozon"],
+    "description": "Ведение кабинетов WB и Ozon.\nРабота с рекламой.",
+}
+
+RESUME = {
+    "first_name": "Иван",
+    "last_name": "Петров",
+    "title": "Менеджер WB",
+    "area": {"id": "1", "name": "Москва"},
+    "total_experience": {"months": 36},
+    "salary": {"amount": 120000, "currency": "RUR"},
+    "skill_set": ["Wildberries", "Excel"],
+    "experience": [
+        {
+            "company": "ООО Ромашка",
+            "position": "Менеджер",
+            "description": "Вывел магазин в топ категории",
+            "start": "2021-03-01",
+            "end": None,
+        }
+    ],
+}
+
+
+def fingerprint(vacancy=VACANCY, resume=RESUME, prompt_version="v1", model="gpt-test", profile=None):
+    return analysis_fingerprint(vacancy, resume, prompt_version, model, vacancy_profile=profile)
+
+
+def reordered(value):
+    """Тот же JSON с обратным порядком ключей"""
+    if isinstance(value, dict):
+        return {key: reordered(value[key]) for key in reversed(list(value))}
+    if isinstance(value, list):
+        return [reordered(item) for item in value]
+    return value
+
+
+@pytest.mark.unit
+def test_key_order_does_not_change_fingerprint():
+    assert fingerprint(reordered(VACANCY), reordered(RESUME)) == fingerprint()
+
+
+@pytest.mark.unit
+def test_whitespace_does_not_change_fingerprint():
+    vacancy = dict(VACANCY, title="  Менеджер   маркетплейсов ", description="Ведение кабинетов WB и Ozon.  Работа с рекламой.")
+    resume = copy.deepcopy(RESUME)
+    resume["title"] = "Менеджер\tWB"
+    resume["experience"][0]["description"] = "Вывел магазин\n в топ категории "
+
+    assert fingerprint(vacancy, resume) == fingerprint()
+
+
+@pytest.mark.unit
+def test_resume_as_json_string_matches_dict():
+    assert fingerprint(resume=json.dumps(RESUME, ensure_ascii=False)) == fingerprint()
+
+
+@pytest.mark.unit
+def test_service_fields_do_not_change_fingerprint():
+    """Фото, даты обновления и счётчики HH не попадают в промпт и не сбрасывают кеш"""
+    resume = copy.deepcopy(RESUME)
+    resume.update(photo={"small": "https://img.hh.ru/1.jpg"}, updated_at="2024-05-01T10:00:00+0300", views=42)
+    resume["experience"][0]["start"] = "2021-03-15"
+    vacancy = dict(VACANCY, area={"id": "1", "name": "Москва", "url": "https://api.hh.ru/areas/1"}, counters={"responses": 7})
+
+    assert fingerprint(vacancy, resume) == fingerprint()
+
+
+@pytest.mark.unit
+def test_area_as_name_matches_area_object():
+    """Область строкой и справочным объектом HH - один отпечаток и одна строка в промпте"""
+    vacancy = dict(VACANCY, area="Москва")
+
+    assert fingerprint(vacancy) == fingerprint()
+    assert vacancy_fingerprint(vacancy, "v1", "gpt-test") == vacancy_fingerprint(VACANCY, "v1", "gpt-test")
+
+    builder = AnalysisPromptBuilder()
+    assert builder.vacancy_details(vacancy) == builder.vacancy_details(VACANCY)
+    assert "**Локация:** Москва" in builder.vacancy_details(VACANCY)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("change", [
+    lambda v, r: v.update(title="Менеджер Ozon"),
+    lambda v, r: v.update(salary_to=200000),
+    lambda v, r: v.update(key_skills=["Wildberries"]),
+    lambda v, r: r.update(skill_set=["Wildberries", "Excel", "SQL"]),
+    lambda v, r: r["experience"][0].update(position="Руководитель"),
+    lambda v, r: r.update(area={"id": "2", "name": "Санкт-Петербург"}),
+])
+def test_prompt_content_changes_fingerprint(change):
+    vacancy, resume = copy.deepcopy(VACANCY), copy.deepcopy(RESUME)
+    change(vacancy, resume)
+
+    assert fingerprint(vacancy, resume) != fingerprint()
+
+
+@pytest.mark.unit
+def test_prompt_version_model_and_profile_change_fingerprint():
+    base = fingerprint()
+
+    assert fingerprint(prompt_version="v2") != base
+    assert fingerprint(model="gpt-other") != base
+    assert fingerprint(profile={"profile_hash": "abc"}) != base
+    assert fingerprint(profile={"profile_hash": "abc"}) == fingerprint(profile={"profile_hash": "abc", "must_haves": []})
+
+
+@pytest.mark.unit
+def test_resume_fingerprint_depends_only_on_resume_and_version():
+    """Отпечаток резюме без вакансии: общий для всех вакансий, зависит от версии промпта"""
+    assert resume_fingerprint(RESUME, "v1", "gpt-test") == resume_fingerprint(reordered(RESUME), "v1", "gpt-test")
+    assert resume_fingerprint(RESUME, "v1", "gpt-test") != resume_fingerprint(RESUME, "v2", "gpt-test")
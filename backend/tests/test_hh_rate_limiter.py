@@ -0,0 +1,177 @@
+"""
+Тесты лимитера HH.ru: Retry-After ответа 429 блокирует все клиенты токена (fakeredis),
+локальный bucket без Redis, лимитеры и семафоры страниц по хешу токена с ограниченным размером
+"""
+import asyncio
+import time
+from collections import OrderedDict
+
+import fakeredis
+import httpx
+import pytest
+
+from app.config import settings
+from app.services import hh_client, hh_rate_limiter
+from app.services.hh_client import HHClient, _acquire_page_limiter, _release_page_limiter
+from app.services.hh_rate_limiter import HHRateLimiter, get_hh_rate_limiter, parse_retry_after, token_hash
+
+TOKEN = "employer-token-1"
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(hh_rate_limiter, "get_async_redis", lambda: client)
+    return client
+
+
+@pytest.fixture
+def redis_unavailable(monkeypatch):
+    def unavailable():
+        raise ConnectionError("Redis недоступен")
+
+    monkeypatch.setattr(hh_rate_limiter, "get_async_redis", unavailable)
+
+
+@pytest.fixture
+def limiters(monkeypatch):
+    """Пустой реестр лимитеров процесса"""
+    registry = OrderedDict()
+    monkeypatch.setattr(hh_rate_limiter, "_limiters", registry)
+    return registry
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("value, expected", [
+    ("5", 5.0),
+    ("1.5", 1.5),
+    ("-3", 0.0),
+    ("", 60.0),
+    (None, 60.0),
+    ("Wed, 21 Oct 2015 07:28:00 GMT", 60.0),
+])
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+@pytest.mark.unit
+async def test_retry_after_blocks_all_clients_of_token(redis):
+    """429 у одного процесса: другой процесс с тем же токеном ждёт, другой токен - нет"""
+    worker = HHRateLimiter(TOKEN, rate=10, burst=5)
+    api = HHRateLimiter(TOKEN, rate=10, burst=5)
+    other_token = HHRateLimiter("employer-token-2", rate=10, burst=5)
+
+    await worker.penalize(30.0)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(api.acquire(), timeout=0.2)
+    await asyncio.wait_for(other_token.acquire(), timeout=0.2)
+
+    blocked_until = int(await redis.hget(worker.key, "blocked_until"))
+    assert blocked_until - time.time() * 1000 > 29_000
+    assert (await api.get_shared_stats())["rate_limit_hits"] == 1
+
+
+@pytest.mark.unit
+async def test_acquire_resumes_after_retry_after(redis):
+    """После паузы Retry-After запрос допускается, ожидание попадает в счётчики"""
+    limiter = HHRateLimiter(TOKEN, rate=10, burst=5)
+
+    await limiter.penalize(0.3)
+    started = time.monotonic()
+    await limiter.acquire()
+
+    assert time.monotonic() - started >= 0.25
+    stats = limiter.get_stats()
+    assert stats["acquired"] == 1
+    assert stats["throttled"] == 1
+    assert stats["rate_limit_hits"] == 1
+    shared = await limiter.get_shared_stats()
+    assert shared["throttled"] == 1
+    assert shared["throttled_seconds"] >= 0.25
+
+
+@pytest.mark.unit
+async def test_burst_then_rate(redis):
+    """Всплеск до burst без ожидания, дальше - не быстрее rate"""
+    limiter = HHRateLimiter(TOKEN, rate=10, burst=3)
+
+    started = time.monotonic()
+    for _ in range(3):
+        await limiter.acquire()
+    assert time.monotonic() - started < 0.1
+
+    await limiter.acquire()
+    assert time.monotonic() - started >= 0.08
+    assert limiter.stats["throttled"] == 1
+
+
+@pytest.mark.unit
+async def test_local_bucket_honours_retry_after_without_redis(redis_unavailable):
+    limiter = HHRateLimiter(TOKEN, rate=10, burst=5)
+
+    await limiter.penalize(0.3)
+    started = time.monotonic()
+    await limiter.acquire()
+
+    assert time.monotonic() - started >= 0.25
+    assert limiter._redis_retry_at > time.monotonic()
+    assert await limiter.get_shared_stats() == {}
+
+
+@pytest.mark.unit
+async def test_client_waits_retry_after_before_retry(redis, limiters, monkeypatch):
+    """HHClient на 429 не повторяет запрос раньше Retry-After"""
+    monkeypatch.setattr(settings, "HH_MOCK_MODE", False)
+    requested_at = []
+
+    def handler(request):
+        requested_at.append(time.monotonic())
+        if len(requested_at) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0.3"})
+        return httpx.Response(200, json={"id": "employer-1"})
+
+    client = HHClient(TOKEN)
+    await client.session.aclose()
+    client.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    try:
+        assert await client._make_request("GET", "/me") == {"id": "employer-1"}
+    finally:
+        await client.close()
+
+    assert len(requested_at) == 2
+    assert requested_at[1] - requested_at[0] >= 0.25
+    assert get_hh_rate_limiter(TOKEN).stats["rate_limit_hits"] == 1
+
+
+@pytest.mark.unit
+def test_limiters_keyed_by_token_hash_and_bounded(limiters, monkeypatch):
+    """Один лимитер на токен, токен в памяти не хранится, старые токены вытесняются"""
+    monkeypatch.setattr(hh_rate_limiter, "LIMITERS_MAX", 3)
+
+    first = get_hh_rate_limiter("token-0")
+    assert get_hh_rate_limiter("token-0") is first
+    for i in range(1, 5):
+        get_hh_rate_limiter(f"token-{i}")
+
+    assert list(limiters) == [token_hash(f"token-{i}") for i in (2, 3, 4)]
+    assert all("token-" not in key and "token-" not in limiter.key for key, limiter in limiters.items())
+    assert get_hh_rate_limiter("token-0") is not first
+
+
+@pytest.mark.unit
+async def test_page_limiter_is_shared_and_removed_after_last_user(monkeypatch):
+    """Семафор страниц общий для загрузок одного токена и удаляется после последней"""
+    monkeypatch.setattr(settings, "HH_PAGE_CONCURRENCY", 2)
+
+    first = _acquire_page_limiter(TOKEN)
+    second = _acquire_page_limiter(TOKEN)
+    limiters = hh_client._page_limiters[asyncio.get_running_loop()]
+
+    assert first is second
+    assert list(limiters) == [hh_client._token_key(TOKEN)]
+
+    _release_page_limiter(TOKEN)
+    assert limiters
+    _release_page_limiter(TOKEN)
+    assert not limiters
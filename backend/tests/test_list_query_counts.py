@@ -0,0 +1,112 @@
+"""
+Регрессионные тесты списков API: число SQL запросов не зависит от размера страницы,
+JSON документы (resume_data, raw_result) не выбираются
+"""
+import re
+import uuid
+
+import pytest
+from sqlalchemy import event
+
+from app.models.application import Application
+from app.models.user import User
+from app.models.vacancy import Vacancy
+from app.services.auth_service import AuthService
+from app.workers.analysis_pipeline import save_analysis_result
+from tests.conftest import async_engine
+
+# Колонка целиком в списке выборки; выражения вида JSON_QUERY(raw_result, ...) допустимы
+BLOB_COLUMN = re.compile(r"(?<!\()\b(applications\.resume_data|analysis_results\.raw_result)\b")
+
+AI_RESULT = {
+    "score": 80,
+    "recommendation": "hire",
+    "verdict": "High",
+    "priority": "top",
+    "must_have_missing": 0,
+    "must_haves": [{"requirement": "Опыт WB", "status": "yes", "evidence": "e" * 200}],
+    "reasoning_for_hr": "r" * 2000,
+}
+
+
+def seed_vacancy(db, size: int):
+    """Вакансия с size проанализированными и size непроанализированными откликами"""
+    user = User(id=str(uuid.uuid4()), email=f"{uuid.uuid4().hex[:8]}@test.ru", password_hash="x")
+    db.add(user)
+    db.flush()
+    vacancy = Vacancy(id=str(uuid.uuid4()), user_id=user.id, hh_vacancy_id=uuid.uuid4().hex[:8], title="Менеджер WB")
+    db.add(vacancy)
+
+    application_ids = []
+    for i in range(2 * size):
+        application = Application(
+            id=str(uuid.uuid4()),
+            vacancy_id=vacancy.id,
+            hh_application_id=uuid.uuid4().hex,
+            candidate_name=f"Кандидат {i}",
+            collection_id="response",
+            status="response",
+            resume_data={"title": "Менеджер", "skill_set": ["WB"], "description": "d" * 2000}
+        )
+        db.add(application)
+        application_ids.append(application.id)
+    db.commit()
+
+    for application_id in application_ids[:size]:
+        save_analysis_result(db, application_id, AI_RESULT)
+
+    token = AuthService(None)._create_access_token({"sub": str(user.id), "email": user.email, "role": "user"})
+    return vacancy.id, {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def statements():
+    """SQL запросы async движка за время теста"""
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        captured.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    yield captured
+    event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+# URL, ключ списка в ответе, строк на единицу size (seed_vacancy: size с анализом и size без)
+LIST_URLS = [
+    ("/api/analysis/results?limit=100", "results", 1),
+    ("/api/applications/unanalyzed?limit=100", "applications", 1),
+    ("/api/hh/vacancies/{vacancy_id}/applications?limit=100", "applications", 2),
+]
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("url,key,rows_per_size", LIST_URLS)
+def test_list_query_count_does_not_depend_on_size(client, db, statements, url, key, rows_per_size):
+    """Число запросов одинаково для 3 и 15 строк - без запроса на строку"""
+    counts = []
+    for size in (3, 15):
+        vacancy_id, headers = seed_vacancy(db, size)
+        statements.clear()
+        response = client.get(url.format(vacancy_id=vacancy_id), headers=headers)
+        assert response.status_code == 200
+        assert len(response.json()["data"][key]) == size * rows_per_size
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1]
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("url,key,rows_per_size", LIST_URLS)
+def test_list_does_not_select_json_documents(client, db, statements, url, key, rows_per_size):
+    """resume_data и raw_result целиком не выбираются списками"""
+    vacancy_id, headers = seed_vacancy(db, 3)
+    statements.clear()
+    response = client.get(url.format(vacancy_id=vacancy_id), headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["data"][key]) == 3 * rows_per_size
+
+    selects = [statement for statement in statements if statement.lstrip().upper().startswith("SELECT")]
+    assert selects
+    for statement in selects:
+        assert not BLOB_COLUMN.search(statement), statement
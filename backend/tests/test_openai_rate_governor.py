@@ -0,0 +1,138 @@
+"""
+Тесты лимитера OpenAI: разбор заголовков x-ratelimit-* и retry-after, общий bucket
+в Redis (fakeredis), блокировка всех процессов по 429, локальный bucket без Redis
+"""
+import fakeredis
+import pytest
+
+from app.services import openai_rate_governor
+from app.services.openai_rate_governor import (
+    OpenAIRateGovernor,
+    _LocalBucket,
+    estimate_tokens,
+    parse_reset_duration,
+    retry_after_seconds,
+)
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(openai_rate_governor, "get_async_redis", lambda: client)
+    return client
+
+
+@pytest.fixture
+def redis_unavailable(monkeypatch):
+    def unavailable():
+        raise ConnectionError("Redis недоступен")
+
+    monkeypatch.setattr(openai_rate_governor, "get_async_redis", unavailable)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("value, expected", [
+    ("20ms", 20),
+    ("1s", 1000),
+    ("6m0s", 360_000),
+    ("1h2m", 3_720_000),
+    ("0.5s", 500),
+    ("1.5", 1500),
+    ("", None),
+    (None, None),
+    ("скоро", None),
+])
+def test_parse_reset_duration(value, expected):
+    assert parse_reset_duration(value) == expected
+
+
+@pytest.mark.unit
+def test_retry_after_prefers_milliseconds_header():
+    assert retry_after_seconds({"retry-after-ms": "1500", "retry-after": "7"}) == 1.5
+    assert retry_after_seconds({"retry-after": "7"}) == 7.0
+    assert retry_after_seconds({"retry-after-ms": "abc", "retry-after": "2"}) == 2.0
+    assert retry_after_seconds({}) is None
+
+
+@pytest.mark.unit
+def test_estimate_tokens_reserves_max_tokens():
+    messages = [{"role": "system", "content": "а" * 300}, {"role": "user", "content": None}]
+    assert estimate_tokens(messages, max_tokens=500) == 600
+
+
+@pytest.mark.unit
+def test_local_bucket_refills_over_window():
+    """1 запрос в минуту: второй ждёт минуту, после окна допускается"""
+    bucket = _LocalBucket(rpm=1, tpm=10_000)
+    now = bucket.ts
+
+    assert bucket.acquire(now, 100) == 0
+    assert bucket.acquire(now, 100) == 60_000
+    assert bucket.acquire(now + 60_000, 100) == 0
+
+
+@pytest.mark.unit
+async def test_shared_bucket_limits_requests_across_processes(redis):
+    """Два процесса (экземпляра) берут запросы из одного bucket в Redis"""
+    first = OpenAIRateGovernor("gpt-test", rpm=2, tpm=100_000)
+    second = OpenAIRateGovernor("gpt-test", rpm=2, tpm=100_000)
+
+    await first.acquire(1000, max_wait=0)
+    await second.acquire(1000, max_wait=0)
+    await second.acquire(1000, max_wait=0)
+
+    assert first.stats["acquired"] == 1
+    assert second.stats["acquired"] == 1
+    assert float(await redis.hget("openai:ratelimit:gpt-test", "req")) < 1
+
+
+@pytest.mark.unit
+async def test_exhausted_headers_block_until_reset(redis):
+    """Остаток токенов 0 в заголовках - допуск закрыт до x-ratelimit-reset-tokens"""
+    governor = OpenAIRateGovernor("gpt-test", rpm=100, tpm=100_000)
+
+    await governor.update_from_headers({
+        "x-ratelimit-limit-requests": "500",
+        "x-ratelimit-limit-tokens": "200000",
+        "x-ratelimit-remaining-requests": "499",
+        "x-ratelimit-remaining-tokens": "0",
+        "x-ratelimit-reset-tokens": "6m0s",
+    })
+    await governor.acquire(1000, max_wait=0)
+
+    state = await redis.hgetall("openai:ratelimit:gpt-test")
+    assert float(state["req_cap"]) == 500
+    assert float(state["tok_cap"]) == 200_000
+    assert int(state["blocked_until"]) - int(state["ts"]) == 360_000
+    assert governor.stats["acquired"] == 0
+
+
+@pytest.mark.unit
+async def test_penalize_blocks_all_processes(redis):
+    """429 в одном процессе приостанавливает запросы всех"""
+    worker = OpenAIRateGovernor("gpt-test", rpm=100, tpm=100_000)
+    api = OpenAIRateGovernor("gpt-test", rpm=100, tpm=100_000)
+
+    await worker.penalize(5.0)
+    await api.acquire(1000, max_wait=0)
+
+    assert worker.stats["rate_limit_hits"] == 1
+    assert api.stats["acquired"] == 0
+    assert worker.get_stats()["throttled_seconds"] == 0
+
+
+@pytest.mark.unit
+async def test_local_bucket_used_when_redis_unavailable(redis_unavailable):
+    """Без Redis: локальный bucket соблюдает RPM и блокировку по 429, Redis не опрашивается 30s"""
+    governor = OpenAIRateGovernor("gpt-test", rpm=1, tpm=100_000)
+
+    await governor.acquire(1000, max_wait=0)
+    await governor.acquire(1000, max_wait=0)
+    assert governor.stats["acquired"] == 1
+    assert governor._redis_retry_at > 0
+
+    governor._local = _LocalBucket(rpm=100, tpm=100_000)
+    await governor.penalize(5.0)
+    await governor.acquire(1000, max_wait=0)
+    assert governor.stats["acquired"] == 1
+    assert governor._local.blocked_until > governor._local.ts
@@ -0,0 +1,223 @@
+"""
+Тесты курсорной пагинации (pagination v2): курсор, условие после курсора при смешанных
+направлениях сортировки, отказ на повреждённый или чужой курсор, обход /api/analysis/results
+"""
+import base64
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, func, select
+
+from app.models.application import Application
+from app.models.user import User
+from app.models.vacancy import Vacancy
+from app.services.auth_service import AuthService
+from app.utils.exceptions import ValidationError
+from app.utils.pagination import Keyset, SortKey, cursor_pagination
+from app.workers.analysis_pipeline import save_analysis_result
+
+metadata = MetaData()
+items = Table(
+    "items",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("score", Integer, nullable=True),
+    Column("name", String, nullable=False),
+)
+
+# score по убыванию (NULL последними), name и id по возрастанию
+ITEMS_KEYSET = Keyset(
+    "items.score",
+    SortKey(func.coalesce(items.c.score, -1), lambda row: row.score if row.score is not None else -1, descending=True),
+    SortKey(items.c.name, lambda row: row.name),
+    SortKey(items.c.id, lambda row: row.id),
+)
+
+ITEMS = [
+    {"id": i, "score": score, "name": name}
+    for i, (score, name) in enumerate(
+        [(90, "b"), (90, "a"), (None, "c"), (75, "a"), (90, "a"), (None, "a"), (0, "z"), (75, "b"), (None, "c")],
+        start=1
+    )
+]
+
+
+@pytest.fixture
+def connection():
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    with engine.connect() as conn:
+        conn.execute(items.insert(), ITEMS)
+        yield conn
+
+
+def read_all_pages(conn, keyset: Keyset, limit: int):
+    """Обход всех страниц по курсорам"""
+    ids, cursor, pages = [], None, 0
+    while True:
+        after = keyset.decode(cursor)
+        rows, cursor = keyset.page(conn.execute(keyset.apply(select(items), after, limit)).all(), limit)
+        ids.extend(row.id for row in rows)
+        pages += 1
+        if cursor is None:
+            return ids, pages
+
+
+def encode_payload(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+@pytest.mark.unit
+def test_cursor_round_trip():
+    """Курсор возвращает значения ключей строки, включая datetime"""
+    created = datetime(2024, 1, 10, 9, 15, 30)
+    keyset = Keyset(
+        "test.created",
+        SortKey(items.c.name, lambda row: row["created"], descending=True),
+        SortKey(items.c.id, lambda row: row["id"]),
+    )
+
+    cursor = keyset.encode({"created": created, "id": "a1"})
+
+    assert "=" not in cursor
+    assert keyset.decode(cursor) == [created, "a1"]
+    assert keyset.decode(None) is None
+    assert keyset.decode("") is None
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("limit", [1, 2, 4, 20])
+def test_pages_follow_mixed_direction_order(connection, limit):
+    """Страницы по курсору совпадают с ORDER BY без пропусков и повторов, NULL score - последними"""
+    expected = [row.id for row in connection.execute(select(items).order_by(*ITEMS_KEYSET.order_by()))]
+
+    ids, pages = read_all_pages(connection, ITEMS_KEYSET, limit)
+
+    assert ids == expected
+    assert pages == max(1, -(-len(ITEMS) // limit))
+    assert [ITEMS[i - 1]["score"] for i in ids[-3:]] == [None, None, None]
+
+
+@pytest.mark.unit
+def test_after_respects_each_key_direction(connection):
+    """После (90, "a", 2): score 90 с name > "a" или name = "a" и id > 2, затем score < 90"""
+    rows = connection.execute(
+        select(items.c.id).where(ITEMS_KEYSET.after([90, "a", 2])).order_by(*ITEMS_KEYSET.order_by())
+    ).scalars().all()
+
+    assert rows == [5, 1, 4, 8, 7, 6, 3, 9]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("cursor", [
+    "не-base64!",
+    encode_payload("строка вместо объекта")[:-1],
+    base64.urlsafe_b64encode(b"{not json").decode(),
+    encode_payload({"k": "items.score"}),
+])
+def test_corrupt_cursor_is_rejected(cursor):
+    with pytest.raises(ValidationError):
+        ITEMS_KEYSET.decode(cursor)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("payload", [
+    {"k": "analysis.verdict", "v": [90, "a", 1]},
+    {"k": "items.score", "v": [90, 1]},
+])
+def test_cursor_of_other_sort_is_rejected(payload):
+    """Курсор другой сортировки или с другим числом ключей не применяется"""
+    with pytest.raises(ValidationError):
+        ITEMS_KEYSET.decode(encode_payload(payload))
+
+
+@pytest.mark.unit
+def test_cursor_pagination_block():
+    assert cursor_pagination("abc") == {
+        "version": 2, "next_cursor": "abc", "has_more": True, "total": None, "total_is_estimate": False
+    }
+    assert cursor_pagination(None, 10, total_is_estimate=True)["has_more"] is False
+
+
+# === /api/analysis/results ===
+
+SCORES = [90, 90, 75, None, 60, 90, None, 40]
+
+
+def seed_results(db):
+    """Вакансия с результатами анализа, включая одинаковые и пустые score"""
+    user = User(id=str(uuid.uuid4()), email=f"{uuid.uuid4().hex[:8]}@test.ru", password_hash="x")
+    db.add(user)
+    db.flush()
+    vacancy = Vacancy(id=str(uuid.uuid4()), user_id=user.id, hh_vacancy_id=uuid.uuid4().hex[:8], title="Менеджер WB")
+    db.add(vacancy)
+
+    application_ids = []
+    for i in range(len(SCORES)):
+        application = Application(
+            id=str(uuid.uuid4()),
+            vacancy_id=vacancy.id,
+            hh_application_id=uuid.uuid4().hex,
+            candidate_name=f"Кандидат {i}",
+            collection_id="response",
+            status="response",
+            resume_data={"title": "Менеджер"}
+        )
+        db.add(application)
+        application_ids.append(application.id)
+    db.commit()
+
+    for application_id, score in zip(application_ids, SCORES):
+        save_analysis_result(db, application_id, {"score": score, "recommendation": "maybe", "verdict": "Medium"})
+
+    token = AuthService(None)._create_access_token({"sub": str(user.id), "email": user.email, "role": "user"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("sort_by", ["score", "verdict"])
+def test_results_pages_through_cursor(client, db, sort_by):
+    """Обход /results по курсору: все результаты ровно по одному разу, score по убыванию"""
+    headers = seed_results(db)
+    ids, scores, cursor, pages = [], [], "", 0
+
+    while cursor is not None:
+        response = client.get(
+            "/api/analysis/results", params={"cursor": cursor, "limit": 3, "sort_by": sort_by}, headers=headers
+        )
+        assert response.status_code == 200
+        data = response.json()["data"]
+        ids.extend(item["id"] for item in data["results"])
+        scores.extend(item["score"] for item in data["results"])
+        pagination = data["pagination"]
+        assert pagination["version"] == 2
+        assert pagination["total"] is None
+        assert pagination["has_more"] is (pagination["next_cursor"] is not None)
+        cursor = pagination["next_cursor"]
+        pages += 1
+
+    assert pages == 3
+    assert len(ids) == len(set(ids)) == len(SCORES)
+    assert scores == [90, 90, 90, 75, 60, 40, None, None]
+
+
+@pytest.mark.integration
+def test_results_include_total_with_cursor(client, db):
+    headers = seed_results(db)
+
+    response = client.get("/api/analysis/results", params={"cursor": "", "limit": 3, "include_total": True}, headers=headers)
+
+    assert response.json()["data"]["pagination"]["total"] == len(SCORES)
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("cursor", ["мусор", encode_payload({"k": "items.score", "v": [90, "a", 1]})])
+def test_results_reject_bad_cursor(client, db, cursor):
+    """Повреждённый курсор или курсор другого списка - 400, а не 500"""
+    headers = seed_results(db)
+
+    response = client.get("/api/analysis/results", params={"cursor": cursor}, headers=headers)
+
+    assert response.status_code == 400
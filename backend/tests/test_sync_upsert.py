@@ -0,0 +1,182 @@
+"""
+Тесты пакетного upsert откликов при синхронизации с HH.ru: повторная синхронизация
+той же страницы ничего не пишет (SQLite - чанками, PostgreSQL - ON CONFLICT ... WHERE)
+"""
+import os
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.models.application import Application
+from app.models.user import User
+from app.models.vacancy import Vacancy
+from app.workers import sync_jobs
+from app.workers.sync_jobs import _upsert_applications, _upsert_rows
+
+# PostgreSQL путь проверяется на реальной БД, если она задана (все изменения откатываются)
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+
+def hh_page(size: int, state: str = "response"):
+    """Страница откликов в формате HH.ru API"""
+    return [
+        {
+            "id": f"negotiation-{i}",
+            "_collection_id": "response",
+            "state": {"id": state},
+            "resume": {
+                "id": f"resume-{i}",
+                "first_name": "Иван",
+                "last_name": f"Кандидат {i}",
+                "title": "Менеджер маркетплейсов",
+                "skill_set": ["WB", "Ozon"],
+            },
+        }
+        for i in range(size)
+    ]
+
+
+def seed_vacancy(db) -> str:
+    user = User(id=str(uuid.uuid4()), email=f"{uuid.uuid4().hex[:8]}@test.ru", password_hash="x")
+    db.add(user)
+    db.flush()
+    vacancy = Vacancy(id=str(uuid.uuid4()), user_id=user.id, hh_vacancy_id=uuid.uuid4().hex[:8], title="Менеджер WB")
+    db.add(vacancy)
+    db.commit()
+    return vacancy.id
+
+
+def capture_writes(db):
+    """INSERT/UPDATE запросы сессии за время теста"""
+    writes = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("INSERT", "UPDATE")):
+            writes.append(statement)
+
+    event.listen(db.get_bind(), "before_cursor_execute", before_cursor_execute)
+    return writes
+
+
+def application_count(db, vacancy_id: str) -> int:
+    return db.query(Application).filter(Application.vacancy_id == vacancy_id).count()
+
+
+@pytest.mark.integration
+async def test_second_sync_of_same_page_writes_nothing(db, monkeypatch):
+    """SQLite: повторная страница без изменений - ни одного INSERT/UPDATE"""
+    monkeypatch.setattr(sync_jobs, "UPSERT_CHUNK_SIZE", 2)
+    vacancy_id = seed_vacancy(db)
+    page = hh_page(5)
+
+    assert await _upsert_applications(db, vacancy_id, page) == (5, 0)
+
+    writes = capture_writes(db)
+    assert await _upsert_applications(db, vacancy_id, page) == (0, 0)
+    assert writes == []
+    assert application_count(db, vacancy_id) == 5
+
+
+@pytest.mark.integration
+async def test_changed_application_is_updated(db):
+    """Изменился один отклик - обновляется только он"""
+    vacancy_id = seed_vacancy(db)
+    page = hh_page(3)
+    await _upsert_applications(db, vacancy_id, page)
+
+    page[1]["state"] = {"id": "invitation"}
+    assert await _upsert_applications(db, vacancy_id, page) == (1, 0)
+
+    db.expire_all()
+    states = {
+        row.hh_application_id: row.state
+        for row in db.query(Application).filter(Application.vacancy_id == vacancy_id)
+    }
+    assert states == {"negotiation-0": "response", "negotiation-1": "invitation", "negotiation-2": "response"}
+
+
+@pytest.mark.integration
+async def test_full_sync_rewrites_unchanged_rows(db):
+    """skip_unchanged=False (полная синхронизация) перезаписывает отклики с тем же хешем"""
+    vacancy_id = seed_vacancy(db)
+    page = hh_page(3)
+    await _upsert_applications(db, vacancy_id, page)
+
+    assert await _upsert_applications(db, vacancy_id, page, skip_unchanged=False) == (3, 0)
+    assert application_count(db, vacancy_id) == 3
+
+
+@pytest.mark.integration
+async def test_duplicate_rows_in_page_are_collapsed(db):
+    """Один отклик дважды на странице - одна строка, побеждает последняя версия"""
+    vacancy_id = seed_vacancy(db)
+    page = hh_page(2)
+    duplicate = dict(page[0], state={"id": "discard"})
+
+    assert await _upsert_applications(db, vacancy_id, page + [duplicate]) == (2, 0)
+
+    row = db.query(Application).filter(Application.hh_application_id == "negotiation-0").one()
+    assert row.state == "discard"
+
+
+class RecordingSession:
+    """Сессия с диалектом PostgreSQL: запрос _upsert_rows сохраняется, а не выполняется"""
+
+    dialect = postgresql.dialect()
+
+    class Result:
+        rowcount = 0
+
+    def __init__(self):
+        self.statements = []
+
+    def get_bind(self):
+        return self
+
+    def execute(self, statement):
+        self.statements.append(statement)
+        return self.Result()
+
+
+@pytest.mark.unit
+def test_postgres_upsert_skips_rows_with_same_content_hash():
+    """PostgreSQL: один INSERT ... ON CONFLICT, обновление только при другом content_hash"""
+    session = RecordingSession()
+    rows = [sync_jobs._application_values("vacancy-1", item) for item in hh_page(3)]
+
+    _upsert_rows(session, Application, rows, ("hh_application_id",), "content_hash")
+
+    assert len(session.statements) == 1
+    sql = str(session.statements[0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (hh_application_id) DO UPDATE" in sql
+    assert "WHERE applications.content_hash IS DISTINCT FROM excluded.content_hash" in sql
+
+
+@pytest.mark.integration
+@pytest.mark.skipif(not TEST_POSTGRES_URL, reason="TEST_POSTGRES_URL не задан")
+async def test_postgres_second_sync_of_same_page_writes_nothing():
+    """PostgreSQL: повторная страница без изменений - ON CONFLICT не обновляет ни одной строки"""
+    engine = create_engine(TEST_POSTGRES_URL)
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = Session(bind=connection, join_transaction_mode="create_savepoint")
+    try:
+        Base.metadata.create_all(bind=connection)
+        vacancy_id = seed_vacancy(db)
+        page = hh_page(5)
+
+        assert await _upsert_applications(db, vacancy_id, page) == (5, 0)
+        assert await _upsert_applications(db, vacancy_id, page) == (0, 0)
+
+        page[2]["state"] = {"id": "invitation"}
+        assert await _upsert_applications(db, vacancy_id, page) == (1, 0)
+        assert application_count(db, vacancy_id) == 5
+    finally:
+        db.close()
+        transaction.rollback()
+        connection.close()
+        engine.dispose()
@@ -478,10 +478,25 @@ const Analysis: React.FC = () => {
   const toggleExpanded = (id: string) => {
     const newSet = new Set(expandedResults);
     if (newSet.has(id)) newSet.delete(id);
-    else newSet.add(id);
+    else {
+      newSet.add(id);
+      loadResultDetails(id);
+    }
     setExpandedResults(newSet);
   };
 
+  // List rows carry summary fields only; reasoning and questions are loaded on expand
+  const loadResultDetails = async (id: string) => {
+    const current = results.find((r) => r.id === id);
+    if (!current || current.raw_result) return;
+    try {
+      const details = await apiClient.getAnalysisResult(id);
+      setResults((prev) => prev.map((r) => (r.id === id ? { ...r, ...details, application: r.application } : r)));
+    } catch (err) {
+      console.error('Failed to load analysis details:', err);
+    }
+  };
+
   // Computed values
   const progressPercent = analysisProgress.total > 0
     ? Math.round((analysisProgress.analyzed / analysisProgress.total) * 100)
@@ -21,7 +21,8 @@ import type {
   Subscription,
   UsageStatistics,
   UpgradeSubscriptionRequest,
-  LimitsCheck
+  LimitsCheck,
+  AreaSuggestion
 } from '@/types';
 
 // Базовая конфигурация API
@@ -570,6 +571,14 @@ class ApiClient {
     return response.data.data;
   }
 
+  async suggestAreas(query: string, limit = 10, parentId?: string): Promise<AreaSuggestion[]> {
+    const response = await this.client.get<ApiResponse<{ items: AreaSuggestion[] }>>(
+      '/api/resume-search/areas/suggest',
+      { params: { q: query, limit, parent_id: parentId } }
+    );
+    return response.data.data?.items ?? [];
+  }
+
   // Публичные HTTP методы для прямых запросов
   public get<T = any>(url: string, config?: any): Promise<AxiosResponse<T>> {
     return this.client.get<T>(url, config);
@@ -518,6 +518,13 @@ export interface DictionaryItem {
   name: string;
 }
 
+export interface AreaSuggestion {
+  id: string;
+  name: string;
+  parent_id: string | null;
+  path: string;
+}
+
 export interface SearchDictionaries {
   experience: DictionaryItem[];
   education_level: DictionaryItem[];